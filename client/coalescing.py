@@ -0,0 +1,39 @@
+import asyncio
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers asking for the same key."""
+
+    def __init__(self):
+        self.flights = {}  # Key -> task of the call currently in flight
+        self.calls = 0  # Calls made through do()
+        self.executions = 0  # Calls that actually ran fn
+
+    async def do(self, key, fn):
+        """Await fn() for key, joining an identical call already in flight if there is one."""
+        self.calls += 1
+        task = self.flights.get(key)
+        if task is None:
+            self.executions += 1
+            task = asyncio.ensure_future(fn())
+            self.flights[key] = task
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        # Shield so one cancelled caller does not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self.flights.get(key) is task:
+            del self.flights[key]
+
+    def forget(self, key):
+        """Stop new callers from joining the call in flight for key (e.g. after a write)."""
+        self.flights.pop(key, None)
+
+    def snapshot(self):
+        """Return call counters and the coalescing ratio (calls per execution)."""
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.calls - self.executions,
+            "coalescing_ratio": self.calls / self.executions if self.executions else 1.0,
+        }
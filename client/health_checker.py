@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+
+import grpc
+import kvstore_pb2
+import kvstore_pb2_grpc
+
+
+CHANNEL_OPTIONS = [("grpc.initial_reconnect_backoff_ms", 100), ("grpc.min_reconnect_backoff_ms", 100),
+                   ("grpc.max_reconnect_backoff_ms", 1000)]  # Notice a recovered server within a second
+
+
+class Endpoint:
+    """Connection and health state for one server."""
+
+    def __init__(self, address):
+        self.address = address
+        self.channel = None
+        self.stub = None
+        self.healthy = True  # Optimistic until the failure detector says otherwise
+        self.consecutive_failures = 0
+        self.down_since = None  # time.monotonic() when the endpoint was marked down
+
+    def connect(self):
+        """
+        Open the channel if it is not open yet and return the stub.
+
+        The channel is kept until close(), reconnecting by itself, so calls and
+        streams running on it are never cut by a health check.
+        """
+        if self.stub is None:
+            self.channel = grpc.aio.insecure_channel(self.address, options=CHANNEL_OPTIONS)
+            self.stub = kvstore_pb2_grpc.KeyValueStoreStub(self.channel)
+        return self.stub
+
+    async def close(self):
+        """Close the channel if one is open."""
+        if self.channel is not None:
+            await self.channel.close()
+        self.channel = None
+        self.stub = None
+
+
+class FailureDetector:
+    """Marks an endpoint down after failure_threshold consecutive failed probes."""
+
+    def __init__(self, failure_threshold=3):
+        self.failure_threshold = failure_threshold
+
+    def record_success(self, endpoint):
+        """Record a successful probe or RPC; return True if the endpoint just recovered."""
+        endpoint.consecutive_failures = 0
+        if not endpoint.healthy:
+            endpoint.healthy = True
+            logging.info(f"Endpoint {endpoint.address} is back up after {time.monotonic() - endpoint.down_since:.2f}s")
+            endpoint.down_since = None
+            return True
+        return False
+
+    def record_failure(self, endpoint):
+        """Record a failed probe; return True if the endpoint was just marked down."""
+        endpoint.consecutive_failures += 1
+        if endpoint.healthy and endpoint.consecutive_failures >= self.failure_threshold:
+            self.mark_down(endpoint)
+            return True
+        return False
+
+    def mark_down(self, endpoint):
+        """Mark an endpoint down immediately (e.g. after an UNAVAILABLE RPC)."""
+        if endpoint.healthy:
+            endpoint.healthy = False
+            endpoint.down_since = time.monotonic()
+            logging.warning(f"Endpoint {endpoint.address} marked down")
+
+
+class RetryBudget:
+    """Token bucket limiting retries to a fraction of requests."""
+
+    def __init__(self, ratio=0.2, reserve=10):
+        self.ratio = ratio  # Tokens earned per request
+        self.reserve = reserve  # Bucket size, so a cold client can still fail over
+        self.tokens = float(reserve)
+
+    def on_request(self):
+        """Credit the bucket for one request."""
+        self.tokens = min(self.reserve, self.tokens + self.ratio)
+
+    def try_acquire(self):
+        """Spend one token for a retry; return False if the budget is exhausted."""
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class HealthChecker:
+    """Background task that pings every endpoint."""
+
+    def __init__(self, endpoints, detector, interval=1.0, timeout=0.5):
+        self.endpoints = endpoints  # List of Endpoint objects
+        self.detector = detector
+        self.interval = interval  # Seconds between probe rounds
+        self.timeout = timeout  # Ping deadline in seconds
+        self.task = None
+
+    def start(self):
+        """Start the probe loop on the running event loop."""
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the probe loop."""
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _probe(self, endpoint):
+        """Ping one endpoint and feed the result to the failure detector."""
+        try:
+            await endpoint.connect().Ping(kvstore_pb2.PingRequest(), timeout=self.timeout)
+            self.detector.record_success(endpoint)
+        except (grpc.RpcError, asyncio.TimeoutError) as e:
+            logging.debug(f"Health check to {endpoint.address} failed: {e}")
+            self.detector.record_failure(endpoint)
+
+    async def _run(self):
+        while True:
+            await asyncio.gather(*[self._probe(endpoint) for endpoint in self.endpoints])
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,71 @@
+import collections
+import math
+
+
+class LatencyTracker:
+    """Sliding window of recent request latencies used to pick the hedge delay."""
+
+    def __init__(self, window=1000, refresh_every=32):
+        self.samples = collections.deque(maxlen=window)  # Latencies in seconds
+        self.refresh_every = refresh_every  # Recompute percentiles every N samples
+        self._since_refresh = 0
+        self._sorted = []
+
+    def record(self, latency):
+        """Add a latency sample (seconds)."""
+        self.samples.append(latency)
+        self._since_refresh += 1
+        if self._since_refresh >= self.refresh_every or len(self._sorted) < self.refresh_every:
+            self._sorted = sorted(self.samples)
+            self._since_refresh = 0
+
+    def percentile(self, pct):
+        """Return the pct-th percentile of the window, or None if it is empty."""
+        if not self._sorted:
+            return None
+        index = min(len(self._sorted) - 1, max(0, math.ceil(pct / 100.0 * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class HedgeBudget:
+    """Token bucket that caps hedged requests to a fraction of all requests."""
+
+    def __init__(self, ratio=0.1, burst=10):
+        self.ratio = ratio  # Tokens earned per request
+        self.burst = burst  # Maximum tokens that can be saved up
+        self.tokens = float(burst)
+
+    def on_request(self):
+        """Credit the bucket for one primary request."""
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def try_acquire(self):
+        """Spend one token for a hedge; return False if the budget is exhausted."""
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        return False
+
+
+class HedgeStats:
+    """Counters describing how hedging behaved."""
+
+    def __init__(self):
+        self.requests = 0  # GETs issued with hedging enabled
+        self.hedges = 0  # Secondary requests actually sent
+        self.wins = 0  # Hedges that answered before the primary
+        self.throttled = 0  # Hedges skipped because the budget was exhausted
+
+    def snapshot(self):
+        """Return the counters plus derived rates as a dict."""
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "wins": self.wins,
+            "throttled": self.throttled,
+            "hedge_rate": self.hedges / self.requests if self.requests else 0.0,
+            "win_rate": self.wins / self.hedges if self.hedges else 0.0,
+        }
@@ -1,87 +1,357 @@
 import sys
 import os
 import grpc
+import time
 
 # sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../server")))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 import kvstore_pb2
-import kvstore_pb2_grpc
 import asyncio
 import logging
 
+from hedging import LatencyTracker, HedgeBudget, HedgeStats  # Hedged GET support
+from health_checker import Endpoint, FailureDetector, HealthChecker, RetryBudget  # Failover support
+from coalescing import SingleFlight  # Coalesce concurrent identical GETs
+from write_batcher import WriteBatcher  # Client-side write batching
+from near_cache import NearCache  # Near-cache with server-pushed invalidations
+
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+READ_OPERATIONS = {"get", "get_bytes", "list_keys", "stats"}  # Safe to resend to another server
+RETRYABLE_CODES = {grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED}
+
+def consistency_level(consistency):
+    """Map "ONE", "QUORUM" or "ALL" (None for the server default) to the protobuf enum."""
+    if consistency is None:
+        return kvstore_pb2.DEFAULT
+    return kvstore_pb2.Consistency.Value(consistency.upper())
+
 class KeyValueClient:
     """
     A gRPC-based asynchronous client for interacting with a distributed key-value store.
     Supports key-value operations such as Put, Get, Delete, ListKeys, and Backup.
 
+    With hedge=True, a GET that has not been answered within the hedge_percentile
+    of recent GET latency is also sent to a second replica; the first response wins
+    and the other call is cancelled. hedge_budget caps hedges to that fraction of GETs.
+
+    With failover=True, every server is pinged in the background; a server that
+    fails failure_threshold probes (or returns UNAVAILABLE) is marked down and
+    later operations go to the next healthy server. Reads that fail are retried
+    there, limited by retry_budget; writes are not, as the failed server may have
+    applied them. Down servers are used again once they answer.
+
+    With coalesce_gets=True, concurrent GETs for the same key share one RPC. A PUT or
+    DELETE of the key detaches the in-flight GET so later reads see the write.
+
+    With batch_writes=True, PUTs and DELETEs are buffered for up to linger_ms (or
+    max_batch_size writes) and sent as one BatchWrite RPC. Each caller still gets
+    its own old value, and writes are applied in the order they were issued.
+
+    With near_cache=True, GET results are kept in a bounded LRU cache invalidated by
+    the server's WatchInvalidations stream, so hits skip the network. If the stream
+    drops, cached entries are only trusted for near_cache_ttl seconds until it is back.
     """
 
 
-    def __init__(self, server_list=None):
+    def __init__(self, server_list=None, hedge=False, hedge_percentile=95, hedge_budget=0.1,
+                 hedge_min_delay=0.002, failover=False, health_check_interval=1.0,
+                 failure_threshold=3, retry_budget=0.2, coalesce_gets=False,
+                 batch_writes=False, linger_ms=5, max_batch_size=100,
+                 near_cache=False, near_cache_size=1000, near_cache_ttl=5.0):
         """Initialize client with a list of servers."""
         self.servers = server_list if server_list else ["localhost:50051"]
         self.channel = None
         self.stub = None
+        self.connected_server = None
+        self.endpoints = {}  # Address -> Endpoint, channels opened lazily
+
+        # Hedged reads
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay  # Floor for the hedge delay (seconds)
+        self.latency_tracker = LatencyTracker()
+        self.hedge_budget = HedgeBudget(ratio=hedge_budget)
+        self.hedge_stats = HedgeStats()
+
+        # Health checks and failover
+        self.failover = failover
+        self.failure_detector = FailureDetector(failure_threshold)
+        self.retry_budget = RetryBudget(ratio=retry_budget)
+        self.health_checker = None
+        self.health_check_interval = health_check_interval
+        self.failovers = 0  # Number of times the primary server changed
+        self.retries = 0
+        self.retries_throttled = 0
+
+        # Single-flight GETs
+        self.coalesce_gets = coalesce_gets
+        self.get_flights = SingleFlight()
+
+        # Write batching
+        self.batch_writes = batch_writes
+        self.write_batcher = WriteBatcher(self._send_batch, linger=linger_ms / 1000.0,
+                                          max_batch_size=max_batch_size)
+
+        # Near-cache
+        self.near_cache = NearCache(near_cache_size, near_cache_ttl) if near_cache else None
+        self.invalidation_task = None
 
     async def initialize(self):
         await self.kv_init(self.servers)  
 
 
 
+    def _endpoint(self, server):
+        """Return the Endpoint for a server address, creating it on first use."""
+        if server not in self.endpoints:
+            self.endpoints[server] = Endpoint(server)
+        return self.endpoints[server]
+
+    def _use_endpoint(self, endpoint):
+        """Make an endpoint the primary server for all operations."""
+        self.stub = endpoint.connect()
+        self.channel = endpoint.channel
+        self.connected_server = endpoint.address
+
     async def kv_init(self, server_list):
         """Initialize connection to the first available server."""
         if not server_list or not isinstance(server_list, list):
             logging.error("Invalid server list. Must be a list of 'host:port' strings.")
             return -1
 
+        self.servers = server_list
         for server in server_list:
+            endpoint = self._endpoint(server)
             try:
                 logging.info(f"Trying to connect to {server}...")
-                channel = grpc.aio.insecure_channel(server)
-                stub = kvstore_pb2_grpc.KeyValueStoreStub(channel)
+                stub = endpoint.connect()
 
                 # Verify connection with a test RPC (Ping)
                 await stub.Ping(kvstore_pb2.PingRequest())
                 
-                self.channel = channel
-                self.stub = stub
+                self._use_endpoint(endpoint)
                 logging.info(f"Connected to {server}")
+                if self.failover:
+                    self._start_health_checks()
+                if self.near_cache is not None and self.invalidation_task is None:
+                    self.invalidation_task = asyncio.create_task(self._watch_invalidations())
                 return 0  # Success
 
             except grpc.RpcError as e:
                 logging.warning(f" Connection to {server} failed: {e.details()}")
+                await endpoint.close()
+                if self.failover:
+                    self.failure_detector.mark_down(endpoint)
 
         logging.error("No servers available. Initialization failed.")
         return -1  # Failure
 
+    def _start_health_checks(self):
+        """Start background Ping probes for every configured server."""
+        if self.health_checker is None:
+            endpoints = [self._endpoint(server) for server in self.servers]
+            self.health_checker = HealthChecker(endpoints, self.failure_detector,
+                                                interval=self.health_check_interval)
+            self.health_checker.start()
+
     async def kv_shutdown(self):
         """Shutdown the gRPC connection asynchronously."""
         if self.channel:
             logging.info("Shutting down client connection...")
-            await self.channel.close()  
+            await self.write_batcher.flush()  # Do not drop buffered writes
+            if self.invalidation_task is not None:
+                self.invalidation_task.cancel()
+                try:
+                    await self.invalidation_task
+                except asyncio.CancelledError:
+                    pass
+                self.invalidation_task = None
+            if self.health_checker is not None:
+                await self.health_checker.stop()
+                self.health_checker = None
+            for endpoint in self.endpoints.values():
+                await endpoint.close()
             self.channel = None
             self.stub = None
+            self.connected_server = None
             logging.info("Connection successfully closed.")
             return 0
         logging.warning("No active connection to shut down.")
         return -1  # Failure
 
-
-    async def put(self, key, value):
-        """Store a key-value pair in the key-value store."""
+    async def _watch_invalidations(self):
+        """Keep the near-cache in sync with the connected server, reconnecting if the stream drops."""
+        retry_delay = 0.1
+        while True:
+            try:
+                call = self._primary().connect().WatchInvalidations(kvstore_pb2.Namespace())
+                first = True
+                async for message in call:
+                    if first:
+                        self.near_cache.stream_up()
+                        logging.info(f"Near-cache invalidation stream live on {self.connected_server}")
+                        first = False
+                        retry_delay = 0.1
+                    elif message.reset:
+                        self.near_cache.reset()
+                    for key in message.keys:
+                        self.near_cache.invalidate(key, message.timestamp)
+                logging.warning("Near-cache invalidation stream ended")
+            except grpc.RpcError as e:
+                logging.warning(f"Near-cache invalidation stream dropped: {e.code()}")
+            except AttributeError:
+                pass  # No connected stub right now
+            self.near_cache.stream_down()
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 5.0)
+
+    def _next_healthy_endpoint(self, exclude):
+        """Return the first healthy endpoint (in server order) not in exclude."""
+        for server in self.servers:
+            endpoint = self._endpoint(server)
+            if endpoint.healthy and server not in exclude:
+                return endpoint
+        return None
+
+    async def _invoke(self, operation, call):
+        """Run call(stub) on the primary, failing over to healthy servers for read operations."""
+        if not self.failover:
+            return await call(self.stub)
+
+        self.retry_budget.on_request()
+        endpoint = self._primary()
+        tried = set()
+        while True:
+            tried.add(endpoint.address)
+            try:
+                result = await call(endpoint.connect())
+                self.failure_detector.record_success(endpoint)
+                return result
+            except grpc.RpcError as e:
+                if e.code() not in RETRYABLE_CODES:
+                    raise
+                self.failure_detector.mark_down(endpoint)
+                if operation not in READ_OPERATIONS:
+                    raise  # The write may have been applied; resending it would apply it twice
+                next_endpoint = self._failover_from(endpoint, tried)
+                if next_endpoint is None:
+                    raise
+                if not self.retry_budget.try_acquire():
+                    self.retries_throttled += 1
+                    raise
+                self.retries += 1
+                endpoint = next_endpoint
+
+    def _primary(self):
+        """Return the primary endpoint, first failing over if the health checker saw it go down."""
+        endpoint = self._endpoint(self.connected_server)
+        if self.failover and not endpoint.healthy:
+            endpoint = self._failover_from(endpoint, set()) or endpoint
+        return endpoint
+
+    def _failover_from(self, endpoint, tried):
+        """Pick the next healthy server and make it primary if endpoint was the primary."""
+        next_endpoint = self._next_healthy_endpoint(tried | {endpoint.address})
+        if next_endpoint is not None and self.connected_server == endpoint.address:
+            logging.warning(f"Failing over from {endpoint.address} to {next_endpoint.address}")
+            self._use_endpoint(next_endpoint)
+            self.failovers += 1
+        return next_endpoint
+
+    def get_failover_stats(self):
+        """Return failover counters and the health of each endpoint."""
+        return {
+            "connected_server": self.connected_server,
+            "failovers": self.failovers,
+            "retries": self.retries,
+            "retries_throttled": self.retries_throttled,
+            "endpoints": {server: endpoint.healthy for server, endpoint in self.endpoints.items()},
+        }
+
+    async def put(self, key, value, consistency=None, namespace=""):
+        """
+        Store a key-value pair in the key-value store.
+
+        consistency ("ONE", "QUORUM" or "ALL") sets how many replicas must apply the
+        write before it returns; None uses the server default (ONE). Writes to a
+        namespace other than the default one are not batched.
+        """
         if not self.stub:
             logging.error("Client not initialized.")
             return -1
 
         logging.info(f"Sending PUT request: {key} -> {value}")
-        response = await self.stub.Put(kvstore_pb2.KeyValue(key=key, value=value))
+        if self.batch_writes and consistency is None and not namespace:
+            old_value = await self.write_batcher.submit("put", key, value)
+            self._forget_key(key)
+            return old_value
+        level = consistency_level(consistency)
+        response = await self._invoke("put", lambda stub: stub.Put(kvstore_pb2.KeyValue(
+            key=key, value=value, consistency=level, namespace=namespace)))
+        self._forget_key(key, namespace)
+        return response.old_value
+
+    async def put_bytes(self, key, value, consistency=None, namespace=""):
+        """
+        Store a key-value pair given as bytes, returning the old value as bytes.
+
+        Keys and values must be UTF-8. This skips the client batcher, and the value
+        is never decoded on its way to disk.
+        """
+        if not self.stub:
+            logging.error("Client not initialized.")
+            return -1
+
+        level = consistency_level(consistency)
+        response = await self._invoke("put_bytes", lambda stub: stub.PutBytes(
+            kvstore_pb2.BytesKeyValue(key=key, value=value, consistency=level, namespace=namespace)))
+        self._forget_key(key.decode(), namespace)
         return response.old_value
 
-    async def get(self, key):
-        """Retrieve the value associated with a given key."""
+    async def get_bytes(self, key, consistency=None, namespace=""):
+        """
+        Retrieve the value of a bytes key as bytes (b"" if it is missing).
+
+        The server copies the value straight out of LMDB into the response. Unlike
+        get(), this bypasses the near-cache, GET coalescing and hedging.
+        """
+        if not self.stub:
+            logging.error("Client not initialized.")
+            return -1
+
+        level = consistency_level(consistency)
+        response = await self._invoke("get_bytes", lambda stub: stub.GetBytes(kvstore_pb2.BytesKey(
+            key=key, consistency=level, namespace=namespace)))
+        return response.value
+
+    def _forget_key(self, key, namespace=""):
+        """Make sure reads issued after a local write do not see the old value."""
+        if namespace:
+            return  # Reads of a namespace are never cached or coalesced
+        self.get_flights.forget(key)
+        if self.near_cache is not None:
+            self.near_cache.invalidate(key)
+
+    async def _send_batch(self, writes):
+        """Send buffered (op, key, value) writes as one BatchWrite RPC and return the old values."""
+        mutations = [kvstore_pb2.Mutation(op=kvstore_pb2.Mutation.DELETE if op == "delete" else kvstore_pb2.Mutation.PUT,
+                                          key=key, value=value)
+                     for op, key, value in writes]
+        logging.info(f"Sending BATCH request with {len(mutations)} writes")
+        response = await self._invoke("batch_write", lambda stub: stub.BatchWrite(kvstore_pb2.MutationBatch(mutations=mutations)))
+        return list(response.old_values)
+
+    async def get(self, key, consistency=None, namespace=""):
+        """
+        Retrieve the value associated with a given key.
+
+        With consistency "QUORUM" or "ALL" the server answers from that many replicas;
+        such reads, and reads of a namespace other than the default one, bypass the
+        near-cache, GET coalescing and hedging.
+        """
         if not isinstance(key, str):
             raise TypeError(f"Expected 'key' as str, got {type(key).__name__}")
 
@@ -89,9 +359,42 @@ class KeyValueClient:
             logging.error("Client not initialized.")
             return -1
 
+        if consistency is not None or namespace:
+            level = consistency_level(consistency)
+            logging.info(f"Sending GET request for key: {key} at {consistency}")
+            return await self._invoke("get", lambda stub: self._get_from(stub, key, level, namespace))
+
+        if self.near_cache is not None:
+            hit, value = self.near_cache.lookup(key)
+            if hit:
+                return value
+            token = self.near_cache.begin_fill(key)
+            try:
+                value = await self._fetch(key)
+            except BaseException:
+                self.near_cache.abort_fill(key)
+                raise
+            self.near_cache.fill(key, value, token)
+            return value
+        return await self._fetch(key)
+
+    async def _fetch(self, key):
+        """GET from the server, sharing the RPC with identical in-flight GETs if enabled."""
         logging.info(f"Sending GET request for key: {key}")
+        if self.coalesce_gets:
+            return await self.get_flights.do(key, lambda: self._send_get(key))
+        return await self._send_get(key)
+
+    async def _send_get(self, key):
+        """Send the GET RPC, hedged if enabled."""
+        if self.hedge:
+            return await self._invoke("get", lambda stub: self._hedged_get(stub, key))
+        return await self._invoke("get", lambda stub: self._get_from(stub, key))
+
+    async def _get_from(self, stub, key, consistency=kvstore_pb2.DEFAULT, namespace=""):
+        """Send a single GET to the given stub."""
         try:
-            response = await self.stub.Get(kvstore_pb2.Key(key=key))
+            response = await stub.Get(kvstore_pb2.Key(key=key, consistency=consistency, namespace=namespace))
             return response.value
         except grpc.RpcError as e:
             if e.code() == grpc.StatusCode.NOT_FOUND:
@@ -99,25 +402,116 @@ class KeyValueClient:
                 return None
             raise
 
-    async def delete(self, key):
-        """Delete a key from the key-value store."""
+    def _hedge_target(self):
+        """Return the healthy server a hedged GET should go to, or None if there is no other replica."""
+        endpoint = self._next_healthy_endpoint({self.connected_server})
+        return endpoint.address if endpoint else None
+
+    def _hedge_delay(self):
+        """Delay after which the GET is hedged: the configured percentile of recent latency."""
+        delay = self.latency_tracker.percentile(self.hedge_percentile)
+        if delay is None:
+            return None  # No latency history yet, do not hedge blindly
+        return max(delay, self.hedge_min_delay)
+
+    async def _hedged_get(self, stub, key):
+        """GET from the primary, hedging to a second replica if it is slow."""
+        self.hedge_stats.requests += 1
+        self.hedge_budget.on_request()
+
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(self._get_from(stub, key))
+        delay = self._hedge_delay()
+        target = self._hedge_target()
+
+        if delay is None or target is None:
+            value = await primary
+            self.latency_tracker.record(time.perf_counter() - start)
+            return value
+
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            self.latency_tracker.record(time.perf_counter() - start)
+            return primary.result()
+
+        if not self.hedge_budget.try_acquire():
+            self.hedge_stats.throttled += 1
+            value = await primary
+            self.latency_tracker.record(time.perf_counter() - start)
+            return value
+
+        logging.info(f"Hedging GET for key '{key}' to {target} after {delay * 1000:.2f} ms")
+        self.hedge_stats.hedges += 1
+        secondary = asyncio.ensure_future(self._get_from(self._endpoint(target).connect(), key))
+        pending = {primary, secondary}
+        error = None
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = task.exception()
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                if task is secondary:
+                    self.hedge_stats.wins += 1
+                self.latency_tracker.record(time.perf_counter() - start)
+                return task.result()
+
+        raise error
+
+    def get_hedge_stats(self):
+        """Return hedge rate and win counters."""
+        return self.hedge_stats.snapshot()
+
+    def get_batching_stats(self):
+        """Return how many batches were sent and their average size."""
+        return self.write_batcher.snapshot()
+
+    def get_near_cache_stats(self):
+        """Return near-cache hit rate and staleness metrics."""
+        return self.near_cache.snapshot() if self.near_cache is not None else {}
+
+    def get_coalescing_stats(self):
+        """Return how many GETs were served by a shared in-flight RPC."""
+        return self.get_flights.snapshot()
+
+    async def delete(self, key, consistency=None, namespace=""):
+        """Delete a key from the key-value store (consistency and namespace as for put)."""
         if not self.stub:
             logging.error("Client not initialized.")
             return -1
 
         logging.info(f"Sending DELETE request for key: {key}")
-        await self.stub.Delete(kvstore_pb2.Key(key=key))
-
-    async def list_keys(self):
-        """Retrieve a list of all stored keys."""
+        if self.batch_writes and consistency is None and not namespace:
+            await self.write_batcher.submit("delete", key)
+        else:
+            level = consistency_level(consistency)
+            await self._invoke("delete", lambda stub: stub.Delete(kvstore_pb2.Key(key=key, consistency=level,
+                                                                                  namespace=namespace)))
+        self._forget_key(key, namespace)
+
+    async def list_keys(self, namespace=""):
+        """Retrieve a list of all stored keys of a namespace (the default one unless set)."""
         if not self.stub:
             logging.error("Client not initialized.")
             return -1
         
         logging.info("Sending LIST request")
-        response = await self.stub.ListKeys(kvstore_pb2.Empty())
+        response = await self._invoke("list_keys", lambda stub: stub.ListKeys(kvstore_pb2.Namespace(namespace=namespace)))
         return response.keys
 
+    async def drop_namespace(self, namespace):
+        """
+        Delete a namespace and all its keys on every node; return how many records
+        the connected server removed, or None if it had no such namespace.
+        """
+        logging.info(f"Sending DROP NAMESPACE request for {namespace}")
+        response = await self._invoke("drop_namespace", lambda stub: stub.DropNamespace(
+            kvstore_pb2.Namespace(namespace=namespace)))
+        return response.keys if response.found else None
+
     async def backup(self):
         """Trigger a backup of the key-value store."""
         if not self.stub:
@@ -125,9 +519,122 @@ class KeyValueClient:
             return -1
 
         logging.info("Sending BACKUP request")
-        response = await self.stub.Backup(kvstore_pb2.Empty())
+        response = await self._invoke("backup", lambda stub: stub.Backup(kvstore_pb2.Empty()))
         return response.success, response.message
 
+    async def watch(self, prefix="", from_sequence=0, namespace=""):
+        """
+        Yield (sequence, op, key, value) for each write the connected server applies
+        to a key of namespace (the default one unless set) starting with prefix, in order.
+
+        from_sequence starts from an earlier write still in the server's history (0:
+        the next write). A dropped stream is resumed after the last sequence read. A
+        watcher that falls behind gets only the newest write per key in each batch.
+        Raises grpc.RpcError (OUT_OF_RANGE) if the writes to resume from are gone, as
+        they are when the client failed over to another server in the meantime.
+        """
+        epoch = 0
+        retry_delay = 0.1
+        while True:
+            try:
+                call = self._primary().connect().Watch(kvstore_pb2.WatchRequest(prefix=prefix, from_sequence=from_sequence,
+                                                                                epoch=epoch, namespace=namespace))
+                async for batch in call:
+                    epoch = batch.epoch
+                    retry_delay = 0.1
+                    for event in batch.events:
+                        op = "delete" if event.mutation.op == kvstore_pb2.Mutation.DELETE else "put"
+                        yield event.sequence, op, event.mutation.key, event.mutation.value
+                    from_sequence = batch.last_sequence + 1
+                return  # The server shut down
+            except grpc.RpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE:
+                    raise
+                logging.warning(f"Watch stream dropped; resuming from {from_sequence}")
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 5.0)
+
+    def _blob_stub(self):
+        """Return the stub of the connected server, which is the only one holding its blobs."""
+        if self.failover:
+            raise RuntimeError("Blobs are stored on one server only; they cannot be used with failover=True")
+        return self._primary().connect()
+
+    async def put_stream(self, key, data, chunk_size=64 * 1024):
+        """
+        Store a blob of any size under key on the connected server; return its size.
+
+        data is bytes, sent in chunk_size pieces, or an iterable or async iterable of
+        byte chunks, sent as they are produced; an exception raised while producing
+        them abandons the upload and is re-raised. Blobs are a key space separate from
+        put()/get() and are not replicated: they stay on the server that stored them,
+        so blob calls raise RuntimeError on a client created with failover=True.
+        """
+        failure = None
+
+        async def pieces():
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                for i in range(0, len(data), chunk_size):
+                    yield data[i:i + chunk_size]
+            elif hasattr(data, "__aiter__"):
+                async for piece in data:
+                    yield piece
+            else:
+                for piece in data:
+                    yield piece
+
+        async def chunks():
+            nonlocal failure
+            previous = None  # Held back until we know whether it is the last chunk
+            try:
+                async for piece in pieces():
+                    if previous is not None:
+                        yield previous
+                    previous = kvstore_pb2.BlobChunk(key="" if previous is not None else key, data=bytes(piece))
+            except Exception as e:
+                failure = e
+                raise
+            if previous is None:
+                previous = kvstore_pb2.BlobChunk(key=key)  # Empty blob
+            previous.last = True
+            yield previous
+
+        try:
+            response = await self._blob_stub().PutStream(chunks())
+        except asyncio.CancelledError:
+            if failure is None:
+                raise
+            raise failure  # gRPC cancels the call when the request iterator fails
+        return response.size
+
+    async def get_stream(self, key):
+        """Yield the chunks of the blob under key as bytes. Raises grpc.RpcError (NOT_FOUND) if there is none."""
+        async for chunk in self._blob_stub().GetStream(kvstore_pb2.Key(key=key)):
+            yield chunk.data
+
+    async def get_blob(self, key):
+        """Return the whole blob under key as bytes, or None if there is none."""
+        try:
+            return b"".join([chunk async for chunk in self.get_stream(key)])
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.NOT_FOUND:
+                return None
+            raise
+
+    async def delete_blob(self, key):
+        """Delete the blob under key; return True if there was one."""
+        response = await self._blob_stub().DeleteBlob(kvstore_pb2.Key(key=key))
+        return response.found
+
+    async def stats(self):
+        """Fetch the connected server's counters as a dict."""
+        if not self.stub:
+            logging.error("Client not initialized.")
+            return -1
+
+        response = await self._invoke("stats", lambda stub: stub.Stats(kvstore_pb2.Empty()))
+        return dict(response.metrics)
+
 async def test_client():
     """Test client operations to verify correctness."""
     client = KeyValueClient(["localhost:50051", "localhost:50052", "localhost:50053"])
@@ -24,31 +24,101 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rkvstore.proto\x12\x07kvstore\"&\n\x08KeyValue\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t\"\x12\n\x03Key\x12\x0b\n\x03key\x18\x01 \x01(\t\"\x16\n\x05Value\x12\r\n\x05value\x18\x01 \x01(\t\"\x1d\n\x08OldValue\x12\x11\n\told_value\x18\x01 \x01(\t\"\x17\n\x07KeyList\x12\x0c\n\x04keys\x18\x01 \x03(\t\"0\n\x0c\x42\x61\x63kupStatus\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x07\n\x05\x45mpty\"\r\n\x0bPingRequest\"\x1f\n\x0cPingResponse\x12\x0f\n\x07message\x18\x01 \x01(\t2\x9d\x02\n\rKeyValueStore\x12+\n\x03Put\x12\x11.kvstore.KeyValue\x1a\x11.kvstore.OldValue\x12#\n\x03Get\x12\x0c.kvstore.Key\x1a\x0e.kvstore.Value\x12&\n\x06\x44\x65lete\x12\x0c.kvstore.Key\x1a\x0e.kvstore.Empty\x12,\n\x08ListKeys\x12\x0e.kvstore.Empty\x1a\x10.kvstore.KeyList\x12/\n\x06\x42\x61\x63kup\x12\x0e.kvstore.Empty\x1a\x15.kvstore.BackupStatus\x12\x33\n\x04Ping\x12\x14.kvstore.PingRequest\x1a\x15.kvstore.PingResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rkvstore.proto\x12\x07kvstore\"d\n\x08KeyValue\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\t\x12)\n\x0b\x63onsistency\x18\x03 \x01(\x0e\x32\x14.kvstore.Consistency\x12\x11\n\tnamespace\x18\x04 \x01(\t\"P\n\x03Key\x12\x0b\n\x03key\x18\x01 \x01(\t\x12)\n\x0b\x63onsistency\x18\x02 \x01(\x0e\x32\x14.kvstore.Consistency\x12\x11\n\tnamespace\x18\x03 \x01(\t\"D\n\x05Value\x12\r\n\x05value\x18\x01 \x01(\t\x12\x0b\n\x03hlc\x18\x02 \x01(\x04\x12\x0c\n\x04node\x18\x03 \x01(\r\x12\x11\n\ttombstone\x18\x04 \x01(\x08\"\x1d\n\x08OldValue\x12\x11\n\told_value\x18\x01 \x01(\t\"i\n\rBytesKeyValue\x12\x0b\n\x03key\x18\x01 \x01(\x0c\x12\r\n\x05value\x18\x02 \x01(\x0c\x12)\n\x0b\x63onsistency\x18\x03 \x01(\x0e\x32\x14.kvstore.Consistency\x12\x11\n\tnamespace\x18\x04 \x01(\t\"U\n\x08\x42ytesKey\x12\x0b\n\x03key\x18\x01 \x01(\x0c\x12)\n\x0b\x63onsistency\x18\x02 \x01(\x0e\x32\x14.kvstore.Consistency\x12\x11\n\tnamespace\x18\x03 \x01(\t\"I\n\nBytesValue\x12\r\n\x05value\x18\x01 \x01(\x0c\x12\x0b\n\x03hlc\x18\x02 \x01(\x04\x12\x0c\n\x04node\x18\x03 \x01(\r\x12\x11\n\ttombstone\x18\x04 \x01(\x08\"\"\n\rBytesOldValue\x12\x11\n\told_value\x18\x01 \x01(\x0c\"4\n\tBlobChunk\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\x12\x0c\n\x04last\x18\x03 \x01(\x08\"7\n\x08\x42lobInfo\x12\r\n\x05\x66ound\x18\x01 \x01(\x08\x12\x0c\n\x04size\x18\x02 \x01(\x04\x12\x0e\n\x06\x63hunks\x18\x03 \x01(\r\"\x17\n\x07KeyList\x12\x0c\n\x04keys\x18\x01 \x03(\t\"\x1e\n\tNamespace\x12\x11\n\tnamespace\x18\x01 \x01(\t\",\n\rNamespaceInfo\x12\r\n\x05\x66ound\x18\x01 \x01(\x08\x12\x0c\n\x04keys\x18\x02 \x01(\x04\"0\n\x0c\x42\x61\x63kupStatus\x12\x0f\n\x07success\x18\x01 \x01(\x08\x12\x0f\n\x07message\x18\x02 \x01(\t\"\x07\n\x05\x45mpty\"+\n\x0bPingRequest\x12\x0e\n\x06rejoin\x18\x01 \x01(\x08\x12\x0c\n\x04node\x18\x02 \x01(\t\"\x1f\n\x0cPingResponse\x12\x0f\n\x07message\x18\x01 \x01(\t\"q\n\x0bServerStats\x12\x32\n\x07metrics\x18\x01 \x03(\x0b\x32!.kvstore.ServerStats.MetricsEntry\x1a.\n\x0cMetricsEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x01:\x02\x38\x01\"\xa5\x01\n\x08Mutation\x12 \n\x02op\x18\x01 \x01(\x0e\x32\x14.kvstore.Mutation.Op\x12\x0b\n\x03key\x18\x02 \x01(\t\x12\r\n\x05value\x18\x03 \x01(\t\x12\x0b\n\x03hlc\x18\x04 \x01(\x04\x12\x0c\n\x04node\x18\x05 \x01(\r\x12\x11\n\tnamespace\x18\x06 \x01(\t\"-\n\x02Op\x12\x07\n\x03PUT\x10\x00\x12\n\n\x06\x44\x45LETE\x10\x01\x12\x12\n\x0e\x44ROP_NAMESPACE\x10\x02\"5\n\rMutationBatch\x12$\n\tmutations\x18\x01 \x03(\x0b\x32\x11.kvstore.Mutation\"\"\n\x0cOldValueList\x12\x12\n\nold_values\x18\x01 \x03(\t\">\n\x0cInvalidation\x12\x0c\n\x04keys\x18\x01 \x03(\t\x12\r\n\x05reset\x18\x02 \x01(\x08\x12\x11\n\ttimestamp\x18\x03 \x01(\x01\"W\n\x0cWatchRequest\x12\x0e\n\x06prefix\x18\x01 \x01(\t\x12\x15\n\rfrom_sequence\x18\x02 \x01(\x04\x12\r\n\x05\x65poch\x18\x03 \x01(\x04\x12\x11\n\tnamespace\x18\x04 \x01(\t\"V\n\nWatchEvent\x12\x10\n\x08sequence\x18\x01 \x01(\x04\x12#\n\x08mutation\x18\x02 \x01(\x0b\x32\x11.kvstore.Mutation\x12\x11\n\ttimestamp\x18\x03 \x01(\x01\"j\n\nWatchBatch\x12\r\n\x05\x65poch\x18\x01 \x01(\x04\x12#\n\x06\x65vents\x18\x02 \x03(\x0b\x32\x13.kvstore.WatchEvent\x12\x15\n\rlast_sequence\x18\x03 \x01(\x04\x12\x11\n\tcoalesced\x18\x04 \x01(\r\"\x8c\x01\n\x10ReplicationEntry\x12\x0b\n\x03seq\x18\x01 \x01(\x04\x12 \n\x02op\x18\x02 \x01(\x0e\x32\x14.kvstore.Mutation.Op\x12\x0b\n\x03key\x18\x03 \x01(\t\x12\r\n\x05value\x18\x04 \x01(\t\x12\x0b\n\x03hlc\x18\x05 \x01(\x04\x12\x0c\n\x04node\x18\x06 \x01(\r\x12\x12\n\nvalue_hash\x18\x07 \x01(\x0c\"q\n\x10ReplicationBatch\x12\x0e\n\x06origin\x18\x01 \x01(\t\x12\r\n\x05\x65poch\x18\x02 \x01(\x04\x12*\n\x07\x65ntries\x18\x03 \x03(\x0b\x32\x19.kvstore.ReplicationEntry\x12\x12\n\nstable_hlc\x18\x04 \x01(\x04\"V\n\x0eReplicationAck\x12\x13\n\x0b\x61pplied_seq\x18\x01 \x01(\x04\x12\x16\n\x0emissing_bodies\x18\x02 \x03(\x0c\x12\x17\n\x0f\x64\x65\x64up_threshold\x18\x03 \x01(\r\"@\n\nLogRequest\x12\x11\n\trequester\x18\x01 \x01(\t\x12\x10\n\x08\x66rom_seq\x18\x02 \x01(\x04\x12\r\n\x05\x65poch\x18\x03 \x01(\x04\"M\n\rSnapshotChunk\x12\x0b\n\x03seq\x18\x01 \x01(\x04\x12\r\n\x05\x65poch\x18\x02 \x01(\x04\x12 \n\x05items\x18\x03 \x03(\x0b\x32\x11.kvstore.Mutation\"\x1e\n\rMerkleRequest\x12\r\n\x05nodes\x18\x01 \x03(\r\" \n\x0eMerkleHashList\x12\x0e\n\x06hashes\x18\x01 \x03(\x0c\"V\n\tKeyDigest\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x0e\n\x06\x64igest\x18\x02 \x01(\x0c\x12\x0b\n\x03hlc\x18\x03 \x01(\x04\x12\x0c\n\x04node\x18\x04 \x01(\r\x12\x11\n\ttombstone\x18\x05 \x01(\x08\"4\n\rKeyDigestList\x12#\n\x07\x65ntries\x18\x01 \x03(\x0b\x32\x12.kvstore.KeyDigest\">\n\tRaftEntry\x12\x0c\n\x04term\x18\x01 \x01(\x04\x12#\n\x08mutation\x18\x02 \x01(\x0b\x32\x11.kvstore.Mutation\"o\n\x0bVoteRequest\x12\x0c\n\x04term\x18\x01 \x01(\x04\x12\x11\n\tcandidate\x18\x02 \x01(\t\x12\x16\n\x0elast_log_index\x18\x03 \x01(\x04\x12\x15\n\rlast_log_term\x18\x04 \x01(\x04\x12\x10\n\x08pre_vote\x18\x05 \x01(\x08\"-\n\x0cVoteResponse\x12\x0c\n\x04term\x18\x01 \x01(\x04\x12\x0f\n\x07granted\x18\x02 \x01(\x08\"\xa4\x01\n\rAppendRequest\x12\x0c\n\x04term\x18\x01 \x01(\x04\x12\x0e\n\x06leader\x18\x02 \x01(\t\x12\x16\n\x0eprev_log_index\x18\x03 \x01(\x04\x12\x15\n\rprev_log_term\x18\x04 \x01(\x04\x12#\n\x07\x65ntries\x18\x05 \x03(\x0b\x32\x12.kvstore.RaftEntry\x12\x15\n\rleader_commit\x18\x06 \x01(\x04\x12\n\n\x02id\x18\x07 \x01(\x04\"P\n\x0e\x41ppendResponse\x12\x0c\n\x04term\x18\x01 \x01(\x04\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x13\n\x0bmatch_index\x18\x03 \x01(\x04\x12\n\n\x02id\x18\x04 \x01(\x04\"f\n\x11RaftSnapshotChunk\x12\x0c\n\x04term\x18\x01 \x01(\x04\x12\x0e\n\x06leader\x18\x02 \x01(\t\x12\x12\n\nlast_index\x18\x03 \x01(\x04\x12\x11\n\tlast_term\x18\x04 \x01(\x04\x12\x0c\n\x04\x64\x61ta\x18\x05 \x01(\x0c*8\n\x0b\x43onsistency\x12\x0b\n\x07\x44\x45\x46\x41ULT\x10\x00\x12\x07\n\x03ONE\x10\x01\x12\n\n\x06QUORUM\x10\x02\x12\x07\n\x03\x41LL\x10\x03\x32\x8d\x0b\n\rKeyValueStore\x12+\n\x03Put\x12\x11.kvstore.KeyValue\x1a\x11.kvstore.OldValue\x12#\n\x03Get\x12\x0c.kvstore.Key\x1a\x0e.kvstore.Value\x12:\n\x08PutBytes\x12\x16.kvstore.BytesKeyValue\x1a\x16.kvstore.BytesOldValue\x12\x32\n\x08GetBytes\x12\x11.kvstore.BytesKey\x1a\x13.kvstore.BytesValue\x12\x34\n\tPutStream\x12\x12.kvstore.BlobChunk\x1a\x11.kvstore.BlobInfo(\x01\x12/\n\tGetStream\x12\x0c.kvstore.Key\x1a\x12.kvstore.BlobChunk0\x01\x12-\n\nDeleteBlob\x12\x0c.kvstore.Key\x1a\x11.kvstore.BlobInfo\x12&\n\x06\x44\x65lete\x12\x0c.kvstore.Key\x1a\x0e.kvstore.Empty\x12\x30\n\x08ListKeys\x12\x12.kvstore.Namespace\x1a\x10.kvstore.KeyList\x12;\n\rDropNamespace\x12\x12.kvstore.Namespace\x1a\x16.kvstore.NamespaceInfo\x12/\n\x06\x42\x61\x63kup\x12\x0e.kvstore.Empty\x1a\x15.kvstore.BackupStatus\x12\x33\n\x04Ping\x12\x14.kvstore.PingRequest\x1a\x15.kvstore.PingResponse\x12-\n\x05Stats\x12\x0e.kvstore.Empty\x1a\x14.kvstore.ServerStats\x12;\n\nBatchWrite\x12\x16.kvstore.MutationBatch\x1a\x15.kvstore.OldValueList\x12\x41\n\x12WatchInvalidations\x12\x12.kvstore.Namespace\x1a\x15.kvstore.Invalidation0\x01\x12\x35\n\x05Watch\x12\x15.kvstore.WatchRequest\x1a\x13.kvstore.WatchBatch0\x01\x12\x44\n\x0eReplicateBatch\x12\x19.kvstore.ReplicationBatch\x1a\x17.kvstore.ReplicationAck\x12<\n\x08\x46\x65tchLog\x12\x13.kvstore.LogRequest\x1a\x19.kvstore.ReplicationBatch0\x01\x12\x39\n\rFetchSnapshot\x12\x0e.kvstore.Empty\x1a\x16.kvstore.SnapshotChunk0\x01\x12?\n\x0cMerkleHashes\x12\x16.kvstore.MerkleRequest\x1a\x17.kvstore.MerkleHashList\x12>\n\x0cMerkleLeaves\x12\x16.kvstore.MerkleRequest\x1a\x16.kvstore.KeyDigestList\x12\x35\n\tFetchKeys\x12\x10.kvstore.KeyList\x1a\x16.kvstore.MutationBatch\x12:\n\x0bRequestVote\x12\x14.kvstore.VoteRequest\x1a\x15.kvstore.VoteResponse\x12\x44\n\rAppendEntries\x12\x16.kvstore.AppendRequest\x1a\x17.kvstore.AppendResponse(\x01\x30\x01\x12H\n\x0fInstallSnapshot\x12\x1a.kvstore.RaftSnapshotChunk\x1a\x17.kvstore.AppendResponse(\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'kvstore_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_SERVERSTATS_METRICSENTRY']._loaded_options = None
+  _globals['_SERVERSTATS_METRICSENTRY']._serialized_options = b'8\001'
+  _globals['_CONSISTENCY']._serialized_start=2966
+  _globals['_CONSISTENCY']._serialized_end=3022
   _globals['_KEYVALUE']._serialized_start=26
-  _globals['_KEYVALUE']._serialized_end=64
-  _globals['_KEY']._serialized_start=66
-  _globals['_KEY']._serialized_end=84
-  _globals['_VALUE']._serialized_start=86
-  _globals['_VALUE']._serialized_end=108
-  _globals['_OLDVALUE']._serialized_start=110
-  _globals['_OLDVALUE']._serialized_end=139
-  _globals['_KEYLIST']._serialized_start=141
-  _globals['_KEYLIST']._serialized_end=164
-  _globals['_BACKUPSTATUS']._serialized_start=166
-  _globals['_BACKUPSTATUS']._serialized_end=214
-  _globals['_EMPTY']._serialized_start=216
-  _globals['_EMPTY']._serialized_end=223
-  _globals['_PINGREQUEST']._serialized_start=225
-  _globals['_PINGREQUEST']._serialized_end=238
-  _globals['_PINGRESPONSE']._serialized_start=240
-  _globals['_PINGRESPONSE']._serialized_end=271
-  _globals['_KEYVALUESTORE']._serialized_start=274
-  _globals['_KEYVALUESTORE']._serialized_end=559
+  _globals['_KEYVALUE']._serialized_end=126
+  _globals['_KEY']._serialized_start=128
+  _globals['_KEY']._serialized_end=208
+  _globals['_VALUE']._serialized_start=210
+  _globals['_VALUE']._serialized_end=278
+  _globals['_OLDVALUE']._serialized_start=280
+  _globals['_OLDVALUE']._serialized_end=309
+  _globals['_BYTESKEYVALUE']._serialized_start=311
+  _globals['_BYTESKEYVALUE']._serialized_end=416
+  _globals['_BYTESKEY']._serialized_start=418
+  _globals['_BYTESKEY']._serialized_end=503
+  _globals['_BYTESVALUE']._serialized_start=505
+  _globals['_BYTESVALUE']._serialized_end=578
+  _globals['_BYTESOLDVALUE']._serialized_start=580
+  _globals['_BYTESOLDVALUE']._serialized_end=614
+  _globals['_BLOBCHUNK']._serialized_start=616
+  _globals['_BLOBCHUNK']._serialized_end=668
+  _globals['_BLOBINFO']._serialized_start=670
+  _globals['_BLOBINFO']._serialized_end=725
+  _globals['_KEYLIST']._serialized_start=727
+  _globals['_KEYLIST']._serialized_end=750
+  _globals['_NAMESPACE']._serialized_start=752
+  _globals['_NAMESPACE']._serialized_end=782
+  _globals['_NAMESPACEINFO']._serialized_start=784
+  _globals['_NAMESPACEINFO']._serialized_end=828
+  _globals['_BACKUPSTATUS']._serialized_start=830
+  _globals['_BACKUPSTATUS']._serialized_end=878
+  _globals['_EMPTY']._serialized_start=880
+  _globals['_EMPTY']._serialized_end=887
+  _globals['_PINGREQUEST']._serialized_start=889
+  _globals['_PINGREQUEST']._serialized_end=932
+  _globals['_PINGRESPONSE']._serialized_start=934
+  _globals['_PINGRESPONSE']._serialized_end=965
+  _globals['_SERVERSTATS']._serialized_start=967
+  _globals['_SERVERSTATS']._serialized_end=1080
+  _globals['_SERVERSTATS_METRICSENTRY']._serialized_start=1034
+  _globals['_SERVERSTATS_METRICSENTRY']._serialized_end=1080
+  _globals['_MUTATION']._serialized_start=1083
+  _globals['_MUTATION']._serialized_end=1248
+  _globals['_MUTATION_OP']._serialized_start=1203
+  _globals['_MUTATION_OP']._serialized_end=1248
+  _globals['_MUTATIONBATCH']._serialized_start=1250
+  _globals['_MUTATIONBATCH']._serialized_end=1303
+  _globals['_OLDVALUELIST']._serialized_start=1305
+  _globals['_OLDVALUELIST']._serialized_end=1339
+  _globals['_INVALIDATION']._serialized_start=1341
+  _globals['_INVALIDATION']._serialized_end=1403
+  _globals['_WATCHREQUEST']._serialized_start=1405
+  _globals['_WATCHREQUEST']._serialized_end=1492
+  _globals['_WATCHEVENT']._serialized_start=1494
+  _globals['_WATCHEVENT']._serialized_end=1580
+  _globals['_WATCHBATCH']._serialized_start=1582
+  _globals['_WATCHBATCH']._serialized_end=1688
+  _globals['_REPLICATIONENTRY']._serialized_start=1691
+  _globals['_REPLICATIONENTRY']._serialized_end=1831
+  _globals['_REPLICATIONBATCH']._serialized_start=1833
+  _globals['_REPLICATIONBATCH']._serialized_end=1946
+  _globals['_REPLICATIONACK']._serialized_start=1948
+  _globals['_REPLICATIONACK']._serialized_end=2034
+  _globals['_LOGREQUEST']._serialized_start=2036
+  _globals['_LOGREQUEST']._serialized_end=2100
+  _globals['_SNAPSHOTCHUNK']._serialized_start=2102
+  _globals['_SNAPSHOTCHUNK']._serialized_end=2179
+  _globals['_MERKLEREQUEST']._serialized_start=2181
+  _globals['_MERKLEREQUEST']._serialized_end=2211
+  _globals['_MERKLEHASHLIST']._serialized_start=2213
+  _globals['_MERKLEHASHLIST']._serialized_end=2245
+  _globals['_KEYDIGEST']._serialized_start=2247
+  _globals['_KEYDIGEST']._serialized_end=2333
+  _globals['_KEYDIGESTLIST']._serialized_start=2335
+  _globals['_KEYDIGESTLIST']._serialized_end=2387
+  _globals['_RAFTENTRY']._serialized_start=2389
+  _globals['_RAFTENTRY']._serialized_end=2451
+  _globals['_VOTEREQUEST']._serialized_start=2453
+  _globals['_VOTEREQUEST']._serialized_end=2564
+  _globals['_VOTERESPONSE']._serialized_start=2566
+  _globals['_VOTERESPONSE']._serialized_end=2611
+  _globals['_APPENDREQUEST']._serialized_start=2614
+  _globals['_APPENDREQUEST']._serialized_end=2778
+  _globals['_APPENDRESPONSE']._serialized_start=2780
+  _globals['_APPENDRESPONSE']._serialized_end=2860
+  _globals['_RAFTSNAPSHOTCHUNK']._serialized_start=2862
+  _globals['_RAFTSNAPSHOTCHUNK']._serialized_end=2964
+  _globals['_KEYVALUESTORE']._serialized_start=3025
+  _globals['_KEYVALUESTORE']._serialized_end=4446
 # @@protoc_insertion_point(module_scope)
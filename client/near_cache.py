@@ -0,0 +1,123 @@
+import collections
+import time
+
+
+class NearCache:
+    """
+    Bounded LRU cache of GET results kept correct by server invalidations.
+
+    While the invalidation stream is live, entries stay valid until the server
+    invalidates them. When the stream is down the cache falls back to leases:
+    entries are only trusted for ttl seconds after they were fetched.
+    """
+
+    def __init__(self, max_entries=1000, ttl=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl  # Lease length used while the invalidation stream is down
+        self.entries = collections.OrderedDict()  # Key -> (value, fetched_at, lease_expiry or None)
+        self.stream_live = False
+        self.sequence = 0  # Bumped on every invalidation, used to reject racing fills
+        self.pending = {}  # Key -> in-flight fills
+        self.invalidated_at = {}  # Key with an in-flight fill -> sequence of its last invalidation
+        self.reset_at = 0  # Sequence of the last full reset
+
+        self.hits = 0
+        self.misses = 0
+        self.lease_hits = 0  # Hits served under the lease fallback
+        self.invalidations = 0
+        self.evictions = 0
+        self.stream_drops = 0
+        self.lag_total = 0.0  # Sum of write -> invalidation delays (seconds)
+        self.lag_max = 0.0
+        self.lag_samples = 0
+
+    def lookup(self, key):
+        """Return (True, value) on a hit, (False, None) on a miss."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            value, _, expiry = entry
+            if expiry is None or expiry > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                if expiry is not None:
+                    self.lease_hits += 1
+                return True, value
+            del self.entries[key]  # Lease expired
+        self.misses += 1
+        return False, None
+
+    def begin_fill(self, key):
+        """Mark a GET for key as in flight and return a token for fill()."""
+        self.pending[key] = self.pending.get(key, 0) + 1
+        return self.sequence
+
+    def fill(self, key, value, token):
+        """Cache a GET result unless key was invalidated while the GET was in flight."""
+        stale = self.invalidated_at.get(key, -1) > token or self.reset_at > token
+        self._end_fill(key)
+        if stale:
+            return
+        expiry = None if self.stream_live else time.monotonic() + self.ttl
+        self.entries[key] = (value, time.monotonic(), expiry)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def abort_fill(self, key):
+        """Forget an in-flight GET that failed."""
+        self._end_fill(key)
+
+    def _end_fill(self, key):
+        self.pending[key] -= 1
+        if self.pending[key] == 0:
+            del self.pending[key]
+            self.invalidated_at.pop(key, None)
+
+    def invalidate(self, key, written_at=None):
+        """Drop key from the cache (written_at is the server time of the write, for lag metrics)."""
+        self.sequence += 1
+        self.invalidations += 1
+        self.entries.pop(key, None)
+        if key in self.pending:
+            self.invalidated_at[key] = self.sequence
+        if written_at:
+            lag = max(0.0, time.time() - written_at)
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+            self.lag_samples += 1
+
+    def reset(self):
+        """Drop every entry; used when invalidations may have been missed."""
+        self.sequence += 1
+        self.reset_at = self.sequence
+        self.entries.clear()
+
+    def stream_up(self):
+        """The invalidation stream is live: anything cached before may have missed updates."""
+        self.reset()
+        self.stream_live = True
+
+    def stream_down(self):
+        """The invalidation stream dropped: fall back to leases."""
+        if self.stream_live:
+            self.stream_drops += 1
+        self.stream_live = False
+        self.reset()
+
+    def snapshot(self):
+        """Return hit rate and staleness metrics."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "lease_hits": self.lease_hits,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "stream_live": self.stream_live,
+            "stream_drops": self.stream_drops,
+            "avg_invalidation_lag_ms": self.lag_total / self.lag_samples * 1000 if self.lag_samples else 0.0,
+            "max_invalidation_lag_ms": self.lag_max * 1000,
+        }
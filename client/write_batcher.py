@@ -0,0 +1,73 @@
+import asyncio
+import logging
+
+
+class WriteBatcher:
+    """
+    Buffers PUTs and DELETEs and flushes them as one batch RPC.
+
+    A batch is sent when max_batch_size writes are buffered or linger seconds after
+    the first buffered write, whichever comes first. Only one batch is in flight at
+    a time, so writes reach the server in submission order.
+    """
+
+    def __init__(self, send_batch, linger=0.005, max_batch_size=100):
+        self.send_batch = send_batch  # Coroutine fn(list of (op, key, value)) -> list of old values
+        self.linger = linger  # Seconds to wait for more writes before flushing
+        self.max_batch_size = max_batch_size
+        self.buffer = []  # Pending (op, key, value, future)
+        self.flush_lock = asyncio.Lock()
+        self.timer = None
+        self.batches = 0
+        self.writes = 0
+
+    async def submit(self, op, key, value=""):
+        """Buffer one write and wait for its own old value."""
+        future = asyncio.get_running_loop().create_future()
+        self.buffer.append((op, key, value, future))
+        if len(self.buffer) >= self.max_batch_size:
+            self._schedule_flush(0)
+        elif self.timer is None:
+            self._schedule_flush(self.linger)
+        return await future
+
+    def _schedule_flush(self, delay):
+        if self.timer is not None:
+            self.timer.cancel()
+        self.timer = asyncio.get_running_loop().call_later(delay, lambda: asyncio.ensure_future(self.flush()))
+
+    async def flush(self):
+        """Send everything buffered so far, one batch at a time."""
+        async with self.flush_lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            while self.buffer:
+                batch = self.buffer[:self.max_batch_size]
+                del self.buffer[:self.max_batch_size]
+                await self._send(batch)
+
+    async def _send(self, batch):
+        self.batches += 1
+        self.writes += len(batch)
+        try:
+            old_values = await self.send_batch([(op, key, value) for op, key, value, _ in batch])
+            if len(old_values) != len(batch):
+                raise RuntimeError(f"Server returned {len(old_values)} results for {len(batch)} writes")
+        except Exception as e:
+            logging.error(f"Batch of {len(batch)} writes failed: {e}")
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (*_, future), old_value in zip(batch, old_values):
+            if not future.done():
+                future.set_result(old_value)
+
+    def snapshot(self):
+        """Return batch counters."""
+        return {
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch_size": self.writes / self.batches if self.batches else 0.0,
+        }
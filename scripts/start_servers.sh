@@ -19,7 +19,7 @@ do
     # Ensure process isn't already running
     if ! lsof -i :$PORT > /dev/null 2>&1; then
         echo "Starting server on port $PORT..."
-        nohup python server/async_server.py --port=$PORT > logs/server_$PORT.log 2>&1 &
+        nohup python server/async_server.py --port=$PORT --db-path=kvstore_$PORT.lmdb > logs/server_$PORT.log 2>&1 &
         sleep 2  # Ensure each server starts properly
     else
         echo "Server on port $PORT is already running. Skipping..."
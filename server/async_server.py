@@ -9,9 +9,28 @@ import asyncio
 import signal
 import argparse  # Allow setting a custom port
 import logging
+import time
+import collections
 
-from multiproc_worker import MultiprocessWorker  # Multiprocessing for parallel execution
-from replication import ReplicationManager  # Replication support
+from multiproc_worker import MultiprocessWorker, LMDB_PRESETS, lmdb_preset  # Multiprocessing for parallel execution
+from replication import ReplicationManager, REPLICATED_METADATA, to_mutation  # Replication support
+from replication_log import build_batch, OP_NAMES
+from retry_policy import cancel_tasks
+from single_flight import SingleFlight  # Coalesce concurrent identical GETs
+from invalidation import InvalidationHub  # Near-cache invalidation stream
+from merkle import MerkleTree  # Incremental hash tree over the keyspace
+from anti_entropy import AntiEntropy  # Background repair from peers
+from hlc import HybridLogicalClock, node_hash  # Versions for last-writer-wins
+from read_repair import ReadRepair  # Heals stale replicas seen by multi-replica reads
+from raft import RaftNode, NotLeader  # Linearizable replication mode
+from chain import ChainReplication, CHAIN_METADATA, SYNCING  # Chain replication mode
+from change_feed import ChangeFeed  # Ordered write events for Watch subscribers
+from cdc import CdcSink  # Exports applied writes to segment files
+from compression import ValueCodec, CODECS  # Compression of stored values
+from tiering import AccessSketch  # Access counts that pick the keys moved to cold segments
+from dedup import value_digest  # Digests of values stored once
+from namespaces import (Namespaces, qualify, split_key, valid_namespace, parse_quota,  # Named key spaces
+                        MAX_NAMESPACE_LENGTH, NAMESPACE_MARK)
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -20,53 +39,494 @@ def get_peer_servers(port):
     all_ports = [50051, 50052, 50053]  # Define available server ports
     return [f"localhost:{p}" for p in all_ports if p != port]  # Exclude current port
 
+def to_mutations(messages):
+    """Convert Mutation / ReplicationEntry messages to worker batch tuples (op, key, value, hlc, node)."""
+    return [(OP_NAMES[m.op], m.key, m.value, m.hlc, m.node) for m in messages]
+
+def old_value_list(results):
+    """OldValueList of the worker's (old value, applied) results; a namespace drop, which peers send, has none."""
+    return kvstore_pb2.OldValueList(old_values=[old_value if isinstance(old_value, str) else ""
+                                                for old_value, _ in results])
+
+BLOB_READ_BYTES = 1 << 20  # Chunks read from the blob store per worker call while streaming a blob
+
+FORWARDED_METADATA = ("x-kv-forwarded", "1")  # Marks requests a Raft follower passed on to the leader
+
+def is_replicated(context):
+    """True if the request is a unary replication from a peer (it must not be replicated again)."""
+    return REPLICATED_METADATA in (context.invocation_metadata() or ())
+
+def is_forwarded(context):
+    return FORWARDED_METADATA in (context.invocation_metadata() or ())
+
+def is_chain_write(context):
+    return CHAIN_METADATA in (context.invocation_metadata() or ())
+
+def is_from_peer(context):
+    """True if another node sent the request, with keys already qualified with their namespace."""
+    metadata = context.invocation_metadata() or ()
+    return REPLICATED_METADATA in metadata or CHAIN_METADATA in metadata or FORWARDED_METADATA in metadata
+
 class AsyncKeyValueStoreServicer(kvstore_pb2_grpc.KeyValueStoreServicer):
-    def __init__(self, port):
-        self.worker = MultiprocessWorker()  # Use multiprocessing worker
-        self.replication_manager = ReplicationManager(get_peer_servers(port))  # Dynamic peer selection
-        logging.info(f"Server initialized on port {port} with peers: {get_peer_servers(port)}")
+    def __init__(self, port, peers=None, replication_mode="log", replication_log=None, max_log_entries=1000000,
+                 db_path=None, anti_entropy_interval=10.0, hints_dir=None, hint_replay_rate=1000,
+                 replication_window=256, replication_overflow="block",
+                 tombstone_gc_interval=30.0, read_repair_rate=100, raft_dir=None, raft_election_timeout=0.3,
+                 raft_snapshot_threshold=10000, watch_history=100000, watch_linger_ms=5.0,
+                 cdc_dir=None, cdc_segment_mb=64, cdc_flush_ms=100, wal_path=None, wal_sync="group",
+                 wal_sync_interval_ms=10, wal_apply_batch=10000, lmdb_options=None, compression=None,
+                 compression_threshold=128, compression_level=None, compression_dict_kb=16,
+                 compression_samples=1000, tiering_interval=0.0, tiering_block_kb=16,
+                 dedup_threshold=0, namespace_quotas=None, max_namespaces=128):
+        peers = peers if peers is not None else get_peer_servers(port)  # Dynamic peer selection
+        self.node_id = f"localhost:{port}"
+        self.peers = peers
+        self.clock = HybridLogicalClock()
+        self.node = node_hash(self.node_id)  # Writer ID stored in the versions this node assigns
+        db_path = db_path or f"kvstore_{port}.lmdb"
+        codec = ValueCodec(os.path.join(db_path, "dictionaries"), compression, threshold=compression_threshold,
+                           level=compression_level, dict_size=int(compression_dict_kb * 1024),
+                           sample_count=compression_samples)
+        self.worker = MultiprocessWorker(db_path, wal_path=wal_path, wal_sync=wal_sync,
+                                         wal_sync_interval=wal_sync_interval_ms / 1000,
+                                         wal_apply_batch=wal_apply_batch,
+                                         lmdb_options=lmdb_options, codec=codec,
+                                         sketch=AccessSketch() if tiering_interval > 0 else None,
+                                         cold_block_size=int(tiering_block_kb * 1024),
+                                         dedup_threshold=dedup_threshold,
+                                         namespaces=Namespaces(namespace_quotas, max_namespaces))  # Use multiprocessing worker
+        self.tiering_interval = tiering_interval
+        # Log batches are compressed as a whole on the wire: peers do not share this node's dictionaries
+        self.batch_compression = grpc.Compression.Gzip if compression else grpc.Compression.NoCompression
+        self.replica_count = len(peers) + 1  # N: every node holds every key
+        self.replication_manager = ReplicationManager(
+            peers, node_id=self.node_id, mode=replication_mode, max_log_entries=max_log_entries,
+            log_path=replication_log or f"replication_log_{port}.lmdb", hints_dir=hints_dir or f"hints_{port}",
+            hint_replay_rate=hint_replay_rate, window=replication_window, overflow=replication_overflow,
+            compression=self.batch_compression)
+        self.replication_log = self.replication_manager.log  # Also stores the applied cursor per origin
+        self.get_flights = SingleFlight()  # Concurrent GETs for one key share a worker call
+        self.invalidations = InvalidationHub()  # Pushes written keys to client near-caches
+        self.change_feed = ChangeFeed(history=watch_history, linger=watch_linger_ms / 1000)
+        self.cdc = None
+        if cdc_dir:
+            self.cdc = CdcSink(cdc_dir, segment_bytes=int(cdc_segment_mb * 1024 * 1024),
+                               flush_interval=cdc_flush_ms / 1000)
+        self.origin_locks = collections.defaultdict(asyncio.Lock)  # Serializes applies per origin
+        self.catch_ups = {}  # Origin -> running catch-up task
+        self.catch_up_stats = {}  # Origin -> (duration ms, entries replayed, snapshot used)
+        self.replication_applied = 0  # Replicated writes applied on this node
+        self.snapshots_applied = 0
+        self.quorum_reads = 0
+        self.quorum_writes = 0
+        self.quorum_failures = 0  # Requests that did not reach enough replicas
+        self.gc_horizons = {}  # Writer node -> HLC up to which every replica applied its writes
+        self.tombstone_gc_interval = tombstone_gc_interval
+        self.tombstones_collected = 0
+        self.namespace_drop_ms = 0.0  # Of the last drop on this node, LMDB commit included
+        self.read_repair = ReadRepair(self.replication_manager.peer_stub, self._apply_repairs, rate=read_repair_rate)
+        self.merkle_tree = MerkleTree()
+        self.anti_entropy = AntiEntropy(self.merkle_tree, peers, self.replication_manager.peer_stub,
+                                        self._apply_repairs, interval=anti_entropy_interval,
+                                        gc_horizon=lambda node: self._gc_horizons().get(node, 0))
+        self.raft = None
+        if replication_mode == "raft":
+            self.raft = RaftNode(self.node_id, peers, self.replication_manager.peer_stub, self._apply,
+                                 self.worker.copy, self._restore_snapshot, raft_dir or f"raft_{port}",
+                                 clock=self.clock, election_timeout=raft_election_timeout,
+                                 snapshot_threshold=raft_snapshot_threshold)
+            self.anti_entropy.interval = 0  # Every node applies the same log
+        self.chain = None
+        if replication_mode == "chain":
+            self.chain = ChainReplication(self.node_id, peers, self.replication_manager.peer_stub, self._sync_from)
+        logging.info(f"Server initialized on port {port} with peers: {peers} ({replication_mode} replication)")
+
+    def _after_write(self, key, value, version):
+        """Propagate an applied write (value None for a delete) to everything that tracks the store's contents."""
+        self.get_flights.forget(key)  # Later GETs must not join a read that predates this write
+        self.invalidations.publish(key)
+        self.change_feed.publish(key, value, version)
+        if self.cdc is not None:
+            self.cdc.publish(key, value, version)
+        self.merkle_tree.update(key, value, version)
+
+    def _new_version(self):
+        return self.clock.now(), self.node
+
+    async def _qualify(self, namespace, key, context):
+        """
+        Return key qualified with its namespace, failing the RPC if the namespace name is
+        invalid or a client's key contains NUL, which could pass for another namespace's key.
+        """
+        if not valid_namespace(namespace):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                                f"Namespaces must not contain NUL and are at most {MAX_NAMESPACE_LENGTH} bytes")
+        if NAMESPACE_MARK in key and not is_from_peer(context):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Keys must not contain NUL")
+        return qualify(namespace, key)
+
+    async def _admit(self, keys, context):
+        """Fail a client write with RESOURCE_EXHAUSTED if it puts one of the (qualified) keys into a full namespace."""
+        for namespace in {split_key(key)[0] for key in keys} - {""}:
+            if not self.worker.namespaces.admit(namespace):
+                await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, f"Namespace {namespace!r} is at its quota")
+
+    async def _restore_snapshot(self, path):
+        """Replace the store with a Raft snapshot and drop everything cached from the old one."""
+        result = await self.worker.restore(path)
+        self.get_flights.forget_all()
+        self.invalidations.reset()
+        return result
+
+    async def _forward(self, method, request, peer):
+        """Pass a client request on to peer, which serves it without forwarding it again."""
+        return await getattr(self.replication_manager.peer_stub(peer), method)(
+            request, metadata=(FORWARDED_METADATA,), timeout=5)
+
+    async def _raft_call(self, method, request, context, fn):
+        """Serve a request through Raft on the leader; a follower forwards it to the leader."""
+        try:
+            return await fn()
+        except NotLeader as e:
+            if e.leader is None or is_forwarded(context):
+                await context.abort(grpc.StatusCode.UNAVAILABLE, str(e))
+            try:
+                return await self._forward(method, request, e.leader)
+            except grpc.aio.AioRpcError as forward_error:
+                await context.abort(forward_error.code(), forward_error.details())
+        except asyncio.TimeoutError:
+            await context.abort(grpc.StatusCode.UNAVAILABLE, f"{method} timed out waiting for the Raft majority")
+
+    async def _chain_call(self, method, request, context, route, fn):
+        """Serve a request here if route() is this node (or None), else forward it there, skipping nodes found down."""
+        while (target := route()) not in (None, self.node_id):
+            try:
+                return await self._forward(method, request, target)
+            except grpc.aio.AioRpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE:
+                    await context.abort(e.code(), e.details())
+                self.chain.mark_down(target)
+        return await fn()
+
+    async def _chain_write(self, mutations, context):
+        """Apply mutations here, then pass them down the chain; returns the results once the tail applied them."""
+        results = await self._apply(mutations)
+        if not isinstance(results, list):
+            logging.error(f"Chain write failed: {results}")
+            await context.abort(grpc.StatusCode.UNKNOWN, "Chain write failed")
+        try:
+            await self.chain.forward(mutations)
+        except grpc.aio.AioRpcError as e:
+            await context.abort(e.code(), e.details())
+        return results
+
+    def _chain_write_route(self, context):
+        return None if is_forwarded(context) else self.chain.head()
+
+    def _chain_read_route(self, context):
+        if not self.chain.serves_reads():
+            return self.chain.predecessor()  # Holds every write this node holds
+        return None if is_forwarded(context) else self.chain.tail()
+
+    async def _sync_from(self, peer):
+        """Copy peer's store into ours (chain mode, on startup and rejoin)."""
+        await self._apply_snapshot(peer, self.replication_manager.peer_stub(peer))
+
+    async def _apply(self, mutations):
+        """
+        Apply (op, key, value, hlc, node) mutations last-writer-wins and propagate the applied ones.
+
+        Returns the worker's (old value, applied) per mutation, or its error string.
+        """
+        for mutation in mutations:
+            self.clock.observe(mutation[3])  # Our next writes must supersede everything we stored
+        results = await self.worker.apply_batch(mutations)
+        if isinstance(results, list):
+            for (op, key, value, hlc, node), (_, applied) in zip(mutations, results):
+                if applied and op == "drop":
+                    self.merkle_tree.remove_prefix(key)
+                    self.get_flights.forget_all()
+                elif applied:
+                    self._after_write(key, value if op == "put" else None, (hlc, node))
+        return results
+
+    def _replicas_required(self, consistency):
+        """Number of replicas, this node included, a request at this consistency level must reach."""
+        if consistency == kvstore_pb2.ALL:
+            return self.replica_count
+        if consistency == kvstore_pb2.QUORUM:
+            return self.replica_count // 2 + 1
+        return 1
+
+    async def _wait_for_write(self, ticket, consistency, context):
+        """Wait for enough replicas to apply a write; fail the RPC if they do not (the write is not undone)."""
+        required = self._replicas_required(consistency)
+        if required == 1:
+            return
+        self.quorum_writes += 1
+        if not await self.replication_manager.wait_for_replicas(ticket, required - 1):
+            self.quorum_failures += 1
+            await context.abort(grpc.StatusCode.UNAVAILABLE, f"Write did not reach {required} replicas")
+
+    async def _quorum_get(self, key, required, context):
+        """Read key from this node and the peers in parallel and return the newest of the first required answers."""
+        self.quorum_reads += 1
+        pending = {asyncio.ensure_future(self._get_local(key)): None}  # Read -> peer (None: this node)
+        namespace, local_key = split_key(key)
+        for peer in self.peers:
+            pending[asyncio.ensure_future(self.replication_manager.peer_stub(peer).Get(
+                kvstore_pb2.Key(key=local_key, namespace=namespace), timeout=2))] = peer
+        answers = []  # (peer, Value)
+        try:
+            while pending and len(answers) < required:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    peer = pending.pop(task)
+                    try:
+                        answers.append((peer, task.result()))
+                    except (grpc.aio.AioRpcError, asyncio.TimeoutError, RuntimeError):
+                        continue
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            raise
+        if len(answers) < required:
+            self.quorum_failures += 1
+            await context.abort(grpc.StatusCode.UNAVAILABLE, f"Only {len(answers)} of {required} replicas answered")
+        self.read_repair.check(key, answers, pending)  # Slower replicas are compared after we answer
+        return max((answer for _, answer in answers), key=lambda answer: (answer.hlc, answer.node))
+
+    async def _get_local(self, key):
+        """Read key from this node as a Value carrying its version (empty for a missing or deleted key)."""
+        record = await self.get_flights.do(key, lambda: self.worker.get_record(key))
+        if record is None:
+            logging.info(f"Key '{key}' not found.")
+            return kvstore_pb2.Value(value="")
+        if isinstance(record, str):  # Worker error
+            raise RuntimeError(record)
+        value, hlc, node, tombstone = record
+        return kvstore_pb2.Value(value="" if tombstone else value, hlc=hlc, node=node, tombstone=tombstone)
 
     async def Ping(self, request, context):
         """Health check method to verify server availability."""
+        if self.chain is not None:
+            self.chain.on_ping(request.node, request.rejoin)
+        if self.chain is not None and self.chain.syncing:
+            return kvstore_pb2.PingResponse(message=SYNCING)
         return kvstore_pb2.PingResponse(message="OK")
     
     async def Put(self, request, context):
         """Asynchronously store a key-value pair and replicate."""
         logging.info(f"PUT request received for key: {request.key}, value: {request.value}")
-        old_value = await self.worker.get(request.key)
-        await self.worker.put(request.key, request.value)
-        asyncio.create_task(self.replication_manager.replicate_put(request.key, request.value))  
-        return kvstore_pb2.OldValue(old_value=old_value if old_value else "")
+        key = await self._qualify(request.namespace, request.key, context)
+        return await self._put("Put", request, key, request.value, context,
+                               lambda old_value: kvstore_pb2.OldValue(old_value=old_value))
+
+    async def PutBytes(self, request, context):
+        """Binary variant of Put; keys and values must still be UTF-8, as replication carries them as strings."""
+        try:
+            key, value = request.key.decode(), request.value.decode()
+        except UnicodeDecodeError:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Keys and values must be valid UTF-8")
+        key = await self._qualify(request.namespace, key, context)
+        return await self._put("PutBytes", request, key, value, context,
+                               lambda old_value: kvstore_pb2.BytesOldValue(old_value=old_value.encode()))
+
+    async def _put(self, method, request, key, value, context, respond):
+        """Store key (qualified) and replicate it; respond(old value) builds the response."""
+        if not is_replicated(context):
+            await self._admit([key], context)
+        if self.raft is not None:
+            async def put():
+                results = await self.raft.propose([("put", key, value, *self._new_version())])
+                return respond(results[0][0])
+            return await self._raft_call(method, request, context, put)
+        if self.chain is not None:
+            async def put():
+                results = await self._chain_write([("put", key, value, *self._new_version())], context)
+                return respond(results[0][0])
+            return await self._chain_call(method, request, context, lambda: self._chain_write_route(context), put)
+        replicated = is_replicated(context)
+        if not replicated:
+            await self.replication_manager.admit()  # Backpressure from slow peers
+        version = self._new_version()
+        if not replicated:  # Logged right after the version is assigned, so log order is version order
+            ticket = self.replication_manager.replicate_put(key, value, version)
+        results = await self._apply([("put", key, value, *version)])
+        if not isinstance(results, list):
+            logging.error(f"Failed to put key {key}: {results}")
+            await context.abort(grpc.StatusCode.UNKNOWN, "Put failed")
+        if replicated:
+            self.replication_applied += 1
+        else:
+            await self._wait_for_write(ticket, request.consistency, context)
+        return respond(results[0][0])
 
     async def Get(self, request, context):
-        """Retrieve a value asynchronously."""
-        value = await self.worker.get(request.key)
-        if value is None: 
-                logging.info(f"Key '{request.key}' not found.")
-                return kvstore_pb2.Value(value= "")  
-        if not isinstance(value, str):  # Ensure it's a string
-            logging.error(f"Invalid return type from worker.get(): {type(value).__name__}")
+        """Retrieve a value asynchronously (from several replicas above consistency ONE)."""
+        key = await self._qualify(request.namespace, request.key, context)
+        if self.raft is not None:  # Always linearizable: the leader reads locally under its lease
+            async def get():
+                await self.raft.read_barrier()
+                return await self._get_local(key)
+            return await self._raft_call("Get", request, context, get)
+        if self.chain is not None:  # Served by the tail, which only holds acknowledged writes
+            return await self._chain_call("Get", request, context, lambda: self._chain_read_route(context),
+                                          lambda: self._get_local(key))
+        required = self._replicas_required(request.consistency)
+        if required > 1:
+            return await self._quorum_get(key, required, context)
+        try:
+            return await self._get_local(key)
+        except RuntimeError as e:
+            logging.error(f"Get failed for key {request.key}: {e}")
             context.set_code(grpc.StatusCode.UNKNOWN)
-            context.set_details("Invalid data type returned")
+            context.set_details("Get failed")
             return kvstore_pb2.Value(value="")  # Return empty string instead of None
-        return kvstore_pb2.Value(value=value)
     
+    async def GetBytes(self, request, context):
+        """Binary variant of Get: the value is copied once, from the memory map into the response."""
+        try:
+            key = request.key.decode()
+        except UnicodeDecodeError:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Keys must be valid UTF-8")
+        key = await self._qualify(request.namespace, key, context)
+        if self.raft is not None:
+            async def get():
+                await self.raft.read_barrier()
+                return await self._get_local_bytes(key.encode())
+            return await self._raft_call("GetBytes", request, context, get)
+        if self.chain is not None:
+            return await self._chain_call("GetBytes", request, context, lambda: self._chain_read_route(context),
+                                          lambda: self._get_local_bytes(key.encode()))
+        required = self._replicas_required(request.consistency)
+        if required > 1:
+            value = await self._quorum_get(key, required, context)
+            return kvstore_pb2.BytesValue(value=value.value.encode(), hlc=value.hlc, node=value.node,
+                                          tombstone=value.tombstone)
+        try:
+            return await self._get_local_bytes(key.encode())
+        except RuntimeError as e:
+            logging.error(f"GetBytes failed for key {request.key}: {e}")
+            context.set_code(grpc.StatusCode.UNKNOWN)
+            context.set_details("Get failed")
+            return kvstore_pb2.BytesValue()
+
+    async def _get_local_bytes(self, key):
+        """Read a bytes key from this node as a BytesValue (empty for a missing or deleted key)."""
+        record = await self.worker.get_raw(key)  # Not coalesced: GET flights are keyed and invalidated by str keys
+        if record is None:
+            return kvstore_pb2.BytesValue()
+        if isinstance(record, str):  # Worker error
+            raise RuntimeError(record)
+        value, hlc, node, tombstone = record
+        return kvstore_pb2.BytesValue(value=b"" if tombstone else value, hlc=hlc, node=node, tombstone=tombstone)
+
+    async def PutStream(self, request_iterator, context):
+        """Store a value of any size streamed in chunks; it replaces the previous blob under the key atomically."""
+        upload = os.urandom(8)
+        key, size, chunks, complete = None, 0, 0, False
+        try:
+            async for chunk in request_iterator:
+                if key is None:
+                    if not chunk.key:
+                        await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "The first chunk must carry the key")
+                    key = chunk.key
+                error = await self.worker.blob_write(upload, chunks, chunk.data)  # Only one chunk is held at a time
+                if error is not None:
+                    logging.error(f"PutStream failed for key {key}: {error}")
+                    await context.abort(grpc.StatusCode.UNKNOWN, "PutStream failed")
+                chunks += 1
+                size += len(chunk.data)
+                complete = chunk.last
+            if not complete:  # A cancelled call can look like a stream that ended early
+                await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "The stream ended before the last chunk")
+        except BaseException:  # Aborted, cancelled or failed: the chunks will never be committed
+            if chunks:
+                self.worker.blob_abort(upload, chunks)
+            raise
+        old_size = await self.worker.blob_commit(key, upload, size, chunks)
+        if isinstance(old_size, str):
+            logging.error(f"PutStream failed for key {key}: {old_size}")
+            self.worker.blob_abort(upload, chunks)
+            await context.abort(grpc.StatusCode.UNKNOWN, "PutStream failed")
+        logging.info(f"PUTSTREAM stored {size} bytes in {chunks} chunks for key: {key}")
+        return kvstore_pb2.BlobInfo(found=old_size is not None, size=size, chunks=chunks)
+
+    async def GetStream(self, request, context):
+        """Stream the blob under a key, reading ahead while the previous chunks are sent."""
+        if request.namespace:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Blobs do not belong to namespaces")
+        manifest = await self.worker.blob_manifest(request.key)
+        if manifest is None:
+            await context.abort(grpc.StatusCode.NOT_FOUND, f"No blob under key {request.key}")
+        if isinstance(manifest, str):
+            logging.error(f"GetStream failed for key {request.key}: {manifest}")
+            await context.abort(grpc.StatusCode.UNKNOWN, "GetStream failed")
+        upload, _, chunks = manifest
+        sent = 0
+        read = asyncio.ensure_future(self.worker.blob_read(upload, 0, BLOB_READ_BYTES)) if chunks else None
+        try:
+            while sent < chunks:
+                data = await read
+                if not isinstance(data, list):  # Replaced or deleted under us, or a worker error
+                    await context.abort(grpc.StatusCode.ABORTED, f"Blob {request.key} changed while it was read")
+                sent += len(data)
+                read = asyncio.ensure_future(self.worker.blob_read(upload, sent, BLOB_READ_BYTES)) \
+                    if sent < chunks else None
+                for chunk in data:
+                    yield kvstore_pb2.BlobChunk(data=chunk)
+        finally:
+            if read is not None:
+                read.cancel()
+
+    async def DeleteBlob(self, request, context):
+        """Delete the blob under a key and its chunks."""
+        if request.namespace:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Blobs do not belong to namespaces")
+        size = await self.worker.blob_delete(request.key)
+        if isinstance(size, str):
+            logging.error(f"DeleteBlob failed for key {request.key}: {size}")
+            await context.abort(grpc.StatusCode.UNKNOWN, "DeleteBlob failed")
+        return kvstore_pb2.BlobInfo(found=size is not None, size=size or 0)
+
     async def Delete(self, request, context):
         """Delete a key asynchronously and replicate delete operation."""
         logging.info(f"DELETE request received for key: {request.key}")
-        success = await self.worker.delete(request.key) 
-        if not success:
+        key = await self._qualify(request.namespace, request.key, context)
+        if self.raft is not None:
+            async def delete():
+                await self.raft.propose([("delete", key, "", *self._new_version())])
+                return Empty()
+            return await self._raft_call("Delete", request, context, delete)
+        if self.chain is not None:
+            async def delete():
+                await self._chain_write([("delete", key, "", *self._new_version())], context)
+                return Empty()
+            return await self._chain_call("Delete", request, context, lambda: self._chain_write_route(context), delete)
+        replicated = is_replicated(context)
+        if not replicated:
+            await self.replication_manager.admit()
+        version = self._new_version()
+        if not replicated:
+            ticket = self.replication_manager.replicate_delete(key, version)
+        results = await self._apply([("delete", key, "", *version)])  # Leaves a tombstone
+        if not isinstance(results, list):
             logging.error(f"Failed to delete key: {request.key}")
             context.set_code(grpc.StatusCode.UNKNOWN)
             context.set_details("Key deletion failed")
             return Empty()
-        asyncio.create_task(self.replication_manager.replicate_delete(request.key))
+        if replicated:
+            self.replication_applied += 1
+        else:
+            await self._wait_for_write(ticket, request.consistency, context)
         return Empty()
 
     async def ListKeys(self, request, context):
-        """Retrieve all stored keys asynchronously."""
+        """Retrieve all stored keys of a namespace asynchronously."""
         logging.info("LIST request received")
-        keys = await self.worker.get_all_keys() 
+        await self._qualify(request.namespace, "", context)
+        keys = await self.worker.get_all_keys(request.namespace)
         if not isinstance(keys, list):  # ✅ Ensure it's a list
             logging.error(f"Invalid return type from worker.get_all_keys(): {type(keys).__name__}")
             context.set_code(grpc.StatusCode.UNKNOWN)
@@ -80,6 +540,43 @@ class AsyncKeyValueStoreServicer(kvstore_pb2_grpc.KeyValueStoreServicer):
             return kvstore_pb2.KeyList(keys=[])
         return kvstore_pb2.KeyList(keys=keys)
 
+    async def DropNamespace(self, request, context):
+        """
+        Delete a namespace and all its keys here and on every peer.
+
+        The drop is a versioned write that is replicated like the others (log, hints or
+        chain), and every node keeps its version, so writes made before it that arrive
+        later (from a lagging peer, a log catch-up, a snapshot or a repair) are refused.
+        """
+        if not request.namespace:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "The default namespace cannot be dropped")
+        if self.raft is not None:  # The Raft log would bring the keys back when it is replayed
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Namespaces cannot be dropped in Raft mode")
+        key = await self._qualify(request.namespace, "", context)
+        logging.info(f"DROP NAMESPACE request received for {request.namespace!r}")
+
+        version = self._new_version()
+
+        async def drop(apply):
+            start = time.perf_counter()
+            results = await apply([("drop", key, "", *version)])
+            self.namespace_drop_ms = (time.perf_counter() - start) * 1000
+            if not isinstance(results, list):
+                logging.error(f"Failed to drop namespace {request.namespace!r}: {results}")
+                await context.abort(grpc.StatusCode.UNKNOWN, "Namespace drop failed")
+            records, _ = results[0]
+            return kvstore_pb2.NamespaceInfo(found=records is not None, keys=records or 0)
+
+        if self.chain is not None:
+            return await self._chain_call("DropNamespace", request, context, lambda: self._chain_write_route(context),
+                                          lambda: drop(lambda mutations: self._chain_write(mutations, context)))
+        ticket = self.replication_manager.replicate_drop(key, version)
+        info = await drop(self._apply)
+        if not await self.replication_manager.wait_for_replicas(ticket, len(self.peers)):
+            logging.warning(f"Namespace {request.namespace!r} is not dropped on every peer yet; "
+                            f"it will be once they catch up")
+        return info
+
     async def Backup(self, request, context):
         """Handles the backup request asynchronously using a worker."""
         logging.info("Initiating Backup...")
@@ -91,13 +588,434 @@ class AsyncKeyValueStoreServicer(kvstore_pb2_grpc.KeyValueStoreServicer):
             return BackupStatus(success=False, message="Backup failed.")
         return BackupStatus(success=True, message="Backup started in background.")
 
-async def serve(port):
-    """Starts the async gRPC server on a specified port."""
+    async def BatchWrite(self, request, context):
+        """Apply a batch of PUTs and DELETEs in one transaction and replicate each of them (unless sent by a peer)."""
+        logging.info(f"BATCH request received with {len(request.mutations)} mutations")
+        for mutation in request.mutations:  # Qualified in place, so forwarded batches carry them as they are stored
+            if mutation.op == kvstore_pb2.Mutation.DROP_NAMESPACE and not is_from_peer(context):
+                await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Namespaces are dropped with DropNamespace")
+            mutation.key = await self._qualify(mutation.namespace, mutation.key, context)
+            mutation.namespace = ""
+        if not is_replicated(context) and not is_chain_write(context):
+            await self._admit([m.key for m in request.mutations if m.op == kvstore_pb2.Mutation.PUT], context)
+        if self.raft is not None:
+            async def batch_write():
+                results = await self.raft.propose([(op, key, value, *self._new_version())
+                                                   for op, key, value, _, _ in to_mutations(request.mutations)])
+                return kvstore_pb2.OldValueList(old_values=[old_value for old_value, _ in results])
+            return await self._raft_call("BatchWrite", request, context, batch_write)
+        if self.chain is not None:
+            chained = is_chain_write(context)  # From our predecessor: keep its versions
+
+            async def batch_write():
+                mutations = [mutation if chained else (*mutation[:3], *self._new_version())
+                             for mutation in to_mutations(request.mutations)]
+                results = await self._chain_write(mutations, context)
+                return old_value_list(results)
+            if chained:
+                return await batch_write()
+            return await self._chain_call("BatchWrite", request, context,
+                                          lambda: self._chain_write_route(context), batch_write)
+        replicated = is_replicated(context)  # Unary replication or hints from a peer: keep their versions
+        mutations = to_mutations(request.mutations)
+        if not replicated:
+            await self.replication_manager.admit(len(mutations))
+        for i, (op, key, value, hlc, node) in enumerate(mutations):
+            if not replicated or not hlc:
+                mutations[i] = (op, key, value, *self._new_version())
+            if not replicated:
+                if op == "put":
+                    self.replication_manager.replicate_put(key, value, mutations[i][3:])
+                else:
+                    self.replication_manager.replicate_delete(key, mutations[i][3:])
+        results = await self._apply(mutations)
+        if not isinstance(results, list):
+            logging.error(f"Batch write failed: {results}")
+            context.set_code(grpc.StatusCode.UNKNOWN)
+            context.set_details("Batch write failed")
+            return kvstore_pb2.OldValueList()
+        if replicated:
+            self.replication_applied += len(mutations)
+        return old_value_list(results)
+
+    async def _apply_replicated(self, origin, epoch, entries, stable_hlc=0):
+        """
+        Apply replicated log entries from origin that have not been applied yet.
+
+        stable_hlc is origin's tombstone GC horizon for its own writes.
+
+        Returns (applied_seq, gap): gap is True if the entries start after a hole in
+        the log, in which case nothing is applied and the caller must catch up first.
+        """
+        async with self.origin_locks[origin]:
+            if stable_hlc:
+                origin_node = node_hash(origin)
+                self.gc_horizons[origin_node] = max(self.gc_horizons.get(origin_node, 0), stable_hlc)
+            cursor = self.replication_log.get_cursor(f"origin:{origin}")
+            applied_seq = cursor[1] if cursor and cursor[0] == epoch else 0  # New epoch restarts the cursor
+            entries = [e for e in entries if e.seq > applied_seq]  # Skip resent entries
+            if not entries:
+                return applied_seq, False
+            if entries[0].seq > applied_seq + 1:
+                return applied_seq, True
+            result = await self._apply(to_mutations(entries))
+            if not isinstance(result, list):
+                raise RuntimeError(f"Failed to apply replication batch from {origin}: {result}")
+            applied_seq = entries[-1].seq
+            self.replication_applied += len(entries)
+            self.replication_log.set_cursor(f"origin:{origin}", epoch, applied_seq)
+            return applied_seq, False
+
+    async def _fill_shared_values(self, entries):
+        """
+        Put the values of entries sent as a digest in place, from the stored bodies or
+        from entries of the same batch; return the digests found in neither.
+        """
+        digests = {entry.value_hash for entry in entries if entry.value_hash}
+        if not digests:
+            return []
+        bodies = await self.worker.get_bodies(list(digests))
+        if not isinstance(bodies, dict):
+            raise RuntimeError(f"Failed to read shared values: {bodies}")
+        values = {digest: value.decode() for digest, value in bodies.items() if value is not None}
+        if len(values) < len(digests):
+            for entry in entries:
+                if not entry.value_hash and entry.value:
+                    digest = value_digest(entry.value.encode())
+                    if digest in digests:
+                        values[digest] = entry.value
+        for entry in entries:
+            if entry.value_hash in values:
+                entry.value = values[entry.value_hash]
+        return [digest for digest in digests if digest not in values]
+
+    async def ReplicateBatch(self, request, context):
+        """Apply a batch of a peer's replication log in one transaction and ack the highest seq applied."""
+        dedup_threshold = self.worker.bodies.threshold
+        try:
+            missing = await self._fill_shared_values(request.entries)
+            if missing:
+                cursor = self.replication_log.get_cursor(f"origin:{request.origin}")
+                applied_seq = cursor[1] if cursor and cursor[0] == request.epoch else 0
+                return kvstore_pb2.ReplicationAck(applied_seq=applied_seq, missing_bodies=missing,
+                                                  dedup_threshold=dedup_threshold)
+            applied_seq, gap = await self._apply_replicated(request.origin, request.epoch, request.entries,
+                                                            request.stable_hlc)
+        except RuntimeError as e:
+            logging.error(str(e))
+            context.set_code(grpc.StatusCode.UNKNOWN)
+            context.set_details("Replication batch failed")
+            return kvstore_pb2.ReplicationAck()
+        if gap:
+            logging.warning(f"Gap in replication log from {request.origin} after seq {applied_seq}; catching up")
+            self.start_catch_up(request.origin)
+        return kvstore_pb2.ReplicationAck(applied_seq=applied_seq, dedup_threshold=dedup_threshold)
+
+    async def FetchLog(self, request, context):
+        """Stream this node's replication log from request.from_seq to a recovering peer."""
+        log = self.replication_log
+        context.set_compression(self.batch_compression)
+        from_seq = request.from_seq if request.epoch == log.epoch else 1
+        if from_seq < log.first_seq:
+            await context.abort(grpc.StatusCode.OUT_OF_RANGE, f"Log truncated before seq {log.first_seq}")
+        seq = from_seq - 1
+        while True:
+            entries = log.read_after(seq, 1024)
+            if not entries:
+                return
+            yield build_batch(self.node_id, log.epoch, entries, self.replication_manager.stable_hlc())
+            seq = entries[-1][0]
+
+    async def FetchSnapshot(self, request, context):
+        """
+        Stream every versioned record, tombstones included, tagged with the log position the copy covers.
+        The namespace drops come first, so they do not remove keys of the snapshot written after them.
+        """
+        seq = self.replication_log.durable_seq()  # Every write up to here is already in the store
+        drops = list(self.worker.namespaces.dropped.items())  # Updated by the worker thread
+        if drops:
+            yield kvstore_pb2.SnapshotChunk(seq=seq, epoch=self.replication_log.epoch, items=[
+                to_mutation("drop", qualify(name, ""), "", *version) for name, version in drops])
+        after_key = ""
+        while True:
+            items = await self.worker.scan(after_key, 1024)
+            if not isinstance(items, list):
+                await context.abort(grpc.StatusCode.UNKNOWN, "Snapshot scan failed")
+            yield kvstore_pb2.SnapshotChunk(seq=seq, epoch=self.replication_log.epoch, items=[
+                to_mutation("delete" if tombstone else "put", key, value, hlc, node)
+                for key, value, hlc, node, tombstone in items])
+            if len(items) < 1024:
+                return
+            after_key = items[-1][0]
+
+    def start_catch_up(self, peer):
+        """Start pulling peer's log (or a snapshot) unless a catch-up from it is already running."""
+        if self.replication_manager.mode != "log":
+            return
+        if peer not in self.catch_ups or self.catch_ups[peer].done():
+            self.catch_ups[peer] = asyncio.create_task(self._catch_up(peer))
+
+    async def _catch_up(self, peer):
+        """Replay peer's log tail from our last cursor, falling back to a snapshot if it was truncated."""
+        stub = self.replication_manager.peer_stub(peer)
+        start = time.monotonic()
+        replayed = 0
+        used_snapshot = False
+        for _ in range(3):  # Log, then at most a snapshot plus the log after it
+            epoch, cursor = self.replication_log.get_cursor(f"origin:{peer}") or (0, 0)
+            try:
+                async for batch in stub.FetchLog(kvstore_pb2.LogRequest(
+                        requester=self.node_id, from_seq=cursor + 1, epoch=epoch)):
+                    applied_seq, gap = await self._apply_replicated(peer, batch.epoch, batch.entries,
+                                                                    batch.stable_hlc)
+                    if gap:
+                        raise RuntimeError(f"Unexpected gap in log from {peer} after seq {applied_seq}")
+                    replayed += len(batch.entries)
+                break
+            except grpc.aio.AioRpcError as e:
+                if e.code() != grpc.StatusCode.OUT_OF_RANGE:
+                    logging.warning(f"Catch-up from {peer} failed: {e.code()}")
+                    return
+                logging.warning(f"Log from {peer} was truncated; applying a snapshot")
+                await self._apply_snapshot(peer, stub)
+                used_snapshot = True
+            except RuntimeError as e:
+                logging.error(str(e))
+                return
+        duration = (time.monotonic() - start) * 1000
+        self.catch_up_stats[peer] = (duration, replayed, used_snapshot)
+        logging.info(f"Caught up with {peer}: {replayed} entries in {duration:.2f} ms"
+                     f"{' after a snapshot' if used_snapshot else ''}")
+
+    async def _apply_snapshot(self, peer, stub):
+        """Copy peer's data and move our cursor to the log position the snapshot covers."""
+        async with self.origin_locks[peer]:
+            seq = epoch = None
+            async for chunk in stub.FetchSnapshot(kvstore_pb2.Empty()):
+                seq, epoch = chunk.seq, chunk.epoch
+                if chunk.items:
+                    await self._apply(to_mutations(chunk.items))
+            if seq is not None:
+                self.replication_log.set_cursor(f"origin:{peer}", epoch, seq)
+            self.snapshots_applied += 1
+
+    async def load_merkle_tree(self):
+        """Hash every stored record into the Merkle tree, then let anti-entropy start."""
+        start = time.monotonic()
+        self.merkle_tree.loading = True  # Writes during the load take precedence over scanned values
+        after_key = ""
+        while True:
+            items = await self.worker.scan(after_key, 1024)
+            if not isinstance(items, list):
+                logging.error(f"Merkle tree load failed: {items}")
+                return
+            for key, value, hlc, node, tombstone in items:
+                self.clock.observe(hlc)
+                self.merkle_tree.load(key, None if tombstone else value, (hlc, node))
+            if len(items) < 1024:
+                break
+            after_key = items[-1][0]
+        self.merkle_tree.loading = False
+        self.merkle_tree.written_while_loading.clear()
+        self.anti_entropy.ready.set()
+        logging.info(f"Merkle tree loaded with {len(self.merkle_tree)} keys in {(time.monotonic() - start) * 1000:.2f} ms")
+
+    async def _apply_repairs(self, mutations):
+        """Store records pulled by anti-entropy or read repair (not replicated again); return how many were applied."""
+        result = await self._apply(to_mutations(mutations))
+        if not isinstance(result, list):
+            raise RuntimeError(f"Failed to apply anti-entropy repairs: {result}")
+        return sum(applied for _, applied in result)
+
+    def _gc_horizons(self):
+        """Writer node -> HLC up to which its tombstones can be dropped: every replica has applied them."""
+        horizons = dict(self.gc_horizons)
+        if self.replication_manager.mode == "log":
+            horizons[self.node] = self.replication_manager.stable_hlc() if self.peers else self.clock.last
+        else:
+            horizons = {}  # Unary replication has no acknowledged position to bound stragglers
+        return horizons
+
+    async def collect_tombstones(self):
+        """Periodically drop the tombstones every replica has applied."""
+        while True:
+            await asyncio.sleep(self.tombstone_gc_interval)
+            horizons = self._gc_horizons()
+            if not horizons:
+                continue
+            removed = await self.worker.collect_tombstones(horizons)
+            if not isinstance(removed, list):
+                logging.error(f"Tombstone collection failed: {removed}")
+                continue
+            for key, hlc, node in removed:
+                self.merkle_tree.remove(key, (hlc, node))
+            self.tombstones_collected += len(removed)
+            if removed:
+                logging.info(f"Collected {len(removed)} tombstones")
+
+    async def tier_cold_keys(self):
+        """Periodically move the keys nobody read or wrote since the previous round out of LMDB."""
+        while True:
+            await asyncio.sleep(self.tiering_interval)
+            moved = await self.worker.tier()
+            if not isinstance(moved, int):
+                logging.error(f"Tiering failed: {moved}")
+
+    async def MerkleHashes(self, request, context):
+        """Return the hashes of the requested Merkle tree nodes."""
+        if not self.anti_entropy.ready.is_set():
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "Merkle tree is still loading")
+        if any(node < 1 or node >= 2 * self.merkle_tree.leaf_count for node in request.nodes):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Unknown Merkle tree node")
+        return kvstore_pb2.MerkleHashList(hashes=self.merkle_tree.hashes(request.nodes))
+
+    async def MerkleLeaves(self, request, context):
+        """Return the key digests and versions held by the requested leaf nodes."""
+        if not self.anti_entropy.ready.is_set():
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "Merkle tree is still loading")
+        if not all(self.merkle_tree.is_leaf(node) and node < 2 * self.merkle_tree.leaf_count for node in request.nodes):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, "Not a Merkle tree leaf")
+        return kvstore_pb2.KeyDigestList(entries=[
+            kvstore_pb2.KeyDigest(key=key, digest=digest, hlc=hlc, node=writer, tombstone=tombstone)
+            for node in request.nodes
+            for key, (digest, (hlc, writer), tombstone) in self.merkle_tree.leaf_entries(node).items()])
+
+    async def FetchKeys(self, request, context):
+        """Return the stored versions of the requested keys that exist (tombstones as DELETEs)."""
+        items = await self.worker.get_many(list(request.keys))
+        if not isinstance(items, list):
+            await context.abort(grpc.StatusCode.UNKNOWN, "Key fetch failed")
+        return kvstore_pb2.MutationBatch(mutations=[
+            to_mutation("delete" if tombstone else "put", key, value, hlc, node)
+            for key, value, hlc, node, tombstone in items])
+
+    async def RequestVote(self, request, context):
+        """Raft: answer a candidate's (pre-)vote request."""
+        if self.raft is None:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Raft replication is not enabled")
+        return await self.raft.handle_vote(request)
+
+    async def AppendEntries(self, request_iterator, context):
+        """Raft: apply the leader's stream of AppendEntries requests in order, answering each."""
+        if self.raft is None:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Raft replication is not enabled")
+        async for request in request_iterator:
+            yield await self.raft.handle_append(request)
+
+    async def InstallSnapshot(self, request_iterator, context):
+        """Raft: replace this node's store with the leader's snapshot."""
+        if self.raft is None:
+            await context.abort(grpc.StatusCode.FAILED_PRECONDITION, "Raft replication is not enabled")
+        return await self.raft.handle_snapshot(request_iterator)
+
+    async def WatchInvalidations(self, request, context):
+        """Stream the keys of a namespace written on this node so clients can invalidate their near-caches."""
+        namespace = request.namespace
+        if not valid_namespace(namespace):
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT,
+                                f"Namespaces must not contain NUL and are at most {MAX_NAMESPACE_LENGTH} bytes")
+        queue = self.invalidations.subscribe()
+        try:
+            yield kvstore_pb2.Invalidation()  # Tell the client the stream is live
+            while True:
+                events = [await queue.get()]
+                while not queue.empty():  # Coalesce everything queued into one message
+                    events.append(queue.get_nowait())
+                if None in events:
+                    yield kvstore_pb2.Invalidation(reset=True)
+                    continue
+                events = [(split_key(key), timestamp) for key, timestamp in events]
+                events = [(key, timestamp) for (key_namespace, key), timestamp in events if key_namespace == namespace]
+                if events:
+                    yield kvstore_pb2.Invalidation(keys=[key for key, _ in events], timestamp=events[0][1])
+        finally:
+            self.invalidations.unsubscribe(queue)
+
+    async def Watch(self, request, context):
+        """Stream the writes applied on this node to a namespace's keys under a prefix, in order and resumable by sequence."""
+        feed = self.change_feed
+        prefix = await self._qualify(request.namespace, request.prefix, context)
+
+        def encode_watch_batch(events, coalesced, cursor):
+            return kvstore_pb2.WatchBatch(epoch=feed.epoch, last_sequence=cursor, coalesced=coalesced, events=[
+                kvstore_pb2.WatchEvent(sequence=seq, mutation=to_mutation(op, split_key(key)[1], value, hlc, node),
+                                       timestamp=timestamp)
+                for seq, op, key, value, hlc, node, timestamp in events])
+
+        if request.epoch and request.epoch != feed.epoch:
+            await context.abort(grpc.StatusCode.OUT_OF_RANGE, "The change feed restarted; watch from the beginning")
+        cursor = request.from_sequence - 1 if request.from_sequence else feed.last_seq
+        feed.subscribers += 1
+        try:
+            yield kvstore_pb2.WatchBatch(epoch=feed.epoch, last_sequence=cursor)  # Tell the client the stream is live
+            while True:
+                await feed.wait(cursor)
+                try:
+                    batch, cursor = feed.read(cursor, prefix, encode_watch_batch)
+                except LookupError as e:
+                    await context.abort(grpc.StatusCode.OUT_OF_RANGE, str(e))
+                if batch is not None:
+                    yield batch
+        finally:
+            feed.subscribers -= 1
+
+    async def Stats(self, request, context):
+        """Return server-side counters."""
+        metrics = {f"get_{name}": value for name, value in self.get_flights.snapshot().items()}
+        metrics.update({f"invalidation_{name}": value for name, value in self.invalidations.snapshot().items()})
+        metrics.update({f"watch_{name}": value for name, value in self.change_feed.snapshot().items()})
+        metrics.update(self.replication_manager.stats())
+        metrics["replication_applied"] = self.replication_applied
+        metrics["replication_snapshots_applied"] = self.snapshots_applied
+        for name, (_, seq) in self.replication_log.cursors.items():
+            if name.startswith("origin:"):
+                metrics[f"replication_cursor_{name[len('origin:'):]}"] = seq
+        for peer, (duration, replayed, _) in self.catch_up_stats.items():
+            metrics[f"replication_catch_up_ms_{peer}"] = duration
+            metrics[f"replication_catch_up_entries_{peer}"] = replayed
+        metrics.update(self.anti_entropy.stats())
+        metrics.update({"quorum_reads": self.quorum_reads, "quorum_writes": self.quorum_writes,
+                        "quorum_failures": self.quorum_failures})
+        metrics.update(self.read_repair.stats())
+        if self.raft is not None:
+            metrics.update(self.raft.stats())
+        if self.chain is not None:
+            metrics.update(self.chain.stats())
+        if self.cdc is not None:
+            metrics.update(self.cdc.stats())
+        metrics.update(self.worker.wal_stats())
+        metrics.update(self.worker.blob_stats())
+        metrics.update(self.worker.codec.stats())
+        metrics.update(self.worker.tier_stats())
+        metrics.update(self.worker.bodies.stats())
+        metrics.update(self.worker.namespaces.stats())
+        metrics["namespace_drop_ms"] = self.namespace_drop_ms
+        metrics.update({f"lmdb_{option}": float(value) for option, value in self.worker.lmdb_options.items()})
+        metrics["tombstones_collected"] = self.tombstones_collected
+        metrics["tombstone_gc_horizon"] = self._gc_horizons().get(self.node, 0)
+        return kvstore_pb2.ServerStats(metrics=metrics)
+
+async def serve(port, peers=None, **options):
+    """Starts the async gRPC server on a specified port (options are passed to the servicer)."""
     server = grpc.aio.server()
-    kvstore_pb2_grpc.add_KeyValueStoreServicer_to_server(AsyncKeyValueStoreServicer(port), server)
+    servicer = AsyncKeyValueStoreServicer(port, peers, **options)
+    kvstore_pb2_grpc.add_KeyValueStoreServicer_to_server(servicer, server)
     server.add_insecure_port(f"127.0.0.1:{port}")  # Bind to specified port
 
     await server.start()
+    servicer.replication_manager.start()
+    if servicer.cdc is not None:
+        servicer.cdc.start()
+    if servicer.raft is not None:
+        servicer.raft.start()
+    if servicer.chain is not None:
+        servicer.chain.start()
+    for peer in servicer.peers:
+        servicer.start_catch_up(peer)  # Pull whatever we missed while we were down
+    merkle_load = asyncio.create_task(servicer.load_merkle_tree())
+    servicer.anti_entropy.start()
+    tombstone_gc = asyncio.create_task(servicer.collect_tombstones()) if servicer.tombstone_gc_interval > 0 else None
+    tiering = asyncio.create_task(servicer.tier_cold_keys()) if servicer.tiering_interval > 0 else None
     logging.info(f"Async gRPC Server started on port {port}")
 
     stop_event = asyncio.Event()
@@ -111,12 +1029,96 @@ async def serve(port):
     loop.add_signal_handler(signal.SIGTERM, shutdown)
 
     await stop_event.wait()
+    await cancel_tasks(merkle_load, tombstone_gc, tiering)  # Before the worker they read from is closed
+    await servicer.anti_entropy.stop()
+    if servicer.raft is not None:
+        await servicer.raft.stop()
+    if servicer.chain is not None:
+        await servicer.chain.stop()
+    await servicer.replication_manager.stop()
     await server.stop(0)
+    if servicer.cdc is not None:
+        await servicer.cdc.stop()  # After the server, so every applied write is exported
+    await servicer.worker.close()  # Applies what is still only in the WAL
+    await cancel_tasks(*(asyncio.all_tasks() - {asyncio.current_task()}))  # Catch-ups and repairs still running
     logging.info("Server shutdown complete.")    
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--port", type=int, default=50051, help="Port number for the server")
+    parser.add_argument("--peers", type=str, default=None, help="Comma-separated peer addresses (default: the other local ports)")
+    parser.add_argument("--replication", choices=["log", "unary", "raft", "chain"], default="log", help="Replication path")
+    parser.add_argument("--replication-log", type=str, default=None, help="Replication log directory (default: replication_log_<port>.lmdb)")
+    parser.add_argument("--replication-log-max", type=int, default=1000000, help="Log entries kept before truncation")
+    parser.add_argument("--hints-dir", type=str, default=None, help="Hinted handoff directory for unary replication (default: hints_<port>)")
+    parser.add_argument("--hint-replay-rate", type=int, default=1000, help="Hinted writes replayed per second to a recovered peer")
+    parser.add_argument("--replication-window", type=int, default=256, help="Unary replication RPCs in flight per peer")
+    parser.add_argument("--replication-overflow", choices=["block", "shed", "spill"], default="block",
+                        help="What a write does when a peer's window is full: wait, skip the peer, or queue a hint")
+    parser.add_argument("--db-path", type=str, default=None, help="LMDB data directory (default: kvstore_<port>.lmdb)")
+    parser.add_argument("--lmdb-preset", choices=list(LMDB_PRESETS), default="durable",
+                        help="LMDB durability preset; the --lmdb-* flags below override single options")
+    for option in ["sync", "metasync", "writemap", "map-async", "readahead", "lock"]:
+        parser.add_argument(f"--lmdb-{option}", action=argparse.BooleanOptionalAction, default=None,
+                            help=f"Turn LMDB's {option.replace('-', '_')} on or off")
+    parser.add_argument("--lmdb-max-readers", type=int, default=None, help="LMDB reader slots (default 126)")
+    parser.add_argument("--lmdb-map-size-mb", type=int, default=None,
+                        help="Largest size the data and blob files may grow to, in MB (default 1024)")
+    parser.add_argument("--anti-entropy-interval", type=float, default=10.0, help="Seconds between anti-entropy rounds (0 disables)")
+    parser.add_argument("--tombstone-gc-interval", type=float, default=30.0, help="Seconds between tombstone collections (0 disables)")
+    parser.add_argument("--read-repair-rate", type=int, default=100, help="Read repairs pushed per second (0 disables)")
+    parser.add_argument("--watch-history", type=int, default=100000, help="Writes kept for Watch subscribers to resume from")
+    parser.add_argument("--watch-linger-ms", type=float, default=5.0,
+                        help="Wait after a write before sending Watch batches, so a burst goes out as one batch")
+    parser.add_argument("--cdc-dir", type=str, default=None, help="Export every applied write to segment files here (default: off)")
+    parser.add_argument("--cdc-segment-mb", type=float, default=64, help="Size at which a CDC segment file is closed")
+    parser.add_argument("--cdc-flush-ms", type=float, default=100, help="Milliseconds between CDC block writes")
+    parser.add_argument("--wal", type=str, default=None, help="Write-ahead log file in front of LMDB (default: off)")
+    parser.add_argument("--wal-sync", choices=["always", "group", "interval", "never"], default="group",
+                        help="When the WAL is fsynced: every write, once per group of queued writes, every interval, or never")
+    parser.add_argument("--wal-sync-interval-ms", type=float, default=10, help="Milliseconds between WAL fsyncs with --wal-sync=interval")
+    parser.add_argument("--wal-apply-batch", type=int, default=10000, help="WAL entries applied to LMDB in one transaction")
+    parser.add_argument("--compression", choices=CODECS, default=None,
+                        help="Compress stored values with zlib, zstd, or zstd if installed (default: off)")
+    parser.add_argument("--compression-threshold", type=int, default=128, help="Smallest value compressed, in bytes")
+    parser.add_argument("--compression-level", type=int, default=None, help="Codec level (default: zlib 6, zstd 3)")
+    parser.add_argument("--compression-dict-kb", type=float, default=16,
+                        help="Size of the dictionary trained from sampled values (0: no dictionary)")
+    parser.add_argument("--compression-samples", type=int, default=1000, help="Values sampled to train the dictionary")
+    parser.add_argument("--tiering-interval", type=float, default=0,
+                        help="Seconds between passes that move keys not accessed since the previous one to cold segments (0 disables)")
+    parser.add_argument("--tiering-block-kb", type=float, default=16, help="Uncompressed size of a cold segment block")
+    parser.add_argument("--dedup-threshold", type=int, default=0,
+                        help="Store values of at least this many bytes once per distinct value (0 disables)")
+    parser.add_argument("--namespace-quota", action="append", type=parse_quota, default=[],
+                        metavar="NAME:MAX_KEYS:MAX_MB",
+                        help="Writes to a namespace at this many records or MB fail (0: no limit; NAME * for any); repeatable")
+    parser.add_argument("--max-namespaces", type=int, default=128, help="Namespaces a node can hold")
+    parser.add_argument("--raft-dir", type=str, default=None, help="Raft log and snapshot directory (default: raft_<port>)")
+    parser.add_argument("--raft-election-timeout", type=float, default=0.3, help="Minimum Raft election timeout in seconds")
+    parser.add_argument("--raft-snapshot-threshold", type=int, default=10000, help="Applied Raft entries between snapshots")
     args = parser.parse_args()
 
-    asyncio.run(serve(args.port))  
+    peers = [p for p in args.peers.split(",") if p] if args.peers is not None else None
+    asyncio.run(serve(args.port, peers, replication_mode=args.replication, replication_log=args.replication_log,
+                      max_log_entries=args.replication_log_max, db_path=args.db_path,
+                      anti_entropy_interval=args.anti_entropy_interval, hints_dir=args.hints_dir,
+                      hint_replay_rate=args.hint_replay_rate, replication_window=args.replication_window,
+                      replication_overflow=args.replication_overflow, tombstone_gc_interval=args.tombstone_gc_interval,
+                      read_repair_rate=args.read_repair_rate, raft_dir=args.raft_dir,
+                      raft_election_timeout=args.raft_election_timeout,
+                      raft_snapshot_threshold=args.raft_snapshot_threshold, watch_history=args.watch_history,
+                      watch_linger_ms=args.watch_linger_ms, cdc_dir=args.cdc_dir,
+                      cdc_segment_mb=args.cdc_segment_mb, cdc_flush_ms=args.cdc_flush_ms, wal_path=args.wal,
+                      wal_sync=args.wal_sync, wal_sync_interval_ms=args.wal_sync_interval_ms,
+                      wal_apply_batch=args.wal_apply_batch, compression=args.compression,
+                      compression_threshold=args.compression_threshold, compression_level=args.compression_level,
+                      compression_dict_kb=args.compression_dict_kb, compression_samples=args.compression_samples,
+                      tiering_interval=args.tiering_interval, tiering_block_kb=args.tiering_block_kb,
+                      dedup_threshold=args.dedup_threshold, namespace_quotas=dict(args.namespace_quota),
+                      max_namespaces=args.max_namespaces,
+                      lmdb_options=lmdb_preset(args.lmdb_preset, sync=args.lmdb_sync, metasync=args.lmdb_metasync,
+                                               writemap=args.lmdb_writemap, map_async=args.lmdb_map_async,
+                                               readahead=args.lmdb_readahead, lock=args.lmdb_lock,
+                                               max_readers=args.lmdb_max_readers,
+                                               map_size=args.lmdb_map_size_mb and args.lmdb_map_size_mb << 20)))  
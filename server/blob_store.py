@@ -0,0 +1,133 @@
+import logging
+import struct
+
+import lmdb
+
+
+MANIFEST = struct.Struct(">8sQI")  # Upload ID, total size, chunk count
+CHUNK_INDEX = struct.Struct(">I")
+MANIFEST_PREFIX = b"m"
+CHUNK_PREFIX = b"c"
+
+
+def manifest_key(key):
+    return MANIFEST_PREFIX + key.encode()
+
+
+def chunk_key(upload, index):
+    return CHUNK_PREFIX + upload + CHUNK_INDEX.pack(index)
+
+
+class BlobStore:
+    """
+    Values of any size, stored as chunks next to the node's LMDB data.
+
+    Chunks of an upload are written under keys derived from a random upload ID,
+    where readers cannot see them, and become the key's value when commit()
+    writes its manifest. Replacing or deleting a blob removes the previous
+    chunks in the same transaction, so readers see the old blob or the new one,
+    never a mix. Chunk writes are not synced; commit() syncs them with the
+    manifest when the node's LMDB options sync. Chunks left by an upload
+    interrupted by a crash are removed when the store is opened.
+    """
+
+    def __init__(self, path, lmdb_options):
+        self.sync = lmdb_options["sync"]
+        self.env = lmdb.open(path, subdir=False, max_dbs=0, **dict(lmdb_options, sync=False, metasync=False))
+        self.chunks_written = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.orphans_removed = self._remove_orphans()
+        if self.orphans_removed:
+            logging.info(f"Removed {self.orphans_removed} chunks of interrupted uploads from {path}")
+
+    def _remove_orphans(self):
+        removed = 0
+        with self.env.begin(write=True) as txn:
+            with txn.cursor() as cursor:
+                uploads = set()
+                found = cursor.set_range(MANIFEST_PREFIX)
+                while found and cursor.key().startswith(MANIFEST_PREFIX):
+                    uploads.add(MANIFEST.unpack(cursor.value())[0])
+                    found = cursor.next()
+                found = cursor.set_range(CHUNK_PREFIX)
+                while found and cursor.key().startswith(CHUNK_PREFIX):
+                    if cursor.key()[1:9] not in uploads:
+                        removed += 1
+                        found = cursor.delete()
+                    else:
+                        found = cursor.next()
+        return removed
+
+    def write_chunk(self, upload, index, data):
+        with self.env.begin(write=True) as txn:
+            txn.put(chunk_key(upload, index), data)
+        self.chunks_written += 1
+        self.bytes_written += len(data)
+
+    def commit(self, key, upload, size, chunks):
+        """Make the upload the value of key; return the size of the blob it replaced, or None."""
+        with self.env.begin(write=True) as txn:
+            old = txn.get(manifest_key(key))
+            txn.put(manifest_key(key), MANIFEST.pack(upload, size, chunks))
+            if old is not None:
+                self._delete_chunks(txn, *MANIFEST.unpack(old))
+        if self.sync:
+            self.env.sync(True)
+        return MANIFEST.unpack(old)[1] if old is not None else None
+
+    def abort(self, upload, chunks):
+        """Remove the chunks of an upload that will not be committed."""
+        with self.env.begin(write=True) as txn:
+            self._delete_chunks(txn, upload, 0, chunks)
+
+    def delete(self, key):
+        """Delete the blob under key; return its size, or None if there was none."""
+        with self.env.begin(write=True) as txn:
+            old = txn.pop(manifest_key(key))
+            if old is not None:
+                self._delete_chunks(txn, *MANIFEST.unpack(old))
+        if old is not None and self.sync:
+            self.env.sync(True)
+        return MANIFEST.unpack(old)[1] if old is not None else None
+
+    def _delete_chunks(self, txn, upload, _, chunks):
+        for index in range(chunks):
+            txn.delete(chunk_key(upload, index))
+
+    def manifest(self, key):
+        """Return (upload ID, size, chunk count) of the blob under key, or None."""
+        with self.env.begin() as txn:
+            data = txn.get(manifest_key(key))
+        return MANIFEST.unpack(data) if data is not None else None
+
+    def read(self, upload, first, max_bytes):
+        """
+        Return the chunks of an upload from index first on, at least one and up to
+        about max_bytes, each copied once out of the memory map. Returns None if
+        the upload was replaced or deleted since its manifest was read.
+        """
+        chunks = []
+        size = 0
+        with self.env.begin(buffers=True) as txn:
+            with txn.cursor() as cursor:
+                if not cursor.set_key(chunk_key(upload, first)):
+                    return None
+                while size < max_bytes and cursor.key()[1:9] == upload:
+                    chunks.append(bytes(cursor.value()))
+                    size += len(chunks[-1])
+                    if not cursor.next():
+                        break
+        self.bytes_read += size
+        return chunks
+
+    def stats(self):
+        return {
+            "blob_chunks_written": self.chunks_written,
+            "blob_bytes_written": self.bytes_written,
+            "blob_bytes_read": self.bytes_read,
+            "blob_orphans_removed": self.orphans_removed,
+        }
+
+    def close(self):
+        self.env.close()
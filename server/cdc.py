@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+from replication_log import encode_entry, decode_entry
+
+
+BLOCK_HEADER = struct.Struct(">IQQ")  # Compressed length, first and last sequence in the block
+RECORD_HEADER = struct.Struct(">IQd")  # Entry length, sequence, time the write was applied
+SEGMENT_SUFFIX = ".cdc"
+
+
+def segment_name(first_seq):
+    return f"{first_seq:020d}{SEGMENT_SUFFIX}"
+
+
+def list_segments(directory):
+    """Return (first sequence, path) of the segments in directory, oldest first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted((int(name[:-len(SEGMENT_SUFFIX)]), os.path.join(directory, name))
+                  for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+
+def scan_blocks(path):
+    """Return (offset, length, first seq, last seq) of the complete blocks in a segment."""
+    blocks = []
+    size = os.path.getsize(path)
+    offset = 0
+    with open(path, "rb") as f:
+        while offset + BLOCK_HEADER.size <= size:
+            f.seek(offset)
+            length, first_seq, last_seq = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+            if offset + BLOCK_HEADER.size + length > size:
+                break  # Partially written block
+            blocks.append((offset, length, first_seq, last_seq))
+            offset += BLOCK_HEADER.size + length
+    return blocks
+
+
+def read_cdc(directory, from_sequence=1):
+    """Yield (seq, op, key, value, timestamp) for every exported write from from_sequence on, in order."""
+    segments = list_segments(directory)
+    for i, (first_seq, path) in enumerate(segments):
+        if i + 1 < len(segments) and segments[i + 1][0] <= from_sequence:
+            continue  # Every write in this segment is older
+        with open(path, "rb") as f:
+            for offset, length, _, last_seq in scan_blocks(path):
+                if last_seq < from_sequence:
+                    continue  # Skip the block without decompressing it
+                f.seek(offset + BLOCK_HEADER.size)
+                records = zlib.decompress(f.read(length))
+                position = 0
+                while position < len(records):
+                    entry_len, seq, timestamp = RECORD_HEADER.unpack_from(records, position)
+                    position += RECORD_HEADER.size
+                    if seq >= from_sequence:
+                        op, key, value, _, _ = decode_entry(records[position:position + entry_len])
+                        yield seq, op, key, value, timestamp
+                    position += entry_len
+
+
+class CdcSink:
+    """
+    Exports every write applied on this node to rolling segment files.
+
+    publish() only appends to an in-memory buffer, so the write path never waits
+    on the disk. A background task compresses what was buffered into one block
+    every flush_interval seconds (or sooner once flush_records are waiting) and
+    appends it from a thread. A segment is closed once it reaches segment_bytes
+    and the next one is named after its first sequence. Sequences continue from
+    the last exported write after a restart; writes still buffered when the
+    process dies are lost.
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, flush_interval=0.1, flush_records=10000):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.flush_records = flush_records
+        os.makedirs(directory, exist_ok=True)
+        self.last_seq = 0
+        self.file = None
+        segments = list_segments(directory)
+        if segments:
+            first_seq, path = segments[-1]
+            blocks = scan_blocks(path)
+            end = blocks[-1][0] + BLOCK_HEADER.size + blocks[-1][1] if blocks else 0
+            with open(path, "r+b") as f:
+                f.truncate(end)  # Drop a block torn by a crash
+            self.last_seq = blocks[-1][3] if blocks else first_seq - 1
+            self.file = open(path, "ab")
+        self.buffer = []
+        self.buffer_full = asyncio.Event()
+        self.task = None
+        self.stopping = False
+        self.exported = 0
+        self.blocks = 0
+        self.segments = len(segments)
+        self.bytes_written = 0
+        self.flush_ms = 0.0
+
+    def publish(self, key, value, version):
+        """Buffer an applied write (value None for a delete) for export."""
+        self.last_seq += 1
+        self.buffer.append((self.last_seq, "put" if value is not None else "delete", key, value or "", version,
+                            time.time()))
+        if len(self.buffer) >= self.flush_records:
+            self.buffer_full.set()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush task and write out what is still buffered."""
+        if self.task is not None:
+            self.stopping = True  # Not cancelled: a block still being written would race the final flush
+            self.buffer_full.set()
+            await self.task
+            self.task = None
+        await self.flush()
+        if self.file is not None:
+            await asyncio.to_thread(self._close_segment)
+
+    async def _run(self):
+        while not self.stopping:
+            try:
+                await asyncio.wait_for(self.buffer_full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except OSError as e:
+                logging.error(f"CDC export to {self.directory} failed: {e}")  # Records stay buffered for the next try
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        records, self.buffer = self.buffer, []
+        self.buffer_full.clear()
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write_block, records)
+        except OSError:
+            self.buffer[:0] = records
+            raise
+        self.flush_ms = (time.perf_counter() - start) * 1000
+        self.exported += len(records)
+
+    def _write_block(self, records):
+        """Compress records into one block and append it, starting a new segment if needed."""
+        chunks = []
+        for seq, op, key, value, version, timestamp in records:
+            entry = encode_entry(op, key, value, *version)
+            chunks.append(RECORD_HEADER.pack(len(entry), seq, timestamp) + entry)
+        data = zlib.compress(b"".join(chunks), 1)
+        if self.file is None or self.file.tell() >= self.segment_bytes:
+            self._close_segment()
+            self.file = open(os.path.join(self.directory, segment_name(records[0][0])), "ab")
+            self.segments += 1
+        self.file.write(BLOCK_HEADER.pack(len(data), records[0][0], records[-1][0]) + data)
+        self.file.flush()  # In the OS page cache: readers see it and it survives a process crash
+        self.blocks += 1
+        self.bytes_written += BLOCK_HEADER.size + len(data)
+
+    def _close_segment(self):
+        if self.file is not None:
+            os.fsync(self.file.fileno())
+            self.file.close()
+            self.file = None
+
+    def stats(self):
+        return {
+            "cdc_last_sequence": self.last_seq,
+            "cdc_exported": self.exported,
+            "cdc_buffered": len(self.buffer),
+            "cdc_blocks": self.blocks,
+            "cdc_segments": self.segments,
+            "cdc_bytes_written": self.bytes_written,
+            "cdc_last_flush_ms": self.flush_ms,
+        }
+
+
+# Read exported writes, e.g. python server/cdc.py cdc_50051 --from-sequence 1000 --follow
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print exported writes as JSON lines")
+    parser.add_argument("directory", help="CDC segment directory of a node")
+    parser.add_argument("--from-sequence", type=int, default=1, help="First sequence to print")
+    parser.add_argument("--follow", action="store_true", help="Keep printing writes as they are exported")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="Seconds between checks for new writes")
+    args = parser.parse_args()
+
+    next_seq = args.from_sequence
+    try:
+        while True:
+            for seq, op, key, value, timestamp in read_cdc(args.directory, next_seq):
+                print(json.dumps({"seq": seq, "op": op, "key": key, "value": value, "timestamp": timestamp}),
+                      flush=True)
+                next_seq = seq + 1
+            if not args.follow:
+                break
+            time.sleep(args.poll_interval)
+    except (KeyboardInterrupt, BrokenPipeError):
+        pass
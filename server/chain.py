@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+
+import grpc
+import kvstore_pb2
+
+from replication import to_mutation
+from retry_policy import cancel_tasks
+
+
+CHAIN_METADATA = ("x-kv-chain", "1")  # Marks a write passed down the chain by the predecessor
+SYNCING = "SYNCING"  # Ping message of a node still copying its neighbour's store
+
+
+class ChainReplication:
+    """
+    Chain replication over every node, ordered by address.
+
+    Writes enter at the head. Each node applies a write before passing it to its
+    successor, and a write is acknowledged once the tail has applied it, so the
+    tail only holds acknowledged writes and serves the strongly consistent reads.
+    Every node sends one copy of each write instead of the writer sending N - 1.
+
+    Each node keeps its own view of which nodes are down. A successor that cannot
+    be reached is dropped from the chain and the write goes to the next node. A
+    dropped node may have missed writes even if its process kept running, so a
+    node that answers health pings again is told to rejoin: it resyncs, and is
+    spliced back in once it reports that it is syncing. A (re)started or
+    rejoining node copies the store of its nearest neighbour that is not syncing
+    itself; while it is syncing it passes reads to its predecessor, which holds
+    every write it holds. When the whole chain starts at once, the node nearest
+    the head that finds no synced peer goes first.
+
+    The tail also passes reads to its predecessor unless that node pinged it
+    within the last lease without dropping it, so a tail that was cut off stops
+    answering from its stale copy at most one lease after its last ping.
+    """
+
+    def __init__(self, node_id, peers, get_stub, sync, health_interval=0.5, timeout=5.0):
+        self.node_id = node_id
+        self.chain = sorted([node_id, *peers])
+        self.get_stub = get_stub  # fn(peer) -> stub
+        self.sync = sync  # Coroutine fn(peer): copy peer's store into ours
+        self.health_interval = health_interval
+        self.lease = 3 * health_interval  # How long a ping from our predecessor vouches for our data
+        self.timeout = timeout
+        self.down = set()
+        self.confirmed = {}  # Peer -> time.monotonic() of its last ping that kept us in its chain
+        self.syncing = True
+        self.resync_requested = False  # Asked to rejoin while a sync was running
+        self.resyncs = 0  # Rejoins after being dropped by a peer
+        self.reconfigurations = 0
+        self.forwarded = 0  # Mutations passed to a successor
+        self.tasks = []
+
+    def _live(self):
+        return [node for node in self.chain if node not in self.down]
+
+    def head(self):
+        return self._live()[0]
+
+    def tail(self):
+        return self._live()[-1]
+
+    def successor(self):
+        live = self._live()
+        position = live.index(self.node_id)
+        return live[position + 1] if position + 1 < len(live) else None
+
+    def predecessor(self):
+        live = self._live()
+        position = live.index(self.node_id)
+        return live[position - 1] if position > 0 else None
+
+    def mark_down(self, peer):
+        """Drop peer from the chain after it failed a request."""
+        if peer in self.down or peer == self.node_id:
+            return
+        self.down.add(peer)
+        self.reconfigurations += 1
+        logging.warning(f"Chain reconfigured: {peer} is down (head {self.head()}, tail {self.tail()})")
+
+    def _mark_up(self, peer):
+        if peer in self.down:
+            self.down.discard(peer)
+            self.reconfigurations += 1
+            logging.info(f"Chain reconfigured: {peer} rejoined (head {self.head()}, tail {self.tail()})")
+
+    def start(self):
+        if not self.tasks:
+            self.tasks = [asyncio.create_task(self._resync()), asyncio.create_task(self._health_checks())]
+
+    async def stop(self):
+        await cancel_tasks(*self.tasks)
+        self.tasks = []
+
+    def on_ping(self, peer, rejoin):
+        """Record a health ping from peer, which asks us to rejoin if it dropped us from its chain."""
+        if rejoin:
+            self.rejoin()
+        elif peer:
+            self.confirmed[peer] = time.monotonic()
+
+    def serves_reads(self):
+        """Return False if reads must go to the predecessor: we are syncing, or it has not vouched for us lately."""
+        if self.syncing:
+            return False
+        predecessor = self.predecessor()
+        return predecessor is None or time.monotonic() - self.confirmed.get(predecessor, float("-inf")) < self.lease
+
+    def rejoin(self):
+        """Resync because a peer dropped this node from its chain: writes may have skipped it meanwhile."""
+        self.syncing = True
+        self.resyncs += 1
+        if not self.tasks:
+            return  # start() syncs first anyway
+        if self.tasks[0].done():
+            self.tasks[0] = asyncio.create_task(self._resync())
+        else:
+            self.resync_requested = True  # The running copy may predate the writes we missed
+
+    async def _resync(self):
+        while True:
+            self.resync_requested = False
+            await self._sync()
+            if not self.resync_requested:
+                self.syncing = False
+                return
+
+    async def _sync(self):
+        """Copy the store of the nearest synced node, predecessors first, before serving reads as the tail."""
+        position = self.chain.index(self.node_id)
+        while True:
+            syncing_predecessors = False
+            for peer in self.chain[:position][::-1] + self.chain[position + 1:]:
+                try:
+                    response = await self.get_stub(peer).Ping(kvstore_pb2.PingRequest(), timeout=1)
+                    if response.message == SYNCING:
+                        syncing_predecessors |= self.chain.index(peer) < position
+                        continue
+                    await self.sync(peer)
+                    logging.info(f"Chain sync from {peer} complete")
+                    return
+                except (grpc.aio.AioRpcError, asyncio.TimeoutError) as e:
+                    logging.info(f"Chain sync from {peer} failed: {e.code() if hasattr(e, 'code') else e}")
+            if not syncing_predecessors:
+                return  # Nobody to copy from, or we go first
+            await asyncio.sleep(self.health_interval)
+
+    async def _health_checks(self):
+        while True:
+            await asyncio.gather(*[self._check(peer) for peer in self.chain if peer != self.node_id])
+            await asyncio.sleep(self.health_interval)
+
+    async def _check(self, peer):
+        try:
+            # A dropped peer syncs before it answers, so it is spliced back in as a syncing node
+            await self.get_stub(peer).Ping(kvstore_pb2.PingRequest(rejoin=peer in self.down, node=self.node_id),
+                                           timeout=1)
+        except (grpc.aio.AioRpcError, asyncio.TimeoutError):
+            self.mark_down(peer)
+            return
+        self._mark_up(peer)
+
+    async def forward(self, mutations):
+        """
+        Pass (op, key, value, hlc, node) mutations this node applied to its successor.
+
+        Returns once the tail applied them. Raises AioRpcError if a live successor
+        rejected them.
+        """
+        request = kvstore_pb2.MutationBatch(mutations=[to_mutation(*mutation) for mutation in mutations])
+        while (successor := self.successor()) is not None:
+            try:
+                await self.get_stub(successor).BatchWrite(request, metadata=(CHAIN_METADATA,), timeout=self.timeout)
+                self.forwarded += len(mutations)
+                return
+            except grpc.aio.AioRpcError as e:
+                if e.code() != grpc.StatusCode.UNAVAILABLE:
+                    raise
+                self.mark_down(successor)  # Versions make the retry to the next node idempotent
+
+    def stats(self):
+        return {
+            "chain_head": 1 if self.head() == self.node_id else 0,
+            "chain_tail": 1 if self.tail() == self.node_id else 0,
+            "chain_length": len(self._live()),
+            "chain_syncing": 1 if self.syncing else 0,
+            "chain_resyncs": self.resyncs,
+            "chain_reconfigurations": self.reconfigurations,
+            "chain_forwarded": self.forwarded,
+        }
@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+from namespaces import NAMESPACE_MARK
+
+
+class ChangeFeed:
+    """
+    Ordered feed of the writes applied on this node, for Watch subscribers.
+
+    Every applied write gets the next sequence number and is kept in a bounded
+    in-memory history, so a subscriber can resume from any sequence still in it.
+    Subscribers have no queue of their own: each keeps a cursor into the history,
+    so a subscriber costs the same however far behind it is. A subscriber gets
+    every event while it is at most max_pending events behind; further behind, it
+    reads batch_size events at once and gets only the newest event per key among
+    them. One whose cursor fell out of the history has to start over.
+
+    Subscribers at the same cursor with the same prefix share one encoded batch,
+    and wait linger seconds after a write so that a burst goes out as one batch:
+    each message sent costs about as much as the write itself.
+    """
+
+    def __init__(self, history=100000, max_pending=256, batch_size=1000, linger=0.005):
+        self.epoch = int(time.time() * 1000)  # Sequences restart with the process
+        self.history = history
+        self.max_pending = max_pending  # Events a subscriber may be behind before they are coalesced
+        self.batch_size = batch_size
+        self.linger = linger
+        self.events = []  # (sequence, op, key, value, hlc, node, timestamp), oldest first
+        self.first_seq = 1
+        self.last_seq = 0
+        self.changed = asyncio.Event()  # Replaced after every publish so waiters see the next one
+        self.batches = {}  # (after, prefix) -> read result, for the current last_seq
+        self.batches_seq = 0
+        self.subscribers = 0
+        self.delivered = 0
+        self.coalesced = 0
+
+    def publish(self, key, value, version):
+        """Append an applied write (value None for a delete) and wake the subscribers."""
+        self.last_seq += 1
+        self.events.append((self.last_seq, "put" if value is not None else "delete", key, value or "", *version,
+                            time.time()))
+        if len(self.events) >= 2 * self.history:  # Trim in bulk so each publish stays O(1)
+            drop = len(self.events) - self.history
+            del self.events[:drop]
+            self.first_seq += drop
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def wait(self, after):
+        """Wait until there are events after sequence after, then linger for more."""
+        while self.last_seq <= after:
+            await self.changed.wait()
+        if self.linger > 0:
+            await asyncio.sleep(self.linger)
+
+    def read(self, after, prefix, encode):
+        """
+        Read the events after sequence after.
+
+        Returns (batch, cursor), cursor being the last sequence read and batch
+        encode(events, coalesced, cursor) for the events under prefix (a qualified
+        key prefix: one of the default namespace never matches a namespace's keys) in sequence
+        order (only the newest per key if the subscriber is more than max_pending
+        behind) and the count of older ones skipped (None if no event matched).
+        Raises LookupError if the events after after are no longer in the history.
+        """
+        if after + 1 < self.first_seq:
+            raise LookupError(f"Sequence {after + 1} is no longer in the change feed (oldest {self.first_seq})")
+        if self.batches_seq != self.last_seq:
+            self.batches.clear()
+            self.batches_seq = self.last_seq
+        if (after, prefix) not in self.batches:
+            start = after + 1 - self.first_seq
+            behind = self.last_seq - after > self.max_pending
+            window = self.events[start:start + (self.batch_size if behind else self.max_pending)]
+            events = [event for event in window
+                      if event[2].startswith(prefix) and (prefix or not event[2].startswith(NAMESPACE_MARK))]
+            coalesced = 0
+            if behind:
+                latest = {event[2]: event for event in events}
+                coalesced = len(events) - len(latest)
+                events = sorted(latest.values())
+            cursor = window[-1][0] if window else after
+            self.batches[(after, prefix)] = (encode(events, coalesced, cursor) if events else None, len(events),
+                                             coalesced, cursor)
+        batch, count, coalesced, cursor = self.batches[(after, prefix)]
+        self.delivered += count
+        self.coalesced += coalesced
+        return batch, cursor
+
+    def snapshot(self):
+        return {
+            "subscribers": self.subscribers,
+            "last_sequence": self.last_seq,
+            "first_sequence": self.first_seq,
+            "delivered": self.delivered,
+            "coalesced": self.coalesced,
+        }
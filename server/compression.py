@@ -0,0 +1,153 @@
+import logging
+import os
+import struct
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # Optional: values are compressed with zlib without it
+    zstandard = None
+
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_HEADER = struct.Struct(">BI")  # Codec, ID of the dictionary used (0: none)
+CODECS = ("zlib", "zstd", "auto")
+ZLIB_MAX_DICT = 32 * 1024  # zlib only looks back this far
+
+
+class ValueCodec:
+    """
+    Compresses stored values of at least threshold bytes.
+
+    A compressed value starts with a codec byte and the ID of the dictionary it
+    was compressed with, so values written with any codec or dictionary, or not
+    compressed at all, stay readable side by side. The first sample_count values
+    are sampled to build a dictionary of up to dict_size bytes (zstd's trainer,
+    or for zlib the samples themselves as its preset dictionary), which then
+    compresses every later value. Dictionaries are files in directory that never
+    change once written. A value that does not get smaller is stored as is.
+
+    With codec None nothing is compressed, but existing values still decompress.
+    """
+
+    def __init__(self, directory, codec=None, threshold=128, level=None, dict_size=16 * 1024, sample_count=1000):
+        if codec == "auto":
+            codec = "zstd" if zstandard is not None else "zlib"
+        if codec == "zstd" and zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        self.codec = codec
+        self.directory = directory
+        self.threshold = threshold
+        self.level = level
+        self.dict_size = dict_size
+        self.sample_count = sample_count if dict_size else 0
+        self.samples = []
+        self.dictionaries = {}  # ID -> dictionary bytes
+        self.compressors = {}  # Dictionary ID -> compressor primed with it
+        self.zstd_decompressors = {}
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith("dict-") and name.endswith(".bin"):
+                    with open(os.path.join(directory, name), "rb") as f:
+                        self.dictionaries[int(name[5:-4])] = f.read()
+        self.dictionary_id = max(self.dictionaries, default=0)  # Used for new values
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.compress_ns = 0
+        self.decompressed = 0
+        self.decompress_ns = 0
+
+    def compress(self, data):
+        """Return data compressed with its codec header, or None to store it as is."""
+        if self.codec is None or len(data) < self.threshold:
+            return None
+        start = time.perf_counter_ns()
+        if len(self.samples) < self.sample_count and not self.dictionary_id:
+            self.samples.append(data)
+            if len(self.samples) == self.sample_count:
+                self._train()
+        dictionary = self.dictionaries.get(self.dictionary_id)
+        if self.dictionary_id not in self.compressors:
+            if self.codec == "zstd":
+                self.compressors[self.dictionary_id] = zstandard.ZstdCompressor(
+                    level=self.level or 3,
+                    dict_data=zstandard.ZstdCompressionDict(dictionary) if dictionary else None)
+            else:
+                # With a window just big enough for the dictionary and a smaller hash table the state is
+                # about 70 KB instead of 260 KB, which makes the copy per value several times cheaper
+                window, memory = (max(9, min(15, (len(dictionary) - 1).bit_length())), 5) if dictionary else (15, 8)
+                self.compressors[self.dictionary_id] = zlib.compressobj(self.level or 6, zlib.DEFLATED, window, memory,
+                                                                        zdict=dictionary or b"")
+        if self.codec == "zstd":
+            body = CODEC_HEADER.pack(CODEC_ZSTD, self.dictionary_id) + self.compressors[self.dictionary_id].compress(data)
+        else:
+            compressor = self.compressors[self.dictionary_id].copy()  # Cheaper than priming a new one
+            body = CODEC_HEADER.pack(CODEC_ZLIB, self.dictionary_id) + compressor.compress(data) + compressor.flush()
+        self.compress_ns += time.perf_counter_ns() - start
+        self.compressed += 1
+        self.bytes_in += len(data)
+        if len(body) >= len(data):
+            self.bytes_out += len(data)
+            return None
+        self.bytes_out += len(body)
+        return body
+
+    def decompress(self, body):
+        start = time.perf_counter_ns()
+        codec, dictionary_id = CODEC_HEADER.unpack_from(body)
+        payload = memoryview(body)[CODEC_HEADER.size:]
+        if dictionary_id and dictionary_id not in self.dictionaries:
+            raise ValueError(f"Value was compressed with dictionary {dictionary_id}, which this node does not have")
+        dictionary = self.dictionaries.get(dictionary_id)
+        if codec == CODEC_ZLIB:
+            decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+            data = decompressor.decompress(payload) + decompressor.flush()
+        elif codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ValueError("Value was compressed with zstd, which needs the zstandard package")
+            if dictionary_id not in self.zstd_decompressors:
+                self.zstd_decompressors[dictionary_id] = zstandard.ZstdDecompressor(
+                    dict_data=zstandard.ZstdCompressionDict(dictionary) if dictionary else None)
+            data = self.zstd_decompressors[dictionary_id].decompress(payload)
+        else:
+            raise ValueError(f"Unknown codec {codec}")
+        self.decompress_ns += time.perf_counter_ns() - start
+        self.decompressed += 1
+        return data
+
+    def _train(self):
+        """Build a dictionary from the samples and use it for the values that follow."""
+        if self.codec == "zstd":
+            try:
+                dictionary = zstandard.train_dictionary(self.dict_size, self.samples).as_bytes()
+            except zstandard.ZstdError as e:
+                logging.warning(f"Could not train a compression dictionary: {e}")
+                self.samples = []
+                return
+        else:
+            # zlib finds matches in the dictionary's tail first, so the newest samples go last
+            dictionary = b"".join(self.samples)[-min(self.dict_size, ZLIB_MAX_DICT):]
+        dictionary_id = max(self.dictionaries, default=0) + 1
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"dict-{dictionary_id}.bin")
+        with open(path + ".tmp", "wb") as f:
+            f.write(dictionary)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)  # Written before any value uses it
+        self.dictionaries[dictionary_id] = dictionary
+        self.dictionary_id = dictionary_id
+        self.samples = []
+        logging.info(f"Trained a {len(dictionary)} byte {self.codec} compression dictionary ({path})")
+
+    def stats(self):
+        return {
+            "compression_values": self.compressed,
+            "compression_ratio": self.bytes_in / self.bytes_out if self.bytes_out else 1.0,
+            "compression_us_per_op": self.compress_ns / self.compressed / 1000 if self.compressed else 0.0,
+            "decompression_us_per_op": self.decompress_ns / self.decompressed / 1000 if self.decompressed else 0.0,
+            "compression_dictionary": self.dictionary_id,
+        }
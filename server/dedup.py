@@ -0,0 +1,117 @@
+import hashlib
+import struct
+
+import lmdb
+
+from hlc import HEADER, COMPRESSED, split_record, encode_reference, reference_digest, resolve_reference
+
+
+BODIES_DB = b"\xffbodies"
+SUB_DB_PREFIX = b"\xff"  # Sub-database names are keys of the main DB; no UTF-8 key starts with this byte
+REFS = struct.Struct(">Q")
+REFS_PREFIX = b"r"  # + digest -> number of records referring to the body
+BODY_PREFIX = b"b"  # + digest -> record flags of the body + body
+
+
+def value_digest(value):
+    """Hash identifying a value's body on every node."""
+    return hashlib.blake2b(value, digest_size=20).digest()
+
+
+class BodyStore:
+    """
+    Values of at least threshold bytes, stored once per distinct value in a
+    sub-database of the node's LMDB environment.
+
+    The record of a key holding such a value only keeps the value's digest.
+    Every body counts the records referring to it; the count changes in the
+    same transaction as those records, and the body is deleted with its last
+    reference. New bodies are compressed by codec like any value. With
+    threshold 0 no bodies are added, but existing references still resolve.
+    """
+
+    def __init__(self, threshold=0, codec=None):
+        self.threshold = threshold
+        self.codec = codec
+        self.db = None  # Opened by the worker thread
+        self.bodies = 0
+        self.body_bytes = 0  # Written to new bodies
+        self.shared = 0  # Values stored as one more reference to an existing body
+        self.bytes_saved = 0
+
+    def open(self, db_env):
+        """Open the bodies DB if values are shared now or were shared before."""
+        try:
+            self.db = db_env.open_db(BODIES_DB, create=bool(self.threshold))
+        except lmdb.NotFoundError:
+            self.db = None
+            return
+        with db_env.begin(db=self.db) as txn:
+            self.bodies = txn.stat(self.db)["entries"] // 2
+
+    def share(self, txn, record):
+        """Return record, or if its value is large, a reference to the value's body, stored or counted once more."""
+        if not self.threshold or len(record) - HEADER.size < self.threshold:
+            return record
+        value, hlc, node, tombstone = split_record(record, self.codec)
+        if tombstone:
+            return record
+        digest = value_digest(value)
+        refs = txn.get(REFS_PREFIX + digest, db=self.db)
+        if refs is None:
+            compressed = self.codec.compress(value) if self.codec is not None else None
+            body = bytes([COMPRESSED if compressed is not None else 0]) + (compressed or value)
+            txn.put(BODY_PREFIX + digest, body, db=self.db)
+            count = 0
+            self.bodies += 1
+            self.body_bytes += len(body)
+        else:
+            count = REFS.unpack(refs)[0]
+            self.shared += 1
+            self.bytes_saved += len(value)
+        txn.put(REFS_PREFIX + digest, REFS.pack(count + 1), db=self.db)
+        return encode_reference(digest, hlc, node)
+
+    def release(self, txn, record):
+        """Drop the reference record (the stored record being replaced, or None) holds, if any."""
+        digest = reference_digest(record) if record is not None else None
+        if digest is None:
+            return
+        count = REFS.unpack(txn.get(REFS_PREFIX + digest, db=self.db))[0] - 1
+        if count:
+            txn.put(REFS_PREFIX + digest, REFS.pack(count), db=self.db)
+        else:
+            txn.delete(REFS_PREFIX + digest, db=self.db)
+            txn.delete(BODY_PREFIX + digest, db=self.db)
+            self.bodies -= 1
+
+    def clear(self, txn):
+        txn.drop(self.db, delete=False)
+        self.bodies = 0
+
+    def resolve(self, txn, record):
+        """Return the record with its value in place if it is a reference."""
+        digest = reference_digest(record)
+        if digest is None:
+            return record
+        body = txn.get(BODY_PREFIX + digest, db=self.db) if self.db is not None else None
+        if body is None:
+            raise ValueError(f"Value body {digest.hex()} is missing")
+        return resolve_reference(record, body[0], bytes(body[1:]))
+
+    def value(self, txn, digest):
+        """Return the value stored under digest, or None."""
+        body = txn.get(BODY_PREFIX + digest, db=self.db) if self.db is not None else None
+        if body is None:
+            return None
+        return self.codec.decompress(body[1:]) if body[0] & COMPRESSED else bytes(body[1:])
+
+    def stats(self):
+        if self.db is None:
+            return {}
+        return {
+            "dedup_bodies": self.bodies,
+            "dedup_body_bytes_written": self.body_bytes,
+            "dedup_shared_values": self.shared,
+            "dedup_bytes_saved": self.bytes_saved,
+        }
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+
+import grpc
+import kvstore_pb2
+
+from replication_log import encode_entry, decode_entry
+from retry_policy import cancel_tasks
+
+
+HEADER = struct.Struct(">Id")  # Entry length, time the hint was written
+
+
+class HintLog:
+    """
+    Durable FIFO of writes for one unreachable peer.
+
+    Hints are appended to a file and read back through a memory map. The read
+    offset is kept in a sidecar file, so replay resumes where it stopped after a
+    restart. The file is truncated once every hint in it has been replayed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset_path = path + ".offset"
+        self.file = open(path, "ab")
+        self.read_offset = 0
+        if os.path.exists(self.offset_path):
+            with open(self.offset_path) as f:
+                self.read_offset = int(f.read() or 0)
+        if self.read_offset > os.path.getsize(path):
+            self.read_offset = 0  # Crashed after truncating the file
+        self.depth = 0
+        self.oldest_at = None  # Write time of the next hint to replay
+        entries, _ = self.read(self.read_offset, None)  # Count what is left from a previous run
+        self.depth = len(entries)
+        self.oldest_at = entries[0][-1] if entries else None
+
+    def append(self, op, key, value="", version=(0, 0)):
+        entry = encode_entry(op, key, value, *version)
+        written_at = time.time()
+        self.file.write(HEADER.pack(len(entry), written_at) + entry)
+        self.file.flush()  # In the OS page cache: survives a process crash
+        self.depth += 1
+        if self.oldest_at is None:
+            self.oldest_at = written_at
+
+    def read(self, offset, limit):
+        """Return up to limit hints from offset as (op, key, value, hlc, node, written_at) and the offset after them."""
+        size = os.path.getsize(self.path)
+        if size <= offset:
+            return [], offset
+        entries = []
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as data:
+            while offset + HEADER.size <= size and (limit is None or len(entries) < limit):
+                length, written_at = HEADER.unpack_from(data, offset)
+                end = offset + HEADER.size + length
+                if end > size:
+                    break  # Partially written hint
+                entries.append((*decode_entry(data[offset + HEADER.size:end]), written_at))
+                offset = end
+        return entries, offset
+
+    def commit(self, offset, count):
+        """Mark the hints before offset as replayed."""
+        self.depth -= count
+        drained = self.depth == 0
+        self.read_offset = 0 if drained else offset
+        with open(self.offset_path + ".tmp", "w") as f:
+            f.write(str(self.read_offset))
+        os.replace(self.offset_path + ".tmp", self.offset_path)
+        if drained:
+            self.file.truncate(0)  # Everything replayed: start the file over
+            self.oldest_at = None
+        else:
+            self.oldest_at = self.read(offset, 1)[0][0][-1]
+
+    def close(self):
+        self.file.close()
+
+
+class HintedHandoff:
+    """
+    Queues writes for unreachable peers and replays them once the peer is back.
+
+    While a peer has hints queued, all its new writes are queued behind them so
+    they still arrive in order. A background task pings each peer with hints every
+    health_interval seconds; once it answers, the hints are replayed in batches
+    through BatchWrite, throttled to replay_rate writes per second.
+    """
+
+    def __init__(self, peers, directory, get_stub, send_batch, replay_rate=1000, batch_size=100, health_interval=1.0):
+        os.makedirs(directory, exist_ok=True)
+        self.get_stub = get_stub  # fn(peer) -> stub, used for health pings
+        self.send_batch = send_batch  # Coroutine fn(peer, list of (op, key, value, hlc, node))
+        self.replay_rate = replay_rate
+        self.batch_size = batch_size
+        self.health_interval = health_interval
+        self.logs = {peer: HintLog(os.path.join(directory, peer.replace(":", "_") + ".hints")) for peer in peers}
+        self.replayed = {peer: 0 for peer in peers}
+        self.task = None
+
+    def has_hints(self, peer):
+        return self.logs[peer].depth > 0
+
+    def add(self, peer, op, key, value="", version=(0, 0)):
+        """Queue a write that could not be delivered to peer."""
+        self.logs[peer].append(op, key, value, version)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        await cancel_tasks(self.task)
+        self.task = None
+        for log in self.logs.values():
+            log.close()
+
+    async def _run(self):
+        while True:
+            await asyncio.gather(*[self._replay(peer) for peer, log in self.logs.items() if log.depth > 0])
+            await asyncio.sleep(self.health_interval)
+
+    async def _replay(self, peer):
+        """Replay peer's hints in order if it answers a ping."""
+        log = self.logs[peer]
+        stub = self.get_stub(peer)
+        try:
+            await stub.Ping(kvstore_pb2.PingRequest(), timeout=1)
+        except (grpc.aio.AioRpcError, asyncio.TimeoutError):
+            return
+        logging.info(f"Peer {peer} is back; replaying {log.depth} hints")
+        while log.depth > 0:
+            entries, offset = log.read(log.read_offset, self.batch_size)
+            if not entries:
+                return
+            start = time.monotonic()
+            try:
+                await self.send_batch(peer, [entry[:-1] for entry in entries])
+            except (grpc.aio.AioRpcError, asyncio.TimeoutError) as e:
+                logging.warning(f"Hint replay to {peer} failed: {e.code() if hasattr(e, 'code') else e}")
+                return
+            log.commit(offset, len(entries))
+            self.replayed[peer] += len(entries)
+            await asyncio.sleep(max(0.0, len(entries) / self.replay_rate - (time.monotonic() - start)))  # Throttle
+        logging.info(f"Hint replay to {peer} complete")
+
+    def stats(self):
+        """Return queue depth, age of the oldest hint and hints replayed per peer."""
+        metrics = {}
+        now = time.time()
+        for peer, log in self.logs.items():
+            metrics[f"hints_depth_{peer}"] = log.depth
+            metrics[f"hints_oldest_age_{peer}"] = now - log.oldest_at if log.oldest_at else 0.0
+            metrics[f"hints_replayed_{peer}"] = self.replayed[peer]
+        return metrics
@@ -0,0 +1,98 @@
+import struct
+import time
+import zlib
+
+
+RECORD_FORMAT = 1  # First byte of every versioned record
+HEADER = struct.Struct(">BQIB")  # Format, HLC, writer node, flags
+TOMBSTONE = 0x01
+COMPRESSED = 0x02  # The value starts with a codec header (see compression.py)
+SHARED = 0x04  # The value is the hash of a body stored once for every key holding it (see dedup.py)
+
+
+def node_hash(node_id):
+    """Compact 32-bit ID of a node, stored with every version it writes."""
+    return zlib.crc32(node_id.encode())
+
+
+class HybridLogicalClock:
+    """
+    Hybrid logical clock packed in one 64-bit integer: milliseconds since the epoch
+    in the high 48 bits and a logical counter in the low 16 bits.
+
+    now() is always greater than every timestamp this node generated or observed,
+    so a write here supersedes everything it could have seen.
+    """
+
+    def __init__(self):
+        self.last = 0
+
+    def now(self):
+        self.last = max(self.last + 1, int(time.time() * 1000) << 16)
+        return self.last
+
+    def observe(self, remote):
+        """Merge a timestamp received from another node."""
+        if remote > self.last:
+            self.last = remote
+
+
+def encode_record(value, hlc, node, tombstone=False, codec=None):
+    """Encode a stored value with its version: 14-byte header + value, compressed if codec says so."""
+    data = value.encode()
+    flags = TOMBSTONE if tombstone else 0
+    if codec is not None:
+        compressed = codec.compress(data)
+        if compressed is not None:
+            data, flags = compressed, flags | COMPRESSED
+    return HEADER.pack(RECORD_FORMAT, hlc, node, flags) + data
+
+
+def decode_record(data, codec=None):
+    """
+    Return (value, hlc, node, tombstone) for a stored record.
+
+    Values written before versioning have no header and are read as version 0.
+    A compressed value needs the codec of the node that wrote it.
+    """
+    value, hlc, node, tombstone = split_record(data, codec)
+    return value.decode(), hlc, node, tombstone
+
+
+def split_record(data, codec=None):
+    """Like decode_record, but return the value as bytes, copied once out of data (e.g. an LMDB buffer)."""
+    view = memoryview(data)
+    if len(view) >= HEADER.size and view[0] == RECORD_FORMAT:
+        _, hlc, node, flags = HEADER.unpack_from(view)
+        if flags & COMPRESSED:
+            if codec is None:
+                raise ValueError("Compressed record read without a codec")
+            return codec.decompress(view[HEADER.size:]), hlc, node, bool(flags & TOMBSTONE)
+        return bytes(view[HEADER.size:]), hlc, node, bool(flags & TOMBSTONE)
+    return bytes(view), 0, 0, False
+
+
+def record_version(data):
+    """Return (hlc, node, tombstone) of a stored record without decoding its value."""
+    if len(data) >= HEADER.size and data[0] == RECORD_FORMAT:
+        _, hlc, node, flags = HEADER.unpack_from(data)
+        return hlc, node, bool(flags & TOMBSTONE)
+    return 0, 0, False
+
+
+def encode_reference(digest, hlc, node):
+    """Encode a version whose value is the body stored under digest."""
+    return HEADER.pack(RECORD_FORMAT, hlc, node, SHARED) + digest
+
+
+def reference_digest(data):
+    """Return the body digest a record refers to, or None if it holds its value itself."""
+    if len(data) >= HEADER.size and data[0] == RECORD_FORMAT and data[HEADER.size - 1] & SHARED:
+        return bytes(data[HEADER.size:])
+    return None
+
+
+def resolve_reference(data, flags, body):
+    """Return the record data refers to, with the body (stored with its record flags) as its value."""
+    _, hlc, node, _ = HEADER.unpack_from(data)
+    return HEADER.pack(RECORD_FORMAT, hlc, node, flags) + body
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import time
+
+
+class InvalidationHub:
+    """Fans out the keys written on this node to WatchInvalidations subscribers."""
+
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending  # Queued notifications per subscriber before it is reset
+        self.subscribers = set()
+        self.published = 0
+        self.resets = 0
+
+    def subscribe(self):
+        """Register a subscriber and return its queue."""
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        self.subscribers.add(queue)
+        logging.info(f"Invalidation subscriber added ({len(self.subscribers)} active)")
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        logging.info(f"Invalidation subscriber removed ({len(self.subscribers)} active)")
+
+    def publish(self, key):
+        """Notify every subscriber that key changed."""
+        self.published += 1
+        event = (key, time.time())
+        for queue in self.subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A slow subscriber drops its backlog and is told to clear its whole cache
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+                self.resets += 1
+
+    def reset(self):
+        """Tell every subscriber to clear its whole cache (e.g. after the store was replaced)."""
+        for queue in self.subscribers:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(None)
+        self.resets += len(self.subscribers)
+
+    def snapshot(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "resets": self.resets,
+        }
@@ -44,6 +44,31 @@ class KeyValueStoreStub(object):
                 request_serializer=kvstore__pb2.Key.SerializeToString,
                 response_deserializer=kvstore__pb2.Value.FromString,
                 _registered_method=True)
+        self.PutBytes = channel.unary_unary(
+                '/kvstore.KeyValueStore/PutBytes',
+                request_serializer=kvstore__pb2.BytesKeyValue.SerializeToString,
+                response_deserializer=kvstore__pb2.BytesOldValue.FromString,
+                _registered_method=True)
+        self.GetBytes = channel.unary_unary(
+                '/kvstore.KeyValueStore/GetBytes',
+                request_serializer=kvstore__pb2.BytesKey.SerializeToString,
+                response_deserializer=kvstore__pb2.BytesValue.FromString,
+                _registered_method=True)
+        self.PutStream = channel.stream_unary(
+                '/kvstore.KeyValueStore/PutStream',
+                request_serializer=kvstore__pb2.BlobChunk.SerializeToString,
+                response_deserializer=kvstore__pb2.BlobInfo.FromString,
+                _registered_method=True)
+        self.GetStream = channel.unary_stream(
+                '/kvstore.KeyValueStore/GetStream',
+                request_serializer=kvstore__pb2.Key.SerializeToString,
+                response_deserializer=kvstore__pb2.BlobChunk.FromString,
+                _registered_method=True)
+        self.DeleteBlob = channel.unary_unary(
+                '/kvstore.KeyValueStore/DeleteBlob',
+                request_serializer=kvstore__pb2.Key.SerializeToString,
+                response_deserializer=kvstore__pb2.BlobInfo.FromString,
+                _registered_method=True)
         self.Delete = channel.unary_unary(
                 '/kvstore.KeyValueStore/Delete',
                 request_serializer=kvstore__pb2.Key.SerializeToString,
@@ -51,9 +76,14 @@ class KeyValueStoreStub(object):
                 _registered_method=True)
         self.ListKeys = channel.unary_unary(
                 '/kvstore.KeyValueStore/ListKeys',
-                request_serializer=kvstore__pb2.Empty.SerializeToString,
+                request_serializer=kvstore__pb2.Namespace.SerializeToString,
                 response_deserializer=kvstore__pb2.KeyList.FromString,
                 _registered_method=True)
+        self.DropNamespace = channel.unary_unary(
+                '/kvstore.KeyValueStore/DropNamespace',
+                request_serializer=kvstore__pb2.Namespace.SerializeToString,
+                response_deserializer=kvstore__pb2.NamespaceInfo.FromString,
+                _registered_method=True)
         self.Backup = channel.unary_unary(
                 '/kvstore.KeyValueStore/Backup',
                 request_serializer=kvstore__pb2.Empty.SerializeToString,
@@ -64,6 +94,71 @@ class KeyValueStoreStub(object):
                 request_serializer=kvstore__pb2.PingRequest.SerializeToString,
                 response_deserializer=kvstore__pb2.PingResponse.FromString,
                 _registered_method=True)
+        self.Stats = channel.unary_unary(
+                '/kvstore.KeyValueStore/Stats',
+                request_serializer=kvstore__pb2.Empty.SerializeToString,
+                response_deserializer=kvstore__pb2.ServerStats.FromString,
+                _registered_method=True)
+        self.BatchWrite = channel.unary_unary(
+                '/kvstore.KeyValueStore/BatchWrite',
+                request_serializer=kvstore__pb2.MutationBatch.SerializeToString,
+                response_deserializer=kvstore__pb2.OldValueList.FromString,
+                _registered_method=True)
+        self.WatchInvalidations = channel.unary_stream(
+                '/kvstore.KeyValueStore/WatchInvalidations',
+                request_serializer=kvstore__pb2.Namespace.SerializeToString,
+                response_deserializer=kvstore__pb2.Invalidation.FromString,
+                _registered_method=True)
+        self.Watch = channel.unary_stream(
+                '/kvstore.KeyValueStore/Watch',
+                request_serializer=kvstore__pb2.WatchRequest.SerializeToString,
+                response_deserializer=kvstore__pb2.WatchBatch.FromString,
+                _registered_method=True)
+        self.ReplicateBatch = channel.unary_unary(
+                '/kvstore.KeyValueStore/ReplicateBatch',
+                request_serializer=kvstore__pb2.ReplicationBatch.SerializeToString,
+                response_deserializer=kvstore__pb2.ReplicationAck.FromString,
+                _registered_method=True)
+        self.FetchLog = channel.unary_stream(
+                '/kvstore.KeyValueStore/FetchLog',
+                request_serializer=kvstore__pb2.LogRequest.SerializeToString,
+                response_deserializer=kvstore__pb2.ReplicationBatch.FromString,
+                _registered_method=True)
+        self.FetchSnapshot = channel.unary_stream(
+                '/kvstore.KeyValueStore/FetchSnapshot',
+                request_serializer=kvstore__pb2.Empty.SerializeToString,
+                response_deserializer=kvstore__pb2.SnapshotChunk.FromString,
+                _registered_method=True)
+        self.MerkleHashes = channel.unary_unary(
+                '/kvstore.KeyValueStore/MerkleHashes',
+                request_serializer=kvstore__pb2.MerkleRequest.SerializeToString,
+                response_deserializer=kvstore__pb2.MerkleHashList.FromString,
+                _registered_method=True)
+        self.MerkleLeaves = channel.unary_unary(
+                '/kvstore.KeyValueStore/MerkleLeaves',
+                request_serializer=kvstore__pb2.MerkleRequest.SerializeToString,
+                response_deserializer=kvstore__pb2.KeyDigestList.FromString,
+                _registered_method=True)
+        self.FetchKeys = channel.unary_unary(
+                '/kvstore.KeyValueStore/FetchKeys',
+                request_serializer=kvstore__pb2.KeyList.SerializeToString,
+                response_deserializer=kvstore__pb2.MutationBatch.FromString,
+                _registered_method=True)
+        self.RequestVote = channel.unary_unary(
+                '/kvstore.KeyValueStore/RequestVote',
+                request_serializer=kvstore__pb2.VoteRequest.SerializeToString,
+                response_deserializer=kvstore__pb2.VoteResponse.FromString,
+                _registered_method=True)
+        self.AppendEntries = channel.stream_stream(
+                '/kvstore.KeyValueStore/AppendEntries',
+                request_serializer=kvstore__pb2.AppendRequest.SerializeToString,
+                response_deserializer=kvstore__pb2.AppendResponse.FromString,
+                _registered_method=True)
+        self.InstallSnapshot = channel.stream_unary(
+                '/kvstore.KeyValueStore/InstallSnapshot',
+                request_serializer=kvstore__pb2.RaftSnapshotChunk.SerializeToString,
+                response_deserializer=kvstore__pb2.AppendResponse.FromString,
+                _registered_method=True)
 
 
 class KeyValueStoreServicer(object):
@@ -81,6 +176,38 @@ class KeyValueStoreServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def PutBytes(self, request, context):
+        """Binary variants of Put and Get
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetBytes(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def PutStream(self, request_iterator, context):
+        """Values of any size, sent and stored in chunks
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def GetStream(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def DeleteBlob(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def Delete(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -93,6 +220,13 @@ class KeyValueStoreServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def DropNamespace(self, request, context):
+        """Deletes a namespace and its keys on every node
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def Backup(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -105,6 +239,84 @@ class KeyValueStoreServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def Stats(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def BatchWrite(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def WatchInvalidations(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def Watch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def ReplicateBatch(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def FetchLog(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def FetchSnapshot(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def MerkleHashes(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def MerkleLeaves(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def FetchKeys(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def RequestVote(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def AppendEntries(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def InstallSnapshot(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_KeyValueStoreServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -118,6 +330,31 @@ def add_KeyValueStoreServicer_to_server(servicer, server):
                     request_deserializer=kvstore__pb2.Key.FromString,
                     response_serializer=kvstore__pb2.Value.SerializeToString,
             ),
+            'PutBytes': grpc.unary_unary_rpc_method_handler(
+                    servicer.PutBytes,
+                    request_deserializer=kvstore__pb2.BytesKeyValue.FromString,
+                    response_serializer=kvstore__pb2.BytesOldValue.SerializeToString,
+            ),
+            'GetBytes': grpc.unary_unary_rpc_method_handler(
+                    servicer.GetBytes,
+                    request_deserializer=kvstore__pb2.BytesKey.FromString,
+                    response_serializer=kvstore__pb2.BytesValue.SerializeToString,
+            ),
+            'PutStream': grpc.stream_unary_rpc_method_handler(
+                    servicer.PutStream,
+                    request_deserializer=kvstore__pb2.BlobChunk.FromString,
+                    response_serializer=kvstore__pb2.BlobInfo.SerializeToString,
+            ),
+            'GetStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.GetStream,
+                    request_deserializer=kvstore__pb2.Key.FromString,
+                    response_serializer=kvstore__pb2.BlobChunk.SerializeToString,
+            ),
+            'DeleteBlob': grpc.unary_unary_rpc_method_handler(
+                    servicer.DeleteBlob,
+                    request_deserializer=kvstore__pb2.Key.FromString,
+                    response_serializer=kvstore__pb2.BlobInfo.SerializeToString,
+            ),
             'Delete': grpc.unary_unary_rpc_method_handler(
                     servicer.Delete,
                     request_deserializer=kvstore__pb2.Key.FromString,
@@ -125,9 +362,14 @@ def add_KeyValueStoreServicer_to_server(servicer, server):
             ),
             'ListKeys': grpc.unary_unary_rpc_method_handler(
                     servicer.ListKeys,
-                    request_deserializer=kvstore__pb2.Empty.FromString,
+                    request_deserializer=kvstore__pb2.Namespace.FromString,
                     response_serializer=kvstore__pb2.KeyList.SerializeToString,
             ),
+            'DropNamespace': grpc.unary_unary_rpc_method_handler(
+                    servicer.DropNamespace,
+                    request_deserializer=kvstore__pb2.Namespace.FromString,
+                    response_serializer=kvstore__pb2.NamespaceInfo.SerializeToString,
+            ),
             'Backup': grpc.unary_unary_rpc_method_handler(
                     servicer.Backup,
                     request_deserializer=kvstore__pb2.Empty.FromString,
@@ -138,6 +380,71 @@ def add_KeyValueStoreServicer_to_server(servicer, server):
                     request_deserializer=kvstore__pb2.PingRequest.FromString,
                     response_serializer=kvstore__pb2.PingResponse.SerializeToString,
             ),
+            'Stats': grpc.unary_unary_rpc_method_handler(
+                    servicer.Stats,
+                    request_deserializer=kvstore__pb2.Empty.FromString,
+                    response_serializer=kvstore__pb2.ServerStats.SerializeToString,
+            ),
+            'BatchWrite': grpc.unary_unary_rpc_method_handler(
+                    servicer.BatchWrite,
+                    request_deserializer=kvstore__pb2.MutationBatch.FromString,
+                    response_serializer=kvstore__pb2.OldValueList.SerializeToString,
+            ),
+            'WatchInvalidations': grpc.unary_stream_rpc_method_handler(
+                    servicer.WatchInvalidations,
+                    request_deserializer=kvstore__pb2.Namespace.FromString,
+                    response_serializer=kvstore__pb2.Invalidation.SerializeToString,
+            ),
+            'Watch': grpc.unary_stream_rpc_method_handler(
+                    servicer.Watch,
+                    request_deserializer=kvstore__pb2.WatchRequest.FromString,
+                    response_serializer=kvstore__pb2.WatchBatch.SerializeToString,
+            ),
+            'ReplicateBatch': grpc.unary_unary_rpc_method_handler(
+                    servicer.ReplicateBatch,
+                    request_deserializer=kvstore__pb2.ReplicationBatch.FromString,
+                    response_serializer=kvstore__pb2.ReplicationAck.SerializeToString,
+            ),
+            'FetchLog': grpc.unary_stream_rpc_method_handler(
+                    servicer.FetchLog,
+                    request_deserializer=kvstore__pb2.LogRequest.FromString,
+                    response_serializer=kvstore__pb2.ReplicationBatch.SerializeToString,
+            ),
+            'FetchSnapshot': grpc.unary_stream_rpc_method_handler(
+                    servicer.FetchSnapshot,
+                    request_deserializer=kvstore__pb2.Empty.FromString,
+                    response_serializer=kvstore__pb2.SnapshotChunk.SerializeToString,
+            ),
+            'MerkleHashes': grpc.unary_unary_rpc_method_handler(
+                    servicer.MerkleHashes,
+                    request_deserializer=kvstore__pb2.MerkleRequest.FromString,
+                    response_serializer=kvstore__pb2.MerkleHashList.SerializeToString,
+            ),
+            'MerkleLeaves': grpc.unary_unary_rpc_method_handler(
+                    servicer.MerkleLeaves,
+                    request_deserializer=kvstore__pb2.MerkleRequest.FromString,
+                    response_serializer=kvstore__pb2.KeyDigestList.SerializeToString,
+            ),
+            'FetchKeys': grpc.unary_unary_rpc_method_handler(
+                    servicer.FetchKeys,
+                    request_deserializer=kvstore__pb2.KeyList.FromString,
+                    response_serializer=kvstore__pb2.MutationBatch.SerializeToString,
+            ),
+            'RequestVote': grpc.unary_unary_rpc_method_handler(
+                    servicer.RequestVote,
+                    request_deserializer=kvstore__pb2.VoteRequest.FromString,
+                    response_serializer=kvstore__pb2.VoteResponse.SerializeToString,
+            ),
+            'AppendEntries': grpc.stream_stream_rpc_method_handler(
+                    servicer.AppendEntries,
+                    request_deserializer=kvstore__pb2.AppendRequest.FromString,
+                    response_serializer=kvstore__pb2.AppendResponse.SerializeToString,
+            ),
+            'InstallSnapshot': grpc.stream_unary_rpc_method_handler(
+                    servicer.InstallSnapshot,
+                    request_deserializer=kvstore__pb2.RaftSnapshotChunk.FromString,
+                    response_serializer=kvstore__pb2.AppendResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'kvstore.KeyValueStore', rpc_method_handlers)
@@ -204,7 +511,7 @@ class KeyValueStore(object):
             _registered_method=True)
 
     @staticmethod
-    def Delete(request,
+    def PutBytes(request,
             target,
             options=(),
             channel_credentials=None,
@@ -217,9 +524,90 @@ class KeyValueStore(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/kvstore.KeyValueStore/Delete',
+            '/kvstore.KeyValueStore/PutBytes',
+            kvstore__pb2.BytesKeyValue.SerializeToString,
+            kvstore__pb2.BytesOldValue.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetBytes(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/GetBytes',
+            kvstore__pb2.BytesKey.SerializeToString,
+            kvstore__pb2.BytesValue.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def PutStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/kvstore.KeyValueStore/PutStream',
+            kvstore__pb2.BlobChunk.SerializeToString,
+            kvstore__pb2.BlobInfo.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def GetStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/kvstore.KeyValueStore/GetStream',
             kvstore__pb2.Key.SerializeToString,
-            kvstore__pb2.Empty.FromString,
+            kvstore__pb2.BlobChunk.FromString,
             options,
             channel_credentials,
             insecure,
@@ -231,7 +619,7 @@ class KeyValueStore(object):
             _registered_method=True)
 
     @staticmethod
-    def ListKeys(request,
+    def DeleteBlob(request,
             target,
             options=(),
             channel_credentials=None,
@@ -244,9 +632,9 @@ class KeyValueStore(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/kvstore.KeyValueStore/ListKeys',
-            kvstore__pb2.Empty.SerializeToString,
-            kvstore__pb2.KeyList.FromString,
+            '/kvstore.KeyValueStore/DeleteBlob',
+            kvstore__pb2.Key.SerializeToString,
+            kvstore__pb2.BlobInfo.FromString,
             options,
             channel_credentials,
             insecure,
@@ -258,7 +646,7 @@ class KeyValueStore(object):
             _registered_method=True)
 
     @staticmethod
-    def Backup(request,
+    def Delete(request,
             target,
             options=(),
             channel_credentials=None,
@@ -271,9 +659,9 @@ class KeyValueStore(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/kvstore.KeyValueStore/Backup',
-            kvstore__pb2.Empty.SerializeToString,
-            kvstore__pb2.BackupStatus.FromString,
+            '/kvstore.KeyValueStore/Delete',
+            kvstore__pb2.Key.SerializeToString,
+            kvstore__pb2.Empty.FromString,
             options,
             channel_credentials,
             insecure,
@@ -285,7 +673,7 @@ class KeyValueStore(object):
             _registered_method=True)
 
     @staticmethod
-    def Ping(request,
+    def ListKeys(request,
             target,
             options=(),
             channel_credentials=None,
@@ -298,9 +686,441 @@ class KeyValueStore(object):
         return grpc.experimental.unary_unary(
             request,
             target,
-            '/kvstore.KeyValueStore/Ping',
-            kvstore__pb2.PingRequest.SerializeToString,
-            kvstore__pb2.PingResponse.FromString,
+            '/kvstore.KeyValueStore/ListKeys',
+            kvstore__pb2.Namespace.SerializeToString,
+            kvstore__pb2.KeyList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def DropNamespace(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/DropNamespace',
+            kvstore__pb2.Namespace.SerializeToString,
+            kvstore__pb2.NamespaceInfo.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Backup(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/Backup',
+            kvstore__pb2.Empty.SerializeToString,
+            kvstore__pb2.BackupStatus.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Ping(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/Ping',
+            kvstore__pb2.PingRequest.SerializeToString,
+            kvstore__pb2.PingResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Stats(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/Stats',
+            kvstore__pb2.Empty.SerializeToString,
+            kvstore__pb2.ServerStats.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def BatchWrite(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/BatchWrite',
+            kvstore__pb2.MutationBatch.SerializeToString,
+            kvstore__pb2.OldValueList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def WatchInvalidations(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/kvstore.KeyValueStore/WatchInvalidations',
+            kvstore__pb2.Namespace.SerializeToString,
+            kvstore__pb2.Invalidation.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def Watch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/kvstore.KeyValueStore/Watch',
+            kvstore__pb2.WatchRequest.SerializeToString,
+            kvstore__pb2.WatchBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def ReplicateBatch(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/ReplicateBatch',
+            kvstore__pb2.ReplicationBatch.SerializeToString,
+            kvstore__pb2.ReplicationAck.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def FetchLog(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/kvstore.KeyValueStore/FetchLog',
+            kvstore__pb2.LogRequest.SerializeToString,
+            kvstore__pb2.ReplicationBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def FetchSnapshot(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/kvstore.KeyValueStore/FetchSnapshot',
+            kvstore__pb2.Empty.SerializeToString,
+            kvstore__pb2.SnapshotChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def MerkleHashes(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/MerkleHashes',
+            kvstore__pb2.MerkleRequest.SerializeToString,
+            kvstore__pb2.MerkleHashList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def MerkleLeaves(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/MerkleLeaves',
+            kvstore__pb2.MerkleRequest.SerializeToString,
+            kvstore__pb2.KeyDigestList.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def FetchKeys(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/FetchKeys',
+            kvstore__pb2.KeyList.SerializeToString,
+            kvstore__pb2.MutationBatch.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def RequestVote(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(
+            request,
+            target,
+            '/kvstore.KeyValueStore/RequestVote',
+            kvstore__pb2.VoteRequest.SerializeToString,
+            kvstore__pb2.VoteResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def AppendEntries(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(
+            request_iterator,
+            target,
+            '/kvstore.KeyValueStore/AppendEntries',
+            kvstore__pb2.AppendRequest.SerializeToString,
+            kvstore__pb2.AppendResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
+    @staticmethod
+    def InstallSnapshot(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/kvstore.KeyValueStore/InstallSnapshot',
+            kvstore__pb2.RaftSnapshotChunk.SerializeToString,
+            kvstore__pb2.AppendResponse.FromString,
             options,
             channel_credentials,
             insecure,
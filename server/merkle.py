@@ -0,0 +1,121 @@
+import hashlib
+
+
+EMPTY = bytes(16)  # Hash of a range with no keys
+
+
+def key_digest(key, value, version=(0, 0)):
+    """Digest of one key-value pair at a version (value None for a tombstone)."""
+    record = b"\1" if value is None else b"\0" + value.encode()
+    return hashlib.blake2b(key.encode() + b"\0" + version[0].to_bytes(8, "big") + version[1].to_bytes(4, "big")
+                           + record, digest_size=16).digest()
+
+
+class MerkleTree:
+    """
+    Merkle tree over hash ranges of the keyspace, updated incrementally on every write.
+
+    Keys are spread over 2**depth leaf ranges by the hash of the key. A leaf hash is
+    the XOR of the digests of its versioned key-value pairs (tombstones included, so
+    deletes are compared too), so a write only touches one leaf,
+    and inner nodes are rehashed lazily, along the paths of changed leaves, when
+    hashes are read. Nodes are numbered like a heap: the root is 1 and the children
+    of node n are 2n and 2n + 1.
+    """
+
+    def __init__(self, depth=10):
+        self.depth = depth
+        self.leaf_count = 1 << depth
+        self.nodes = [EMPTY] * (2 * self.leaf_count)
+        self.buckets = [{} for _ in range(self.leaf_count)]  # Leaf -> {key: (digest, version, tombstone)}
+        self.leaf_xor = [0] * self.leaf_count
+        self.dirty = set()  # Leaves whose path to the root must be rehashed
+        self.loading = False
+        self.written_while_loading = set()  # Keys a bulk load must not overwrite
+
+    def leaf_of(self, key):
+        """Return the leaf range a key belongs to."""
+        prefix = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+        return prefix >> (64 - self.depth)
+
+    def update(self, key, value, version):
+        """Record a write at version (hlc, node); value None for a delete."""
+        if self.loading:
+            self.written_while_loading.add(key)
+        self._set(key, (key_digest(key, value, version), version, value is None))
+
+    def load(self, key, value, version):
+        """Record a pair read by a bulk load, unless the key was written since the load began."""
+        if key not in self.written_while_loading:
+            self._set(key, (key_digest(key, value, version), version, value is None))
+
+    def remove(self, key, version):
+        """Forget a key whose tombstone at version was garbage collected (unless it was written since)."""
+        if self.version(key) == version:
+            self._set(key, None)
+
+    def remove_prefix(self, prefix):
+        """Forget every key starting with prefix (the keys of a dropped namespace)."""
+        for leaf, bucket in enumerate(self.buckets):
+            keys = [key for key in bucket if key.startswith(prefix)]
+            for key in keys:
+                self.leaf_xor[leaf] ^= int.from_bytes(bucket.pop(key)[0], "big")
+            if keys:
+                self.dirty.add(leaf)
+
+    def _set(self, key, entry):
+        leaf = self.leaf_of(key)
+        bucket = self.buckets[leaf]
+        old = bucket.get(key)
+        if old == entry:
+            return
+        if old is not None:
+            del bucket[key]
+            self.leaf_xor[leaf] ^= int.from_bytes(old[0], "big")
+        if entry is not None:
+            bucket[key] = entry
+            self.leaf_xor[leaf] ^= int.from_bytes(entry[0], "big")
+        self.dirty.add(leaf)
+
+    def _refresh(self):
+        """Rehash the paths from changed leaves to the root."""
+        if not self.dirty:
+            return
+        parents = set()
+        for leaf in self.dirty:
+            node = self.leaf_count + leaf
+            self.nodes[node] = self.leaf_xor[leaf].to_bytes(16, "big")
+            parents.add(node >> 1)
+        self.dirty = set()
+        while parents:
+            next_parents = set()
+            for node in parents:
+                left, right = self.nodes[2 * node], self.nodes[2 * node + 1]
+                self.nodes[node] = EMPTY if left == right == EMPTY else \
+                    hashlib.blake2b(left + right, digest_size=16).digest()
+                if node > 1:
+                    next_parents.add(node >> 1)
+            parents = next_parents
+
+    def root(self):
+        return self.hashes([1])[0]
+
+    def hashes(self, nodes):
+        """Return the hashes of the given nodes."""
+        self._refresh()
+        return [self.nodes[node] for node in nodes]
+
+    def is_leaf(self, node):
+        return node >= self.leaf_count
+
+    def version(self, key):
+        """Return the version recorded for key, or None."""
+        entry = self.buckets[self.leaf_of(key)].get(key)
+        return entry[1] if entry else None
+
+    def leaf_entries(self, node):
+        """Return the {key: (digest, version, tombstone)} map of a leaf node."""
+        return self.buckets[node - self.leaf_count]
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self.buckets)
@@ -1,91 +1,607 @@
 import asyncio
 import threading
 import queue
+import concurrent.futures
 import lmdb
 import logging
+import os
+import time
+
+from hlc import HybridLogicalClock, encode_record, decode_record, split_record, record_version
+from wal import WriteAheadLog, SYNC_POLICIES
+from blob_store import BlobStore
+from compression import ValueCodec
+from tiering import ColdTier, merge_sorted
+from dedup import BodyStore, SUB_DB_PREFIX
+from namespaces import Namespaces, NAMESPACE_MARK, split_key, qualify, namespace_db_name
+
+WRITE_OPERATIONS = ("put", "delete", "batch")
+OVERLAY_OPERATIONS = WRITE_OPERATIONS + ("get", "get_record", "get_raw", "get_many")  # Read the WAL overlay themselves
+BLOB_OPERATIONS = ("blob_write", "blob_commit", "blob_abort", "blob_delete", "blob_manifest", "blob_read")
+SUB_DBS = 2  # Besides the namespaces: the value bodies and the namespace drop versions
+TIER_SCAN_KEYS = 100000  # LMDB keys a tiering pass looks at; the next pass goes on from there
+MAX_GROUP = 1000  # Writes acknowledged by one group fsync at most
+LMDB_PRESETS = {
+    # LMDB's defaults: every commit fsyncs data and meta pages, nothing acknowledged is lost
+    "durable": {"sync": True, "metasync": True, "writemap": False, "map_async": False, "readahead": True},
+    # One fsync per commit; a system crash may roll back the last commit but never corrupts the store
+    "balanced": {"sync": True, "metasync": False, "writemap": True, "map_async": False, "readahead": True},
+    # No fsyncs; the OS writes pages back when it likes. Survives a process crash, not a system crash
+    "cache": {"sync": False, "metasync": False, "writemap": True, "map_async": True, "readahead": False},
+}
+
+
+def lmdb_preset(name="durable", **overrides):
+    """Return lmdb.open() options for a preset, with the overrides that are not None applied."""
+    options = dict(LMDB_PRESETS[name], max_readers=126, lock=True, map_size=1 << 30)
+    options.update({option: value for option, value in overrides.items() if value is not None})
+    return options
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 class MultiprocessWorker:
-    """Manages database operations using threads with an async interface."""
+    """
+    Manages database operations on a worker thread with an async interface.
+
+    One thread serves the queue, in order. LMDB admits one write transaction at a
+    time, and every operation runs in one, so more threads would only wait on
+    each other. The environment, the blob file and the sub-databases are opened
+    once, as LMDB refuses a second open of an environment in the same process,
+    and the access sketch, WAL overlay and cold tier are only changed by that
+    thread.
 
-    def __init__(self, db_path="kvstore.lmdb", num_threads=4):
+    With wal_path set, writes go to a write-ahead log and an in-memory overlay
+    instead of LMDB, and are acknowledged once the log is synced per wal_sync:
+    "always" fsyncs every write, "group" fsyncs once for all the writes queued
+    together, "interval" fsyncs every wal_sync_interval seconds and "never"
+    leaves it to the OS. The overlay is applied to LMDB in one transaction once
+    the log holds wal_apply_batch entries or wal_apply_interval seconds after the
+    last apply, and before an operation that reads LMDB directly; then the log is
+    emptied.
+
+    Values are compressed by codec (a ValueCodec) if it has a codec set.
+    Keys can be moved to a ColdTier in the same directory: with sketch (an
+    AccessSketch) set, every read and write is counted and tier() moves the keys
+    not accessed since the previous pass out of LMDB. A read that finds a key
+    there copies it back into LMDB, which always takes precedence over the cold
+    copy. With dedup_threshold set, values of that many bytes or more are stored
+    once in a BodyStore sub-database, and the records of the keys holding them
+    refer to them by digest.
+    Keys qualified with a namespace (see namespaces.qualify) are kept in that
+    namespace's sub-database of namespaces (a Namespaces), which is neither
+    tiered nor deduplicated, so it can be dropped as a whole.
+    Blobs (values of any size, written and read in chunks) are kept in a
+    separate BlobStore file in the same directory, outside the WAL.
+    """
+
+    def __init__(self, db_path="kvstore.lmdb", wal_path=None, wal_sync="group",
+                 wal_sync_interval=0.01, wal_apply_batch=10000, wal_apply_interval=1.0, lmdb_options=None,
+                 codec=None, sketch=None, cold_block_size=16 * 1024, dedup_threshold=0, namespaces=None):
         self.task_queue = queue.Queue()  # Blocking queue for thread communication
-        self.result_queue = queue.Queue()
         self.db_path = db_path
-        self.threads = []
+        self.lmdb_options = lmdb_options or lmdb_preset()
+        self.codec = codec or ValueCodec(os.path.join(db_path, "dictionaries"))  # Reads compressed values either way
+        self.cold = ColdTier(os.path.join(db_path, "cold"), block_size=cold_block_size)  # Read even if tiering is off
+        self.sketch = sketch
+        self.bodies = BodyStore(dedup_threshold, self.codec)  # Resolves shared values even if dedup is off
+        self.namespaces = namespaces or Namespaces()
+        self.tier_position = None  # LMDB key the next tiering pass starts after
+        self.demoted = 0
+        self.demoted_bytes = 0  # Keys and records moved out of LMDB
+        self.promoted = 0
+        self.lmdb_used_bytes = 0  # As of the last tiering pass
         self.running = True
+        if wal_sync not in SYNC_POLICIES:
+            raise ValueError(f"Unknown WAL sync policy {wal_sync!r}")
+        self.wal = WriteAheadLog(wal_path) if wal_path else None
+        self.wal_sync = wal_sync
+        self.wal_sync_interval = wal_sync_interval
+        self.wal_apply_batch = wal_apply_batch
+        self.wal_apply_interval = wal_apply_interval
+        self.last_apply = time.monotonic()
+        self.overlay = {}  # Key -> encoded record logged in the WAL but not yet applied to LMDB
+        self.unsynced = []  # (result, caller's future) of writes waiting for the WAL sync
+        self.wal_applies = 0
+        self.wal_applied_keys = 0
+        self.db_env = lmdb.open(db_path, max_dbs=self.namespaces.max_namespaces + SUB_DBS, **self.lmdb_options)
+        self.blobs = BlobStore(os.path.join(db_path, "blobs.mdb"), self.lmdb_options)
+        self.bodies.open(self.db_env)
+        self.namespaces.open(self.db_env)
 
-        # Start worker threads
-        for _ in range(num_threads):
-            thread = threading.Thread(target=self._worker, daemon=True)
-            thread.start()
-            self.threads.append(thread)
+        self.thread = threading.Thread(target=self._worker, daemon=True)
+        self.thread.start()
 
     def _worker(self):
         """Worker function to process database operations."""
         
-        db_env = lmdb.open(self.db_path, map_size=10485760, max_dbs=1)
+        db_env = self.db_env
+        if self.wal is not None:
+            self.overlay.update(self.wal.replay())  # Writes acknowledged before a crash
+            if self.overlay:
+                logging.info(f"Replaying {len(self.overlay)} keys from the WAL")
+                self._apply_overlay(db_env)
 
         while self.running:
             try:
-                task = self.task_queue.get()
+                if self.wal is None:
+                    task = self.task_queue.get()
+                else:
+                    try:
+                        task = self.task_queue.get(timeout=self.wal_sync_interval)
+                    except queue.Empty:
+                        if self.wal_sync == "interval":
+                            self.wal.sync()
+                        self._maybe_apply_overlay(db_env)
+                        continue
                 if task is None:
                     break  # Stop signal received
 
-                operation, key, value = task
-                with db_env.begin(write=True) as txn:
-                    if operation == "put":
-                        old_value = txn.get(key.encode())  # Fetch old value before overwriting
-                        txn.put(key.encode(), value.encode())  
-                        self.result_queue.put(old_value.decode() if old_value else "")  # Return empty string if key doesn't exist
-                    elif operation == "get":
-                        result = txn.get(key.encode())
-                        self.result_queue.put(result.decode() if result else "")  
-                    elif operation == "delete":
-                        txn.delete(key.encode())
-                        self.result_queue.put(f"Deleted {key}")
-                    elif operation == "list_keys":
-                        with txn.cursor() as cursor:
-                            keys = [key.decode() for key, _ in cursor]
-                        self.result_queue.put(keys)
-                    elif operation == "backup":
-                        backup_path = "lmdb_backup"
-                        db_env.copy(backup_path, compact=True)
-                        self.result_queue.put(f"Backup successful -> {backup_path}")
+                operation, key, value, future = task  # Each task carries its own result future
+                if operation in BLOB_OPERATIONS:
+                    self._blob_operation(operation, key, value, future)
+                    if self.wal is not None:
+                        self._sync_wal()  # Writes queued before this one may be waiting for a sync
+                    continue
+                if self.wal is not None:
+                    if operation not in OVERLAY_OPERATIONS or (
+                            operation == "batch" and any(mutation[0] == "drop" for mutation in value)):
+                        self._apply_overlay(db_env)  # Scans, copies and restores read LMDB directly; drops drop it
+                    elif operation in WRITE_OPERATIONS:
+                        caller = future
+                        future = concurrent.futures.Future()  # Passed on to the caller once the WAL is synced
+                        self.unsynced.append((future, caller))
+                try:
+                    with db_env.begin(write=True, buffers=operation == "get_raw") as txn:
+                        if operation == "put":
+                            put_value, hlc, node = value
+                            old_value, _ = self._write(txn, key, put_value, hlc, node)
+                            future.set_result(old_value)  # Empty string if the key did not exist
+                        elif operation == "get":
+                            record = self._read(txn, key)
+                            future.set_result(record[0] if record and not record[3] else "")
+                        elif operation == "get_record":
+                            future.set_result(self._read(txn, key))
+                        elif operation == "get_raw":
+                            data = self._lookup(txn, key.decode())  # A view of the map, valid in this transaction
+                            future.set_result(split_record(data, self.codec) if data is not None else None)
+                        elif operation == "delete":
+                            hlc, node = value
+                            self._write(txn, key, "", hlc, node, tombstone=True)
+                            future.set_result(f"Deleted {key}")
+                        elif operation == "batch":
+                            results = []  # (old value, applied) per mutation, applied in order in one transaction
+                            for op, batch_key, batch_value, hlc, node in value:
+                                if op == "drop":  # (records dropped, applied)
+                                    results.append(self.namespaces.drop(txn, split_key(batch_key)[0], (hlc, node)))
+                                    continue
+                                results.append(self._write(txn, batch_key, batch_value, hlc, node,
+                                                           tombstone=op == "delete"))
+                            future.set_result(results)
+                        elif operation == "get_many":
+                            items = []  # (key, value, hlc, node, tombstone) for the keys in value that exist
+                            for many_key in value:
+                                record = self._read(txn, many_key)
+                                if record is not None:
+                                    items.append((many_key, *record))
+                            future.set_result(items)
+                        elif operation == "scan":
+                            items = []  # Up to value records, tombstones included, with (qualified) keys after key
+                            for record_key, record in self._scan(txn, key):
+                                if len(items) == value:
+                                    break
+                                items.append((record_key, *decode_record(self.bodies.resolve(txn, record), self.codec)))
+                            future.set_result(items)
+                        elif operation == "gc":
+                            removed = []  # (key, hlc, node) of tombstones whose writer's horizon (value: node -> HLC) covers them
+                            for namespace, db in [("", None)] + list(self.namespaces.dbs.items()):
+                                with txn.cursor(db=db) as cursor:
+                                    found = cursor.first()
+                                    while found and not cursor.key().startswith(SUB_DB_PREFIX):
+                                        hlc, node, tombstone = record_version(cursor.value())
+                                        # A tombstone shadowing a cold copy stays until compaction drops that copy
+                                        if tombstone and hlc <= value.get(node, 0) and (
+                                                namespace or not self.cold.segments or self.cold.get(cursor.key()) is None):
+                                            removed.append((qualify(namespace, cursor.key().decode()), hlc, node))
+                                            found = cursor.delete()
+                                        else:
+                                            found = cursor.next()
+                                if namespace:
+                                    self.namespaces.track(txn, namespace)
+                            future.set_result(removed)
+                        elif operation == "list_keys":
+                            if key:
+                                db = self.namespaces.db(txn, key)
+                                records = self._records(txn, db=db) if db is not None else []
+                            else:
+                                records = self._records(txn)
+                            future.set_result([record_key.decode() for record_key, record in records
+                                               if not record_version(record)[2]])
+                        elif operation == "copy":
+                            self._copy(db_env, txn, value)  # Consistent copy as of this transaction's start
+                            future.set_result(value)
+                        elif operation == "restore":
+                            source = lmdb.open(value, readonly=True, lock=False,
+                                               max_dbs=self.namespaces.max_namespaces + SUB_DBS)
+                            try:
+                                with source.begin() as source_txn:
+                                    with source_txn.cursor() as cursor:
+                                        source_keys = (item for item in cursor if not item[0].startswith(SUB_DB_PREFIX))
+                                        if self.bodies.db is None and not self.namespaces.dbs and \
+                                                self.namespaces.drops_db is None:
+                                            txn.drop(db_env.open_db(txn=txn), delete=False)  # Replace everything
+                                            txn.cursor().putmulti(source_keys, append=True)
+                                        else:
+                                            self._restore_keys(txn, source_keys)
+                                    self.namespaces.restore(txn, source, source_txn)
+                            finally:
+                                source.close()
+                            self.cold.clear()  # Cold keys belong to the replaced store
+                            future.set_result(value)
+                        elif operation == "backup":
+                            backup_path = "lmdb_backup"
+                            self._copy(db_env, txn, backup_path)
+                            future.set_result(f"Backup successful -> {backup_path}")
+                        elif operation == "tier":
+                            future.set_result(self._tier(db_env, txn))
+                        elif operation == "bodies":
+                            future.set_result({digest: self.bodies.value(txn, digest) for digest in value})
+                except Exception as e:
+                    logging.error(f"Database operation error: {e}")
+                    future.set_result(f"Error: {str(e)}")
+                    self.namespaces.open(db_env)
+                if self.wal is not None:
+                    self._sync_wal()
+                    self._maybe_apply_overlay(db_env)
 
             except Exception as e:
-                logging.error(f"Database operation error: {e}")
-                self.result_queue.put(f"Error: {str(e)}")
+                logging.error(f"Worker error: {e}")
+        if self.wal is not None:
+            self._apply_overlay(db_env)
+
+    def _blob_operation(self, operation, key, value, future):
+        try:
+            if operation == "blob_write":
+                self.blobs.write_chunk(*value)
+                future.set_result(None)
+            elif operation == "blob_commit":
+                future.set_result(self.blobs.commit(key, *value))
+            elif operation == "blob_abort":
+                self.blobs.abort(*value)
+                future.set_result(None)
+            elif operation == "blob_delete":
+                future.set_result(self.blobs.delete(key))
+            elif operation == "blob_manifest":
+                future.set_result(self.blobs.manifest(key))
+            elif operation == "blob_read":
+                future.set_result(self.blobs.read(*value))
+        except Exception as e:
+            logging.error(f"Blob operation error: {e}")
+            future.set_result(f"Error: {str(e)}")
+
+    def _sync_wal(self):
+        """Sync the WAL as the policy requires and acknowledge the writes it now covers."""
+        if not self.unsynced:
+            return
+        if self.wal_sync == "always":
+            self.wal.sync()
+        elif self.wal_sync == "group":
+            if not self.task_queue.empty() and len(self.unsynced) < MAX_GROUP:
+                return  # More writes queued: sync them together
+            self.wal.sync()
+        else:
+            self.wal.write()
+            if self.wal_sync == "interval" and time.monotonic() - self.wal.last_sync >= self.wal_sync_interval:
+                self.wal.sync()
+        for result, caller in self.unsynced:
+            caller.set_result(result.result())
+        self.unsynced = []
+
+    def _maybe_apply_overlay(self, db_env):
+        if self.wal.pending >= self.wal_apply_batch or \
+                (self.wal.pending and time.monotonic() - self.last_apply >= self.wal_apply_interval):
+            self._apply_overlay(db_env)
+
+    def _apply_overlay(self, db_env):
+        """Write the overlay to LMDB in one synced transaction, acknowledge the waiting writes and empty the WAL."""
+        if self.overlay:
+            with db_env.begin(write=True) as txn:
+                for key, record in self.overlay.items():
+                    self._store(txn, key.encode(), record)
+            db_env.sync(True)
+            self.wal_applies += 1
+            self.wal_applied_keys += len(self.overlay)
+            self.overlay = {}
+        for result, caller in self.unsynced:  # Durable in LMDB now
+            caller.set_result(result.result())
+        self.unsynced = []
+        self.wal.reset()
+        self.last_apply = time.monotonic()
+
+    def _copy(self, db_env, txn, path):
+        """
+        Copy the store, cold keys and namespaces included, to path; values compressed
+        with this node's dictionaries are copied uncompressed, and shared values in full.
+        """
+        if not self.codec.dictionaries and not self.cold.segments and self.bodies.db is None:
+            db_env.copy(path, compact=True)
+            return
+
+        def plain(records):
+            records = ((key, self.bodies.resolve(txn, record)) for key, record in records)
+            if self.codec.dictionaries:
+                records = ((key, encode_record(*decode_record(record, self.codec))) for key, record in records)
+            return records
+
+        target = lmdb.open(path, max_dbs=self.namespaces.max_namespaces + SUB_DBS, map_size=self.lmdb_options["map_size"])
+        try:
+            with target.begin(write=True) as target_txn:
+                target_txn.cursor().putmulti(plain(self._records(txn)), append=True)
+                for name, db in self.namespaces.dbs.items():
+                    target_db = target.open_db(namespace_db_name(name), txn=target_txn)
+                    target_txn.cursor(db=target_db).putmulti(plain(self._records(txn, db=db)), append=True)
+                self.namespaces.copy_drops(target, target_txn)
+        finally:
+            target.close()
+
+    def _records(self, txn, start=None, db=None):
+        """
+        Yield (key, record) of every stored key, hot or cold, in key order from the
+        first at or after start; of namespace database db instead if it is set.
+        """
+        def hot():
+            with txn.cursor(db=db) as cursor:
+                found = cursor.set_range(start) if start is not None else cursor.first()
+                while found and not cursor.key().startswith(SUB_DB_PREFIX):
+                    yield cursor.key(), cursor.value()
+                    found = cursor.next()
+
+        if not self.cold.segments or db is not None:
+            return hot()
+        return merge_sorted([hot(), self.cold.items(start)])
+
+    def _scan(self, txn, after):
+        """Yield (qualified key, record) of every key after the qualified key after ("": all), namespaces first."""
+        for name in sorted(self.namespaces.dbs):
+            prefix = qualify(name, "")
+            start = None
+            if after.startswith(prefix):
+                start = after[len(prefix):].encode()
+            elif after > prefix:
+                continue  # Every key of this namespace sorts before after
+            for key, record in self._records(txn, start, self.namespaces.dbs[name]):
+                key = prefix + key.decode()
+                if key != after:
+                    yield key, record
+        start = after.encode() if after and not after.startswith(NAMESPACE_MARK) else None
+        for key, record in self._records(txn, start):
+            if key != start:
+                yield key.decode(), record
 
-    async def put(self, key, value):
-        """Queue a PUT request asynchronously and return only the stored value."""
+    def _tier(self, db_env, txn):
+        """Move the keys not accessed since the previous pass to a new cold segment; return how many moved."""
+        if len(self.cold.segments) >= self.cold.max_segments:
+            db_env.sync(True)  # Promoted copies must be durable before compaction drops the cold ones
+            self.cold.compact(lambda key: txn.get(key) is not None)
+        cold = []
+        scanned = 0
+        if self.sketch.ages:  # Counting starts with the first pass after startup
+            with txn.cursor() as cursor:
+                found = cursor.set_range(self.tier_position + b"\0") if self.tier_position else cursor.first()
+                while found and scanned < TIER_SCAN_KEYS and not cursor.key().startswith(SUB_DB_PREFIX):
+                    key, record = cursor.key(), cursor.value()
+                    if not record_version(record)[2] and self.sketch.estimate(key) == 0:
+                        cold.append((key, record))  # Tombstones stay in LMDB for the collector
+                    scanned += 1
+                    found = cursor.next()
+                # Go on from here only if the pass ran out of keys to look at, not at the end of the main keys
+                self.tier_position = key if found and scanned == TIER_SCAN_KEYS else None
+        if cold:
+            self.cold.write(((key, self.bodies.resolve(txn, record)) for key, record in cold),
+                            len(cold))  # Synced before the keys leave LMDB
+            for key, record in cold:
+                self.bodies.release(txn, record)
+                txn.delete(key)
+            self.demoted += len(cold)
+            self.demoted_bytes += sum(len(key) + len(record) for key, record in cold)
+            logging.info(f"Moved {len(cold)} cold keys out of LMDB")
+        self.sketch.age()
+        stat = txn.stat(db_env.open_db(txn=txn))  # Includes this pass's deletes
+        self.lmdb_used_bytes = stat["psize"] * (stat["branch_pages"] + stat["leaf_pages"] + stat["overflow_pages"])
+        return len(cold)
 
-        await asyncio.to_thread(self.task_queue.put, ("put", key, value))
-        old_value = await asyncio.to_thread(self.result_queue.get)  #  Wait for the correct value
+    def wal_stats(self):
+        if self.wal is None:
+            return {}
+        return {
+            "wal_appends": self.wal.appends,
+            "wal_syncs": self.wal.syncs,
+            "wal_sync_ms": self.wal.sync_ms,
+            "wal_overlay_keys": len(self.overlay),
+            "wal_applies": self.wal_applies,
+            "wal_applied_keys": self.wal_applied_keys,
+        }
+
+    def _lookup(self, txn, key):
+        """Return the stored record of key from the WAL overlay, LMDB or the cold tier, or None."""
+        if key.startswith(NAMESPACE_MARK):
+            data = self.overlay.get(key) if self.overlay else None
+            if data is None:
+                namespace, local_key = split_key(key)
+                db = self.namespaces.db(txn, namespace)
+                data = txn.get(local_key.encode(), db=db) if db is not None else None
+            return data
+        key_bytes = key.encode()
+        if self.sketch is not None:
+            self.sketch.record(key_bytes)
+        data = self.overlay.get(key) if self.overlay else None
+        if data is None:
+            data = txn.get(key_bytes)
+            if data is not None:
+                return self.bodies.resolve(txn, data)
+        if data is None and self.cold.segments:
+            data = self.cold.get(key_bytes)
+            if data is not None:
+                self._store(txn, key_bytes, data)  # Promoted: hot until a tiering pass finds it cold again
+                self.promoted += 1
+        return data
+
+    def _store(self, txn, key, record):
+        """Put a record under key (bytes) in LMDB, sharing its value's body with other keys if it is large."""
+        if key.startswith(NAMESPACE_MARK.encode()):
+            namespace, local_key = split_key(key.decode())
+            txn.put(local_key.encode(), record, db=self.namespaces.db(txn, namespace, create=True))
+            self.namespaces.track(txn, namespace)
+            return
+        if self.bodies.db is not None:
+            self.bodies.release(txn, txn.get(key))
+            record = self.bodies.share(txn, record)
+        txn.put(key, record)
+
+    def _restore_keys(self, txn, source):
+        """Replace the keys of the main database and the value bodies with the (key, record) items of source."""
+        with txn.cursor() as cursor:
+            found = cursor.first()
+            while found and not cursor.key().startswith(SUB_DB_PREFIX):
+                found = cursor.delete()
+        if self.bodies.db is not None:
+            self.bodies.clear(txn)
+        for key, record in source:
+            self._store(txn, key, record)
+
+    def _read(self, txn, key):
+        """Return (value, hlc, node, tombstone) for key, or None."""
+        data = self._lookup(txn, key)
+        return decode_record(data, self.codec) if data is not None else None
+
+    def tier_stats(self):
+        if self.sketch is None and not self.cold.segments:
+            return {}
+        return dict(self.cold.stats(), tiering_demoted=self.demoted,
+                    tiering_demoted_bytes=self.demoted_bytes, tiering_promoted=self.promoted,
+                    tiering_sketch_bytes=len(self.sketch.counters) if self.sketch is not None else 0,
+                    lmdb_used_bytes=self.lmdb_used_bytes)
+
+    def _write(self, txn, key, value, hlc, node, tombstone=False):
+        """Store a version of key unless a newer one is stored (last writer wins); return (old value, applied)."""
+        current = self._read(txn, key)
+        old_value = current[0] if current and not current[3] else ""
+        if current is not None and (current[1], current[2]) >= (hlc, node):
+            return old_value, False
+        if key.startswith(NAMESPACE_MARK) and self.namespaces.superseded(split_key(key)[0], (hlc, node)):
+            return old_value, False  # Written before its namespace was dropped
+        # A value that will be shared is compressed once, as its body, instead
+        shared = self.bodies.threshold and len(value) >= self.bodies.threshold and not key.startswith(NAMESPACE_MARK)
+        record = encode_record(value, hlc, node, tombstone, None if shared else self.codec)
+        if self.wal is not None:
+            self.wal.append(key, record)
+            self.overlay[key] = record
+        else:
+            self._store(txn, key.encode(), record)
+        return old_value, True
+
+    async def _submit(self, operation, key=None, value=None):
+        """Queue an operation and wait for its own result."""
+
+        future = concurrent.futures.Future()
+        self.task_queue.put((operation, key, value, future))  # Unbounded queue, never blocks
+        return await asyncio.wrap_future(future)
+
+    async def put(self, key, value, version=(0, 0)):
+        """Queue a PUT of value at version (hlc, node) and return the previous value."""
+
+        old_value = await self._submit("put", key, (value, *version))  #  Wait for the correct value
         logging.info(f"Put operation stored '{old_value}' for key '{key}'")  
         return old_value  
 
     async def get(self, key):
         """Queue a GET request asynchronously and return result."""
 
-        await asyncio.to_thread(self.task_queue.put, ("get", key, None))
-        value = await asyncio.to_thread(self.result_queue.get)
+        value = await self._submit("get", key)
         logging.info(f" DEBUG: get() returned '{value}' for key '{key}'")  
         return value  
     
-    async def delete(self, key):
-        """Queue a DELETE request asynchronously."""
+    async def get_record(self, key):
+        """Return (value, hlc, node, tombstone) for key, or None if it was never written."""
+
+        return await self._submit("get_record", key)
+
+    async def get_raw(self, key):
+        """Return (value, hlc, node, tombstone) for a bytes key with the value as bytes, or None."""
+
+        return await self._submit("get_raw", key)
+
+    async def blob_write(self, upload, index, data):
+        """Store one chunk of an upload; it stays invisible until blob_commit()."""
+
+        return await self._submit("blob_write", value=(upload, index, data))
+
+    async def blob_commit(self, key, upload, size, chunks):
+        """Make an upload the blob under key; return the size of the blob it replaced, or None."""
 
-        await asyncio.to_thread(self.task_queue.put, ("delete", key, None))
-        return await asyncio.to_thread(self.result_queue.get)
+        return await self._submit("blob_commit", key, (upload, size, chunks))
 
+    def blob_abort(self, upload, chunks):
+        """Queue removal of the chunks of an upload that will not be committed, without waiting."""
 
-    async def get_all_keys(self):
-        """Queue a LIST_KEYS request asynchronously and return result."""
+        self.task_queue.put(("blob_abort", None, (upload, chunks), concurrent.futures.Future()))
 
-        await asyncio.to_thread(self.task_queue.put, ("list_keys", None, None))
-        result = await asyncio.to_thread(self.result_queue.get)
+    async def blob_delete(self, key):
+        """Delete the blob under key; return its size, or None if there was none."""
+
+        return await self._submit("blob_delete", key)
+
+    async def blob_manifest(self, key):
+        """Return (upload ID, size, chunk count) of the blob under key, or None."""
+
+        return await self._submit("blob_manifest", key)
+
+    async def blob_read(self, upload, first, max_bytes):
+        """Return about max_bytes of an upload's chunks from index first on, or None if it was replaced."""
+
+        return await self._submit("blob_read", value=(upload, first, max_bytes))
+
+    def blob_stats(self):
+        return self.blobs.stats()
+
+    async def delete(self, key, version=(0, 0)):
+        """Queue a DELETE at version (hlc, node); it leaves a tombstone."""
+
+        return await self._submit("delete", key, version)
+
+
+    async def apply_batch(self, mutations):
+        """
+        Apply a list of ("put"|"delete"|"drop", key, value, hlc, node) in one transaction.
+
+        Each mutation is skipped if a newer version is stored; returns (old value, applied) per mutation.
+        A "drop" drops the namespace its key qualifies and returns (records it held or None, applied).
+        """
+
+        return await self._submit("batch", value=mutations)
+
+
+    async def get_many(self, keys):
+        """Return (key, value, hlc, node, tombstone) for the keys that exist, read in one transaction."""
+
+        return await self._submit("get_many", value=keys)
+
+
+    async def scan(self, after_key, limit):
+        """Return up to limit (key, value, hlc, node, tombstone) records with keys greater than after_key ("" = from the start)."""
+
+        return await self._submit("scan", after_key, limit)
+
+
+    async def collect_tombstones(self, horizons):
+        """Delete tombstones whose HLC is at or below their writer's horizon (node -> HLC); return (key, hlc, node) of each."""
+
+        return await self._submit("gc", value=horizons)
+
+
+    async def get_all_keys(self, namespace=""):
+        """Queue a LIST_KEYS request for the keys of a namespace asynchronously and return result."""
+
+        result = await self._submit("list_keys", namespace)
 
         if not isinstance(result, list):  # Ensure it's a list
             logging.error(f"Unexpected type in get_all_keys(): {type(result).__name__}, value={result}")
@@ -98,28 +614,51 @@ class MultiprocessWorker:
 
         return result
 
+    async def copy(self, path):
+        """Write a compacted copy of the store to the empty directory path."""
+
+        return await self._submit("copy", value=path)
+
+    async def restore(self, path):
+        """Replace the whole store with the LMDB copy in path, in one transaction."""
+
+        return await self._submit("restore", value=path)
+
+    async def tier(self):
+        """Move the keys not read or written since the previous call to the cold tier; return how many moved."""
+
+        return await self._submit("tier")
+
+    async def get_bodies(self, digests):
+        """Return digest -> value (bytes) of the shared value bodies, None for those not stored."""
+
+        return await self._submit("bodies", value=digests)
+
     async def backup(self):
         """Queue a BACKUP request asynchronously."""
 
-        await asyncio.to_thread(self.task_queue.put, ("backup", None, None))
-        return await asyncio.to_thread(self.result_queue.get)
+        return await self._submit("backup")
 
     async def close(self):
-        """Stop all threads and cleanup."""
+        """Stop the worker thread and close the stores."""
 
         self.running = False
-        for _ in self.threads:
-            await asyncio.to_thread(self.task_queue.put, None)  # Stop signal
-        for thread in self.threads:
-            thread.join()
+        await asyncio.to_thread(self.task_queue.put, None)  # Stop signal
+        await asyncio.to_thread(self.thread.join)
+        if self.wal is not None:
+            self.wal.close()
+        self.blobs.close()
+        self.cold.close()
+        self.db_env.close()
         logging.info("Worker shut down gracefully.")
 
 # Testing Asynchronous Thread Worker
 async def test_async_worker():
     worker = MultiprocessWorker()
+    clock = HybridLogicalClock()
 
     logging.info("Putting key 'foo' -> 'bar'")
-    await worker.put("foo", "bar")
+    await worker.put("foo", "bar", (clock.now(), 0))
 
     logging.info("Getting key 'foo'")
     value = await worker.get("foo")
@@ -134,7 +673,7 @@ async def test_async_worker():
     print(f"Backup Status: {backup_status}")
 
     logging.info("Deleting key 'foo'")
-    await worker.delete("foo")
+    await worker.delete("foo", (clock.now(), 0))
 
     await worker.close()
 
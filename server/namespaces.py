@@ -0,0 +1,191 @@
+import logging
+import struct
+
+import lmdb
+
+from dedup import SUB_DB_PREFIX
+
+
+NAMESPACE_MARK = "\0"  # Qualified keys of a namespace: mark + namespace + mark + key
+NAMESPACE_DB_PREFIX = SUB_DB_PREFIX + b"ns:"
+DROPS_DB = SUB_DB_PREFIX + b"drops"  # Namespace name -> version of its last drop
+DROP_VERSION = struct.Struct(">QI")  # HLC, node
+MAX_NAMESPACE_LENGTH = 128
+
+
+def qualify(namespace, key):
+    """
+    Return the key as it is stored, logged and replicated: a namespace's keys
+    carry its name, those of the default namespace ("") are unchanged.
+    Qualified keys sort by namespace, then key, before every default key.
+    """
+    return f"{NAMESPACE_MARK}{namespace}{NAMESPACE_MARK}{key}" if namespace else key
+
+
+def split_key(key):
+    """Return (namespace, key) of a qualified key."""
+    if key.startswith(NAMESPACE_MARK):
+        namespace, _, key = key[1:].partition(NAMESPACE_MARK)
+        return namespace, key
+    return "", key
+
+
+def namespace_db_name(namespace):
+    return NAMESPACE_DB_PREFIX + namespace.encode()
+
+
+def valid_namespace(namespace):
+    return NAMESPACE_MARK not in namespace and len(namespace.encode()) <= MAX_NAMESPACE_LENGTH
+
+
+def namespace_names(txn):
+    """Return the names of the namespaces in the LMDB environment of txn (whose main DB lists them)."""
+    names = []
+    with txn.cursor() as cursor:
+        found = cursor.set_range(NAMESPACE_DB_PREFIX)
+        while found and cursor.key().startswith(NAMESPACE_DB_PREFIX):
+            names.append(bytes(cursor.key()[len(NAMESPACE_DB_PREFIX):]).decode())
+            found = cursor.next()
+    return names
+
+
+def parse_quota(text):
+    """Parse NAME:MAX_KEYS:MAX_MB (0: no limit; NAME * for every namespace without its own) to (name, limits)."""
+    name, max_keys, max_mb = text.rsplit(":", 2)
+    return name, (int(max_keys), int(float(max_mb) * 1024 * 1024))
+
+
+class Namespaces:
+    """
+    Named key spaces, each a sub-database of the node's LMDB environment.
+
+    The default namespace is the main database. A namespace is created by its
+    first write, and dropping it frees its B-tree in one call instead of
+    deleting key by key. Usage (records, tombstones included, and bytes of
+    pages) is tracked as it is written; quotas maps names, or "*" for any
+    namespace, to (max keys, max bytes) limits (0: none) that admit() checks.
+
+    A drop is versioned like a write and its version is kept, so a write to the
+    namespace made before the drop (replicated late, replayed from a log or
+    pulled by a repair) is refused instead of bringing the namespace back.
+    """
+
+    def __init__(self, quotas=None, max_namespaces=128):
+        self.quotas = quotas or {}
+        self.max_namespaces = max_namespaces
+        self.db_env = None  # Set by open()
+        self.dbs = {}  # Name -> database handle
+        self.usage = {}  # Name -> (records, bytes)
+        self.drops_db = None  # Created by the first drop
+        self.dropped = {}  # Name -> (hlc, node) of its last drop
+        self.rejected = 0
+        self.drops = 0
+
+    def open(self, db_env):
+        """Open every existing namespace (again after a failed transaction, which closes the handles it created)."""
+        self.db_env = db_env
+        self.dbs = {}
+        with db_env.begin() as txn:
+            names = namespace_names(txn)
+        for name in names:
+            self.dbs[name] = db_env.open_db(namespace_db_name(name), create=False)
+        try:
+            self.drops_db = db_env.open_db(DROPS_DB, create=False)
+        except lmdb.NotFoundError:
+            self.drops_db = None
+        with db_env.begin() as txn:
+            for name in names:
+                self.track(txn, name)
+            self.dropped = {}
+            if self.drops_db is not None:
+                with txn.cursor(db=self.drops_db) as cursor:
+                    self.dropped = {bytes(name).decode(): DROP_VERSION.unpack(version) for name, version in cursor}
+
+    def db(self, txn, name, create=False):
+        """Return the handle of namespace name, creating it in txn if create is set, or None."""
+        db = self.dbs.get(name)
+        if db is None and create:
+            if len(self.dbs) >= self.max_namespaces:
+                raise ValueError(f"Cannot create namespace {name!r}: there are {self.max_namespaces} already")
+            db = self.dbs[name] = self.db_env.open_db(namespace_db_name(name), txn=txn)
+            logging.info(f"Created namespace {name!r}")
+        return db
+
+    def track(self, txn, name):
+        stat = txn.stat(self.dbs[name])
+        self.usage[name] = (stat["entries"],
+                            stat["psize"] * (stat["branch_pages"] + stat["leaf_pages"] + stat["overflow_pages"]))
+
+    def admit(self, name):
+        """Return False (and count a rejection) if namespace name is at its quota."""
+        max_keys, max_bytes = self.quotas.get(name) or self.quotas.get("*") or (0, 0)
+        keys, used = self.usage.get(name, (0, 0))
+        if (max_keys and keys >= max_keys) or (max_bytes and used >= max_bytes):
+            self.rejected += 1
+            return False
+        return True
+
+    def superseded(self, name, version):
+        """True if namespace name was dropped at or after version (hlc, node), so a write at version must not apply."""
+        dropped = self.dropped.get(name)
+        return dropped is not None and dropped >= version
+
+    def drop(self, txn, name, version):
+        """
+        Delete namespace name with its keys as of version (hlc, node) unless a later
+        drop is recorded; return (records it held or None if it did not exist, applied).
+        """
+        if self.superseded(name, version):
+            return None, False
+        self._record_drop(txn, name, version)
+        db = self.dbs.get(name)
+        if db is None:
+            return None, True
+        records = txn.stat(db)["entries"]
+        txn.drop(db, delete=True)
+        del self.dbs[name]
+        self.usage.pop(name, None)
+        self.drops += 1
+        logging.info(f"Dropped namespace {name!r} with {records} records")
+        return records, True
+
+    def _record_drop(self, txn, name, version):
+        if self.drops_db is None:
+            self.drops_db = self.db_env.open_db(DROPS_DB, txn=txn)
+        txn.put(name.encode(), DROP_VERSION.pack(*version), db=self.drops_db)
+        self.dropped[name] = version
+
+    def restore(self, txn, source_env, source_txn):
+        """Replace every namespace with those of an LMDB copy of a store opened as source_env, and add its drops."""
+        for name in list(self.dbs):
+            txn.drop(self.dbs.pop(name), delete=True)
+        self.usage = {}
+        for name in namespace_names(source_txn):
+            source_db = source_env.open_db(namespace_db_name(name), txn=source_txn, create=False)
+            with source_txn.cursor(db=source_db) as cursor:
+                txn.cursor(db=self.db(txn, name, create=True)).putmulti(cursor, append=True)
+            self.track(txn, name)
+        try:
+            source_drops = source_env.open_db(DROPS_DB, txn=source_txn, create=False)
+        except lmdb.NotFoundError:
+            return
+        with source_txn.cursor(db=source_drops) as cursor:
+            for name, version in cursor:
+                name, version = bytes(name).decode(), DROP_VERSION.unpack(version)
+                if not self.superseded(name, version):  # The copied keys are newer than the copy's drops
+                    self._record_drop(txn, name, version)
+
+    def copy_drops(self, target_env, target_txn):
+        """Write the drop versions to an LMDB copy of the store being written in target_txn."""
+        if self.dropped:
+            target_db = target_env.open_db(DROPS_DB, txn=target_txn)
+            for name, version in list(self.dropped.items()):
+                target_txn.put(name.encode(), DROP_VERSION.pack(*version), db=target_db)
+
+    def stats(self):
+        metrics = {"namespace_count": len(self.dbs), "namespace_quota_rejections": self.rejected,
+                   "namespace_drops": self.drops}
+        for name, (keys, used) in list(self.usage.items()):  # Updated by the worker thread
+            metrics[f"namespace_keys_{name}"] = keys
+            metrics[f"namespace_bytes_{name}"] = used
+        return metrics
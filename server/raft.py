@@ -0,0 +1,665 @@
+import asyncio
+import logging
+import os
+import random
+import shutil
+import struct
+import time
+
+import grpc
+import lmdb
+import kvstore_pb2
+
+from replication_log import encode_entry, decode_entry
+from retry_policy import cancel_tasks
+
+
+FOLLOWER, CANDIDATE, LEADER = "follower", "candidate", "leader"
+SNAPSHOT_CHUNK = 1 << 20  # Bytes per InstallSnapshot message
+
+
+class NotLeader(Exception):
+    """Raised for requests that only the leader can serve; leader is its address if known."""
+
+    def __init__(self, leader):
+        super().__init__(f"Not the Raft leader (leader: {leader or 'unknown'})")
+        self.leader = leader
+
+
+def to_raft_entry(term, mutation):
+    if mutation is None:
+        return kvstore_pb2.RaftEntry(term=term)
+    op, key, value, hlc, node = mutation
+    return kvstore_pb2.RaftEntry(term=term, mutation=kvstore_pb2.Mutation(
+        op=kvstore_pb2.Mutation.DELETE if op == "delete" else kvstore_pb2.Mutation.PUT,
+        key=key, value=value, hlc=hlc, node=node))
+
+
+def from_raft_entry(entry):
+    if not entry.HasField("mutation"):
+        return entry.term, None
+    m = entry.mutation
+    return entry.term, ("delete" if m.op == kvstore_pb2.Mutation.DELETE else "put", m.key, m.value, m.hlc, m.node)
+
+
+class RaftLog:
+    """
+    Persistent Raft state: the current term, the vote, and the log after the last snapshot.
+
+    Entries are (term, mutation) with mutation (op, key, value, hlc, node), or None
+    for the no-op a new leader appends. They are kept in memory and in an LMDB
+    environment (sub-databases "entries" and "meta"); a node only answers for state
+    that has been committed to it.
+    """
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.env = lmdb.open(path, map_size=1 << 30, max_dbs=2)
+        self.entries_db = self.env.open_db(b"entries")
+        self.meta_db = self.env.open_db(b"meta")
+        self.term = 0
+        self.voted_for = ""
+        self.snapshot_index = 0  # Last index covered by the snapshot; entries[0] follows it
+        self.snapshot_term = 0
+        self.entries = []
+        self.persisted_index = 0
+        self.persist_lock = asyncio.Lock()
+        self._load()
+
+    def _load(self):
+        with self.env.begin() as txn:
+            meta = txn.get(b"state", db=self.meta_db)
+            if meta is not None:
+                self.term, self.snapshot_index, self.snapshot_term = struct.unpack_from(">QQQ", meta)
+                self.voted_for = meta[24:].decode()
+            with txn.cursor(db=self.entries_db) as cursor:
+                for key, data in cursor:
+                    index = struct.unpack(">Q", key)[0]
+                    if index <= self.snapshot_index:
+                        continue
+                    term = struct.unpack_from(">Q", data)[0]
+                    self.entries.append((term, decode_entry(data[8:]) if len(data) > 8 else None))
+        self.persisted_index = self.last_index
+        logging.info(f"Raft log loaded: term {self.term}, snapshot at {self.snapshot_index}, "
+                     f"{len(self.entries)} entries after it")
+
+    @property
+    def last_index(self):
+        return self.snapshot_index + len(self.entries)
+
+    def term_at(self, index):
+        """Term of the entry at index, or None if it is not in the log (0 for the empty log)."""
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        if index < self.snapshot_index or index > self.last_index:
+            return None
+        return self.entries[index - self.snapshot_index - 1][0]
+
+    def last_term(self):
+        return self.term_at(self.last_index)
+
+    def slice(self, start, limit):
+        """Return up to limit entries from index start (which must be after the snapshot)."""
+        offset = start - self.snapshot_index - 1
+        return self.entries[offset:offset + limit]
+
+    def append(self, entries):
+        """Append entries in memory and return the index of the last one; persist() makes them durable."""
+        self.entries.extend(entries)
+        return self.last_index
+
+    def truncate_from(self, index):
+        """Drop the entries from index on (they conflict with the leader's log)."""
+        del self.entries[index - self.snapshot_index - 1:]
+        self.persisted_index = min(self.persisted_index, index - 1)
+
+    async def persist(self):
+        """Write the unpersisted entries and the term and vote in one transaction."""
+        async with self.persist_lock:
+            start = self.persisted_index + 1
+            last, last_term = self.last_index, self.last_term()
+            entries = self.slice(start, last - self.persisted_index)
+            await asyncio.to_thread(self._write, start, entries, self._state())
+            if self.term_at(last) == last_term:  # Not truncated meanwhile
+                self.persisted_index = max(self.persisted_index, last)
+
+    async def save_state(self):
+        """Persist the current term and vote (before answering a vote or a higher term)."""
+        await asyncio.to_thread(self._write, None, [], self._state())
+
+    async def compact(self, index, term):
+        """Drop the entries covered by a snapshot of the state up to index."""
+        if index <= self.snapshot_index:
+            return
+        keep = self.term_at(index) == term
+        if keep:
+            del self.entries[:index - self.snapshot_index]  # Keep the entries after the snapshot
+        else:
+            self.entries = []  # Our log conflicts with the snapshot: the snapshot wins
+            self.persisted_index = index
+        self.snapshot_index, self.snapshot_term = index, term
+        self.persisted_index = max(self.persisted_index, index)
+        async with self.persist_lock:
+            await asyncio.to_thread(self._compact, index if keep else None, self._state())
+
+    def _state(self):
+        return struct.pack(">QQQ", self.term, self.snapshot_index, self.snapshot_term) + self.voted_for.encode()
+
+    def _write(self, start, entries, state):
+        with self.env.begin(write=True) as txn:
+            if start is not None:
+                with txn.cursor(db=self.entries_db) as cursor:  # Drop any conflicting suffix first
+                    while cursor.set_range(struct.pack(">Q", start)):
+                        cursor.delete()
+                for offset, (term, mutation) in enumerate(entries):
+                    data = struct.pack(">Q", term) + (encode_entry(*mutation) if mutation else b"")
+                    txn.put(struct.pack(">Q", start + offset), data, db=self.entries_db, append=True)
+            txn.put(b"state", state, db=self.meta_db)
+
+    def _compact(self, index, state):
+        """Delete the entries up to index (all of them if index is None)."""
+        with self.env.begin(write=True) as txn:
+            with txn.cursor(db=self.entries_db) as cursor:
+                while cursor.first() and (index is None or struct.unpack(">Q", cursor.key())[0] <= index):
+                    cursor.delete()
+            txn.put(b"state", state, db=self.meta_db)
+
+    def close(self):
+        self.env.close()
+
+
+class RaftNode:
+    """
+    Raft consensus over the store's writes, for linearizable reads and writes.
+
+    The leader appends each write to its log and streams the log to every follower
+    over one AppendEntries stream per follower: requests are pipelined (up to
+    max_inflight unacknowledged) and batched (up to batch_size entries). A write is
+    applied, in log order on every node, once a majority has persisted it.
+    Followers that fell behind the log are sent the latest snapshot, an LMDB copy
+    of the store taken every snapshot_threshold applied entries.
+
+    Elections use a pre-vote round, and a node that heard from a leader within the
+    minimum election timeout does not vote. A new leader therefore cannot be elected
+    until that long after the last heartbeat a majority acknowledged, so the leader
+    holds a lease until then and serves reads locally without a round trip.
+    """
+
+    def __init__(self, node_id, peers, get_stub, apply, take_snapshot, restore_snapshot, directory,
+                 clock=None, election_timeout=0.3, heartbeat_interval=0.05, batch_size=512, max_inflight=8,
+                 snapshot_threshold=10000):
+        self.node_id = node_id
+        self.peers = peers
+        self.get_stub = get_stub  # fn(peer) -> stub
+        self.apply = apply  # Coroutine fn(list of mutations) -> (old value, applied) per mutation
+        self.take_snapshot = take_snapshot  # Coroutine fn(path): copy the store into the empty directory path
+        self.restore_snapshot = restore_snapshot  # Coroutine fn(path): replace the store with the copy in path
+        self.clock = clock  # Observes the versions of replicated entries
+        self.directory = directory
+        self.log = RaftLog(os.path.join(directory, "log"))
+        self.snapshot_path = os.path.join(directory, "snapshot")
+        self.election_timeout = election_timeout  # Minimum; each wait is drawn from [timeout, 2 * timeout]
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_duration = election_timeout * 0.9  # Margin for clock drift between nodes
+        self.batch_size = batch_size
+        self.max_inflight = max_inflight
+        self.snapshot_threshold = snapshot_threshold
+
+        self.role = FOLLOWER
+        self.leader_id = None
+        self.heard_at = time.monotonic()  # Last contact with a current leader (or vote granted)
+        self.commit_index = self.log.snapshot_index
+        self.last_applied = self.log.snapshot_index  # Entries after the snapshot are reapplied (idempotent)
+        self.term_start_index = 0  # Index of the no-op this node appended when it became leader
+        self.next_index = {}
+        self.match_index = {}
+        self.acked_at = {}  # Peer -> send time of the latest request it acknowledged in this term
+        self.waiters = {}  # Log index -> future resolved with the apply result
+        self.changed = asyncio.Event()  # Replaced after every commit, apply or ack so waiters see the next one
+        self.apply_lock = asyncio.Lock()  # Applying entries and installing a snapshot exclude each other
+        self.persist_needed = asyncio.Event()
+        self.tasks = []
+        self.replicators = []
+
+        self.elections = 0
+        self.lease_reads = 0
+        self.snapshots_taken = 0
+        self.snapshots_installed = 0
+        self.snapshots_sent = 0
+
+    @property
+    def majority(self):
+        return (len(self.peers) + 1) // 2 + 1
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._election_timer()), asyncio.create_task(self._apply_loop()),
+                      asyncio.create_task(self._persist_loop())]
+
+    async def stop(self):
+        await cancel_tasks(*self.tasks, *self.replicators)
+        self.log.close()
+
+    def _notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def _wait_until(self, condition, timeout):
+        """Wait until condition() holds; return False on timeout."""
+        deadline = time.monotonic() + timeout
+        while not condition():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    # Elections
+
+    async def _election_timer(self):
+        while True:
+            timeout = random.uniform(self.election_timeout, 2 * self.election_timeout)
+            await asyncio.sleep(timeout)
+            if self.role != LEADER and time.monotonic() - self.heard_at >= timeout:
+                await self._start_election()
+
+    async def _request_votes(self, term, pre_vote):
+        """Ask every peer for its vote; return True once a majority granted it."""
+        request = kvstore_pb2.VoteRequest(term=term, candidate=self.node_id, last_log_index=self.log.last_index,
+                                          last_log_term=self.log.last_term(), pre_vote=pre_vote)
+        votes = 1  # Our own
+        if votes >= self.majority:
+            return True
+        calls = [asyncio.ensure_future(self.get_stub(peer).RequestVote(request, timeout=self.election_timeout))
+                 for peer in self.peers]
+        try:
+            for result in asyncio.as_completed(calls):
+                try:
+                    response = await result
+                except (grpc.aio.AioRpcError, asyncio.TimeoutError):
+                    continue
+                if response.term > self.log.term and not (pre_vote and response.granted):
+                    await self._become_follower(response.term, None)
+                    return False
+                votes += response.granted
+                if votes >= self.majority:
+                    return True
+        finally:
+            for call in calls:
+                call.cancel()
+        return False
+
+    async def _start_election(self):
+        # Pre-vote first, so a node that was cut off does not disrupt the cluster with a higher term
+        if not await self._request_votes(self.log.term + 1, pre_vote=True) or self.role == LEADER:
+            return
+        self.role = CANDIDATE
+        self.log.term += 1
+        self.log.voted_for = self.node_id
+        self.elections += 1
+        term = self.log.term
+        await self.log.save_state()
+        logging.info(f"Raft: starting election for term {term}")
+        if await self._request_votes(term, pre_vote=False) and self.role == CANDIDATE and self.log.term == term:
+            self._become_leader()
+
+    def _become_leader(self):
+        self.role = LEADER
+        self.leader_id = self.node_id
+        self.next_index = {peer: self.log.last_index + 1 for peer in self.peers}
+        self.match_index = {peer: 0 for peer in self.peers}
+        self.acked_at = {}
+        self.term_start_index = self.log.append([(self.log.term, None)])  # Commits the entries of earlier terms
+        self.persist_needed.set()
+        self.replicators = [asyncio.create_task(self._replicate(peer, self.log.term)) for peer in self.peers]
+        logging.info(f"Raft: {self.node_id} is leader for term {self.log.term}")
+        self._advance_commit()
+        self._notify()
+
+    async def _become_follower(self, term, leader):
+        """Step down (or stay a follower) in term, following leader if known."""
+        if self.role == LEADER:
+            logging.info(f"Raft: {self.node_id} steps down in term {term}")
+            for task in self.replicators:
+                task.cancel()
+            self.replicators = []
+            for index, waiter in list(self.waiters.items()):
+                if index > self.commit_index and not waiter.done():
+                    waiter.set_exception(NotLeader(leader))  # Outcome unknown: it may still commit
+        self.role = FOLLOWER
+        if leader:
+            self.leader_id = leader
+        if term > self.log.term:
+            self.log.term = term
+            self.log.voted_for = ""
+            self.leader_id = leader
+            await self.log.save_state()
+        self._notify()
+
+    async def handle_vote(self, request):
+        """Answer a (pre-)vote request."""
+        if self.role == LEADER or time.monotonic() - self.heard_at < self.election_timeout:
+            return kvstore_pb2.VoteResponse(term=self.log.term, granted=False)  # A leader is alive
+        up_to_date = (request.last_log_term, request.last_log_index) >= (self.log.last_term(), self.log.last_index)
+        if request.pre_vote:
+            return kvstore_pb2.VoteResponse(term=self.log.term,
+                                            granted=request.term > self.log.term and up_to_date)
+        if request.term > self.log.term:
+            await self._become_follower(request.term, None)
+        granted = (request.term == self.log.term and up_to_date
+                   and self.log.voted_for in ("", request.candidate))
+        if granted:
+            self.log.voted_for = request.candidate
+            self.heard_at = time.monotonic()
+            await self.log.save_state()
+        return kvstore_pb2.VoteResponse(term=self.log.term, granted=granted)
+
+    # Log replication (leader)
+
+    async def propose(self, mutations, timeout=5.0):
+        """Append mutations to the log and return their apply results once committed (leader only)."""
+        if self.role != LEADER:
+            raise NotLeader(self.leader_id)
+        loop = asyncio.get_running_loop()
+        first = self.log.last_index + 1
+        for mutation in mutations:
+            self.log.append([(self.log.term, mutation)])
+        futures = [loop.create_future() for _ in mutations]
+        for offset, future in enumerate(futures):
+            self.waiters[first + offset] = future
+        self.persist_needed.set()
+        self._notify()  # Wake the replicators
+        try:
+            return await asyncio.wait_for(asyncio.gather(*futures), timeout)
+        finally:
+            for offset in range(len(futures)):
+                self.waiters.pop(first + offset, None)
+
+    async def _persist_loop(self):
+        """Group-commit the leader's new entries; they count towards the majority once persisted."""
+        while True:
+            await self.persist_needed.wait()
+            self.persist_needed.clear()
+            if self.role == LEADER and self.log.persisted_index < self.log.last_index:
+                await self.log.persist()
+                self._advance_commit()
+
+    def _advance_commit(self):
+        if self.role != LEADER:
+            return
+        matches = sorted([self.log.persisted_index] + list(self.match_index.values()), reverse=True)
+        index = matches[self.majority - 1]
+        if index > self.commit_index and self.log.term_at(index) == self.log.term:  # Only count current-term entries
+            self.commit_index = index
+            self._notify()
+
+    async def _replicate(self, peer, term):
+        """Keep peer's log in sync with ours over an AppendEntries stream while we lead in term."""
+        retry_delay = 0.05
+        while self.role == LEADER and self.log.term == term:
+            try:
+                if self.next_index[peer] <= self.log.snapshot_index:
+                    await self._send_snapshot(peer, term)
+                    continue
+                await self._stream_entries(peer, term)
+                retry_delay = 0.05
+            except (grpc.aio.AioRpcError, grpc.aio.UsageError, asyncio.TimeoutError, OSError) as e:
+                logging.debug(f"Raft: replication to {peer} failed: {e}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 1.0)
+
+    async def _stream_entries(self, peer, term):
+        """Pipeline AppendEntries to peer until its log diverges (then return to resync) or the stream fails."""
+        call = self.get_stub(peer).AppendEntries()
+        sent = {}  # Request id -> send time
+        next_index = self.next_index[peer]
+        request_id = 0
+        resync = asyncio.Event()
+
+        async def receive():
+            try:
+                async for response in call:
+                    sent_at = sent.pop(response.id, None)
+                    if response.term > self.log.term:
+                        await self._become_follower(response.term, None)
+                        return
+                    if not response.success:
+                        self.next_index[peer] = max(1, min(response.match_index + 1, self.log.last_index + 1))
+                        return
+                    if response.match_index > self.match_index[peer]:
+                        self.match_index[peer] = response.match_index
+                        self._advance_commit()
+                    if sent_at is not None:
+                        self.acked_at[peer] = max(self.acked_at.get(peer, 0), sent_at)
+                    self._notify()
+            finally:
+                resync.set()
+
+        receiver = asyncio.create_task(receive())
+        try:
+            last_sent = 0.0
+            while self.role == LEADER and self.log.term == term and not resync.is_set():
+                if next_index <= self.log.snapshot_index:
+                    self.next_index[peer] = next_index
+                    return  # Entries were compacted away: send the snapshot
+                pending = self.log.last_index >= next_index
+                if (pending and len(sent) < self.max_inflight) or time.monotonic() - last_sent >= self.heartbeat_interval:
+                    entries = self.log.slice(next_index, self.batch_size) if len(sent) < self.max_inflight else []
+                    request_id += 1
+                    request = kvstore_pb2.AppendRequest(
+                        term=term, leader=self.node_id, prev_log_index=next_index - 1,
+                        prev_log_term=self.log.term_at(next_index - 1), leader_commit=self.commit_index,
+                        id=request_id, entries=[to_raft_entry(*entry) for entry in entries])
+                    last_sent = time.monotonic()
+                    sent[request_id] = last_sent
+                    await call.write(request)
+                    next_index += len(entries)  # Optimistic: the next batch follows right away
+                    self.next_index[peer] = next_index
+                    continue
+                waiter = asyncio.ensure_future(self.changed.wait())
+                await asyncio.wait([waiter, receiver], timeout=self.heartbeat_interval,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+            if resync.is_set():
+                receiver.result()  # Surface a stream error
+        finally:
+            receiver.cancel()
+            call.cancel()
+
+    async def _send_snapshot(self, peer, term):
+        index, snapshot_term = self._snapshot_meta()
+        logging.info(f"Raft: sending snapshot at {index} to {peer}")
+
+        def chunks():
+            with open(os.path.join(self.snapshot_path, "data.mdb"), "rb") as f:
+                while True:
+                    data = f.read(SNAPSHOT_CHUNK)
+                    yield kvstore_pb2.RaftSnapshotChunk(term=term, leader=self.node_id, last_index=index,
+                                                        last_term=snapshot_term, data=data)
+                    if len(data) < SNAPSHOT_CHUNK:
+                        return
+
+        response = await self.get_stub(peer).InstallSnapshot(chunks(), timeout=60)
+        if response.term > self.log.term:
+            await self._become_follower(response.term, None)
+            return
+        self.snapshots_sent += 1
+        self.match_index[peer] = max(self.match_index[peer], index)
+        self.next_index[peer] = index + 1
+        self._advance_commit()
+
+    def _snapshot_meta(self):
+        with open(os.path.join(self.snapshot_path, "meta")) as f:
+            index, term = f.read().split()
+        return int(index), int(term)
+
+    # Log replication (follower)
+
+    async def handle_append(self, request):
+        """Apply one AppendEntries request from the leader."""
+        if request.term < self.log.term:
+            return kvstore_pb2.AppendResponse(term=self.log.term, success=False, match_index=self.log.last_index,
+                                              id=request.id)
+        if request.term > self.log.term or self.role != FOLLOWER or self.leader_id != request.leader:
+            await self._become_follower(request.term, request.leader)
+        self.heard_at = time.monotonic()
+        prev = request.prev_log_index
+        if prev > self.log.last_index:
+            return kvstore_pb2.AppendResponse(term=self.log.term, success=False, match_index=self.log.last_index,
+                                              id=request.id)
+        if prev >= self.log.snapshot_index and self.log.term_at(prev) != request.prev_log_term:
+            # Skip back over the whole conflicting term rather than one entry per round trip
+            conflict_term = self.log.term_at(prev)
+            while prev > self.log.snapshot_index and self.log.term_at(prev - 1) == conflict_term:
+                prev -= 1
+            return kvstore_pb2.AppendResponse(term=self.log.term, success=False, match_index=prev - 1, id=request.id)
+
+        entries = [from_raft_entry(entry) for entry in request.entries]
+        for offset, (term, mutation) in enumerate(entries):
+            index = prev + 1 + offset
+            if index <= self.log.snapshot_index:
+                continue  # Already covered by our snapshot
+            existing = self.log.term_at(index)
+            if existing == term:
+                continue
+            if existing is not None:
+                self.log.truncate_from(index)
+            new = entries[offset:]
+            self.log.append(new)
+            if self.clock is not None:
+                for _, new_mutation in new:
+                    if new_mutation is not None:
+                        self.clock.observe(new_mutation[3])
+            break
+        if self.log.persisted_index < self.log.last_index:
+            await self.log.persist()
+        match = prev + len(entries)
+        if min(request.leader_commit, match) > self.commit_index:
+            self.commit_index = min(request.leader_commit, match)
+            self._notify()
+        return kvstore_pb2.AppendResponse(term=self.log.term, success=True, match_index=match, id=request.id)
+
+    async def handle_snapshot(self, request_iterator):
+        """Receive the leader's snapshot and replace our store and log with it."""
+        incoming = os.path.join(self.directory, "snapshot.incoming")
+        shutil.rmtree(incoming, ignore_errors=True)
+        os.makedirs(incoming)
+        first = None
+        with open(os.path.join(incoming, "data.mdb"), "wb") as f:
+            async for chunk in request_iterator:
+                if first is None:
+                    first = chunk
+                    if chunk.term < self.log.term:
+                        return kvstore_pb2.AppendResponse(term=self.log.term, success=False)
+                    await self._become_follower(chunk.term, chunk.leader)
+                self.heard_at = time.monotonic()
+                f.write(chunk.data)
+        if first is None:
+            return kvstore_pb2.AppendResponse(term=self.log.term, success=False)
+        index, term = first.last_index, first.last_term
+        async with self.apply_lock:
+            if index > self.last_applied:
+                result = await self.restore_snapshot(incoming)
+                if result != incoming:
+                    raise RuntimeError(f"Installing the snapshot failed: {result}")
+                self._install_snapshot_dir(incoming, index, term)
+                await self.log.compact(index, term)
+                self.commit_index = max(self.commit_index, index)
+                self.last_applied = index
+                self.snapshots_installed += 1
+                logging.info(f"Raft: installed snapshot at {index} from {first.leader}")
+        self._notify()
+        return kvstore_pb2.AppendResponse(term=self.log.term, success=True, match_index=index)
+
+    def _install_snapshot_dir(self, path, index, term):
+        with open(os.path.join(path, "meta"), "w") as f:
+            f.write(f"{index} {term}")
+        shutil.rmtree(self.snapshot_path, ignore_errors=True)
+        os.replace(path, self.snapshot_path)
+
+    # State machine
+
+    async def _apply_loop(self):
+        while True:
+            if self.commit_index <= self.last_applied:
+                await self.changed.wait()
+                continue
+            async with self.apply_lock:
+                start = self.last_applied + 1
+                end = min(self.commit_index, start + self.batch_size - 1)
+                if start > end:
+                    continue
+                entries = self.log.slice(start, end - start + 1)
+                mutations = [mutation for _, mutation in entries if mutation is not None]
+                results = await self.apply(mutations) if mutations else []
+                if not isinstance(results, list):
+                    logging.error(f"Raft: applying entries {start}..{end} failed: {results}")
+                    await asyncio.sleep(0.1)
+                    continue
+                results = iter(results)
+                for offset, (_, mutation) in enumerate(entries):
+                    result = next(results) if mutation is not None else None
+                    waiter = self.waiters.get(start + offset)
+                    if waiter is not None and not waiter.done():
+                        waiter.set_result(result)
+                self.last_applied = end
+                if self.last_applied - self.log.snapshot_index >= self.snapshot_threshold:
+                    await self._snapshot()
+            self._notify()
+
+    async def _snapshot(self):
+        """Copy the store as of last_applied and drop the log entries it covers (under apply_lock)."""
+        index, term = self.last_applied, self.log.term_at(self.last_applied)
+        start = time.monotonic()
+        path = os.path.join(self.directory, "snapshot.tmp")
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        result = await self.take_snapshot(path)
+        if result != path:
+            logging.error(f"Raft: snapshot failed: {result}")
+            return
+        self._install_snapshot_dir(path, index, term)
+        await self.log.compact(index, term)
+        self.snapshots_taken += 1
+        logging.info(f"Raft: snapshot at {index} in {(time.monotonic() - start) * 1000:.2f} ms")
+
+    # Reads
+
+    def has_lease(self):
+        """True while no other leader can have been elected."""
+        if self.role != LEADER:
+            return False
+        acks = sorted(self.acked_at.get(peer, 0) for peer in self.peers)[::-1]
+        lease_start = acks[self.majority - 2] if self.majority > 1 else time.monotonic()
+        return time.monotonic() < lease_start + self.lease_duration
+
+    async def read_barrier(self, timeout=2.0):
+        """Wait until a local read is linearizable: we hold the lease and applied everything committed."""
+        if self.role != LEADER:
+            raise NotLeader(self.leader_id)
+        if not await self._wait_until(lambda: self.commit_index >= self.term_start_index and self.has_lease()
+                                      or self.role != LEADER, timeout):
+            raise asyncio.TimeoutError()
+        if self.role != LEADER:
+            raise NotLeader(self.leader_id)
+        read_index = self.commit_index
+        if not await self._wait_until(lambda: self.last_applied >= read_index, timeout):
+            raise asyncio.TimeoutError()
+        self.lease_reads += 1
+
+    def stats(self):
+        return {
+            "raft_term": self.log.term,
+            "raft_leader": 1 if self.role == LEADER else 0,
+            "raft_commit_index": self.commit_index,
+            "raft_last_applied": self.last_applied,
+            "raft_last_index": self.log.last_index,
+            "raft_snapshot_index": self.log.snapshot_index,
+            "raft_elections": self.elections,
+            "raft_lease_reads": self.lease_reads,
+            "raft_snapshots_taken": self.snapshots_taken,
+            "raft_snapshots_sent": self.snapshots_sent,
+            "raft_snapshots_installed": self.snapshots_installed,
+        }
@@ -0,0 +1,105 @@
+import asyncio
+import collections
+import logging
+import time
+
+import grpc
+import kvstore_pb2
+
+from replication import REPLICATED_METADATA
+
+
+class ReadRepair:
+    """
+    Heals stale replicas on the read path.
+
+    After a read that consulted several replicas has answered the client, the
+    replicas that had not answered yet are awaited in the background, and the
+    newest version seen is pushed to every replica that returned an older one.
+    Pushes are limited to rate per second by a token bucket; repairs over the
+    limit are dropped and left to anti-entropy.
+    """
+
+    def __init__(self, get_stub, apply_local, rate=100, window=10.0):
+        self.get_stub = get_stub  # fn(peer) -> stub
+        self.apply_local = apply_local  # Coroutine fn(list of Mutation), repairs this node
+        self.rate = rate  # Repairs per second (0 disables read repair)
+        self.window = window  # Seconds the repair rate metric is averaged over
+        self.tokens = float(rate)
+        self.refilled_at = time.monotonic()
+        self.in_flight = set()  # (peer, key) being repaired; peer None is this node
+        self.tasks = set()
+        self.recent = collections.deque()  # time.monotonic() of the repairs in the last window
+        self.repairs = 0
+        self.dropped = 0  # Stale replicas not repaired because of the rate limit
+        self.failed = 0
+
+    def check(self, key, answers, pending):
+        """
+        Repair key on the replicas that answered a read with an older version.
+
+        answers is a list of (peer, Value) already received, pending maps the reads
+        still in flight to their peer; peer None is this node.
+        """
+        if self.rate <= 0:
+            return
+        task = asyncio.ensure_future(self._check(key, list(answers), pending))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _check(self, key, answers, pending):
+        if pending:
+            await asyncio.wait(pending)
+            for task, peer in pending.items():
+                if not task.cancelled() and task.exception() is None:
+                    answers.append((peer, task.result()))
+        newest = max((answer for _, answer in answers), key=lambda answer: (answer.hlc, answer.node))
+        if not newest.hlc:
+            return  # No replica has ever stored the key
+        stale = [peer for peer, answer in answers if (answer.hlc, answer.node) < (newest.hlc, newest.node)]
+        await asyncio.gather(*[self._repair(peer, key, newest) for peer in stale])
+
+    def _take_token(self):
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.refilled_at) * self.rate)
+        self.refilled_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def _repair(self, peer, key, newest):
+        if (peer, key) in self.in_flight:
+            return  # Another read is already repairing this replica
+        if not self._take_token():
+            self.dropped += 1
+            return
+        self.in_flight.add((peer, key))
+        mutation = kvstore_pb2.Mutation(
+            op=kvstore_pb2.Mutation.DELETE if newest.tombstone else kvstore_pb2.Mutation.PUT,
+            key=key, value=newest.value, hlc=newest.hlc, node=newest.node)
+        try:
+            if peer is None:
+                await self.apply_local([mutation])
+            else:
+                await self.get_stub(peer).BatchWrite(kvstore_pb2.MutationBatch(mutations=[mutation]),
+                                                     metadata=(REPLICATED_METADATA,), timeout=2)
+            self.repairs += 1
+            self.recent.append(time.monotonic())
+        except (grpc.aio.AioRpcError, asyncio.TimeoutError, RuntimeError) as e:
+            self.failed += 1
+            logging.debug(f"Read repair of {key} on {peer or 'this node'} failed: {e}")
+        finally:
+            self.in_flight.discard((peer, key))
+
+    def stats(self):
+        """Return repair counters and the repair rate over the last window."""
+        cutoff = time.monotonic() - self.window
+        while self.recent and self.recent[0] < cutoff:
+            self.recent.popleft()
+        return {
+            "read_repairs": self.repairs,
+            "read_repair_rate": len(self.recent) / self.window,
+            "read_repairs_dropped": self.dropped,
+            "read_repairs_failed": self.failed,
+        }
@@ -4,69 +4,300 @@ import kvstore_pb2_grpc
 import asyncio
 import logging
 
+from replication_log import ReplicationLog, PeerShipper, CHANNEL_OPTIONS, OPS
+from hinted_handoff import HintedHandoff
+from retry_policy import CircuitBreaker, CLOSED, backoff_delay
+
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
+REPLICATED_METADATA = ("x-kv-replicated", "1")  # Marks unary replication so peers do not re-replicate
+
+def to_mutation(op, key, value, hlc, node):
+    return kvstore_pb2.Mutation(op=OPS[op], key=key, value=value, hlc=hlc, node=node)
+
+
 class ReplicationManager:
-    """Manages replication to multiple peers. """
+    """
+    Manages replication to multiple peers.
+
+    In "log" mode (default) every write is appended to a sequenced replication log and
+    a shipper per peer sends it in ordered batches through ReplicateBatch. In "unary"
+    mode each write is sent to each peer as its own BatchWrite RPC, and writes for a
+    peer that cannot be reached are queued as hints and replayed once it is back.
+    Writes carry their version (hlc, node), so peers apply them last-writer-wins.
 
-    def __init__(self, peers, max_retries=3):
+    Unary replication keeps at most window RPCs in flight per peer. When a peer's
+    window is full, overflow decides what happens to the next write: "block" makes
+    the writer wait for a slot, "shed" drops it for that peer (anti-entropy repairs
+    it later) and "spill" queues it as a hint. Failed RPCs are retried with jittered
+    backoff; after repeated failures a per-peer circuit breaker opens and writes go
+    straight to hints until a probe succeeds.
+
+    compression (a grpc.Compression) applies to the log batches sent to peers.
+    """
+
+    def __init__(self, peers, node_id=None, mode="log", batch_size=256, log_path=None,
+                 max_log_entries=1000000, hints_dir=None, hint_replay_rate=1000, window=256, overflow="block",
+                 max_attempts=3, compression=grpc.Compression.NoCompression):
         self.peers = peers # List of peer addresses
-        self.max_retries = max_retries # Maximum number of retries
         self.stubs = {}  # Cached gRPC stubs for peer communication
+        self.channels = {}
+        self.mode = mode
+        self.window = window  # Unary RPCs in flight per peer
+        self.overflow = overflow
+        self.max_attempts = max_attempts  # RPC attempts per write before it becomes a hint
+        self.breakers = {peer: CircuitBreaker(peer) for peer in peers}
+        self.in_flight = {peer: 0 for peer in peers}
+        self.slot_event = asyncio.Event()  # Replaced after a slot frees up so blocked writers see the next one
+        self.retries = {peer: 0 for peer in peers}
+        self.shed = {peer: 0 for peer in peers}
+        self.spilled = {peer: 0 for peer in peers}  # Writes queued as hints because the window was full
+        self.blocked = 0  # Writes that waited for a window slot
+        self.log = ReplicationLog(log_path if mode == "log" else None, max_entries=max_log_entries)
+        self.shippers = {}
+        if mode == "log":
+            self.shippers = {peer: PeerShipper(node_id, peer, self.log, batch_size, on_ack=self._on_ack,
+                                                   stable_hlc=self.stable_hlc, breaker=self.breakers[peer],
+                                                   compression=compression)
+                             for peer in peers}
+        self.ack_event = asyncio.Event()  # Replaced after every ack so waiters see the next one
+        self.unary_tasks = set()  # Outstanding unary replication tasks
+        self.hints = None
+        if mode == "unary":
+            self.hints = HintedHandoff(peers, hints_dir or "hints", self._get_stub, self._send_hints,
+                                       replay_rate=hint_replay_rate)
+
+    def start(self):
+        """Start the log flusher and the per-peer shippers (needs a running event loop)."""
+        self.log.start()
+        for shipper in self.shippers.values():
+            shipper.start()
+        if self.hints is not None:
+            self.hints.start()
+
+    async def stop(self):
+        for shipper in self.shippers.values():
+            await shipper.stop()
+        if self.hints is not None:
+            await self.hints.stop()
+        await self.log.stop()
+        for channel in self.channels.values():
+            await channel.close()
+
+    def peer_stub(self, peer):
+        """Return the stub on the persistent channel to a peer."""
+        if peer in self.shippers:
+            return self.shippers[peer].get_stub()
+        return self._get_stub(peer)
 
     def _get_stub(self, peer):
-        """Return a fresh stub if the connection is stale."""
+        """Return the stub on the persistent channel to a peer (gRPC reconnects it after failures)."""
 
-        if peer not in self.stubs or self.stubs[peer]._channel._state != grpc.ChannelConnectivity.READY:
-            self.stubs[peer] = kvstore_pb2_grpc.KeyValueStoreStub(grpc.aio.insecure_channel(peer))
+        if peer not in self.stubs:
+            self.channels[peer] = grpc.aio.insecure_channel(peer, options=CHANNEL_OPTIONS)
+            self.stubs[peer] = kvstore_pb2_grpc.KeyValueStoreStub(self.channels[peer])
         return self.stubs[peer]
 
-    async def _replicate_request(self, method, request, peer):
-        """Send gRPC request with retries and backoff."""
+    def _window_full(self, peer, count=1):
+        """True if count more RPCs to peer would overflow its window (a window is never full while empty)."""
 
-        retry_delay = 1     # Initial retry delay in seconds
-        max_delay = 10      # Maximum delay between retries
+        return 0 < self.in_flight[peer] and self.in_flight[peer] + count > self.window
 
-        for attempt in range(1, self.max_retries + 1):
-            try:
-                stub = self._get_stub(peer)  # Get fresh stub if needed
-                await asyncio.wait_for(method(request), timeout=3)
-                logging.info(f" Replication to {peer} succeeded.")
-                return True
-            except (grpc.aio.AioRpcError, asyncio.TimeoutError) as e:
-                logging.warning(f" Replication attempt {attempt}/{self.max_retries} to {peer} failed: {e}")
-                if attempt < self.max_retries:
-                    await asyncio.sleep(min(retry_delay, max_delay))
-                    retry_delay *= 2        # Exponential backoff
+    async def admit(self, count=1):
+        """Wait until every peer has room for count more writes (unary mode with the "block" policy)."""
+
+        if self.mode != "unary" or self.overflow != "block":
+            return
+        blocked = False
+        # Writes for a peer with hints or a tripped breaker are queued as hints, so they take no slot
+        while any(self._window_full(peer, count) and not self.hints.has_hints(peer)
+                  and self.breakers[peer].state == CLOSED for peer in self.peers):
+            blocked = True
+            await self.slot_event.wait()
+        self.blocked += blocked
+
+    def _release(self, peer):
+        self.in_flight[peer] -= 1
+        self.slot_event.set()
+        self.slot_event = asyncio.Event()
+
+    async def _replicate_request(self, request, peer, mutation):
+        """
+        Send one replication RPC, retrying with jittered backoff.
+
+        The write is queued as a hint if the peer has hints queued, its breaker is
+        open or every attempt failed. Returns True if the peer applied it.
+        """
+
+        breaker = self.breakers[peer]
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                if self.hints.has_hints(peer) or not breaker.allow():
+                    break  # Stay behind the queued hints to keep the order
+                try:
+                    await self._get_stub(peer).BatchWrite(request, metadata=(REPLICATED_METADATA,), timeout=3)
+                    breaker.record_success()
+                    return True
+                except (grpc.aio.AioRpcError, asyncio.TimeoutError) as e:
+                    breaker.record_failure()
+                    logging.warning(f" Replication to {peer} failed ({e.code() if hasattr(e, 'code') else e}), "
+                                    f"attempt {attempt}/{self.max_attempts}")
+                if attempt < self.max_attempts:
+                    self.retries[peer] += 1
+                    await asyncio.sleep(backoff_delay(attempt))
+            self.hints.add(peer, *mutation[:3], version=mutation[3:])
+            return False
+        finally:
+            self._release(peer)
+
+    async def _send_hints(self, peer, mutations):
+        """Replay queued writes to peer in one BatchWrite that the peer does not replicate again."""
+
+        await self._get_stub(peer).BatchWrite(
+            kvstore_pb2.MutationBatch(mutations=[to_mutation(*mutation) for mutation in mutations]),
+            metadata=(REPLICATED_METADATA,), timeout=5)
+
+    def replicate_put(self, key, value, version):
+        """
+        Replicate a PUT made at version (hlc, node) to all peers.
+
+        Returns a ticket for wait_for_replicas: the log sequence number in log mode,
+        the per-peer tasks in unary mode.
+        """
+
+        if self.mode == "unary":
+            return self._replicate_unary(("put", key, value, *version))
+        return self.log.append("put", key, value, version)
+
+    def replicate_delete(self, key, version):
+        """Replicate a DELETE to all peers and return a ticket for wait_for_replicas."""
+
+        if self.mode == "unary":
+            return self._replicate_unary(("delete", key, "", *version))
+        return self.log.append("delete", key, "", version)
+
+    def replicate_drop(self, key, version):
+        """Replicate the drop of the namespace key qualifies to all peers and return a ticket for wait_for_replicas."""
+
+        if self.mode == "unary":
+            return self._replicate_unary(("drop", key, "", *version))
+        return self.log.append("drop", key, "", version)
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.unary_tasks.add(task)
+        task.add_done_callback(self.unary_tasks.discard)
+        return task
+
+    def _replicate_unary(self, mutation):
+        """Send one write to all peers in parallel and return the per-peer tasks (or results)."""
+
+        request = kvstore_pb2.MutationBatch(mutations=[to_mutation(*mutation)])
+        tickets = []
+        for peer in self.peers:
+            if self._window_full(peer) and self.overflow != "block":
+                if self.overflow == "shed":
+                    self.shed[peer] += 1
                 else:
-                    logging.error(f" Final failure: Could not replicate to {peer}.")
-                    return False
+                    self.hints.add(peer, *mutation[:3], version=mutation[3:])
+                    self.spilled[peer] += 1
+                tickets.append(False)  # Not applied by the peer yet
+                continue
+            self.in_flight[peer] += 1
+            tickets.append(self._spawn(self._replicate_request(request, peer, mutation)))
+        return tickets
 
-    async def replicate_put(self, key, value):
-        """Send a PUT request to all peers in parallel."""
+    async def wait_for_replicas(self, ticket, count, timeout=3.0):
+        """Wait until count peers have applied the write behind ticket; return False on timeout."""
 
-        request = kvstore_pb2.KeyValue(key=key, value=value)
-        tasks = [self._replicate_request(stub, stub.Put, request, peer) for peer, stub in self.stubs.items()]
-        await asyncio.gather(*tasks)  #  Run replication tasks concurrently
+        if count <= 0:
+            return True
+        if self.mode == "unary":
+            acked = 0
+            try:
+                for result in asyncio.as_completed([task for task in ticket if task is not False], timeout=timeout):
+                    acked += await result  # True if the peer applied it
+                    if acked >= count:
+                        return True
+            except asyncio.TimeoutError:
+                pass
+            return False
+        deadline = asyncio.get_running_loop().time() + timeout
+        while sum(1 for shipper in self.shippers.values() if shipper.acked_seq >= ticket) < count:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self.ack_event.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def stable_hlc(self):
+        """HLC up to which every peer has applied this node's writes (log mode only, else 0)."""
+
+        if not self.shippers:
+            return 0
+        return min(shipper.acked_hlc for shipper in self.shippers.values())
+
+    def _on_ack(self):
+        self.truncate_acked()
+        self.ack_event.set()
+        self.ack_event = asyncio.Event()
+
+    def stats(self):
+        """Return replication counters, including per-peer lag."""
 
-    async def replicate_delete(self, key):
-        """Send a DELETE request to all peers in parallel."""
-        
-        request = kvstore_pb2.Key(key=key)
-        tasks = [self._replicate_request(stub, stub.Delete, request, peer) for peer, stub in self.stubs.items()]
-        await asyncio.gather(*tasks)  #  Run replication tasks concurrently
+        metrics = {"replication_last_seq": self.log.last_seq, "replication_first_seq": self.log.first_seq,
+                   "replication_unary_in_flight": len(self.unary_tasks), "replication_blocked": self.blocked}
+        for peer, breaker in self.breakers.items():
+            metrics[f"replication_breaker_{peer}"] = breaker.state  # 0 closed, 1 half-open, 2 open
+            metrics[f"replication_breaker_opens_{peer}"] = breaker.opens
+        if self.mode == "unary":
+            for peer in self.peers:
+                metrics[f"replication_in_flight_{peer}"] = self.in_flight[peer]
+                metrics[f"replication_retries_{peer}"] = self.retries[peer]
+                metrics[f"replication_shed_{peer}"] = self.shed[peer]
+                metrics[f"replication_spilled_{peer}"] = self.spilled[peer]
+        for peer, shipper in self.shippers.items():
+            metrics[f"replication_acked_seq_{peer}"] = shipper.acked_seq
+            metrics[f"replication_lag_{peer}"] = shipper.lag()
+            metrics[f"replication_batches_{peer}"] = shipper.batches_sent
+            metrics[f"replication_bytes_{peer}"] = shipper.bytes_sent
+            metrics[f"replication_bodies_skipped_{peer}"] = shipper.bodies_skipped
+            metrics[f"replication_body_bytes_skipped_{peer}"] = shipper.body_bytes_skipped
+            metrics[f"replication_bodies_missing_{peer}"] = shipper.bodies_missing
+            metrics[f"replication_in_flight_{peer}"] = shipper.in_flight
+        if self.hints is not None:
+            metrics.update(self.hints.stats())
+        return metrics
+
+    def truncate_acked(self):
+        """Drop log entries every peer has acknowledged."""
+
+        if self.shippers:
+            self.log.truncate(min(shipper.acked_seq for shipper in self.shippers.values()))
 
 # Testing Replication
 if __name__ == "__main__":
+    from hlc import HybridLogicalClock, node_hash
+
     async def main():
         peers = ["localhost:50052", "localhost:50053"]
-        replicator = ReplicationManager(peers)
+        replicator = ReplicationManager(peers, node_id="localhost:50051")
+        replicator.start()
 
+        clock = HybridLogicalClock()
+        node = node_hash("localhost:50051")
         logging.info("Replicating PUT foo -> bar")
-        await replicator.replicate_put("foo", "bar")
+        replicator.replicate_put("foo", "bar", (clock.now(), node))
 
         logging.info("Replicating DELETE foo")
-        await replicator.replicate_delete("foo")
+        replicator.replicate_delete("foo", (clock.now(), node))
+
+        await asyncio.sleep(1)  # Give the shippers time to send the batch
+        logging.info(f"Replication stats: {replicator.stats()}")
+        await replicator.stop()
 
     asyncio.run(main())  # Run async replication test
@@ -0,0 +1,380 @@
+import asyncio
+import collections
+import logging
+import struct
+import time
+
+import grpc
+import lmdb
+import kvstore_pb2
+import kvstore_pb2_grpc
+
+from retry_policy import CircuitBreaker, backoff_delay, cancel_tasks
+from dedup import value_digest
+
+
+CHANNEL_OPTIONS = [("grpc.initial_reconnect_backoff_ms", 100), ("grpc.min_reconnect_backoff_ms", 100),
+                   ("grpc.max_reconnect_backoff_ms", 1000)]  # Reconnect quickly once a peer is back
+OPS = {"put": 0, "delete": 1, "drop": 2}  # The Mutation.Op numbers; "drop" drops the namespace its key qualifies
+OP_NAMES = {code: name for name, code in OPS.items()}
+KNOWN_BODIES = 100000  # Digests of shared values a shipper remembers the peer has
+
+
+ENTRY_HEADER = struct.Struct(">BIQI")  # Op, key length, HLC, writer node
+
+
+def encode_entry(op, key, value, hlc=0, node=0):
+    """Pack an entry as op byte + key length + version + key + value."""
+    key_bytes = key.encode()
+    return ENTRY_HEADER.pack(OPS[op], len(key_bytes), hlc, node) + key_bytes + value.encode()
+
+
+def decode_entry(data):
+    """Return (op, key, value, hlc, node)."""
+    op, key_len, hlc, node = ENTRY_HEADER.unpack_from(data)
+    start = ENTRY_HEADER.size
+    key = bytes(data[start:start + key_len]).decode()
+    value = bytes(data[start + key_len:]).decode()
+    return OP_NAMES[op], key, value, hlc, node
+
+
+class ReplicationLog:
+    """
+    Log of local writes, each tagged with a monotonic sequence number.
+
+    With a path, the log and the replication cursors are persisted in a dedicated
+    LMDB environment (sub-databases "log", "cursors" and "meta") so sequence numbers,
+    unshipped entries and peer cursors survive a restart. Appends are group-committed
+    by a background flusher: it writes everything appended while the previous flush was
+    running in one transaction, which keeps the commit off the write path.
+    Recent entries are also kept in memory for the shippers.
+    """
+
+    def __init__(self, path=None, max_entries=1000000, memory_entries=10000):
+        self.max_entries = max_entries  # Oldest entries are truncated beyond this
+        self.memory_entries = memory_entries  # Recent entries kept in memory
+        self.tail = collections.deque()  # (seq, op, key, value, hlc, node, appended_at)
+        self.last_seq = 0
+        self.first_seq = 1  # Oldest sequence number still in the log
+        self.epoch = int(time.time() * 1000)  # Sequence numbers restart with every new log
+        self.cursors = {}  # Name -> (epoch, seq)
+        self.appended = asyncio.Event()
+
+        self.unflushed = []  # Entries appended since the last flush
+        self.dirty_cursors = set()
+        self.truncate_to = 0  # Persisted entries up to this seq are to be deleted
+        self.flushed_seq = 0
+        self.flush_needed = asyncio.Event()
+        self.flush_task = None
+
+        self.env = None
+        if path is not None:
+            self.env = lmdb.open(path, map_size=1 << 30, max_dbs=3)
+            self.log_db = self.env.open_db(b"log")
+            self.cursor_db = self.env.open_db(b"cursors")
+            self.meta_db = self.env.open_db(b"meta")
+            self._load()
+
+    def _load(self):
+        """Restore sequence numbers and cursors from disk."""
+        with self.env.begin(write=True) as txn:
+            epoch = txn.get(b"epoch", db=self.meta_db)
+            if epoch is None:
+                txn.put(b"epoch", struct.pack(">Q", self.epoch), db=self.meta_db)
+            else:
+                self.epoch = struct.unpack(">Q", epoch)[0]
+            first_seq = txn.get(b"first_seq", db=self.meta_db)
+            last_seq = txn.get(b"last_seq", db=self.meta_db)
+            self.first_seq = struct.unpack(">Q", first_seq)[0] if first_seq else 1
+            self.last_seq = struct.unpack(">Q", last_seq)[0] if last_seq else 0
+            with txn.cursor(db=self.cursor_db) as cursor:
+                for name, value in cursor:
+                    self.cursors[name.decode()] = struct.unpack(">QQ", value)
+        self.flushed_seq = self.last_seq
+        logging.info(f"Replication log loaded: seq {self.first_seq}..{self.last_seq}, epoch {self.epoch}, "
+                     f"{len(self.cursors)} cursors")
+
+    def start(self):
+        """Start the background flusher (needs a running event loop)."""
+        if self.env is not None and self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+            self.flush_task = None
+        await self.flush()
+        if self.env is not None:
+            self.env.close()
+            self.env = None
+
+    def append(self, op, key, value="", version=(0, 0)):
+        """Add a write made at version (hlc, node) to the log and return its sequence number."""
+        self.last_seq += 1
+        entry = (self.last_seq, op, key, value, *version, time.monotonic())
+        self.tail.append(entry)
+        if self.env is not None:
+            self.unflushed.append(entry)
+        # Keep flushed entries on disk only; unflushed ones must stay in memory
+        while len(self.tail) > self.memory_entries and (self.env is None or self.tail[0][0] <= self.flushed_seq):
+            if self.env is None:
+                self.first_seq = self.tail[0][0] + 1
+            self.tail.popleft()
+        if self.last_seq - self.first_seq + 1 > self.max_entries:
+            self.truncate(self.last_seq - self.max_entries)
+        if self.env is None:
+            self.appended.set()
+        else:
+            self.flush_needed.set()
+        return self.last_seq
+
+    def durable_seq(self):
+        """Highest sequence number that may be shipped: only persisted entries leave the node."""
+        return self.flushed_seq if self.env is not None else self.last_seq
+
+    def read_after(self, seq, limit):
+        """Return up to limit shippable entries with a sequence number greater than seq."""
+        seq = max(seq, self.first_seq - 1)
+        limit = min(limit, self.durable_seq() - seq)
+        if limit <= 0:
+            return []
+        if self.tail and seq + 1 >= self.tail[0][0]:
+            start = seq + 1 - self.tail[0][0]
+            return [self.tail[i] for i in range(start, min(start + limit, len(self.tail)))]
+        if self.env is None:
+            return []
+        entries = []
+        with self.env.begin(db=self.log_db) as txn:
+            with txn.cursor() as cursor:
+                found = cursor.set_range(struct.pack(">Q", seq + 1))
+                while found and len(entries) < limit:
+                    entry_seq = struct.unpack(">Q", cursor.key())[0]
+                    entries.append((entry_seq, *decode_entry(cursor.value()), None))
+                    found = cursor.next()
+        return entries
+
+    def truncate(self, seq):
+        """Drop entries up to and including seq (acknowledged by every peer, or over the size cap)."""
+        if seq < self.first_seq:
+            return
+        while self.tail and self.tail[0][0] <= seq:
+            self.tail.popleft()
+        self.first_seq = seq + 1
+        self.truncate_to = max(self.truncate_to, seq)
+
+    def get_cursor(self, name):
+        """Return the (epoch, seq) stored under name, or None."""
+        return self.cursors.get(name)
+
+    def set_cursor(self, name, epoch, seq):
+        """Update a replication cursor; it is persisted with the next flush."""
+        self.cursors[name] = (epoch, seq)
+        self.dirty_cursors.add(name)
+        self.flush_needed.set()
+
+    async def wait_for(self, seq):
+        """Wait until the log holds a shippable entry after seq."""
+        while self.durable_seq() <= seq:
+            self.appended.clear()
+            await self.appended.wait()
+
+    async def _flush_loop(self):
+        while True:
+            await self.flush_needed.wait()
+            self.flush_needed.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Persist new entries, dirty cursors and truncation in one LMDB transaction."""
+        if self.env is None or not (self.unflushed or self.dirty_cursors or self.truncate_to):
+            return
+        entries, self.unflushed = self.unflushed, []
+        cursors = {name: self.cursors[name] for name in self.dirty_cursors}
+        self.dirty_cursors = set()
+        truncate_to, self.truncate_to = self.truncate_to, 0
+        meta = (self.first_seq, self.last_seq)
+        await asyncio.to_thread(self._write, entries, cursors, truncate_to, meta)
+        if entries:
+            self.flushed_seq = entries[-1][0]
+            self.appended.set()
+
+    def _write(self, entries, cursors, truncate_to, meta):
+        with self.env.begin(write=True) as txn:
+            for seq, op, key, value, hlc, node, _ in entries:
+                if seq > truncate_to:
+                    txn.put(struct.pack(">Q", seq), encode_entry(op, key, value, hlc, node), db=self.log_db, append=True)
+            for name, (epoch, seq) in cursors.items():
+                txn.put(name.encode(), struct.pack(">QQ", epoch, seq), db=self.cursor_db)
+            if truncate_to:
+                with txn.cursor(db=self.log_db) as cursor:
+                    while cursor.first() and struct.unpack(">Q", cursor.key())[0] <= truncate_to:
+                        cursor.delete()
+            txn.put(b"first_seq", struct.pack(">Q", meta[0]), db=self.meta_db)
+            txn.put(b"last_seq", struct.pack(">Q", meta[1]), db=self.meta_db)
+
+
+def build_batch(origin, epoch, entries, stable_hlc=0):
+    """Build a ReplicationBatch from log entries."""
+    return kvstore_pb2.ReplicationBatch(origin=origin, epoch=epoch, stable_hlc=stable_hlc, entries=[
+        kvstore_pb2.ReplicationEntry(
+            seq=seq,
+            op=OPS[op], key=key, value=value, hlc=hlc, node=node)
+        for seq, op, key, value, hlc, node, _ in entries])
+
+
+class PeerShipper:
+    """
+    Ships the replication log to one peer in ordered batches through ReplicateBatch.
+
+    If the peer shares large values (its acks carry its dedup threshold), a value
+    the peer applied from an earlier batch, or that an earlier entry of the same
+    batch carries, is sent as its digest only. The peer answers with the digests
+    it no longer has, which are then sent in full.
+    """
+
+    def __init__(self, node_id, peer, log, batch_size=256, timeout=3, on_ack=None, stable_hlc=None,
+                 horizon_interval=1.0, breaker=None, compression=grpc.Compression.NoCompression):
+        self.node_id = node_id  # Origin reported to the peer
+        self.peer = peer
+        self.log = log
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.on_ack = on_ack  # Called after every acknowledged batch
+        self.stable_hlc = stable_hlc or (lambda: 0)  # fn() -> HLC every peer has applied, sent with batches
+        self.acked_hlc = 0  # HLC of the entry at acked_seq (0 until the first ack since startup)
+        self.horizon_interval = horizon_interval  # Seconds idle before an empty batch carries a new stable_hlc
+        self.sent_stable_hlc = 0
+        cursor = log.get_cursor(f"peer:{peer}")
+        self.acked_seq = cursor[1] if cursor and cursor[0] == log.epoch else 0  # Highest seq the peer applied
+        self.acked_at = time.monotonic()
+        self.batches_sent = 0
+        self.entries_sent = 0
+        self.in_flight = 0  # Entries in the batch being sent
+        self.breaker = breaker or CircuitBreaker(peer)
+        self.compression = compression  # Of the batches sent
+        self.bytes_sent = 0
+        self.peer_dedup_threshold = 0  # From the peer's last ack
+        self.known_bodies = collections.OrderedDict()  # Digests of values the peer stores, oldest first
+        self.bodies_skipped = 0  # Values sent as their digest
+        self.body_bytes_skipped = 0
+        self.bodies_missing = 0  # Digests the peer did not have, resent in full
+        self.shipped_bodies = []  # (seq, digest) of the large values in the last batch built
+        self.channel = None
+        self.stub = None
+        self.task = None
+
+    def get_stub(self):
+        """Return the stub on a persistent channel to the peer."""
+        if self.stub is None:
+            self.channel = grpc.aio.insecure_channel(self.peer, options=CHANNEL_OPTIONS)
+            self.stub = kvstore_pb2_grpc.KeyValueStoreStub(self.channel)
+        return self.stub
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        await cancel_tasks(self.task)
+        self.task = None
+        if self.channel is not None:
+            await self.channel.close()
+
+    def _build_batch(self, entries):
+        self.sent_stable_hlc = self.stable_hlc()
+        batch = build_batch(self.node_id, self.log.epoch, entries, self.sent_stable_hlc)
+        self.shipped_bodies = []
+        if self.peer_dedup_threshold:
+            in_batch = set()
+            for entry in batch.entries:
+                value = entry.value.encode()
+                if entry.op == kvstore_pb2.Mutation.PUT and len(value) >= self.peer_dedup_threshold:
+                    digest = value_digest(value)
+                    self.shipped_bodies.append((entry.seq, digest))
+                    if digest not in self.known_bodies and digest not in in_batch:
+                        in_batch.add(digest)
+                    else:
+                        entry.value_hash = digest
+                        entry.value = ""
+                        self.bodies_skipped += 1
+                        self.body_bytes_skipped += len(value)
+        self.bytes_sent += batch.ByteSize()
+        return batch
+
+    def _learn_bodies(self, ack):
+        """Update the digests the peer is known to store from its ack of the last batch."""
+        self.peer_dedup_threshold = ack.dedup_threshold
+        for seq, digest in self.shipped_bodies:
+            if seq <= ack.applied_seq:
+                self.known_bodies[digest] = True
+                self.known_bodies.move_to_end(digest)
+        for digest in ack.missing_bodies:
+            self.known_bodies.pop(digest, None)
+            self.bodies_missing += 1
+        while len(self.known_bodies) > KNOWN_BODIES:
+            self.known_bodies.popitem(last=False)
+
+    async def _run(self):
+        failures = 0
+        while True:
+            try:
+                await asyncio.wait_for(self.log.wait_for(self.acked_seq), self.horizon_interval)
+            except asyncio.TimeoutError:
+                if self.stable_hlc() > self.sent_stable_hlc:  # Idle: still let the peer collect tombstones
+                    try:
+                        await self.get_stub().ReplicateBatch(self._build_batch([]), timeout=self.timeout,
+                                                             compression=self.compression)
+                    except (grpc.aio.AioRpcError, asyncio.TimeoutError):
+                        pass
+                continue
+            if self.acked_seq + 1 < self.log.first_seq:
+                # The peer will see the gap and fall back to a snapshot
+                logging.warning(f"Replication log truncated past {self.peer}'s cursor ({self.acked_seq})")
+            entries = self.log.read_after(self.acked_seq, self.batch_size)
+            if not entries:
+                continue
+            if not self.breaker.allow():
+                await asyncio.sleep(self.breaker.retry_after())
+                continue
+            self.in_flight = len(entries)
+            try:
+                ack = await self.get_stub().ReplicateBatch(self._build_batch(entries), timeout=self.timeout,
+                                                           compression=self.compression)
+                self.breaker.record_success()
+                self._learn_bodies(ack)
+                progressed = ack.applied_seq > self.acked_seq
+                for entry in entries:
+                    if entry[0] == ack.applied_seq:
+                        self.acked_hlc = entry[4]
+                self._ack(ack.applied_seq)
+                self.batches_sent += 1
+                self.entries_sent += len(entries)
+                if progressed or ack.missing_bodies:  # Missing bodies: resend the batch in full right away
+                    failures = 0
+                else:
+                    failures += 1
+                    await asyncio.sleep(backoff_delay(failures, cap=10))  # Peer is catching up another way; do not spin
+            except (grpc.aio.AioRpcError, asyncio.TimeoutError) as e:
+                logging.warning(f"Replication batch to {self.peer} failed: {e.code() if hasattr(e, 'code') else e}")
+                self.breaker.record_failure()
+                failures += 1
+                await asyncio.sleep(backoff_delay(failures, cap=10))
+            finally:
+                self.in_flight = 0
+
+    def _ack(self, seq):
+        """Record the peer's applied position and persist it."""
+        if seq > self.acked_seq:
+            self.acked_seq = seq
+            self.acked_at = time.monotonic()
+            self.log.set_cursor(f"peer:{self.peer}", self.log.epoch, seq)
+            if self.on_ack is not None:
+                self.on_ack()
+
+    def lag(self):
+        """Entries the peer has not acknowledged yet."""
+        return self.log.last_seq - self.acked_seq
@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import random
+import time
+
+
+CLOSED, HALF_OPEN, OPEN = 0, 1, 2  # Circuit breaker states, as reported in Stats
+
+
+def backoff_delay(attempt, base=0.05, cap=5.0):
+    """Seconds to wait before retry number attempt (from 1): exponential with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+async def cancel_tasks(*tasks):
+    """
+    Cancel background tasks and wait until they end.
+
+    gRPC reports a call cancelled this way as an AioRpcError with status CANCELLED,
+    which the retry loops catch like any failed call, so a task that carried on
+    is cancelled again.
+    """
+    pending = [task for task in tasks if task is not None]
+    while pending:
+        for task in pending:
+            task.cancel()
+        await asyncio.wait(pending, timeout=0.1)
+        pending = [task for task in pending if not task.done()]
+
+
+class CircuitBreaker:
+    """
+    Per-peer circuit breaker.
+
+    Opens after failure_threshold consecutive failures; while open, callers skip
+    the peer. After reset_timeout seconds one probe is let through (half-open): a
+    success closes the breaker, a failure opens it again for twice as long, up to
+    max_reset_timeout.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=0.5, max_reset_timeout=10.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self.failures = 0  # Consecutive failures
+        self.opened_at = 0.0
+        self.opens = 0
+
+    def allow(self):
+        """True if a request may be sent now; moves an open breaker to half-open once its timeout passed."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            return True  # The probe
+        return self.state == CLOSED
+
+    def retry_after(self):
+        """Seconds until an open breaker lets a probe through (0 if it is not open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        if self.state != CLOSED:
+            logging.info(f"Circuit to {self.name} closed")
+        self.state = CLOSED
+        self.failures = 0
+        self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)  # Probe failed
+        elif self.state == OPEN or self.failures < self.failure_threshold:
+            return
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.opens += 1
+        logging.warning(f"Circuit to {self.name} opened for {self.reset_timeout:.2f}s after {self.failures} failures")
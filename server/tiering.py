@@ -0,0 +1,277 @@
+import hashlib
+import heapq
+import logging
+import os
+import struct
+import zlib
+from bisect import bisect_right
+
+
+ENTRY = struct.Struct(">HI")  # Key length, record length
+INDEX_ENTRY = struct.Struct(">QIH")  # Block offset, compressed length, length of the block's first key
+FOOTER = struct.Struct(">QQIII")  # Index offset, bloom filter offset, key count, bloom hashes, magic
+MAGIC = 0x434F4C44
+SEGMENT_SUFFIX = ".cold"
+HALVE = bytes(i >> 1 for i in range(256))  # bytes.translate table that halves every counter
+
+
+def key_hashes(key):
+    """Two independent 32-bit hashes of key, combined as h1 + i * h2 for the i-th slot."""
+    h = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+    return h & 0xFFFFFFFF, (h >> 32) | 1
+
+
+class AccessSketch:
+    """
+    Count-min sketch of key accesses: depth rows of width 8-bit counters, so its
+    size does not grow with the number of keys. estimate() can overcount (keys
+    sharing counters), never undercount. age() halves every counter, so counts
+    fade unless the key keeps being accessed.
+    """
+
+    def __init__(self, width=1 << 18, depth=4):
+        self.width = width
+        self.depth = depth
+        self.counters = bytearray(width * depth)
+        self.ages = 0
+
+    def _slots(self, key):
+        h1, h2 = key_hashes(key)
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def record(self, key):
+        slots = self._slots(key)
+        low = min(self.counters[slot] for slot in slots)
+        if low < 255:
+            for slot in slots:
+                if self.counters[slot] == low:  # Conservative update: only the counters at the minimum
+                    self.counters[slot] = low + 1
+
+    def estimate(self, key):
+        return min(self.counters[slot] for slot in self._slots(key))
+
+    def age(self):
+        self.counters = self.counters.translate(HALVE)
+        self.ages += 1
+
+
+class ColdSegment:
+    """
+    An immutable file of sorted (key, record) entries in zlib-compressed blocks.
+
+    The first key of every block (the sparse index) and a bloom filter of the
+    keys are kept in memory, so get() reads at most one block from disk, and
+    none for most keys the segment does not hold.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.id = int(os.path.basename(path)[:-len(SEGMENT_SUFFIX)])
+        self.fd = os.open(path, os.O_RDONLY)
+        self.size = os.fstat(self.fd).st_size
+        index_offset, bloom_offset, self.key_count, self.bloom_hashes, magic = FOOTER.unpack(
+            os.pread(self.fd, FOOTER.size, self.size - FOOTER.size))
+        if magic != MAGIC:
+            os.close(self.fd)
+            raise ValueError(f"{path} is not a cold segment")
+        index = os.pread(self.fd, bloom_offset - index_offset, index_offset)
+        self.bloom = os.pread(self.fd, self.size - FOOTER.size - bloom_offset, bloom_offset)
+        self.first_keys, self.blocks = [], []  # Blocks: (offset, compressed length)
+        position = 0
+        while position < len(index):
+            offset, length, key_len = INDEX_ENTRY.unpack_from(index, position)
+            position += INDEX_ENTRY.size
+            self.first_keys.append(index[position:position + key_len])
+            self.blocks.append((offset, length))
+            position += key_len
+        self.index_bytes = len(index) + len(self.bloom)
+
+    def may_contain(self, key):
+        bits = len(self.bloom) * 8
+        h1, h2 = key_hashes(key)
+        for i in range(self.bloom_hashes):
+            bit = (h1 + i * h2) % bits
+            if not self.bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def _block(self, index):
+        offset, length = self.blocks[index]
+        return zlib.decompress(os.pread(self.fd, length, offset))
+
+    def get(self, key):
+        """Return the record of key, or None; reads one block."""
+        index = bisect_right(self.first_keys, key) - 1
+        if index < 0:
+            return None
+        for entry_key, record in iter_block(self._block(index)):
+            if entry_key >= key:
+                return record if entry_key == key else None
+        return None
+
+    def items(self, start=None):
+        """Yield the (key, record) entries in key order, from the first key at or after start."""
+        first = max(bisect_right(self.first_keys, start) - 1, 0) if start is not None else 0
+        for index in range(first, len(self.blocks)):
+            for key, record in iter_block(self._block(index)):
+                if start is None or key >= start:
+                    yield key, record
+
+    def close(self):
+        os.close(self.fd)
+
+
+def iter_block(block):
+    position = 0
+    while position < len(block):
+        key_len, record_len = ENTRY.unpack_from(block, position)
+        position += ENTRY.size
+        yield block[position:position + key_len], block[position + key_len:position + key_len + record_len]
+        position += key_len + record_len
+
+
+def write_segment(path, items, expected_keys, block_size=16 * 1024, bits_per_key=10, level=6):
+    """Write sorted (key, record) items to a new segment file at path; return the number written."""
+    bits = max(64, expected_keys * bits_per_key)
+    hashes = max(1, round(bits_per_key * 0.69))  # Optimal for the bits per key: about 1% false positives
+    bloom = bytearray((bits + 7) // 8)
+    bits = len(bloom) * 8
+    index = bytearray()
+    block, first_key, count, offset = bytearray(), None, 0, 0
+    with open(path + ".tmp", "wb") as f:
+        def flush():
+            nonlocal block, offset
+            data = zlib.compress(bytes(block), level)
+            f.write(data)
+            index.extend(INDEX_ENTRY.pack(offset, len(data), len(first_key)) + first_key)
+            offset += len(data)
+            block = bytearray()
+
+        for key, record in items:
+            if first_key is None or len(block) >= block_size:
+                if block:
+                    flush()
+                first_key = bytes(key)
+            block.extend(ENTRY.pack(len(key), len(record)))
+            block.extend(key)
+            block.extend(record)
+            h1, h2 = key_hashes(key)
+            for i in range(hashes):
+                bit = (h1 + i * h2) % bits
+                bloom[bit >> 3] |= 1 << (bit & 7)
+            count += 1
+        if block:
+            flush()
+        f.write(index)
+        f.write(bloom)
+        f.write(FOOTER.pack(offset, offset + len(index), count, hashes, MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+    return count
+
+
+def merge_sorted(sources):
+    """Merge sorted (key, record) iterators; for a key in several, keep the one from the earliest source."""
+    def ranked(rank, source):
+        for key, record in source:
+            yield key, rank, record
+
+    merged = heapq.merge(*(ranked(rank, source) for rank, source in enumerate(sources)))
+    last = None
+    for key, _, record in merged:
+        if key != last:
+            last = key
+            yield key, record
+
+
+class ColdTier:
+    """
+    Records moved out of LMDB, in ColdSegment files in directory.
+
+    write() adds a segment; a key in a newer segment supersedes older copies,
+    and the caller keeps LMDB ahead of all of them. Once there are more than
+    max_segments, compact() merges them into one and drops the keys the caller
+    says are stored elsewhere now.
+    """
+
+    def __init__(self, directory, block_size=16 * 1024, max_segments=4):
+        self.directory = directory
+        self.block_size = block_size
+        self.max_segments = max_segments
+        self.segments = []  # Newest first
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(".tmp"):
+                    os.remove(os.path.join(directory, name))  # Left by a crash during a write
+            self.segments = sorted((ColdSegment(os.path.join(directory, name)) for name in os.listdir(directory)
+                                    if name.endswith(SEGMENT_SUFFIX)), key=lambda s: s.id, reverse=True)
+        self.gets = 0
+        self.hits = 0
+        self.hit_reads = 0  # Blocks read by gets that found their key
+        self.wasted_reads = 0  # Blocks read because of a bloom filter false positive
+        self.compactions = 0
+
+    def get(self, key):
+        """Return the newest cold record of key (bytes), or None."""
+        self.gets += 1
+        reads = 0
+        for segment in self.segments:
+            if segment.may_contain(key):
+                reads += 1
+                record = segment.get(key)
+                if record is not None:
+                    self.hits += 1
+                    self.hit_reads += reads
+                    return record
+        self.wasted_reads += reads
+        return None
+
+    def items(self, start=None):
+        """Yield the newest (key, record) of every cold key in key order, from start on."""
+        return merge_sorted([segment.items(start) for segment in self.segments])
+
+    def write(self, items, expected_keys):
+        """Add a segment with the sorted (key, record) items; synced before it returns."""
+        os.makedirs(self.directory, exist_ok=True)
+        segment_id = self.segments[0].id + 1 if self.segments else 1
+        path = os.path.join(self.directory, f"{segment_id:010d}{SEGMENT_SUFFIX}")
+        if write_segment(path, items, expected_keys, self.block_size):
+            self.segments.insert(0, ColdSegment(path))
+        else:
+            os.remove(path)
+
+    def compact(self, shadowed):
+        """Merge every segment into one, leaving out the keys for which shadowed(key) is true."""
+        old = list(self.segments)
+        self.write(((key, record) for key, record in self.items() if not shadowed(key)),
+                   sum(segment.key_count for segment in old))
+        for segment in old:
+            segment.close()
+            os.remove(segment.path)
+        self.segments = self.segments[:len(self.segments) - len(old)]
+        self.compactions += 1
+        logging.info(f"Compacted {len(old)} cold segments in {self.directory}")
+
+    def clear(self):
+        for segment in self.segments:
+            segment.close()
+            os.remove(segment.path)
+        self.segments = []
+
+    def stats(self):
+        return {
+            "tiering_segments": len(self.segments),
+            "tiering_cold_keys": sum(segment.key_count for segment in self.segments),
+            "tiering_cold_bytes": sum(segment.size for segment in self.segments),
+            "tiering_index_bytes": sum(segment.index_bytes for segment in self.segments),
+            "tiering_cold_gets": self.gets,
+            "tiering_cold_hits": self.hits,
+            "tiering_block_reads_per_hit": self.hit_reads / self.hits if self.hits else 0.0,
+            "tiering_wasted_block_reads": self.wasted_reads,
+            "tiering_compactions": self.compactions,
+        }
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
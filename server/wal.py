@@ -0,0 +1,81 @@
+import logging
+import os
+import struct
+import time
+import zlib
+
+
+WAL_HEADER = struct.Struct(">III")  # CRC32 of key + record, key length, record length
+SYNC_POLICIES = ("always", "group", "interval", "never")
+
+
+class WriteAheadLog:
+    """
+    Append-only log of writes not yet applied to LMDB.
+
+    Entries are (key, encoded record) with a checksum, so a torn tail left by a
+    crash is detected and dropped on replay. append() only buffers; write() hands
+    the buffer to the OS and sync() also fsyncs it. Once the entries are applied
+    to LMDB and LMDB is synced, reset() empties the log.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "ab")
+        self.synced = True
+        self.pending = 0  # Entries since the last reset
+        self.appends = 0
+        self.syncs = 0
+        self.sync_ms = 0.0  # Time spent in fsync
+        self.last_sync = time.monotonic()
+
+    def replay(self):
+        """Return the (key, record) entries in the log, dropping a torn or corrupt tail."""
+        with open(self.path, "rb") as f:
+            data = f.read()
+        entries = []
+        offset = 0
+        while offset + WAL_HEADER.size <= len(data):
+            crc, key_len, record_len = WAL_HEADER.unpack_from(data, offset)
+            start = offset + WAL_HEADER.size
+            end = start + key_len + record_len
+            if end > len(data) or zlib.crc32(data[start:end]) != crc:
+                break
+            entries.append((data[start:start + key_len].decode(), data[start + key_len:end]))
+            offset = end
+        if offset < len(data):
+            logging.warning(f"Dropping {len(data) - offset} bytes of torn WAL tail in {self.path}")
+            self.file.truncate(offset)
+        return entries
+
+    def append(self, key, record):
+        key_bytes = key.encode()
+        self.file.write(WAL_HEADER.pack(zlib.crc32(key_bytes + record), len(key_bytes), len(record)) + key_bytes + record)
+        self.synced = False
+        self.pending += 1
+        self.appends += 1
+
+    def write(self):
+        """Hand buffered entries to the OS: they survive a process crash but not a power loss."""
+        self.file.flush()
+
+    def sync(self):
+        self.file.flush()
+        if not self.synced:
+            start = time.perf_counter()
+            os.fsync(self.file.fileno())
+            self.sync_ms += (time.perf_counter() - start) * 1000
+            self.syncs += 1
+            self.synced = True
+        self.last_sync = time.monotonic()
+
+    def reset(self):
+        self.file.truncate(0)
+        self.synced = True
+        self.pending = 0
+
+    def close(self):
+        self.file.close()
@@ -79,3 +79,287 @@ async def test_eventual_consistency():
 
     assert value == "final_value", f"Expected 'final_value', got '{value}'"
 
+
+@pytest.mark.asyncio
+async def test_batched_writes_preserve_order():
+    """Test if batched PUTs/DELETEs return per-caller old values in submission order."""
+    client = KeyValueClient(["localhost:50051"], batch_writes=True, linger_ms=20)
+    await client.initialize()
+
+    await client.delete("batched_key")
+    results = await asyncio.gather(
+        client.put("batched_key", "first"),
+        client.put("batched_key", "second"),
+        client.delete("batched_key"),
+        client.put("batched_key", "third"),
+    )
+    value = await client.get("batched_key")
+    stats = client.get_batching_stats()
+    await client.kv_shutdown()
+
+    assert results == ["", "first", None, ""], f"Unexpected old values: {results}"
+    assert value == "third", f"Expected 'third', got '{value}'"
+    assert stats["avg_batch_size"] > 1, f"Writes were not batched: {stats}"
+
+@pytest.mark.asyncio
+async def test_near_cache_invalidation():
+    """Test if a near-cached value is invalidated when another client overwrites it."""
+    cached_client = KeyValueClient(["localhost:50051"], near_cache=True)
+    writer = KeyValueClient(["localhost:50051"])
+    await cached_client.initialize()
+    await writer.initialize()
+
+    for _ in range(50):  # Wait for the invalidation stream to go live
+        if cached_client.get_near_cache_stats()["stream_live"]:
+            break
+        await asyncio.sleep(0.1)
+
+    await writer.put("near_cache_key", "old_value")
+    await asyncio.sleep(0.5)  # Let the invalidation for this write arrive before caching
+    assert await cached_client.get("near_cache_key") == "old_value"
+    assert await cached_client.get("near_cache_key") == "old_value"  # Served from the near-cache
+    await writer.put("near_cache_key", "new_value")
+    await asyncio.sleep(0.5)  # Allow the invalidation to arrive
+    value = await cached_client.get("near_cache_key")
+    stats = cached_client.get_near_cache_stats()
+
+    await cached_client.kv_shutdown()
+    await writer.kv_shutdown()
+
+    assert value == "new_value", f"Expected 'new_value', got '{value}'"
+    assert stats["hits"] >= 1, f"Near-cache was never hit: {stats}"
+
+
+@pytest.mark.asyncio
+async def test_write_all_visible_on_every_replica():
+    """Test that a write at consistency ALL can be read right away from every replica."""
+    writer = KeyValueClient(["localhost:50051"])
+    await writer.initialize()
+    await writer.put("consistency_all", "everywhere", consistency="ALL")
+
+    for server in ["localhost:50052", "localhost:50053"]:
+        reader = KeyValueClient([server])
+        await reader.kv_init([server])
+        value = await reader.get("consistency_all")
+        assert value == "everywhere", f"{server} returned '{value}' after a write at ALL"
+        await reader.kv_shutdown()
+
+    await writer.delete("consistency_all", consistency="QUORUM")
+    assert await writer.get("consistency_all", consistency="QUORUM") == "", "QUORUM read returned a deleted key"
+    await writer.kv_shutdown()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_converge():
+    """Test that conflicting writes made on different nodes at once leave every replica with the same value."""
+    servers = ["localhost:50051", "localhost:50052", "localhost:50053"]
+    clients = [KeyValueClient([server]) for server in servers]
+    for client, server in zip(clients, servers):
+        await client.kv_init([server])
+
+    for round_number in range(5):
+        await asyncio.gather(*[client.put("conflict_key", f"{server}_{round_number}")
+                               for client, server in zip(clients, servers)])
+    await clients[0].delete("conflict_deleted")
+    await asyncio.gather(*[client.put("conflict_deleted", "written") for client in clients[1:]])
+    await clients[0].delete("conflict_deleted")  # Newer than both PUTs
+
+    for _ in range(50):
+        values = [await client.get("conflict_key") for client in clients]
+        deleted = [await client.get("conflict_deleted") for client in clients]
+        if len(set(values)) == 1 and deleted == ["", "", ""]:
+            break
+        await asyncio.sleep(0.1)
+    for client in clients:
+        await client.kv_shutdown()
+
+    assert len(set(values)) == 1, f"Replicas diverged: {values}"
+    assert values[0].endswith("_4"), f"An older write won: {values[0]}"
+    assert deleted == ["", "", ""], f"A deleted key came back: {deleted}"
+
+
+@pytest.mark.asyncio
+async def test_quorum_read_repairs_stale_replicas():
+    """Test that a QUORUM read pushes the newest version to the replicas that returned an older one."""
+    import grpc
+    import kvstore_pb2
+    import kvstore_pb2_grpc
+    from replication import REPLICATED_METADATA
+
+    async with grpc.aio.insecure_channel("localhost:50052") as channel:
+        # Marked as already replicated, so only 50052 stores it
+        await kvstore_pb2_grpc.KeyValueStoreStub(channel).Put(
+            kvstore_pb2.KeyValue(key="read_repair_key", value="fresh"), metadata=(REPLICATED_METADATA,))
+
+    coordinator = KeyValueClient(["localhost:50051"])
+    await coordinator.initialize()
+    before = await coordinator.stats()
+    await coordinator.get("read_repair_key", consistency="QUORUM")
+
+    servers = ["localhost:50051", "localhost:50052", "localhost:50053"]
+    readers = [KeyValueClient([server]) for server in servers]
+    for reader, server in zip(readers, servers):
+        await reader.kv_init([server])
+    for _ in range(20):
+        values = [await reader.get("read_repair_key") for reader in readers]
+        if values == ["fresh"] * 3:
+            break
+        await asyncio.sleep(0.1)
+    stats = await coordinator.stats()
+    for reader in readers:
+        await reader.kv_shutdown()
+    await coordinator.kv_shutdown()
+
+    assert values == ["fresh"] * 3, f"Stale replicas were not repaired: {values}"
+    assert stats["read_repairs"] - before["read_repairs"] >= 2, f"Expected 2 read repairs: {stats}"
+    assert stats["read_repair_rate"] > 0
+
+
+@pytest.mark.asyncio
+async def test_watch_delivers_ordered_resumable_events():
+    """Test that Watch streams writes under a prefix in order, resumes from a sequence and coalesces a backlog."""
+    import kvstore_pb2
+
+    client = KeyValueClient(["localhost:50051"])
+    await client.initialize()
+    received = []
+
+    async def consume(limit, **options):
+        async for event in client.watch("watch_", **options):
+            received.append(event)
+            if len(received) >= limit:
+                return
+
+    watcher = asyncio.create_task(consume(5))
+    await asyncio.sleep(0.2)  # Let the stream go live
+    await client.put("watch_a", "1")
+    await client.put("other_key", "ignored")
+    await client.put("watch_b", "2")
+    await client.delete("watch_a")
+    await client.put("watch_a", "3")
+    await client.put("watch_c", "4")
+    await asyncio.wait_for(watcher, 5)
+    assert [event[1:] for event in received] == [("put", "watch_a", "1"), ("put", "watch_b", "2"),
+                                                  ("delete", "watch_a", ""), ("put", "watch_a", "3"),
+                                                  ("put", "watch_c", "4")], f"Unexpected events: {received}"
+    sequences = [event[0] for event in received]
+    assert sequences == sorted(sequences), "Events were delivered out of order"
+
+    resume_from, expected = received[2][0], received[2:]  # Resume as a reconnecting watcher would
+    received.clear()
+    await asyncio.wait_for(consume(3, from_sequence=resume_from), 5)
+    assert received == expected, f"Resumed watch returned {received}, expected {expected}"
+
+    # A backlog larger than a subscriber's buffer is coalesced to the newest write per key
+    received.clear()
+    watcher = asyncio.create_task(consume(10))
+    await asyncio.sleep(0.2)
+    mutations = [kvstore_pb2.Mutation(op=kvstore_pb2.Mutation.PUT, key=f"watch_hot_{i % 10}", value=str(i))
+                 for i in range(500)]
+    await client.stub.BatchWrite(kvstore_pb2.MutationBatch(mutations=mutations))
+    await asyncio.wait_for(watcher, 5)
+    stats = await client.stats()
+    await client.kv_shutdown()
+    assert sorted(event[2:] for event in received) == sorted((f"watch_hot_{i}", str(490 + i)) for i in range(10)), \
+        f"Coalesced events do not carry the newest values: {received}"
+    assert stats["watch_coalesced"] >= 490, f"Only {stats['watch_coalesced']:.0f} events were coalesced"
+
+
+@pytest.mark.asyncio
+async def test_watches_are_scoped_to_a_namespace():
+    """Test that Watch and WatchInvalidations deliver only a namespace's keys, without the namespace."""
+    import kvstore_pb2
+
+    client = KeyValueClient(["localhost:50051"])
+    await client.initialize()
+    received = {"": [], "wns": []}
+
+    async def consume(namespace):
+        async for event in client.watch("scoped_", namespace=namespace):
+            received[namespace].append(event[1:])
+            if len(received[namespace]) >= 2:
+                return
+
+    async def invalidated(namespace):
+        keys = []
+        async for message in client.stub.WatchInvalidations(kvstore_pb2.Namespace(namespace=namespace)):
+            keys.extend(message.keys)
+            if len(keys) >= 2:
+                return keys
+
+    watchers = [asyncio.create_task(consume(ns)) for ns in received]
+    invalidations = [asyncio.create_task(invalidated(ns)) for ns in received]
+    await asyncio.sleep(0.2)  # Let the streams go live
+    await client.put("scoped_a", "tenant", namespace="wns")
+    await client.put("scoped_a", "default")
+    await client.delete("scoped_a", namespace="wns")
+    await client.delete("scoped_a")
+    await asyncio.wait_for(asyncio.gather(*watchers), 5)
+    keys = await asyncio.wait_for(asyncio.gather(*invalidations), 5)
+    await client.kv_shutdown()
+    assert received == {"": [("put", "scoped_a", "default"), ("delete", "scoped_a", "")],
+                        "wns": [("put", "scoped_a", "tenant"), ("delete", "scoped_a", "")]}, f"Watched {received}"
+    assert keys == [["scoped_a", "scoped_a"]] * 2, f"Invalidated {keys}"
+
+
+@pytest.mark.asyncio
+async def test_bytes_api_round_trip():
+    """Test that PutBytes/GetBytes round-trip values, interoperate with Put/Get and reject non-UTF-8 data."""
+    import grpc
+
+    client = KeyValueClient(["localhost:50051"])
+    assert await client.put_bytes(b"bytes_key", b"v") == -1 and await client.get_bytes(b"bytes_key") == -1, \
+        "An uninitialized client should refuse bytes calls like the others"
+    await client.initialize()
+    value = "bytes é中".encode()
+    await client.put_bytes(b"bytes_key", b"first")
+    old_value = await client.put_bytes(b"bytes_key", value)
+    assert old_value == b"first", f"Expected b'first', got {old_value!r}"
+    assert await client.get_bytes(b"bytes_key") == value
+    assert await client.get("bytes_key") == value.decode(), "Get does not see the PutBytes value"
+
+    await client.put("bytes_str_key", "from Put")
+    assert await client.get_bytes(b"bytes_str_key") == b"from Put", "GetBytes does not see the Put value"
+    await client.delete("bytes_str_key")
+    assert await client.get_bytes(b"bytes_str_key") == b"", "GetBytes returned a deleted value"
+
+    with pytest.raises(grpc.RpcError) as error:
+        await client.put_bytes(b"bytes_bad", b"\xff\xfe")
+    assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+    for consistency in [None, "QUORUM"]:
+        with pytest.raises(grpc.RpcError) as error:
+            await client.get_bytes(b"\xff\xfe", consistency=consistency)
+        assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT, f"Non-UTF-8 key read at {consistency}"
+    await client.kv_shutdown()
+
+
+@pytest.mark.asyncio
+async def test_blob_stream_round_trip():
+    """Test that streamed blobs round-trip, are replaced atomically and survive an interrupted upload."""
+    client = KeyValueClient(["localhost:50051"])
+    await client.initialize()
+    blob = os.urandom(3 * 1024 * 1024 + 123)  # Not UTF-8, larger than a default gRPC message
+    assert await client.put_stream("blob_key", blob) == len(blob)
+    assert await client.get_blob("blob_key") == blob, "Streamed blob came back different"
+
+    async def interrupted():
+        yield b"partial" * 1000
+        raise RuntimeError("Upload interrupted")
+
+    with pytest.raises(Exception):
+        await client.put_stream("blob_key", interrupted())
+    assert await client.get_blob("blob_key") == blob, "An interrupted upload changed the blob"
+
+    small = b"small blob"
+    await client.put_stream("blob_key", [small[:5], small[5:]])
+    assert await client.get_blob("blob_key") == small
+    assert "blob_key" not in await client.list_keys(), "Blobs must not show up among the regular keys"
+    assert await client.delete_blob("blob_key")
+    assert await client.get_blob("blob_key") is None
+    await client.kv_shutdown()
+
+    failover_client = KeyValueClient(["localhost:50051", "localhost:50052"], failover=True)
+    await failover_client.initialize()
+    with pytest.raises(RuntimeError):  # Blobs are node-local, so a failover would lose them
+        await failover_client.put_stream("blob_key", small)
+    await failover_client.kv_shutdown()
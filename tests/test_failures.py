@@ -4,6 +4,9 @@ import subprocess
 import time
 import sys
 import os
+import json
+import signal
+import grpc
 
 # Ensure the server module is accessible
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../server")))
@@ -193,3 +196,1014 @@ async def test_concurrent_writes():
     assert "value_4" in observed_values, f"Final expected value 'value_4' not seen. Observed: {observed_values}"
 
 
+
+
+@pytest.mark.asyncio
+async def test_snapshot_catch_up_after_log_truncation():
+    """Test that a replica falls back to a snapshot when the origin truncated the entries it missed."""
+    origin, replica = 50067, 50068
+    subprocess.run("rm -rf /tmp/kv_rlog_50067 /tmp/kv_rlog_50068", shell=True)
+
+    def start(port, peer):
+        return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                 f"--replication-log=/tmp/kv_rlog_{port}", "--replication-log-max=100"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    origin_server = start(origin, replica)
+    replica_server = None
+    try:
+        writer = KeyValueClient([f"localhost:{origin}"])
+        for _ in range(100):
+            if await writer.kv_init([f"localhost:{origin}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        for i in range(500):  # Replica is down, so the capped log drops the oldest entries
+            await writer.put(f"snapshot_{i}", f"value_{i}")
+        await asyncio.sleep(0.1)
+        stats = await writer.stats()
+        assert stats["replication_first_seq"] > 1, "Log was not truncated"
+
+        replica_server = start(replica, origin)
+        reader = KeyValueClient([f"localhost:{replica}"])
+        for _ in range(100):
+            if await reader.kv_init([f"localhost:{replica}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        replica_stats = {}
+        for _ in range(100):
+            replica_stats = await reader.stats()
+            if replica_stats.get(f"replication_cursor_localhost:{origin}", 0) >= stats["replication_last_seq"]:
+                break
+            await asyncio.sleep(0.1)
+        assert replica_stats.get("replication_snapshots_applied", 0) >= 1, "Replica did not use a snapshot"
+        assert replica_stats.get(f"replication_cursor_localhost:{origin}", 0) >= stats["replication_last_seq"]
+        await reader.kv_shutdown()
+        await writer.kv_shutdown()
+    finally:
+        for server in [origin_server, replica_server]:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+
+@pytest.mark.asyncio
+async def test_anti_entropy_repairs_missed_writes():
+    """Test that anti-entropy repairs writes a replica missed while it was down."""
+    node_a, node_b = 50073, 50074
+    subprocess.run("rm -rf /tmp/kv_ae_50073 /tmp/kv_ae_50074 /tmp/kv_rlog_50073 /tmp/kv_rlog_50074", shell=True)
+
+    def start(port, peer):
+        # Unary replication drops writes for a peer that is down
+        return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                 "--replication=unary", f"--db-path=/tmp/kv_ae_{port}",
+                                 f"--replication-log=/tmp/kv_rlog_{port}", "--anti-entropy-interval=0.2"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    server_a = start(node_a, node_b)
+    server_b = None
+    try:
+        writer = KeyValueClient([f"localhost:{node_a}"])
+        for _ in range(100):
+            if await writer.kv_init([f"localhost:{node_a}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        for i in range(50):
+            await writer.put(f"missed_{i}", f"value_{i}")
+        await asyncio.sleep(4)  # Let the unary retries to the down replica give up
+
+        server_b = start(node_b, node_a)
+        reader = KeyValueClient([f"localhost:{node_b}"])
+        for _ in range(100):
+            if await reader.kv_init([f"localhost:{node_b}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        values = []
+        for _ in range(50):
+            values = [await reader.get(f"missed_{i}") for i in range(50)]
+            if values == [f"value_{i}" for i in range(50)]:
+                break
+            await asyncio.sleep(0.2)
+        assert values == [f"value_{i}" for i in range(50)], "Replica was not repaired"
+        await reader.kv_shutdown()
+        await writer.kv_shutdown()
+    finally:
+        for server in [server_a, server_b]:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+
+@pytest.mark.asyncio
+async def test_hinted_handoff_replays_after_recovery():
+    """Test that writes for a down peer are queued as hints and replayed in order once it recovers."""
+    node_a, node_b = 50075, 50076
+    subprocess.run("rm -rf /tmp/kv_hh_*", shell=True)
+
+    def start(port, peer):
+        return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                 "--replication=unary", f"--db-path=/tmp/kv_hh_db_{port}",
+                                 f"--hints-dir=/tmp/kv_hh_hints_{port}", "--anti-entropy-interval=0",
+                                 "--hint-replay-rate=500"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    server_a = start(node_a, node_b)
+    server_b = None
+    try:
+        writer = KeyValueClient([f"localhost:{node_a}"])
+        for _ in range(100):
+            if await writer.kv_init([f"localhost:{node_a}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        for i in range(300):
+            await writer.put(f"hint_{i % 100}", f"value_{i}")  # Overwrites check replay order
+        await asyncio.sleep(1)
+        stats = await writer.stats()
+        print(f"Hints queued for the down peer: {stats[f'hints_depth_localhost:{node_b}']:.0f}, "
+              f"oldest {stats[f'hints_oldest_age_localhost:{node_b}']:.2f}s old")
+        assert stats[f"hints_depth_localhost:{node_b}"] == 300, "Writes for the down peer were not queued"
+
+        server_b = start(node_b, node_a)
+        start_time = time.time()
+        while time.time() - start_time < 30:
+            stats = await writer.stats()
+            if stats[f"hints_depth_localhost:{node_b}"] == 0:
+                break
+            await asyncio.sleep(0.1)
+        print(f"Replayed {stats[f'hints_replayed_localhost:{node_b}']:.0f} hints "
+              f"{time.time() - start_time:.2f}s after the peer restarted")
+        assert stats[f"hints_depth_localhost:{node_b}"] == 0, "Hints were not replayed"
+
+        reader = KeyValueClient([f"localhost:{node_b}"])
+        await reader.kv_init([f"localhost:{node_b}"])
+        values = [await reader.get(f"hint_{i}") for i in range(100)]
+        assert values == [f"value_{200 + i}" for i in range(100)], "Replayed writes were applied out of order"
+        await reader.kv_shutdown()
+        await writer.kv_shutdown()
+    finally:
+        for server in [server_a, server_b]:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+
+@pytest.mark.asyncio
+async def test_tombstones_kept_until_every_replica_applied_them():
+    """Test that delete tombstones survive while a replica is down and are collected once it has applied them."""
+    node_a, node_b = 50077, 50078
+    subprocess.run("rm -rf /tmp/kv_gc_*", shell=True)
+
+    def start(port, peer):
+        return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                 f"--db-path=/tmp/kv_gc_db_{port}", f"--replication-log=/tmp/kv_gc_rlog_{port}",
+                                 "--anti-entropy-interval=0.2", "--tombstone-gc-interval=0.3"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    server_a, server_b = start(node_a, node_b), start(node_b, node_a)
+    try:
+        writer = KeyValueClient([f"localhost:{node_a}"])
+        for _ in range(100):
+            if await writer.kv_init([f"localhost:{node_a}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        for i in range(50):
+            await writer.put(f"gc_{i}", f"value_{i}", consistency="ALL")
+
+        server_b.terminate()
+        server_b.wait()
+        for i in range(50):
+            await writer.delete(f"gc_{i}")
+        await asyncio.sleep(1.5)
+        stats = await writer.stats()
+        assert stats["tombstones_collected"] == 0, "Tombstones were collected while a replica had not applied them"
+
+        server_b = start(node_b, node_a)
+        reader = KeyValueClient([f"localhost:{node_b}"])
+        for _ in range(100):
+            if await reader.kv_init([f"localhost:{node_b}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        start_time = time.time()
+        while time.time() - start_time < 30:
+            stats_a, stats_b = await writer.stats(), await reader.stats()
+            if stats_a["tombstones_collected"] >= 50 and stats_b["tombstones_collected"] >= 50:
+                break
+            await asyncio.sleep(0.2)
+        print(f"Tombstones collected {time.time() - start_time:.2f}s after the replica restarted: "
+              f"{stats_a['tombstones_collected']:.0f} on A, {stats_b['tombstones_collected']:.0f} on B")
+        assert stats_a["tombstones_collected"] >= 50 and stats_b["tombstones_collected"] >= 50, "Tombstones were not collected"
+
+        await asyncio.sleep(1)  # Several anti-entropy rounds after the collection
+        values = [await reader.get(f"gc_{i}") for i in range(50)] + [await writer.get(f"gc_{i}") for i in range(50)]
+        assert values == [""] * 100, "Deleted keys came back after their tombstones were collected"
+        await reader.kv_shutdown()
+        await writer.kv_shutdown()
+    finally:
+        for server in [server_a, server_b]:
+            server.terminate()
+            server.wait()
+
+
+def start_raft_server(port, ports, snapshot_threshold=10000):
+    """Start a Raft-replicated server with its data and Raft log under /tmp."""
+    peers = ",".join(f"localhost:{peer}" for peer in ports if peer != port)
+    return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers={peers}",
+                             "--replication=raft", f"--db-path=/tmp/kv_raft_db_{port}", f"--raft-dir=/tmp/kv_raft_{port}",
+                             f"--raft-snapshot-threshold={snapshot_threshold}"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def find_raft_leader(clients, timeout=10):
+    """Return the port whose server is the Raft leader, or None."""
+    start = time.time()
+    while time.time() - start < timeout:
+        for port, node in clients.items():
+            try:
+                if (await node.stats()).get("raft_leader"):
+                    return port
+            except Exception:
+                pass
+        await asyncio.sleep(0.1)
+    return None
+
+
+@pytest.mark.asyncio
+async def test_raft_leader_failover():
+    """Test that a Raft cluster elects a new leader, keeps committed writes and catches a restarted node up by snapshot."""
+    ports = [50081, 50082, 50083]
+    subprocess.run("rm -rf /tmp/kv_raft_*", shell=True)
+    servers = {port: start_raft_server(port, ports, snapshot_threshold=200) for port in ports}
+    clients = {}
+    try:
+        for port in ports:
+            clients[port] = KeyValueClient([f"localhost:{port}"])
+            for _ in range(100):
+                if await clients[port].kv_init([f"localhost:{port}"]) == 0:
+                    break
+                await asyncio.sleep(0.2)
+        leader = await find_raft_leader(clients)
+        assert leader is not None, "No Raft leader was elected"
+        follower = next(port for port in ports if port != leader)
+        for i in range(100):
+            await clients[follower].put(f"raft_{i}", f"value_{i}")  # Forwarded to the leader
+
+        servers[leader].terminate()
+        servers[leader].wait()
+        await clients.pop(leader).kv_shutdown()
+        killed_at = time.time()
+        while time.time() - killed_at < 10:
+            try:
+                await clients[follower].put("raft_after_failover", "ok")
+                break
+            except grpc.RpcError:
+                await asyncio.sleep(0.05)
+        failover = time.time() - killed_at
+        for i in range(100, 600):
+            await clients[follower].put(f"raft_{i}", f"value_{i}")
+        new_leader = await find_raft_leader(clients)
+
+        servers[leader] = start_raft_server(leader, ports, snapshot_threshold=200)
+        clients[leader] = KeyValueClient([f"localhost:{leader}"])
+        for _ in range(100):
+            if await clients[leader].kv_init([f"localhost:{leader}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        commit_index = (await clients[new_leader].stats())["raft_commit_index"]
+        start = time.time()
+        while time.time() - start < 30:
+            stats = await clients[leader].stats()
+            if stats["raft_last_applied"] >= commit_index:
+                break
+            await asyncio.sleep(0.1)
+        print(f"New leader {new_leader} accepted writes {failover * 1000:.2f} ms after leader {leader} was killed; "
+              f"restarted node applied up to {stats['raft_last_applied']:.0f}/{commit_index:.0f} "
+              f"{time.time() - start:.2f}s after restart ({stats['raft_snapshots_installed']:.0f} snapshots installed)")
+
+        assert new_leader is not None and new_leader != leader, "No new leader took over"
+        assert failover < 5, f"Writes were unavailable for {failover:.2f}s after the leader failed"
+        assert stats["raft_last_applied"] >= commit_index, "The restarted node did not catch up"
+        assert stats["raft_snapshots_installed"] >= 1, "The restarted node was not caught up by snapshot"
+        values = [await clients[leader].get(f"raft_{i}") for i in range(600)]
+        assert values == [f"value_{i}" for i in range(600)], "Committed writes were lost across the failover"
+        for node in clients.values():
+            await node.kv_shutdown()
+    finally:
+        for server in servers.values():
+            server.terminate()
+            server.wait()
+
+
+def start_chain_server(port, ports):
+    """Start a chain-replicated server with its data under /tmp."""
+    peers = ",".join(f"localhost:{peer}" for peer in ports if peer != port)
+    return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers={peers}",
+                             "--replication=chain", f"--db-path=/tmp/kv_chain_db_{port}"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+@pytest.mark.asyncio
+async def test_chain_reconfigures_around_failed_nodes():
+    """Test that the chain drops a failed tail and middle node, keeps every acknowledged write and splices restarted nodes back."""
+    ports = [50084, 50085, 50086]  # Chain order: head, middle, tail
+    subprocess.run("rm -rf /tmp/kv_chain_*", shell=True)
+    servers = {port: start_chain_server(port, ports) for port in ports}
+    try:
+        head = KeyValueClient([f"localhost:{ports[0]}"])
+        for _ in range(100):
+            if await head.kv_init([f"localhost:{ports[0]}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        start = time.time()
+        while time.time() - start < 10 and (await head.stats())["chain_length"] < 3:
+            await asyncio.sleep(0.1)
+
+        written = 0
+        for failed in [ports[2], ports[1]]:  # The tail, then the middle node
+            for i in range(written, written + 100):
+                await head.put(f"chain_{i}", f"value_{i}")
+            written += 100
+            servers[failed].terminate()
+            servers[failed].wait()
+            killed_at = time.time()
+            for i in range(written, written + 100):  # The first writes find the failed node down
+                await head.put(f"chain_{i}", f"value_{i}")
+            written += 100
+            print(f"Wrote 100 keys in {(time.time() - killed_at) * 1000:.2f} ms after {failed} failed")
+            values = [await head.get(f"chain_{i}") for i in range(written)]
+            assert values == [f"value_{i}" for i in range(written)], f"Acknowledged writes lost after {failed} failed"
+
+        stats = await head.stats()
+        assert stats["chain_length"] == 1 and stats["chain_tail"] == 1, "The head did not become the tail"
+
+        restart = time.time()
+        for port in [ports[1], ports[2]]:
+            servers[port] = start_chain_server(port, ports)
+        tail = KeyValueClient([f"localhost:{ports[2]}"])
+        for _ in range(100):
+            if await tail.kv_init([f"localhost:{ports[2]}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        while time.time() - restart < 20:
+            stats, tail_stats = await head.stats(), await tail.stats()
+            if stats["chain_length"] == 3 and tail_stats["chain_length"] == 3 and not tail_stats["chain_syncing"]:
+                break
+            await asyncio.sleep(0.1)
+        print(f"Restarted nodes rejoined {time.time() - restart:.2f}s after restart (including startup); "
+              f"{stats['chain_reconfigurations']:.0f} reconfigurations seen by the head")
+        assert stats["chain_length"] == 3 and tail_stats["chain_tail"] == 1, "The restarted nodes did not rejoin"
+
+        await head.put("chain_after_rejoin", "ok")
+        values = [await tail.get(f"chain_{i}") for i in range(written)]
+        assert values == [f"value_{i}" for i in range(written)], "The restarted tail is missing writes"
+        assert await tail.get("chain_after_rejoin") == "ok", "Writes do not reach the rejoined tail"
+        await tail.kv_shutdown()
+        await head.kv_shutdown()
+    finally:
+        for server in servers.values():
+            server.terminate()
+            server.wait()
+
+
+
+@pytest.mark.asyncio
+async def test_chain_node_resyncs_after_partition():
+    """Test a tail that was cut off while its process kept running resyncs before it serves reads again."""
+    ports = [50110, 50111, 50112]  # Chain order: head, middle, tail
+    subprocess.run("rm -rf /tmp/kv_chain_*", shell=True)
+    servers = {port: start_chain_server(port, ports) for port in ports}
+    clients = {}
+    try:
+        for port in ports:
+            clients[port] = KeyValueClient([f"localhost:{port}"])
+            for _ in range(100):
+                if await clients[port].kv_init([f"localhost:{port}"]) == 0:
+                    break
+                await asyncio.sleep(0.2)
+
+        async def chain_length(port, length):
+            start = time.time()
+            while time.time() - start < 20:
+                stats = await clients[port].stats()
+                if stats["chain_length"] == length and not stats["chain_syncing"]:
+                    return True
+                await asyncio.sleep(0.1)
+            return False
+
+        assert await chain_length(ports[0], 3), "The chain did not form"
+        head, tail = clients[ports[0]], clients[ports[2]]
+        await head.put("partitioned", "before")
+
+        servers[ports[2]].send_signal(signal.SIGSTOP)  # Alive but unreachable
+        assert await chain_length(ports[0], 2), "The head did not drop the stopped tail"
+        for i in range(50):
+            await head.put(f"missed_{i}", "v")
+        await head.put("partitioned", "after")
+        servers[ports[2]].send_signal(signal.SIGCONT)
+
+        reads = []  # Reads at the old tail while it rejoins must never be stale
+        start = time.time()
+        while time.time() - start < 20:
+            reads.append(await tail.get("partitioned"))
+            stats = await tail.stats()
+            if stats["chain_resyncs"] and not stats["chain_syncing"]:
+                break
+            await asyncio.sleep(0.05)
+        assert await chain_length(ports[0], 3), "The stopped tail did not rejoin"
+        values = [await tail.get(f"missed_{i}") for i in range(50)]
+        for client in clients.values():
+            await client.kv_shutdown()
+    finally:
+        for server in servers.values():
+            server.send_signal(signal.SIGCONT)
+            server.terminate()
+            server.wait()
+        subprocess.run("rm -rf /tmp/kv_chain_*", shell=True)
+
+    assert stats["chain_resyncs"] >= 1, "The rejoining tail did not resync"
+    assert set(reads) == {"after"}, f"The rejoining tail served stale reads: {set(reads)}"
+    assert values == ["v"] * 50, "The rejoined tail is missing writes made while it was cut off"
+
+CDC_SEGMENT_MB = 0.002  # About 2 KB: the test's writes fill several segments
+
+
+def start_cdc_server(port):
+    """Start a standalone server exporting its writes to small CDC segments under /tmp."""
+    return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", "--peers=",
+                             f"--db-path=/tmp/kv_cdc_db_{port}", f"--replication-log=/tmp/kv_cdc_rlog_{port}",
+                             f"--cdc-dir=/tmp/kv_cdc_{port}", f"--cdc-segment-mb={CDC_SEGMENT_MB}", "--cdc-flush-ms=20"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+@pytest.mark.asyncio
+async def test_cdc_export_resumes_after_restart():
+    """Test that every write is exported in order across rotated segments and that sequences continue after a restart."""
+    from cdc import list_segments, read_cdc, scan_blocks
+    port = 50089
+    subprocess.run("rm -rf /tmp/kv_cdc_*", shell=True)
+    server = start_cdc_server(port)
+    try:
+        client = KeyValueClient([f"localhost:{port}"])
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        expected = []
+        for i in range(500):
+            await client.put(f"cdc_{i}", f"value_{i}")
+            expected.append(("put", f"cdc_{i}", f"value_{i}"))
+        for i in range(0, 500, 10):
+            await client.delete(f"cdc_{i}")
+            expected.append(("delete", f"cdc_{i}", ""))
+        await client.kv_shutdown()
+        server.terminate()  # Flushes the buffered writes on the way out
+        server.wait()
+
+        server = start_cdc_server(port)
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        await client.put("cdc_after_restart", "ok")
+        expected.append(("put", "cdc_after_restart", "ok"))
+        await client.kv_shutdown()
+        server.terminate()
+        server.wait()
+
+        records = list(read_cdc(f"/tmp/kv_cdc_{port}"))
+        segments = list_segments(f"/tmp/kv_cdc_{port}")
+        print(f"{len(records)} writes exported to {len(segments)} segments")
+        assert [record[0] for record in records] == list(range(1, len(expected) + 1)), "Sequences are not contiguous"
+        assert [record[1:4] for record in records] == expected, "Exported writes differ from the writes made"
+        segment_bytes = int(CDC_SEGMENT_MB * 1024 * 1024)
+        block_offsets = [offset for _, path in segments for offset, _, _, _ in scan_blocks(path)]
+        assert len(segments) > 2, "Segments were not rotated"
+        assert max(block_offsets) < segment_bytes, "A block was appended to a segment already at its size"
+
+        reader = subprocess.run(["python", "server/cdc.py", f"/tmp/kv_cdc_{port}", "--from-sequence=540"],
+                                capture_output=True, text=True, check=True)
+        assert [json.loads(line)["seq"] for line in reader.stdout.splitlines()] == \
+            list(range(540, len(expected) + 1)), "The reader did not start at the requested sequence"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+@pytest.mark.asyncio
+async def test_wal_replays_acknowledged_writes_after_crash():
+    """Test that writes acknowledged under --wal-sync=always survive a SIGKILL before they reach LMDB."""
+    port = 50093
+    subprocess.run("rm -rf /tmp/kv_wal_*", shell=True)
+    args = ["python", "server/async_server.py", f"--port={port}", "--peers=", f"--db-path=/tmp/kv_wal_db_{port}",
+            f"--replication-log=/tmp/kv_wal_rlog_{port}", f"--wal=/tmp/kv_wal_{port}/wal.log", "--wal-sync=always"]
+    server = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        client = KeyValueClient([f"localhost:{port}"])
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        await asyncio.gather(*[client.put(f"wal_{i}", f"value_{i}") for i in range(300)])
+        await client.delete("wal_0")
+        stats = await client.stats()
+        server.kill()  # No chance to apply the WAL to LMDB
+        server.wait()
+        await client.kv_shutdown()
+        print(f"Killed with {stats['wal_overlay_keys']:.0f} keys only in the WAL, {stats['wal_syncs']:.0f} fsyncs")
+
+        server = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        values = [await client.get(f"wal_{i}") for i in range(300)]
+        await client.kv_shutdown()
+        assert values == [""] + [f"value_{i}" for i in range(1, 300)], "Acknowledged writes were lost in the crash"
+    finally:
+        server.terminate()
+        server.wait()
+
+
+@pytest.mark.asyncio
+async def test_compressed_values_readable_across_restarts():
+    """Test that values written with compression off, with zlib, and before and after dictionary training stay readable."""
+    port = 50096
+    subprocess.run("rm -rf /tmp/kv_zip_*", shell=True)
+    args = ["python", "server/async_server.py", f"--port={port}", "--peers=", f"--db-path=/tmp/kv_zip_db_{port}",
+            f"--replication-log=/tmp/kv_zip_rlog_{port}"]
+    zlib_args = ["--compression=zlib", "--compression-threshold=32", "--compression-samples=50"]
+    expected = {}
+    client = KeyValueClient([f"localhost:{port}"])
+    for phase, extra in [("plain", []), ("zlib", zlib_args), ("restarted", zlib_args), ("off", [])]:
+        server = subprocess.Popen(args + extra, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(100):
+                if await client.kv_init([f"localhost:{port}"]) == 0:
+                    break
+                await asyncio.sleep(0.2)
+            for i in range(100):
+                key = f"zip_{phase}_{i}"
+                expected[key] = json.dumps({"phase": phase, "id": i, "payload": "abc" * (i % 20)})
+                await client.put(key, expected[key])
+            values = {key: await client.get(key) for key in expected}
+            stats = await client.stats()
+            await client.kv_shutdown()
+        finally:
+            server.terminate()
+            server.wait()
+        assert values == expected, f"Values read back wrong after the {phase} phase"
+        if extra:
+            assert stats["compression_dictionary"] == 1, "The node did not train (or reload) its dictionary"
+    subprocess.run("rm -rf /tmp/kv_zip_*", shell=True)
+
+
+@pytest.mark.asyncio
+async def test_cold_keys_survive_restart_and_deletes():
+    """Test that keys moved to cold segments stay readable after a crash, and that overwrites and deletes of them stick."""
+    port = 50100
+    subprocess.run("rm -rf /tmp/kv_tier_*", shell=True)
+    args = ["python", "server/async_server.py", f"--port={port}", "--peers=", f"--db-path=/tmp/kv_tier_db_{port}",
+            f"--replication-log=/tmp/kv_tier_rlog_{port}", "--tiering-interval=0.3", "--tombstone-gc-interval=0.3"]
+    client = KeyValueClient([f"localhost:{port}"])
+    expected = {f"cold_{i}": f"value_{i}" for i in range(200)}
+
+    async def start():
+        server = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        return server
+
+    server = await start()
+    try:
+        for key, value in expected.items():
+            await client.put(key, value)
+        for _ in range(50):
+            if (await client.stats()).get("tiering_cold_keys", 0) >= len(expected):
+                break
+            await asyncio.sleep(0.1)
+        assert (await client.stats())["tiering_cold_keys"] >= len(expected), "Keys were not moved to the cold tier"
+        for _ in range(10):  # Let the new versions go cold too, and the collector pass over the tombstones
+            await client.put("cold_0", "rewritten")
+            await client.delete("cold_1")
+            await asyncio.sleep(0.3)
+        expected["cold_0"] = "rewritten"
+        expected["cold_1"] = ""
+        server.kill()  # No clean shutdown
+        server.wait()
+        await client.kv_shutdown()
+
+        server = await start()
+        values = {key: await client.get(key) for key in expected}
+        keys = set(await client.list_keys())
+        stats = await client.stats()
+        await client.kv_shutdown()
+    finally:
+        server.terminate()
+        server.wait()
+    subprocess.run("rm -rf /tmp/kv_tier_*", shell=True)
+
+    assert values == expected, "Cold keys read back wrong after a restart"
+    assert keys == set(expected) - {"cold_1"}, "Listing keys did not include the cold keys (or showed a deleted one)"
+    assert stats["tiering_promoted"] >= len(expected) - 2, "Reads did not promote cold keys"
+
+
+@pytest.mark.asyncio
+async def test_snapshot_catch_up_includes_cold_keys():
+    """Test that a replica catching up from a snapshot gets the keys its origin moved to cold segments."""
+    origin, replica = 50113, 50114
+    subprocess.run("rm -rf /tmp/kv_tier_*", shell=True)
+
+    def start(port, peer, *extra):
+        return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                 f"--db-path=/tmp/kv_tier_db_{port}", f"--replication-log=/tmp/kv_tier_rlog_{port}",
+                                 "--replication-log-max=100", *extra],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def connect(port):
+        client = KeyValueClient([f"localhost:{port}"])
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        return client
+
+    servers = [start(origin, replica, "--tiering-interval=0.3")]
+    expected = {f"cold_snapshot_{i}": f"value_{i}" for i in range(300)}
+    try:
+        writer = await connect(origin)
+        for key, value in expected.items():  # The replica is down, so the capped log drops most of them
+            await writer.put(key, value)
+        for _ in range(50):
+            if (await writer.stats()).get("tiering_cold_keys", 0) >= len(expected) - 10:
+                break
+            await asyncio.sleep(0.1)
+        stats = await writer.stats()
+        assert stats["tiering_cold_keys"] >= len(expected) - 10, "Keys were not moved to the cold tier"
+
+        servers.append(start(replica, origin))
+        reader = await connect(replica)
+        for _ in range(100):
+            replica_stats = await reader.stats()
+            if replica_stats.get(f"replication_cursor_localhost:{origin}", 0) >= stats["replication_last_seq"]:
+                break
+            await asyncio.sleep(0.1)
+        values = {key: await reader.get(key) for key in expected}
+        await reader.kv_shutdown()
+        await writer.kv_shutdown()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+        subprocess.run("rm -rf /tmp/kv_tier_*", shell=True)
+
+    assert replica_stats.get("replication_snapshots_applied", 0) >= 1, "Replica did not use a snapshot"
+    assert values == expected, f"{sum(values[key] != value for key, value in expected.items())} cold keys missing"
+
+@pytest.mark.asyncio
+async def test_tiering_keeps_running_with_dedup_and_namespaces():
+    """Test that tiering passes go on when LMDB's main database also lists shared bodies and namespaces."""
+    port = 50115
+    subprocess.run("rm -rf /tmp/kv_tier_*", shell=True)
+    server = subprocess.Popen(["python", "server/async_server.py", f"--port={port}", "--peers=",
+                               f"--db-path=/tmp/kv_tier_db_{port}", f"--replication-log=/tmp/kv_tier_rlog_{port}",
+                               "--tiering-interval=0.3", "--dedup-threshold=64"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = KeyValueClient([f"localhost:{port}"])
+
+    async def cold_keys(count):
+        for _ in range(50):
+            if (await client.stats()).get("tiering_cold_keys", 0) >= count:
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+    try:
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        await client.put("shared", "x" * 100)  # Sub-databases sort after every key of the main one
+        await client.put("tenant_key", "v", namespace="tenant")
+        expected = {}
+        for batch in range(3):  # Every batch needs a later pass than the one before
+            batch_keys = {f"tier_{batch}_{i}": f"value_{i}" for i in range(100)}
+            for key, value in batch_keys.items():
+                await client.put(key, value)
+            expected.update(batch_keys)
+            assert await cold_keys(len(expected)), f"Batch {batch} was not moved to the cold tier"
+        values = {key: await client.get(key) for key in expected}
+        await client.kv_shutdown()
+    finally:
+        server.terminate()
+        server.wait()
+        subprocess.run("rm -rf /tmp/kv_tier_*", shell=True)
+
+    assert values == expected, "Cold keys read back wrong"
+
+@pytest.mark.asyncio
+async def test_dedup_replication_resends_released_bodies():
+    """Test that a value sent by digest to a peer that no longer stores its body is resent in full."""
+    ports = (50103, 50104)
+    subprocess.run("rm -rf /tmp/kv_dedup_*", shell=True)
+
+    def start(port, peer):
+        return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                 f"--db-path=/tmp/kv_dedup_db_{port}", f"--replication-log=/tmp/kv_dedup_rlog_{port}",
+                                 "--dedup-threshold=256"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def connect(port):
+        client = KeyValueClient([f"localhost:{port}"])
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        return client
+
+    async def replicated(client, key, value):
+        for _ in range(100):
+            if await client.get(key) == value:
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    servers = [start(*ports), start(*ports[::-1])]
+    payload = json.dumps({"defaults": ["setting"] * 100})
+    try:
+        origin, peer = await connect(ports[0]), await connect(ports[1])
+        for i in range(5):
+            await origin.put(f"dedup_{i}", payload)
+        assert await replicated(peer, "dedup_4", payload), "Shared values did not replicate"
+        for i in range(5):  # The peer drops its last references to the body...
+            await peer.put(f"dedup_{i}", f"changed_{i}")
+        assert await replicated(origin, "dedup_4", "changed_4"), "Overwrites did not replicate back"
+        await origin.put("dedup_again", payload)  # ...which the origin still thinks the peer has
+        assert await replicated(peer, "dedup_again", payload), "Value sent by digest was not resent in full"
+
+        servers[1].kill()  # Reference counts must survive a crash
+        servers[1].wait()
+        await peer.kv_shutdown()
+        servers[1] = start(*ports[::-1])
+        peer = await connect(ports[1])
+        await origin.put("dedup_after_restart", payload)
+        assert await replicated(peer, "dedup_after_restart", payload), "Value did not replicate after a restart"
+        values = [await peer.get(key) for key in ["dedup_0", "dedup_again", "dedup_after_restart"]]
+        origin_stats, peer_stats = await origin.stats(), await peer.stats()
+        await origin.kv_shutdown()
+        await peer.kv_shutdown()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+    subprocess.run("rm -rf /tmp/kv_dedup_*", shell=True)
+
+    assert values == ["changed_0", payload, payload]
+    assert peer_stats["dedup_bodies"] == 1, f"Peer stores {peer_stats['dedup_bodies']} bodies for one shared value"
+    assert origin_stats[f"replication_bodies_skipped_localhost:{ports[1]}"] > 0, "No value was sent by digest"
+    assert origin_stats[f"replication_bodies_missing_localhost:{ports[1]}"] > 0, "The released body was never missed"
+
+
+@pytest.mark.asyncio
+async def test_namespaces_isolate_keys_enforce_quotas_and_drop_everywhere():
+    """Test namespaced keys replicate, respect their quota, survive a crash and stay gone once dropped."""
+    ports = (50106, 50107)
+    subprocess.run("rm -rf /tmp/kv_ns_*", shell=True)
+
+    def start(port, peer):
+        return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                 f"--db-path=/tmp/kv_ns_db_{port}", f"--replication-log=/tmp/kv_ns_rlog_{port}",
+                                 "--namespace-quota=small:3:0", "--anti-entropy-interval=1"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def connect(port):
+        client = KeyValueClient([f"localhost:{port}"])
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        return client
+
+    async def replicated(client, key, value, namespace):
+        for _ in range(100):
+            if await client.get(key, namespace=namespace) == value:
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    servers = [start(*ports), start(*ports[::-1])]
+    try:
+        origin, peer = await connect(ports[0]), await connect(ports[1])
+        await origin.put("user", "default")
+        await origin.put("user", "tenant a", namespace="a")
+        await origin.put("user", "tenant b", namespace="b")
+        assert await replicated(peer, "user", "tenant b", "b"), "Namespaced write did not replicate"
+        assert [await peer.get("user", namespace=ns) for ns in ["", "a", "b"]] == ["default", "tenant a", "tenant b"]
+        assert list(await origin.list_keys(namespace="a")) == ["user"]
+        for forged in [origin.get("\0a\0user"), origin.put("\0a\0user", "forged"), origin.get_bytes(b"\0a\0user")]:
+            with pytest.raises(grpc.RpcError) as error:  # A default key must not reach into namespace a
+                await forged
+            assert error.value.code() == grpc.StatusCode.INVALID_ARGUMENT
+
+        for i in range(3):
+            await origin.put(f"k{i}", "v", namespace="small")
+        with pytest.raises(grpc.RpcError) as error:
+            await origin.put("k3", "v", namespace="small")
+        assert error.value.code() == grpc.StatusCode.RESOURCE_EXHAUSTED
+        await origin.delete("k0", namespace="small")  # Deletes are always admitted
+
+        assert await origin.drop_namespace("a") == 1
+        assert await peer.drop_namespace("missing") is None
+        assert await peer.get("user", namespace="a") == "", "Drop did not reach the peer"
+
+        servers[1].kill()  # Namespaces must survive a crash, dropped ones stay dropped
+        servers[1].wait()
+        await peer.kv_shutdown()
+        servers[1] = start(*ports[::-1])
+        peer = await connect(ports[1])
+        await asyncio.sleep(3)  # A few anti-entropy rounds
+        keys = {ns: sorted(await peer.list_keys(namespace=ns)) for ns in ["", "a", "b", "small"]}
+        origin_keys = sorted(await origin.list_keys(namespace="a"))
+        stats = await origin.stats()
+        await origin.kv_shutdown()
+        await peer.kv_shutdown()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+    subprocess.run("rm -rf /tmp/kv_ns_*", shell=True)
+
+    assert keys == {"": ["user"], "a": [], "b": ["user"], "small": ["k1", "k2"]}, f"Peer holds {keys}"
+    assert origin_keys == [], "A dropped namespace came back"
+    assert stats["namespace_quota_rejections"] == 1 and stats["namespace_drops"] == 1
+    assert stats["namespace_keys_small"] == 3, "Records of a namespace should count its tombstone"
+
+
+@pytest.mark.asyncio
+async def test_dropped_namespace_stays_dropped_on_a_lagging_peer():
+    """Test a peer that was down during a drop drops the namespace on catch-up, by log or snapshot, and never restores it."""
+    ports = (50116, 50117)
+    subprocess.run("rm -rf /tmp/kv_drop_*", shell=True)
+
+    def start(port, peer, *extra):
+        return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                 f"--db-path=/tmp/kv_drop_db_{port}", f"--replication-log=/tmp/kv_drop_rlog_{port}",
+                                 "--anti-entropy-interval=0.5", *extra],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def connect(port):
+        client = KeyValueClient([f"localhost:{port}"])
+        for _ in range(100):
+            if await client.kv_init([f"localhost:{port}"]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        return client
+
+    async def wait_for(check):
+        for _ in range(100):
+            if await check():
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+    async def caught_up(origin, peer):
+        last_seq = (await origin.stats())["replication_last_seq"]
+        return (await peer.stats()).get(f"replication_cursor_localhost:{ports[0]}", 0) >= last_seq
+
+    async def restart_peer():
+        servers[1] = start(*ports[::-1])
+        peer = await connect(ports[1])
+        assert await wait_for(lambda: caught_up(origin, peer)), "The peer did not catch up"
+        await asyncio.sleep(2)  # A few anti-entropy rounds, which must not copy the keys back
+        return peer
+
+    async def stop_peer():
+        servers[1].kill()
+        servers[1].wait()
+        await peer.kv_shutdown()
+
+    servers = [start(*ports, "--replication-log-max=50"), start(*ports[::-1])]
+    try:
+        origin, peer = await connect(ports[0]), await connect(ports[1])
+        for namespace in ["t", "u"]:
+            for i in range(5):
+                await origin.put(f"k{i}", "old", namespace=namespace)
+        await peer.put("from_peer", "old", namespace="t")
+        assert await wait_for(lambda: origin.get("from_peer", namespace="t")) and \
+            await wait_for(lambda: peer.get("k4", namespace="u")), "Namespaced writes did not replicate"
+
+        await stop_peer()  # Catches up from the log: the write and the drop are queued for it
+        await origin.put("queued", "old", namespace="t")
+        assert await origin.drop_namespace("t") == 7
+        peer = await restart_peer()
+        log_keys = [sorted(await client.list_keys(namespace="t")) for client in (origin, peer)]
+
+        await stop_peer()  # Catches up from a snapshot: the log is truncated past its cursor
+        assert await origin.drop_namespace("u") == 5
+        for i in range(60):
+            await origin.put(f"filler_{i}", "v")
+        peer = await restart_peer()
+        snapshot_keys = [sorted(await client.list_keys(namespace="u")) for client in (origin, peer)]
+        peer_stats = await peer.stats()
+
+        await peer.put("fresh", "new", namespace="t")  # Written after the drop, so it is kept
+        recreated = await wait_for(lambda: origin.get("fresh", namespace="t"))
+        await origin.kv_shutdown()
+        await peer.kv_shutdown()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+        subprocess.run("rm -rf /tmp/kv_drop_*", shell=True)
+
+    assert log_keys == [[], []], f"Keys of the dropped namespace came back after a log catch-up: {log_keys}"
+    assert peer_stats.get("replication_snapshots_applied", 0) >= 1, "The peer did not catch up from a snapshot"
+    assert snapshot_keys == [[], []], f"Keys of the dropped namespace came back after a snapshot: {snapshot_keys}"
+    assert recreated, "A write made after the drop was refused"
+
+
+@pytest.mark.asyncio
+async def test_failover_retries_reads_but_not_writes():
+    """Test a failed read is retried on the next server while a failed write is raised, never resent."""
+    ports = (50108, 50109)
+    subprocess.run("rm -rf /tmp/kv_fo_*", shell=True)
+    servers = [subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--db-path=/tmp/kv_fo_db_{port}",
+                                 f"--replication-log=/tmp/kv_fo_rlog_{port}"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for port in ports]
+    addresses = [f"localhost:{port}" for port in ports]
+    client = KeyValueClient(addresses, failover=True, health_check_interval=60)
+    backup = KeyValueClient(addresses[1:])
+    try:
+        for _ in range(100):
+            if await client.kv_init(addresses) == 0 and await backup.kv_init(addresses[1:]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        await backup.put("only_on_backup", "v")
+
+        servers[0].kill()
+        servers[0].wait()
+        assert await client.get("only_on_backup") == "v", "Read was not retried on the next server"
+
+        client.failure_detector.record_success(client.endpoints[addresses[0]])  # Pretend the probe missed it
+        client._use_endpoint(client.endpoints[addresses[0]])
+        with pytest.raises(grpc.RpcError) as error:
+            await client.put("lost", "v")
+        assert error.value.code() == grpc.StatusCode.UNAVAILABLE
+        assert await backup.get("lost") == "", "A failed write was resent to another server"
+
+        await client.put("moved", "v")  # The next write goes to the healthy server
+        assert await backup.get("moved") == "v"
+        stats = client.get_failover_stats()
+        await client.kv_shutdown()
+        await backup.kv_shutdown()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+        subprocess.run("rm -rf /tmp/kv_fo_*", shell=True)
+
+    assert stats["connected_server"] == addresses[1] and stats["retries"] == 1, f"Unexpected failover stats: {stats}"
+
+
+@pytest.mark.asyncio
+async def test_client_streams_work_after_the_server_restarts():
+    """Test health checks of a restarted server keep the client's channel usable, so streams still work."""
+    address = "localhost:50108"
+    subprocess.run("rm -rf /tmp/kv_fo_*", shell=True)
+
+    def start():
+        return subprocess.Popen(["python", "server/async_server.py", "--port=50108", "--db-path=/tmp/kv_fo_db_50108",
+                                 "--replication-log=/tmp/kv_fo_rlog_50108"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    async def wait_until(healthy):
+        for _ in range(150):
+            if client.endpoints[address].healthy == healthy:
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
+    server = start()
+    client = KeyValueClient([address], failover=True, health_check_interval=0.1)
+    try:
+        for _ in range(100):
+            if await client.kv_init([address]) == 0:
+                break
+            await asyncio.sleep(0.2)
+        server.kill()
+        server.wait()
+        assert await wait_until(False), "The stopped server was not marked down"
+        server = start()
+        assert await wait_until(True), "The restarted server was not marked up"
+
+        events = client.watch(prefix="after_restart")
+        next_event = asyncio.ensure_future(events.__anext__())
+        await asyncio.sleep(0.5)  # Let the stream start
+        await client.put("after_restart", "v")
+        event = await asyncio.wait_for(next_event, 5)
+        await events.aclose()
+        await client.kv_shutdown()
+    finally:
+        server.terminate()
+        server.wait()
+        subprocess.run("rm -rf /tmp/kv_fo_*", shell=True)
+
+    assert event[1:] == ("put", "after_restart", "v"), f"Unexpected watch event: {event}"
@@ -10,6 +10,7 @@ from client.kv_client import KeyValueClient
 import random
 import numpy as np
 import subprocess
+import json
 import pytest
 import asyncio
 import time
@@ -305,3 +306,1245 @@ async def test_performance_under_failure():
     # Assertions
     assert successful_requests > 0, "All PUT operations failed under node failure!"
     assert throughput > 20, f"Throughput too low: {throughput:.2f} req/sec"
+
+
+@pytest.mark.asyncio
+async def test_hedged_get_tail_latency():
+    """Compare GET p50/p99 with and without hedging while the primary is busy with backups."""
+    plain_client = KeyValueClient(["localhost:50051", "localhost:50052"])
+    hedged_client = KeyValueClient(["localhost:50051", "localhost:50052"], hedge=True,
+                                   hedge_percentile=95, hedge_budget=0.1)
+    await plain_client.initialize()
+    await hedged_client.initialize()
+
+    keys = [f"hedge_key{i}" for i in range(100)]
+    await asyncio.gather(*[plain_client.put(key, f"value_{key}") for key in keys])
+
+    async def run_reads(kv_client, num_requests=500):
+        latencies = []
+        stop = asyncio.Event()
+
+        async def slow_primary():
+            # Backups on the primary stand in for a busy node
+            while not stop.is_set():
+                await plain_client.backup()
+                await asyncio.sleep(0.05)
+
+        background = asyncio.create_task(slow_primary())
+        semaphore = asyncio.Semaphore(10)
+
+        async def timed_get(key):
+            async with semaphore:
+                start = time.perf_counter()
+                value = await kv_client.get(key)
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert value == f"value_{key}", f"Unexpected value for {key}: {value}"
+
+        await asyncio.gather(*[timed_get(random.choice(keys)) for _ in range(num_requests)])
+        stop.set()
+        await background
+        return np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+    plain_p50, plain_p99 = await run_reads(plain_client)
+    hedged_p50, hedged_p99 = await run_reads(hedged_client)
+    stats = hedged_client.get_hedge_stats()
+
+    print(f"Plain GET  p50: {plain_p50:.2f} ms, p99: {plain_p99:.2f} ms")
+    print(f"Hedged GET p50: {hedged_p50:.2f} ms, p99: {hedged_p99:.2f} ms")
+    print(f"Hedge rate: {stats['hedge_rate']:.2%}, wins: {stats['wins']}/{stats['hedges']}, throttled: {stats['throttled']}")
+
+    await plain_client.kv_shutdown()
+    await hedged_client.kv_shutdown()
+
+    # The budget caps hedges to 10% of requests plus the initial burst
+    max_hedges = hedged_client.hedge_budget.burst + 0.1 * stats["requests"]
+    assert stats["hedges"] <= max_hedges, f"Hedge budget exceeded: {stats['hedges']} > {max_hedges}"
+
+
+@pytest.mark.asyncio
+async def test_throughput_recovery_after_node_kill():
+    """Measure how long PUT throughput takes to recover when the connected node is killed."""
+    client = KeyValueClient(["localhost:50052", "localhost:50051"], failover=True,
+                            health_check_interval=0.2)
+    await client.initialize()
+    assert client.connected_server == "localhost:50052"
+
+    bucket_size = 0.05  # Seconds per throughput bucket
+    successes = {}  # Bucket index -> successful PUTs
+    stop = asyncio.Event()
+    start_time = time.time()
+
+    async def writer(writer_id):
+        i = 0
+        while not stop.is_set():
+            try:
+                await client.put(f"recovery_{writer_id}_{i}", f"value_{i}")
+                bucket = int((time.time() - start_time) / bucket_size)
+                successes[bucket] = successes.get(bucket, 0) + 1
+            except Exception:
+                await asyncio.sleep(0.01)
+            i += 1
+
+    writers = [asyncio.create_task(writer(w)) for w in range(10)]
+    await asyncio.sleep(1.0)
+
+    print("Stopping server on port 50052...")
+    kill_time = time.time()
+    process = await asyncio.create_subprocess_exec("pkill", "-f", "python server/async_server.py --port=50052")
+    await process.wait()
+    await asyncio.sleep(2.0)
+    stop.set()
+    await asyncio.gather(*writers)
+
+    kill_bucket = int((kill_time - start_time) / bucket_size)
+    baseline = sum(successes.get(b, 0) for b in range(kill_bucket)) / max(kill_bucket, 1)
+    recovered_bucket = next((b for b in range(kill_bucket + 1, kill_bucket + 40)
+                             if successes.get(b, 0) >= 0.5 * baseline), None)
+
+    stats = client.get_failover_stats()
+    print(f"Baseline throughput: {baseline / bucket_size:.2f} requests/sec")
+    print(f"Failover stats: {stats}")
+
+    # Restart the node and wait for the background health checks to reconnect it
+    print("Restarting server on port 50052...")
+    await asyncio.create_subprocess_exec("python", "server/async_server.py", "--port=50052", stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    reconnect_deadline = time.time() + 15
+    while not client.endpoints["localhost:50052"].healthy and time.time() < reconnect_deadline:
+        await asyncio.sleep(0.2)
+    reconnected = client.endpoints["localhost:50052"].healthy
+    await client.kv_shutdown()
+
+    assert recovered_bucket is not None, "Throughput did not recover after the node was killed"
+    recovery_time = (recovered_bucket - kill_bucket) * bucket_size
+    print(f"Throughput recovered within {recovery_time:.2f} s of the node kill")
+    assert stats["connected_server"] == "localhost:50051", f"Client did not fail over: {stats}"
+    assert reconnected, "Recovered node was not reconnected in the background"
+
+
+@pytest.mark.asyncio
+async def test_hot_cold_get_coalescing():
+    """Compare hot/cold GET throughput with and without single-flight coalescing."""
+    plain_client = KeyValueClient(["localhost:50051"])
+    coalescing_client = KeyValueClient(["localhost:50051"], coalesce_gets=True)
+    await plain_client.initialize()
+    await coalescing_client.initialize()
+
+    num_requests = 1000
+    hot_keys = [f"hot_key{i}" for i in range(10)]
+    cold_keys = [f"cold_key{i}" for i in range(90)]
+    await asyncio.gather(*[plain_client.put(key, f"value_{key}") for key in hot_keys + cold_keys])
+    access_pattern = [random.choice(hot_keys) if random.random() < 0.9 else random.choice(cold_keys)
+                      for _ in range(num_requests)]
+
+    async def run_reads(kv_client):
+        start_time = time.time()
+        values = await asyncio.gather(*[kv_client.get(key) for key in access_pattern])
+        elapsed = time.time() - start_time
+        assert values == [f"value_{key}" for key in access_pattern], "Coalesced GET returned a wrong value"
+        return num_requests / elapsed
+
+    server_before = await plain_client.stats()
+    plain_throughput = await run_reads(plain_client)
+    server_after_plain = await plain_client.stats()
+    coalesced_throughput = await run_reads(coalescing_client)
+
+    client_stats = coalescing_client.get_coalescing_stats()
+    server_calls = server_after_plain["get_calls"] - server_before["get_calls"]
+    server_executions = server_after_plain["get_executions"] - server_before["get_executions"]
+
+    print(f"Plain hot/cold GET throughput: {plain_throughput:.2f} requests/sec")
+    print(f"Coalesced hot/cold GET throughput: {coalesced_throughput:.2f} requests/sec")
+    print(f"Throughput gain: {coalesced_throughput / plain_throughput:.2f}x")
+    print(f"Client coalescing ratio: {client_stats['coalescing_ratio']:.2f} ({client_stats['coalesced']} GETs shared an RPC)")
+    print(f"Server coalescing ratio (plain client): {server_calls / max(server_executions, 1):.2f}")
+
+    await plain_client.kv_shutdown()
+    await coalescing_client.kv_shutdown()
+
+    assert client_stats["coalesced"] > 0, "No GETs were coalesced on a hot-key workload"
+    assert server_executions <= server_calls, "Server executed more worker GETs than it received"
+
+
+async def run_linger_benchmark(num_producers, puts_per_producer, results):
+    """Run tight-loop PUT producers against the standalone node at several linger settings."""
+    for linger_ms in [None, 1, 5, 20]:  # None = unbatched
+        client = KeyValueClient(["localhost:50069"], batch_writes=linger_ms is not None,
+                                linger_ms=linger_ms or 0)
+        assert await wait_for_server(client, "localhost:50069"), "Server did not start"
+        latencies = []
+
+        async def producer(producer_id):
+            key = f"linger_{linger_ms}_{producer_id}"
+            await client.delete(key)
+            previous = ""
+            for i in range(puts_per_producer):
+                start = time.perf_counter()
+                old_value = await client.put(key, f"value_{i}")
+                latencies.append((time.perf_counter() - start) * 1000)
+                assert old_value == previous, f"Expected old value '{previous}', got '{old_value}'"
+                previous = f"value_{i}"
+
+        start_time = time.time()
+        await asyncio.gather(*[producer(p) for p in range(num_producers)])
+        throughput = num_producers * puts_per_producer / (time.time() - start_time)
+        results[linger_ms] = (throughput, np.percentile(latencies, 50), np.percentile(latencies, 99),
+                              client.get_batching_stats()["avg_batch_size"])
+        await client.kv_shutdown()
+
+
+@pytest.mark.asyncio
+async def test_write_batching_linger():
+    """Measure PUT throughput and latency for tight-loop producers at several linger settings."""
+    num_producers = 20
+    puts_per_producer = 50
+    results = {}
+    # A standalone node without peers, so replication does not share the measured write path
+    server = subprocess.Popen(["python", "server/async_server.py", "--port=50069", "--peers=",
+                               "--replication-log=/tmp/kv_rlog_50069"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        await run_linger_benchmark(num_producers, puts_per_producer, results)
+    finally:
+        server.terminate()
+        server.wait()
+
+    for linger_ms, (throughput, p50, p99, batch_size) in results.items():
+        label = "unbatched" if linger_ms is None else f"linger {linger_ms} ms"
+        print(f"{label}: {throughput:.2f} requests/sec, p50 {p50:.2f} ms, p99 {p99:.2f} ms, avg batch {batch_size:.1f}")
+
+    assert all(throughput > 100 for throughput, *_ in results.values()), f"PUT throughput too low: {results}"
+
+
+@pytest.mark.asyncio
+async def test_near_cache_read_mostly():
+    """Measure GET throughput, hit rate and staleness with a near-cache on a read-mostly workload."""
+    plain_client = KeyValueClient(["localhost:50051"])
+    cached_client = KeyValueClient(["localhost:50051"], near_cache=True, near_cache_size=100)
+    await plain_client.initialize()
+    await cached_client.initialize()
+    for _ in range(50):  # Wait for the invalidation stream to go live
+        if cached_client.get_near_cache_stats()["stream_live"]:
+            break
+        await asyncio.sleep(0.1)
+
+    config_keys = [f"config_key{i}" for i in range(20)]
+    await asyncio.gather(*[plain_client.put(key, "v0") for key in config_keys])
+    num_reads = 2000
+
+    async def read_loop(kv_client):
+        start_time = time.time()
+        for i in range(num_reads):
+            await kv_client.get(config_keys[i % len(config_keys)])
+        return num_reads / (time.time() - start_time)
+
+    async def occasional_writes():
+        for i in range(20):  # ~1% writes from another client
+            await plain_client.put(random.choice(config_keys), f"v{i + 1}")
+            await asyncio.sleep(0.01)
+
+    plain_throughput = await read_loop(plain_client)
+    cached_throughput, _ = await asyncio.gather(read_loop(cached_client), occasional_writes())
+    await asyncio.sleep(0.5)  # Let the last invalidations arrive
+
+    # After the writes settle, every cached value must match the server
+    mismatches = [key for key in config_keys if await cached_client.get(key) != await plain_client.get(key)]
+    stats = cached_client.get_near_cache_stats()
+
+    print(f"Plain GET throughput: {plain_throughput:.2f} requests/sec")
+    print(f"Near-cache GET throughput: {cached_throughput:.2f} requests/sec")
+    print(f"Near-cache hit rate: {stats['hit_rate']:.2%}, invalidations: {stats['invalidations']}")
+    print(f"Invalidation lag avg: {stats['avg_invalidation_lag_ms']:.2f} ms, max: {stats['max_invalidation_lag_ms']:.2f} ms")
+
+    await plain_client.kv_shutdown()
+    await cached_client.kv_shutdown()
+
+    assert not mismatches, f"Near-cache served stale values for {mismatches}"
+    assert stats["hit_rate"] > 0.5, f"Near-cache hit rate too low: {stats}"
+
+
+@pytest.mark.asyncio
+async def test_replication_log_vs_unary():
+    """Compare replication throughput and lag of the batched log shipper against unary per-key RPCs."""
+    num_writes = 1000
+    results = {}
+
+    for mode, ports in [("unary", (50061, 50062)), ("log", (50063, 50064))]:
+        origin, replica = ports
+        servers = [
+            subprocess.Popen(["python", "server/async_server.py", f"--port={origin}", f"--peers=localhost:{replica}",
+                              f"--replication={mode}"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+            subprocess.Popen(["python", "server/async_server.py", f"--port={replica}", f"--peers=localhost:{origin}",
+                              f"--replication={mode}"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        ]
+        try:
+            writer = KeyValueClient([f"localhost:{origin}"])
+            reader = KeyValueClient([f"localhost:{replica}"])
+            for _ in range(100):  # Wait for both servers to come up
+                if await writer.kv_init([f"localhost:{origin}"]) == 0 and await reader.kv_init([f"localhost:{replica}"]) == 0:
+                    break
+                await asyncio.sleep(0.2)
+            assert writer.stub and reader.stub, f"{mode} servers did not start"
+
+            semaphore = asyncio.Semaphore(50)
+            max_lag = 0
+
+            async def limited_put(i):
+                async with semaphore:
+                    await writer.put(f"repl_{mode}_{i}", f"value_{i}")
+
+            start_time = time.time()
+            await asyncio.gather(*[limited_put(i) for i in range(num_writes)])
+            writes_done = time.time()
+
+            applied = 0
+            while time.time() - writes_done < 30:
+                applied = (await reader.stats())["replication_applied"]
+                max_lag = max(max_lag, (await writer.stats()).get(f"replication_lag_localhost:{replica}", 0))
+                if applied >= num_writes:
+                    break
+                await asyncio.sleep(0.01)
+            replicated = time.time()
+
+            results[mode] = (applied, num_writes / (replicated - start_time), (replicated - writes_done) * 1000, max_lag)
+            await writer.kv_shutdown()
+            await reader.kv_shutdown()
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait()
+
+    for mode, (applied, throughput, drain_ms, max_lag) in results.items():
+        print(f"{mode} replication: {applied}/{num_writes} applied, {throughput:.2f} writes/sec replicated, "
+              f"drained {drain_ms:.2f} ms after the last write, max lag {max_lag:.0f} entries")
+
+    assert results["log"][0] >= num_writes, f"Log replication did not deliver every write: {results['log']}"
+
+
+def start_replicated_server(port, peer, log_max=1000000):
+    """Start a server replicating to one peer with its own replication log under /tmp."""
+    return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                             f"--replication-log=/tmp/kv_rlog_{port}", f"--replication-log-max={log_max}"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_for_server(client, address):
+    for _ in range(100):
+        if await client.kv_init([address]) == 0:
+            return True
+        await asyncio.sleep(0.2)
+    return False
+
+
+@pytest.mark.asyncio
+async def test_replica_catch_up_after_restart():
+    """Measure how long a restarted replica takes to replay the writes it missed while down."""
+    origin, replica = 50065, 50066
+    subprocess.run("rm -rf /tmp/kv_rlog_50065 /tmp/kv_rlog_50066", shell=True)
+    origin_server = start_replicated_server(origin, replica)
+    replica_server = start_replicated_server(replica, origin)
+    results = []
+    try:
+        writer = KeyValueClient([f"localhost:{origin}"])
+        assert await wait_for_server(writer, f"localhost:{origin}"), "Origin did not start"
+        semaphore = asyncio.Semaphore(50)
+
+        async def limited_put(i):
+            async with semaphore:
+                await writer.put(f"catchup_{i}", f"value_{i}")
+
+        written = 0
+        for missed in [200, 1000, 4000]:
+            replica_server.terminate()
+            replica_server.wait()
+            await asyncio.gather(*[limited_put(written + i) for i in range(missed)])
+            written += missed
+            await asyncio.sleep(0.1)  # Let the origin flush its log
+            last_seq = (await writer.stats())["replication_last_seq"]
+
+            restart = time.time()
+            replica_server = start_replicated_server(replica, origin)
+            reader = KeyValueClient([f"localhost:{replica}"])
+            assert await wait_for_server(reader, f"localhost:{replica}"), "Replica did not restart"
+            cursor = 0
+            while time.time() - restart < 30:
+                cursor = (await reader.stats()).get(f"replication_cursor_localhost:{origin}", 0)
+                if cursor >= last_seq:
+                    break
+                await asyncio.sleep(0.01)
+            results.append((missed, cursor, last_seq, (time.time() - restart) * 1000))
+            await reader.kv_shutdown()
+        await writer.kv_shutdown()
+    finally:
+        for server in [origin_server, replica_server]:
+            server.terminate()
+            server.wait()
+
+    for missed, cursor, last_seq, duration in results:
+        print(f"Replica missed {missed} writes: caught up to seq {cursor}/{last_seq} "
+              f"{duration:.2f} ms after restart (including startup)")
+
+    for missed, cursor, last_seq, _ in results:
+        assert cursor >= last_seq, f"Replica did not catch up after missing {missed} writes"
+
+
+@pytest.mark.asyncio
+async def test_anti_entropy_cost_vs_divergence():
+    """Measure Merkle anti-entropy work and repair time as a function of how far two replicas diverged."""
+    import grpc
+    import kvstore_pb2
+    import kvstore_pb2_grpc
+    from replication import REPLICATED_METADATA
+
+    node_a, node_b = 50071, 50072
+    subprocess.run("rm -rf /tmp/kv_ae_50071 /tmp/kv_ae_50072 /tmp/kv_rlog_50071 /tmp/kv_rlog_50072", shell=True)
+    servers = [
+        subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                          f"--db-path=/tmp/kv_ae_{port}", f"--replication-log=/tmp/kv_rlog_{port}",
+                          "--anti-entropy-interval=0.2"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for port, peer in [(node_a, node_b), (node_b, node_a)]
+    ]
+    results = []
+    try:
+        reader = KeyValueClient([f"localhost:{node_b}"])
+        assert await wait_for_server(reader, f"localhost:{node_b}"), "Node B did not start"
+        channel = grpc.aio.insecure_channel(f"localhost:{node_a}")
+        stub = kvstore_pb2_grpc.KeyValueStoreStub(channel)
+        semaphore = asyncio.Semaphore(50)
+
+        async def unreplicated_put(key):
+            # Marked as already replicated, so only node A stores it
+            async with semaphore:
+                await stub.Put(kvstore_pb2.KeyValue(key=key, value=f"value_{key}"), metadata=(REPLICATED_METADATA,))
+
+        written = 0
+        for divergence in [5000, 10, 100, 1000]:  # The first round copies the whole initial dataset
+            before = await reader.stats()
+            await asyncio.gather(*[unreplicated_put(f"ae_{written + i}") for i in range(divergence)])
+            written += divergence
+            start = time.time()
+            stats = before
+            while time.time() - start < 30:
+                stats = await reader.stats()
+                if stats["anti_entropy_keys_repaired"] - before["anti_entropy_keys_repaired"] >= divergence:
+                    break
+                await asyncio.sleep(0.05)
+            results.append((divergence, written,
+                            stats["anti_entropy_keys_repaired"] - before["anti_entropy_keys_repaired"],
+                            stats["anti_entropy_keys_compared"] - before["anti_entropy_keys_compared"],
+                            stats["anti_entropy_nodes_compared"] - before["anti_entropy_nodes_compared"],
+                            (time.time() - start) * 1000))
+        await channel.close()
+        await reader.kv_shutdown()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    for divergence, dataset, repaired, keys_compared, nodes_compared, duration in results:
+        print(f"{divergence} diverged keys of {dataset}: {repaired} repaired, {keys_compared} key digests and "
+              f"{nodes_compared} tree nodes compared, converged in {duration:.2f} ms")
+
+    for divergence, _, repaired, keys_compared, *_ in results:
+        assert repaired >= divergence, f"Only {repaired}/{divergence} diverged keys were repaired"
+    small = results[1]
+    assert small[3] < small[1] / 10, f"Repairing {small[0]} keys compared {small[3]} digests"
+
+
+@pytest.mark.asyncio
+async def test_consistency_level_latency():
+    """Compare PUT and GET throughput and latency at consistency ONE, QUORUM and ALL."""
+    client = KeyValueClient(["localhost:50051"])
+    await client.initialize()
+    num_requests = 500
+    semaphore = asyncio.Semaphore(50)
+    results = {}
+
+    async def timed(operation, latencies):
+        async with semaphore:
+            start = time.perf_counter()
+            await operation
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    for level in ["ONE", "QUORUM", "ALL"]:
+        put_latencies, get_latencies = [], []
+        start_time = time.time()
+        await asyncio.gather(*[timed(client.put(f"consistency_{level}_{i}", f"value_{i}", consistency=level), put_latencies)
+                               for i in range(num_requests)])
+        put_throughput = num_requests / (time.time() - start_time)
+        start_time = time.time()
+        await asyncio.gather(*[timed(client.get(f"consistency_{level}_{i}", consistency=level), get_latencies)
+                               for i in range(num_requests)])
+        get_throughput = num_requests / (time.time() - start_time)
+        results[level] = (put_throughput, np.percentile(put_latencies, 50), np.percentile(put_latencies, 99),
+                          get_throughput, np.percentile(get_latencies, 50), np.percentile(get_latencies, 99))
+
+    stats = await client.stats()
+    await client.kv_shutdown()
+
+    for level, (put_tp, put_p50, put_p99, get_tp, get_p50, get_p99) in results.items():
+        print(f"{level}: PUT {put_tp:.2f} req/sec (p50 {put_p50:.2f} ms, p99 {put_p99:.2f} ms), "
+              f"GET {get_tp:.2f} req/sec (p50 {get_p50:.2f} ms, p99 {get_p99:.2f} ms)")
+
+    assert stats["quorum_failures"] == 0, f"{stats['quorum_failures']:.0f} requests missed their quorum"
+
+
+@pytest.mark.asyncio
+async def test_raft_vs_async_replication():
+    """Compare PUT and GET throughput and latency of Raft replication with the default async log replication."""
+    ports = [50081, 50082, 50083]
+    subprocess.run("rm -rf /tmp/kv_raft_*", shell=True)
+    servers = [
+        subprocess.Popen(["python", "server/async_server.py", f"--port={port}",
+                          "--peers=" + ",".join(f"localhost:{peer}" for peer in ports if peer != port),
+                          "--replication=raft", f"--db-path=/tmp/kv_raft_db_{port}", f"--raft-dir=/tmp/kv_raft_{port}"],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for port in ports
+    ]
+    num_requests = 1000
+    semaphore = asyncio.Semaphore(50)
+    results = {}
+
+    async def timed(operation, latencies):
+        async with semaphore:
+            start = time.perf_counter()
+            await operation
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    try:
+        raft_leader = None
+        start = time.time()
+        while raft_leader is None and time.time() - start < 20:
+            for port in ports:
+                candidate = KeyValueClient([f"localhost:{port}"])
+                if await candidate.kv_init([f"localhost:{port}"]) == 0 and (await candidate.stats()).get("raft_leader"):
+                    raft_leader = candidate
+                    break
+                await candidate.kv_shutdown()
+            await asyncio.sleep(0.1)
+        assert raft_leader is not None, "No Raft leader was elected"
+        async_node = KeyValueClient(["localhost:50051"])
+        await async_node.initialize()
+
+        for name, client in [("async", async_node), ("raft", raft_leader)]:
+            put_latencies, get_latencies = [], []
+            start_time = time.time()
+            await asyncio.gather(*[timed(client.put(f"raft_cmp_{i}", f"value_{i}"), put_latencies)
+                                   for i in range(num_requests)])
+            put_throughput = num_requests / (time.time() - start_time)
+            start_time = time.time()
+            await asyncio.gather(*[timed(client.get(f"raft_cmp_{i}"), get_latencies) for i in range(num_requests)])
+            get_throughput = num_requests / (time.time() - start_time)
+            results[name] = (put_throughput, np.percentile(put_latencies, 50), np.percentile(put_latencies, 99),
+                             get_throughput, np.percentile(get_latencies, 50), np.percentile(get_latencies, 99))
+        stats = await raft_leader.stats()
+        await raft_leader.kv_shutdown()
+        await async_node.kv_shutdown()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    for name, (put_tp, put_p50, put_p99, get_tp, get_p50, get_p99) in results.items():
+        print(f"{name}: PUT {put_tp:.2f} req/sec (p50 {put_p50:.2f} ms, p99 {put_p99:.2f} ms), "
+              f"GET {get_tp:.2f} req/sec (p50 {get_p50:.2f} ms, p99 {get_p99:.2f} ms)")
+    print(f"Raft: {stats['raft_lease_reads']:.0f} lease reads, commit index {stats['raft_commit_index']:.0f}")
+
+    assert stats["raft_commit_index"] >= num_requests, "Not every Raft write was committed"
+
+
+@pytest.mark.asyncio
+async def test_chain_vs_broadcast_replication():
+    """Compare write and read throughput of chain replication with broadcast (log) replication."""
+    ports = [50084, 50085, 50086]  # Chain order: head, middle, tail
+    subprocess.run("rm -rf /tmp/kv_chain_*", shell=True)
+    servers = [
+        subprocess.Popen(["python", "server/async_server.py", f"--port={port}",
+                          "--peers=" + ",".join(f"localhost:{peer}" for peer in ports if peer != port),
+                          "--replication=chain", f"--db-path=/tmp/kv_chain_db_{port}"],
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for port in ports
+    ]
+    num_requests = 1000
+    semaphore = asyncio.Semaphore(50)
+    results = {}
+
+    async def timed(operation, latencies):
+        async with semaphore:
+            start = time.perf_counter()
+            await operation
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    try:
+        head, tail = KeyValueClient([f"localhost:{ports[0]}"]), KeyValueClient([f"localhost:{ports[-1]}"])
+        assert await wait_for_server(head, f"localhost:{ports[0]}"), "Chain head did not start"
+        assert await wait_for_server(tail, f"localhost:{ports[-1]}"), "Chain tail did not start"
+        start = time.time()
+        while time.time() - start < 10 and (await head.stats())["chain_length"] < len(ports):
+            await asyncio.sleep(0.1)
+        broadcast = KeyValueClient(["localhost:50051"])
+        await broadcast.initialize()
+
+        for name, writer, reader, level in [("broadcast ONE", broadcast, broadcast, "ONE"),
+                                            ("broadcast ALL", broadcast, broadcast, "ALL"),
+                                            ("chain", head, tail, None)]:
+            put_latencies, get_latencies = [], []
+            start_time = time.time()
+            await asyncio.gather(*[timed(writer.put(f"chain_cmp_{i}", f"value_{i}", consistency=level), put_latencies)
+                                   for i in range(num_requests)])
+            put_throughput = num_requests / (time.time() - start_time)
+            start_time = time.time()
+            await asyncio.gather(*[timed(reader.get(f"chain_cmp_{i}", consistency=level), get_latencies)
+                                   for i in range(num_requests)])
+            get_throughput = num_requests / (time.time() - start_time)
+            results[name] = (put_throughput, np.percentile(put_latencies, 50), np.percentile(put_latencies, 99),
+                             get_throughput, np.percentile(get_latencies, 50), np.percentile(get_latencies, 99))
+        head_stats, tail_stats = await head.stats(), await tail.stats()
+        for client in [head, tail, broadcast]:
+            await client.kv_shutdown()
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+    for name, (put_tp, put_p50, put_p99, get_tp, get_p50, get_p99) in results.items():
+        print(f"{name}: PUT {put_tp:.2f} req/sec (p50 {put_p50:.2f} ms, p99 {put_p99:.2f} ms), "
+              f"GET {get_tp:.2f} req/sec (p50 {get_p50:.2f} ms, p99 {get_p99:.2f} ms)")
+    print(f"Chain: head forwarded {head_stats['chain_forwarded']:.0f} mutations")
+
+    assert head_stats["chain_head"] == 1 and tail_stats["chain_tail"] == 1, "Unexpected chain layout"
+    assert head_stats["chain_forwarded"] >= num_requests, "Writes did not go down the chain"
+
+
+@pytest.mark.asyncio
+async def test_replication_backpressure_with_stalled_peer():
+    """Measure a write burst under each overflow policy while the unary replication peer is stalled (SIGSTOP)."""
+    import signal
+
+    node_a, node_b = 50087, 50088
+    window = 32
+    num_requests = 1000
+    semaphore = asyncio.Semaphore(50)
+    results = {}
+
+    def start(port, peer, overflow):
+        return subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                 "--replication=unary", f"--db-path=/tmp/kv_bp_db_{port}",
+                                 f"--hints-dir=/tmp/kv_bp_hints_{port}", "--anti-entropy-interval=0",
+                                 f"--replication-window={window}", f"--replication-overflow={overflow}"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    for overflow in ["block", "shed", "spill"]:
+        subprocess.run("rm -rf /tmp/kv_bp_*", shell=True)
+        server_a, server_b = start(node_a, node_b, overflow), start(node_b, node_a, overflow)
+        try:
+            writer = KeyValueClient([f"localhost:{node_a}"])
+            assert await wait_for_server(writer, f"localhost:{node_a}"), "Node A did not start"
+            peer_client = KeyValueClient([f"localhost:{node_b}"])
+            assert await wait_for_server(peer_client, f"localhost:{node_b}"), "Node B did not start"
+            await peer_client.kv_shutdown()
+            server_b.send_signal(signal.SIGSTOP)  # Accepts connections but never answers
+
+            peak_in_flight = 0
+            done = False
+
+            async def sample():
+                nonlocal peak_in_flight
+                while not done:
+                    stats = await writer.stats()
+                    peak_in_flight = max(peak_in_flight, stats[f"replication_in_flight_localhost:{node_b}"])
+                    await asyncio.sleep(0.05)
+
+            async def limited_put(i):
+                async with semaphore:
+                    await writer.put(f"bp_{i}", f"value_{i}")
+
+            sampler = asyncio.create_task(sample())
+            start_time = time.time()
+            await asyncio.gather(*[limited_put(i) for i in range(num_requests)])
+            throughput = num_requests / (time.time() - start_time)
+            done = True
+            await sampler
+            stats = await writer.stats()
+            peer = f"localhost:{node_b}"
+            results[overflow] = (throughput, peak_in_flight, stats[f"replication_breaker_{peer}"],
+                                 stats[f"replication_shed_{peer}"], stats[f"replication_spilled_{peer}"],
+                                 stats[f"hints_depth_{peer}"], stats["replication_blocked"])
+
+            server_b.send_signal(signal.SIGCONT)
+            closed_at = None
+            start_time = time.time()
+            while time.time() - start_time < 20:
+                await writer.put("bp_probe", "ok")
+                if (await writer.stats())[f"replication_breaker_{peer}"] == 0:
+                    closed_at = time.time() - start_time
+                    break
+                await asyncio.sleep(0.2)
+            results[overflow] += (closed_at,)
+            await writer.kv_shutdown()
+        finally:
+            server_b.send_signal(signal.SIGCONT)
+            for server in [server_a, server_b]:
+                server.terminate()
+                server.wait()
+    subprocess.run("rm -rf /tmp/kv_bp_*", shell=True)
+
+    for overflow, (throughput, peak, breaker, shed, spilled, hints, blocked, closed_at) in results.items():
+        print(f"{overflow}: {throughput:.2f} req/sec, peak in flight {peak:.0f}/{window}, breaker state {breaker:.0f}, "
+              f"{shed:.0f} shed, {spilled:.0f} spilled, {hints:.0f} hints, {blocked:.0f} writes blocked; "
+              f"breaker closed {closed_at if closed_at is None else f'{closed_at:.2f}s'} after the peer resumed")
+
+    for overflow, (_, peak, breaker, shed, spilled, *_, closed_at) in results.items():
+        assert peak <= window, f"{overflow}: {peak:.0f} RPCs in flight with a window of {window}"
+        assert breaker == 2, f"{overflow}: the breaker did not open for the stalled peer"
+        assert closed_at is not None, f"{overflow}: the breaker did not close after the peer resumed"
+    assert results["shed"][3] > 0 and results["spill"][4] > 0, "Full windows did not shed or spill writes"
+
+
+@pytest.mark.asyncio
+async def test_watch_fan_out_under_write_load():
+    """Measure write throughput and Watch delivery latency with 0 and 128 watchers on one node."""
+    num_requests = 1000
+    semaphore = asyncio.Semaphore(50)
+    results = {}
+
+    for num_watchers in [0, 128]:
+        client = KeyValueClient(["localhost:50051"])
+        await client.initialize()
+        prefix = f"fanout_{num_watchers}_"
+        sent_at = {}
+        latencies = []
+        delivered = [0] * num_watchers
+
+        async def watcher(w):
+            async for _, _, key, _ in client.watch(prefix):
+                latencies.append((time.perf_counter() - sent_at[key]) * 1000)
+                delivered[w] += 1
+                if delivered[w] >= num_requests:
+                    return
+
+        async def limited_put(i):
+            async with semaphore:
+                sent_at[f"{prefix}{i}"] = time.perf_counter()
+                await client.put(f"{prefix}{i}", f"value_{i}")
+
+        watchers = [asyncio.create_task(watcher(w)) for w in range(num_watchers)]
+        start = time.time()
+        while (await client.stats())["watch_subscribers"] < num_watchers and time.time() - start < 10:
+            await asyncio.sleep(0.05)
+        start_time = time.time()
+        await asyncio.gather(*[limited_put(i) for i in range(num_requests)])
+        throughput = num_requests / (time.time() - start_time)
+        try:
+            await asyncio.wait_for(asyncio.gather(*watchers), 30)
+        except asyncio.TimeoutError:
+            for task in watchers:
+                task.cancel()
+        drained = time.time() - start_time
+        stats = await client.stats()
+        await client.kv_shutdown()
+        results[num_watchers] = (throughput, drained, sum(delivered), stats["watch_coalesced"],
+                                 np.percentile(latencies, 50) if latencies else 0,
+                                 np.percentile(latencies, 99) if latencies else 0)
+
+    for num_watchers, (throughput, drained, delivered, coalesced, p50, p99) in results.items():
+        print(f"{num_watchers} watchers: PUT {throughput:.2f} req/sec, {delivered} events delivered in {drained:.2f}s "
+              f"(p50 {p50:.2f} ms, p99 {p99:.2f} ms after the PUT was sent), {coalesced:.0f} coalesced so far")
+
+    assert results[128][2] == 128 * num_requests, f"Only {results[128][2]} of {128 * num_requests} events were delivered"
+
+
+@pytest.mark.asyncio
+async def test_cdc_export_write_latency():
+    """Measure PUT latency on a standalone node with and without the CDC export, and how quickly writes are exported."""
+    num_requests = 2000
+    semaphore = asyncio.Semaphore(50)
+    subprocess.run("rm -rf /tmp/kv_cdc_*", shell=True)
+    results = {}
+
+    for port, cdc in [(50090, False), (50091, True)]:
+        args = ["python", "server/async_server.py", f"--port={port}", "--peers=", f"--db-path=/tmp/kv_cdc_db_{port}",
+                f"--replication-log=/tmp/kv_cdc_rlog_{port}"]
+        if cdc:
+            args.append(f"--cdc-dir=/tmp/kv_cdc_{port}")
+        server = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            client = KeyValueClient([f"localhost:{port}"])
+            assert await wait_for_server(client, f"localhost:{port}"), f"Server on {port} did not start"
+            latencies = []
+
+            async def limited_put(i):
+                async with semaphore:
+                    start = time.perf_counter()
+                    await client.put(f"cdc_perf_{i}", f"value_{i}" * 10)
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            start_time = time.time()
+            await asyncio.gather(*[limited_put(i) for i in range(num_requests)])
+            throughput = num_requests / (time.time() - start_time)
+            stats = await client.stats()
+            while cdc and stats["cdc_exported"] < num_requests and time.time() - start_time < 30:
+                await asyncio.sleep(0.05)
+                stats = await client.stats()
+            exported_after = time.time() - start_time
+            await client.kv_shutdown()
+            results[cdc] = (throughput, np.percentile(latencies, 50), np.percentile(latencies, 99),
+                            stats.get("cdc_exported", 0), exported_after, stats.get("cdc_bytes_written", 0))
+        finally:
+            server.terminate()
+            server.wait()
+
+    for cdc, (throughput, p50, p99, exported, exported_after, written) in results.items():
+        print(f"CDC {'on' if cdc else 'off'}: PUT {throughput:.2f} req/sec, p50 {p50:.2f} ms, p99 {p99:.2f} ms" +
+              (f", {exported:.0f} writes exported ({written / 1024:.1f} KiB) {exported_after:.2f}s after the first PUT"
+               if cdc else ""))
+
+    assert results[True][3] == num_requests, f"Only {results[True][3]:.0f} of {num_requests} writes were exported"
+
+
+@pytest.mark.asyncio
+async def test_wal_sync_policy_write_latency():
+    """Measure PUT latency on a standalone node without a WAL and under each WAL sync policy."""
+    num_requests = 1000
+    port = 50092
+    semaphore = asyncio.Semaphore(16)
+    results = {}
+
+    for policy in [None, "always", "group", "interval", "never"]:
+        subprocess.run("rm -rf /tmp/kv_wal_*", shell=True)
+        args = ["python", "server/async_server.py", f"--port={port}", "--peers=", f"--db-path=/tmp/kv_wal_db_{port}",
+                f"--replication-log=/tmp/kv_wal_rlog_{port}"]
+        if policy:
+            args += [f"--wal=/tmp/kv_wal_{port}/wal.log", f"--wal-sync={policy}"]
+        server = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            client = KeyValueClient([f"localhost:{port}"])
+            assert await wait_for_server(client, f"localhost:{port}"), f"Server with WAL {policy} did not start"
+            latencies = []
+
+            async def limited_put(i):
+                async with semaphore:
+                    start = time.perf_counter()
+                    await client.put(f"wal_perf_{i}", f"value_{i}")
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+            start_time = time.time()
+            await asyncio.gather(*[limited_put(i) for i in range(num_requests)])
+            throughput = num_requests / (time.time() - start_time)
+            stats = await client.stats()
+            await client.kv_shutdown()
+            results[policy] = (throughput, np.percentile(latencies, 50), np.percentile(latencies, 99),
+                               stats.get("wal_syncs", 0))
+        finally:
+            server.terminate()
+            server.wait()
+
+    for policy, (throughput, p50, p99, syncs) in results.items():
+        print(f"WAL {policy or 'off'}: PUT {throughput:.2f} req/sec, p50 {p50:.2f} ms, p99 {p99:.2f} ms, "
+              f"{syncs:.0f} WAL fsyncs")
+
+    assert results["group"][3] < results["always"][3], "Group commit did not share fsyncs between writes"
+
+
+@pytest.mark.asyncio
+async def test_lmdb_preset_throughput_matrix():
+    """Measure PUT and GET throughput on a standalone node under each LMDB durability preset."""
+    num_requests = 1000
+    port = 50094
+    semaphore = asyncio.Semaphore(50)
+    results = {}
+
+    for preset in ["durable", "balanced", "cache"]:
+        subprocess.run(f"rm -rf kvstore_{port}.lmdb /tmp/kv_lmdb_*", shell=True)
+        server = subprocess.Popen(["python", "server/async_server.py", f"--port={port}", "--peers=",
+                                   f"--replication-log=/tmp/kv_lmdb_rlog_{port}", f"--lmdb-preset={preset}"],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            client = KeyValueClient([f"localhost:{port}"])
+            assert await wait_for_server(client, f"localhost:{port}"), f"Server with preset {preset} did not start"
+
+            async def limited(request):
+                async with semaphore:
+                    await request
+
+            start_time = time.time()
+            await asyncio.gather(*[limited(client.put(f"preset_{i}", f"value_{i}")) for i in range(num_requests)])
+            put_throughput = num_requests / (time.time() - start_time)
+            start_time = time.time()
+            await asyncio.gather(*[limited(client.get(f"preset_{i}")) for i in range(num_requests)])
+            get_throughput = num_requests / (time.time() - start_time)
+            stats = await client.stats()
+            await client.kv_shutdown()
+            results[preset] = (put_throughput, get_throughput, stats["lmdb_sync"], stats["lmdb_writemap"])
+        finally:
+            server.terminate()
+            server.wait()
+        assert os.path.isdir(f"kvstore_{port}.lmdb"), "The node did not get its own data directory"
+    subprocess.run(f"rm -rf kvstore_{port}.lmdb /tmp/kv_lmdb_*", shell=True)
+
+    print(f"{'preset':<10}{'PUT req/sec':>14}{'GET req/sec':>14}")
+    for preset, (put_throughput, get_throughput, _, _) in results.items():
+        print(f"{preset:<10}{put_throughput:>14.2f}{get_throughput:>14.2f}")
+
+    assert results["durable"][2:] == (1, 0) and results["cache"][2:] == (0, 1), "Presets were not applied"
+
+
+@pytest.mark.asyncio
+async def test_bytes_get_throughput_by_value_size():
+    """Compare GET and GetBytes throughput for small, medium and large values."""
+    num_requests = 1000
+    semaphore = asyncio.Semaphore(50)
+    client = KeyValueClient(["localhost:50051"])
+    await client.initialize()
+    results = {}
+
+    async def limited(request):
+        async with semaphore:
+            return await request
+
+    for size in [100, 2048, 65536]:
+        value = "v" * size
+        keys = [f"bytes_perf_{size}_{i}" for i in range(20)]
+        for key in keys:
+            await client.put(key, value)
+        start_time = time.time()
+        values = await asyncio.gather(*[limited(client.get(keys[i % len(keys)])) for i in range(num_requests)])
+        get_throughput = num_requests / (time.time() - start_time)
+        start_time = time.time()
+        raw_values = await asyncio.gather(*[limited(client.get_bytes(keys[i % len(keys)].encode()))
+                                            for i in range(num_requests)])
+        bytes_throughput = num_requests / (time.time() - start_time)
+        assert all(v == value for v in values) and all(v == value.encode() for v in raw_values)
+        results[size] = (get_throughput, bytes_throughput)
+    await client.kv_shutdown()
+
+    print(f"{'value bytes':<12}{'GET req/sec':>14}{'GetBytes req/sec':>18}")
+    for size, (get_throughput, bytes_throughput) in results.items():
+        print(f"{size:<12}{get_throughput:>14.2f}{bytes_throughput:>18.2f}")
+
+    assert all(bytes_throughput > 0.5 * get_throughput for get_throughput, bytes_throughput in results.values())
+
+
+@pytest.mark.asyncio
+async def test_blob_stream_memory_and_throughput():
+    """Compare server memory high-water mark and throughput of unary and streamed multi-megabyte values."""
+    num_blobs = 16
+    concurrency = 8
+    blob_size = 3 * 1024 * 1024  # Unary calls stay under gRPC's 4 MB message limit
+    port = 50095
+    semaphore = asyncio.Semaphore(concurrency)
+    blob = b"b" * blob_size
+    results = {}
+
+    def high_water_mb(pid):
+        with open(f"/proc/{pid}/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+
+    for mode in ["unary", "stream"]:
+        subprocess.run(f"rm -rf kvstore_{port}.lmdb /tmp/kv_blob_*", shell=True)
+        server = subprocess.Popen(["python", "server/async_server.py", f"--port={port}", "--peers=",
+                                   f"--replication-log=/tmp/kv_blob_rlog_{port}", "--lmdb-preset=cache"],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            client = KeyValueClient([f"localhost:{port}"])
+            assert await wait_for_server(client, f"localhost:{port}"), f"Server for {mode} calls did not start"
+            baseline = high_water_mb(server.pid)
+
+            async def put(i):
+                async with semaphore:
+                    if mode == "unary":
+                        await client.put_bytes(f"blob_{i}".encode(), blob)
+                    else:
+                        await client.put_stream(f"blob_{i}", blob)
+
+            async def get(i):
+                async with semaphore:
+                    if mode == "unary":
+                        return len(await client.get_bytes(f"blob_{i}".encode()))
+                    return sum([len(chunk) async for chunk in client.get_stream(f"blob_{i}")])
+
+            start_time = time.time()
+            await asyncio.gather(*[put(i) for i in range(num_blobs)])
+            put_throughput = num_blobs * blob_size / (1024 * 1024) / (time.time() - start_time)
+            start_time = time.time()
+            sizes = await asyncio.gather(*[get(i) for i in range(num_blobs)])
+            get_throughput = num_blobs * blob_size / (1024 * 1024) / (time.time() - start_time)
+            assert sizes == [blob_size] * num_blobs, f"{mode} reads returned sizes {set(sizes)}"
+            results[mode] = (put_throughput, get_throughput, high_water_mb(server.pid) - baseline)
+            await client.kv_shutdown()
+        finally:
+            server.terminate()
+            server.wait()
+    subprocess.run(f"rm -rf kvstore_{port}.lmdb /tmp/kv_blob_*", shell=True)
+
+    print(f"{'mode':<8}{'PUT MB/s':>10}{'GET MB/s':>10}{'server peak MB':>16}")
+    for mode, (put_throughput, get_throughput, peak) in results.items():
+        print(f"{mode:<8}{put_throughput:>10.1f}{get_throughput:>10.1f}{peak:>16.1f}")
+
+    assert results["stream"][2] < results["unary"][2], "Streaming did not lower the server's memory high-water mark"
+
+
+@pytest.mark.asyncio
+async def test_compression_ratio_and_cost():
+    """Measure store size, throughput and per-value CPU cost with and without value compression."""
+    num_requests = 3000
+    ports = (50097, 50098)
+    semaphore = asyncio.Semaphore(50)
+    values = [json.dumps({"id": i, "user": f"user_{i}", "email": f"user_{i}@example.com", "active": i % 3 == 0,
+                          "roles": ["reader", "writer"] if i % 2 else ["reader"], "region": "us-east-1",
+                          "preferences": {"theme": "dark", "language": "en", "notifications": True},
+                          "created_at": f"2024-01-{i % 28 + 1:02d}T12:00:00Z"}) for i in range(num_requests)]
+    results = {}
+
+    async def limited(request):
+        async with semaphore:
+            return await request
+
+    for compression in ["off", "zlib"]:
+        subprocess.run("rm -rf /tmp/kv_zip_*", shell=True)
+        servers = [subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                     f"--db-path=/tmp/kv_zip_db_{port}", f"--replication-log=/tmp/kv_zip_rlog_{port}"]
+                                    + ([f"--compression={compression}"] if compression != "off" else []),
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                   for port, peer in [ports, ports[::-1]]]
+        try:
+            client = KeyValueClient([f"localhost:{ports[0]}"])
+            assert await wait_for_server(client, f"localhost:{ports[0]}"), "Server did not start"
+            start_time = time.time()
+            await asyncio.gather(*[limited(client.put(f"zip_{i}", value)) for i, value in enumerate(values)])
+            put_throughput = num_requests / (time.time() - start_time)
+            start_time = time.time()
+            read = await asyncio.gather(*[limited(client.get(f"zip_{i}")) for i in range(num_requests)])
+            get_throughput = num_requests / (time.time() - start_time)
+            assert read == values, f"Values read back with compression {compression} differ"
+            stats = await client.stats()
+            await client.kv_shutdown()
+
+            replica = KeyValueClient([f"localhost:{ports[1]}"])
+            assert await wait_for_server(replica, f"localhost:{ports[1]}"), "Replica did not start"
+            for _ in range(50):  # Replication batches are gzip-compressed between compressing nodes
+                if await replica.get(f"zip_{num_requests - 1}") == values[-1]:
+                    break
+                await asyncio.sleep(0.1)
+            replicated = await replica.get(f"zip_{num_requests - 1}")
+            await replica.kv_shutdown()
+            assert replicated == values[-1], f"Writes did not reach the replica with compression {compression}"
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait()
+        size = os.path.getsize(f"/tmp/kv_zip_db_{ports[0]}/data.mdb") / 1024
+        results[compression] = (put_throughput, get_throughput, size, stats["compression_ratio"],
+                                stats["compression_us_per_op"], stats["decompression_us_per_op"])
+    subprocess.run("rm -rf /tmp/kv_zip_*", shell=True)
+
+    print(f"{'compression':<12}{'PUT req/sec':>12}{'GET req/sec':>12}{'store KB':>10}{'ratio':>7}"
+          f"{'us/compress':>13}{'us/decompress':>15}")
+    for compression, (put_throughput, get_throughput, size, ratio, compress_us, decompress_us) in results.items():
+        print(f"{compression:<12}{put_throughput:>12.2f}{get_throughput:>12.2f}{size:>10.0f}{ratio:>7.2f}"
+              f"{compress_us:>13.1f}{decompress_us:>15.1f}")
+
+    assert results["zlib"][3] > 2, f"Values compressed only {results['zlib'][3]:.2f}x"
+    assert results["zlib"][2] < results["off"][2], "Compression did not shrink the store"
+
+
+@pytest.mark.asyncio
+async def test_tiered_storage_savings_and_latency():
+    """Measure the space cold segments save over LMDB, and GET latency on hot, cold and promoted keys."""
+    num_keys, num_hot, num_sampled = 5000, 500, 300
+    port = 50099
+    subprocess.run("rm -rf /tmp/kv_tier_*", shell=True)
+    server = subprocess.Popen(["python", "server/async_server.py", f"--port={port}", "--peers=",
+                               f"--db-path=/tmp/kv_tier_db_{port}", f"--replication-log=/tmp/kv_tier_rlog_{port}",
+                               "--tiering-interval=1"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        client = KeyValueClient([f"localhost:{port}"])
+        assert await wait_for_server(client, f"localhost:{port}"), "Server did not start"
+        values = {f"tier_{i:05d}": json.dumps({"id": i, "user": f"user_{i}", "region": "us-east-1",
+                                                "payload": "abcdefgh" * 20}) for i in range(num_keys)}
+        semaphore = asyncio.Semaphore(50)
+
+        async def put(key, value):
+            async with semaphore:
+                await client.put(key, value)
+
+        await asyncio.gather(*[put(key, value) for key, value in values.items()])
+        keys = list(values)
+        hot, cold = keys[:num_hot], keys[num_hot:]
+
+        tiered = {}
+        deadline = time.time() + 15
+        while time.time() < deadline:  # Keep the hot keys hot until passes moved the others out
+            for key in hot:
+                await client.get(key)
+            tiered = await client.stats()
+            if tiered.get("tiering_demoted", 0) >= len(cold):
+                break
+
+        async def latencies(sample):
+            timings = []
+            for key in sample:
+                start = time.perf_counter()
+                assert await client.get(key) == values[key], f"Wrong value for {key}"
+                timings.append((time.perf_counter() - start) * 1000)
+            return np.median(timings)
+
+        hot_ms = await latencies(hot[:num_sampled])
+        cold_ms = await latencies(cold[::len(cold) // num_sampled][:num_sampled])
+        promoted_ms = await latencies(cold[::len(cold) // num_sampled][:num_sampled])
+        final = await client.stats()
+        await client.kv_shutdown()
+    finally:
+        server.terminate()
+        server.wait()
+    subprocess.run("rm -rf /tmp/kv_tier_*", shell=True)
+
+    print(f"Moved {tiered['tiering_demoted']:.0f} keys ({tiered['tiering_demoted_bytes'] / 1024:.0f} KB of records) "
+          f"of {num_keys} out of LMDB into {tiered['tiering_segments']:.0f} cold segments of "
+          f"{tiered['tiering_cold_bytes'] / 1024:.0f} KB; LMDB pages in use afterwards: "
+          f"{tiered['lmdb_used_bytes'] / 1024:.0f} KB")
+    print(f"Memory: sparse index + bloom filters {tiered['tiering_index_bytes'] / 1024:.1f} KB, "
+          f"access sketch {tiered['tiering_sketch_bytes'] / 1024:.0f} KB")
+    print(f"GET p50: hot {hot_ms:.3f} ms, cold {cold_ms:.3f} ms, promoted {promoted_ms:.3f} ms; "
+          f"{final['tiering_block_reads_per_hit']:.2f} block reads per cold hit")
+
+    assert tiered["tiering_demoted"] >= len(cold), "The cold keys were not moved out of LMDB"
+    assert tiered["tiering_cold_bytes"] < tiered["tiering_demoted_bytes"] / 2, "Cold segments are not smaller"
+    assert tiered["lmdb_used_bytes"] < tiered["tiering_demoted_bytes"], "Moving keys out did not free LMDB pages"
+    assert final["tiering_block_reads_per_hit"] <= 1.1, "Cold GETs read more than one block"
+
+
+@pytest.mark.asyncio
+async def test_dedup_space_and_replication_bandwidth():
+    """Measure store size and replication bytes with and without dedup on values drawn from a few popular payloads."""
+    num_requests, num_payloads = 3000, 50
+    ports = (50101, 50102)
+    semaphore = asyncio.Semaphore(50)
+    payloads = [json.dumps({"config": i, "settings": {f"option_{j}": f"default_{i}_{j}" for j in range(60)}})
+                for i in range(num_payloads)]
+    rng = random.Random(49)
+    weights = [1 / (rank + 1) for rank in range(num_payloads)]  # Zipf: a few defaults hold most keys
+    values = rng.choices(payloads, weights, k=num_requests)
+    results = {}
+
+    async def limited(request):
+        async with semaphore:
+            return await request
+
+    for dedup in ["off", "on"]:
+        subprocess.run("rm -rf /tmp/kv_dedup_*", shell=True)
+        servers = [subprocess.Popen(["python", "server/async_server.py", f"--port={port}", f"--peers=localhost:{peer}",
+                                     f"--db-path=/tmp/kv_dedup_db_{port}", f"--replication-log=/tmp/kv_dedup_rlog_{port}"]
+                                    + (["--dedup-threshold=512"] if dedup == "on" else []),
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                   for port, peer in [ports, ports[::-1]]]
+        try:
+            client = KeyValueClient([f"localhost:{ports[0]}"])
+            assert await wait_for_server(client, f"localhost:{ports[0]}"), "Server did not start"
+            start_time = time.time()
+            await asyncio.gather(*[limited(client.put(f"dedup_{i}", value)) for i, value in enumerate(values)])
+            put_throughput = num_requests / (time.time() - start_time)
+            read = await asyncio.gather(*[limited(client.get(f"dedup_{i}")) for i in range(num_requests)])
+            assert read == values, f"Values read back with dedup {dedup} differ"
+
+            replica = KeyValueClient([f"localhost:{ports[1]}"])
+            assert await wait_for_server(replica, f"localhost:{ports[1]}"), "Replica did not start"
+            peer = f"localhost:{ports[1]}"
+            for _ in range(100):
+                stats = await client.stats()
+                if stats[f"replication_acked_seq_{peer}"] >= num_requests:
+                    break
+                await asyncio.sleep(0.1)
+            replicated = await asyncio.gather(*[limited(replica.get(f"dedup_{i}")) for i in range(num_requests)])
+            assert replicated == values, f"The replica holds different values with dedup {dedup}"
+            await replica.kv_shutdown()
+            await client.kv_shutdown()
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait()
+        sizes = [os.path.getsize(f"/tmp/kv_dedup_db_{port}/data.mdb") / 1024 for port in ports]
+        results[dedup] = (put_throughput, sizes[0], sizes[1], stats[f"replication_bytes_{peer}"] / 1024,
+                          stats.get(f"replication_bodies_skipped_{peer}", 0), stats.get("dedup_bodies", 0))
+    subprocess.run("rm -rf /tmp/kv_dedup_*", shell=True)
+
+    print(f"{num_requests} values drawn from {num_payloads} payloads of about {len(payloads[0])} bytes")
+    print(f"{'dedup':<7}{'PUT req/sec':>12}{'store KB':>10}{'replica KB':>12}{'shipped KB':>12}"
+          f"{'sent as hash':>14}{'bodies':>8}")
+    for dedup, (put_throughput, size, replica_size, shipped, skipped, bodies) in results.items():
+        print(f"{dedup:<7}{put_throughput:>12.2f}{size:>10.0f}{replica_size:>12.0f}{shipped:>12.0f}"
+              f"{skipped:>14.0f}{bodies:>8.0f}")
+
+    assert results["on"][1] < results["off"][1] / 2, "Dedup did not shrink the store"
+    assert results["on"][3] < results["off"][3] / 2, "Dedup did not cut replication bytes"
+
+
+@pytest.mark.asyncio
+async def test_namespace_scan_and_drop_vs_key_prefixes():
+    """Compare listing and dropping one tenant's keys kept in a namespace and under a key prefix of the shared keyspace."""
+    import grpc
+    import kvstore_pb2
+    import kvstore_pb2_grpc
+
+    port, tenants, keys_per_tenant, batch = 50105, 4, 5000, 500
+    subprocess.run("rm -rf /tmp/kv_ns_bench_*", shell=True)
+    server = subprocess.Popen(["python", "server/async_server.py", f"--port={port}", "--peers=",
+                               f"--db-path=/tmp/kv_ns_bench_db_{port}", f"--replication-log=/tmp/kv_ns_bench_rlog_{port}"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        client = KeyValueClient([f"localhost:{port}"])
+        assert await wait_for_server(client, f"localhost:{port}"), "Server did not start"
+        channel = grpc.aio.insecure_channel(f"localhost:{port}")
+        stub = kvstore_pb2_grpc.KeyValueStoreStub(channel)
+
+        async def write(namespace, prefix, op):
+            for first in range(0, keys_per_tenant, batch):
+                await stub.BatchWrite(kvstore_pb2.MutationBatch(mutations=[
+                    kvstore_pb2.Mutation(op=op, key=f"{prefix}key_{i:06d}", value="x" * 100, namespace=namespace)
+                    for i in range(first, first + batch)]))
+
+        async def median_ms(call, rounds=5):
+            times = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                result = await call()
+                times.append((time.perf_counter() - start) * 1000)
+            return float(np.median(times)), result
+
+        for tenant in range(tenants):  # The same data twice: one namespace per tenant, and prefixed default keys
+            await write(f"tenant_{tenant}", "", kvstore_pb2.Mutation.PUT)
+            await write("", f"tenant_{tenant}/", kvstore_pb2.Mutation.PUT)
+
+        namespace_scan, namespace_keys = await median_ms(lambda: client.list_keys(namespace="tenant_0"))
+
+        async def prefix_keys():
+            return [key for key in await client.list_keys() if key.startswith("tenant_0/")]
+        prefix_scan, keys = await median_ms(prefix_keys)
+        assert len(namespace_keys) == len(keys) == keys_per_tenant
+
+        used_bytes = (await client.stats())["namespace_bytes_tenant_0"]
+        start = time.perf_counter()
+        dropped = await client.drop_namespace("tenant_0")
+        namespace_drop = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        await write("", "tenant_0/", kvstore_pb2.Mutation.DELETE)  # Leaves a tombstone per key
+        prefix_drop = (time.perf_counter() - start) * 1000
+
+        assert dropped == keys_per_tenant
+        assert len(await client.list_keys(namespace="tenant_0")) == 0 and not await prefix_keys()
+        assert len(await client.list_keys(namespace="tenant_1")) == keys_per_tenant, "Drop touched another tenant"
+        stats = await client.stats()
+        await channel.close()
+        await client.kv_shutdown()
+    finally:
+        server.terminate()
+        server.wait()
+    subprocess.run("rm -rf /tmp/kv_ns_bench_*", shell=True)
+
+    print(f"{tenants} tenants x {keys_per_tenant} keys; tenant_0 took {used_bytes / 1024:.0f} KB as a namespace")
+    print(f"{'layout':<11}{'scan ms':>10}{'drop ms':>10}")
+    print(f"{'namespace':<11}{namespace_scan:>10.2f}{namespace_drop:>10.2f}")
+    print(f"{'prefix':<11}{prefix_scan:>10.2f}{prefix_drop:>10.2f}")
+    print(f"Server-side drop, commit included: {stats['namespace_drop_ms']:.2f} ms")
+
+    assert namespace_scan < prefix_scan, "Listing a namespace was not faster than filtering the shared keyspace"
+    assert namespace_drop < prefix_drop / 2, "Dropping a namespace was not much faster than deleting its keys"